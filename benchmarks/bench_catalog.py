@@ -0,0 +1,57 @@
+"""
+VM catalog refresh with 10,000 disk images in ~/.cyberos/vms.
+"""
+
+from types import SimpleNamespace
+
+from harness import Context, benchmark
+from bench_config import checked
+from cyberos_control import CyberOSControlCenter
+from cyberos_emulator import CyberOSEmulatorGUI
+from vm_config import VMStore
+
+IMAGES = 10000
+
+
+def catalog(context: Context) -> VMStore:
+    """A home directory with IMAGES empty disks, each with a stored record."""
+    vm_dir = context.work_dir / ".cyberos" / "vms"
+    vm_dir.mkdir(parents=True)
+    for i in range(IMAGES):
+        (vm_dir / f"vm-{i:05d}.qcow2").touch()
+    # The Control Center looks in ~/.cyberos/vms
+    context.setenv("HOME", str(context.work_dir))
+    store = VMStore(context.work_dir / ".cyberos" / "vms.sqlite")
+    store.import_flat_config(context.work_dir / ".cyberos_vm.conf", vm_dir)
+    return store
+
+
+@benchmark("catalog.refresh", rounds=10, tolerance=0.5)
+def refresh_emulator(context: Context):
+    """Emulator GUI: refresh_vm_list() with 10,000 images and records"""
+    widgets = context.widgets
+    store = catalog(context)
+    form = SimpleNamespace(vm_listbox=widgets.listbox(), vm_name_combo=widgets.combobox(), vm_store=store,
+                           vm_dir=context.work_dir / ".cyberos" / "vms", vm_names=[])
+
+    def call():
+        CyberOSEmulatorGUI.refresh_vm_list(form)
+        assert len(form.vm_names) == IMAGES
+
+    return call
+
+
+@benchmark("catalog.refresh.control_center", rounds=10, tolerance=0.5)
+def refresh_control_center(context: Context):
+    """Control Center: refresh_vm_list() with 10,000 images and records"""
+    widgets = context.widgets
+    messages = checked(context)
+    form = SimpleNamespace(vm_listbox=widgets.listbox(), emu_name_combo=widgets.combobox(),
+                           vm_store=catalog(context), use_daemon_var=widgets.var(False),
+                           log_entry=lambda source, message: messages.append(message))
+
+    def call():
+        CyberOSControlCenter.refresh_vm_list(form)
+        assert form.vm_listbox.size() == IMAGES
+
+    return call
@@ -0,0 +1,101 @@
+"""
+Configuration loading: the launchers' load_config and build.conf.
+"""
+
+import shutil
+from types import SimpleNamespace
+
+from harness import PROJECT_ROOT, Context, benchmark
+from build_variants import load_variants
+from cyberos_control import CyberOSControlCenter
+from cyberos_emulator import CyberOSEmulatorGUI
+from disk_profiles import DISK_PROFILES
+from vm_config import VMConfig, VMStore
+
+# Stored VMs the launcher picks from
+VMS = 1000
+# VMs loaded per timed call
+LOADS = 100
+# Extra variants next to the ones in config/variants
+EXTRA_VARIANTS = 20
+
+
+def populated_store(context: Context) -> VMStore:
+    store = VMStore(context.work_dir / "vms.sqlite")
+    profiles = list(DISK_PROFILES)
+    for i in range(VMS):
+        store.save(VMConfig(name=f"vm-{i:04d}", cores=1 + i % 8, memory=256 * (1 + i % 8),
+                            network=bool(i % 2), disk_profile=profiles[i % len(profiles)],
+                            direct_boot=bool(i % 3)))
+    return store
+
+
+def checked(context: Context) -> list:
+    """A list to pass as add_status/log_entry; the benchmark fails if anything lands in it."""
+    messages = []
+
+    def check():
+        if messages:
+            raise RuntimeError(f"the code path reported: {messages[0].strip()}")
+
+    context.on_cleanup(check)
+    return messages
+
+
+@benchmark("config.load_config", rounds=20)
+def load_config(context: Context):
+    """Emulator GUI: load_config() of 100 stored VMs into the launcher form"""
+    widgets = context.widgets
+    store = populated_store(context)
+    form = SimpleNamespace(
+        vm_store=store, variants=load_variants(PROJECT_ROOT), add_status=checked(context).append,
+        vm_name_var=widgets.var(""), cores_var=widgets.var(0), memory_var=widgets.var(0),
+        disk_size_var=widgets.var(0), network_var=widgets.var(False), display_var=widgets.var(""),
+        disk_profile_var=widgets.var(""), memory_backend_var=widgets.var(""), mem_prealloc_var=widgets.var(False),
+        balloon_var=widgets.var(False), direct_boot_var=widgets.var(False), share_var=widgets.var("off"),
+        share_mode_var=widgets.var(""), variant_var=widgets.var(""), pool_size_var=widgets.var(0),
+    )
+    names = [f"vm-{i:04d}" for i in range(0, VMS, VMS // LOADS)]
+
+    def call():
+        for name in names:
+            CyberOSEmulatorGUI.load_config(form, name)
+
+    return call
+
+
+@benchmark("config.load_config.control_center", rounds=20)
+def load_emulator_config(context: Context):
+    """Control Center: load_emulator_config() of 100 stored VMs into the Emulator tab"""
+    widgets = context.widgets
+    name_var = widgets.var("")
+    form = SimpleNamespace(
+        vm_store=populated_store(context), emu_name_var=name_var, emu_cores_var=widgets.var(0),
+        emu_memory_var=widgets.var(0), emu_disk_var=widgets.var(0), emu_network_var=widgets.var(False),
+        emu_display_var=widgets.var(""), emu_disk_profile_var=widgets.var(""),
+        emu_direct_boot_var=widgets.var(False),
+    )
+    names = [f"vm-{i:04d}" for i in range(0, VMS, VMS // LOADS)]
+
+    def call():
+        for name in names:
+            name_var.set(name)
+            CyberOSControlCenter.load_emulator_config(form)
+
+    return call
+
+
+@benchmark("config.build_conf", rounds=50)
+def build_conf(context: Context):
+    """load_variants(): config/build.conf merged with every config/variants/*.conf"""
+    config = context.work_dir / "config"
+    shutil.copytree(PROJECT_ROOT / "config", config)
+    template = (config / "variants" / "x86_64.conf").read_text()
+    for i in range(EXTRA_VARIANTS):
+        (config / "variants" / f"extra{i:02d}.conf").write_text(template)
+
+    def call():
+        variants = load_variants(context.work_dir)
+        assert len(variants) > EXTRA_VARIANTS
+
+    return call
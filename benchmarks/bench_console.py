@@ -0,0 +1,75 @@
+"""
+Console ingestion: decoding VM output, indexing it and showing it.
+"""
+
+from types import SimpleNamespace
+
+from harness import Context, benchmark
+from console_stream import ConsoleDecoder, configure_tags
+from cyberos_emulator import CyberOSEmulatorGUI
+from log_index import LogIndex
+
+# Bytes of console output per timed call
+CONSOLE_BYTES = 4 * 1024 * 1024
+CHUNK = 65536
+# Lines per timed call of the console widget
+WIDGET_LINES = 2000
+
+
+def boot_log(size: int) -> bytes:
+    """Serial console output like a boot: kernel messages, coloured status lines, progress bars."""
+    sample = b"".join([
+        b"[    1.234567] usb 1-1: new high-speed USB device number 2 using ehci-pci\n" * 6,
+        b"\x1b[1;32m[  OK  ]\x1b[0m Started \x1b[0;1;39mJournal Service\x1b[0m.\n" * 3,
+        b"".join(b"\rCopying rootfs %3d%% [%-20s]" % (p, b"#" * (p // 5)) for p in range(0, 101, 10)) + b"\n",
+    ])
+    return sample * (size // len(sample))
+
+
+@benchmark("console.decode", rounds=10)
+def decode(context: Context):
+    """ConsoleDecoder: 4 MB of boot output in 64 KB chunks"""
+    data = boot_log(CONSOLE_BYTES)
+
+    def call():
+        decoder = ConsoleDecoder()
+        for offset in range(0, len(data), CHUNK):
+            decoder.feed(data[offset:offset + CHUNK])
+
+    return call
+
+
+@benchmark("console.ingest", rounds=5)
+def ingest(context: Context):
+    """Decode 4 MB of boot output and index every line in the log index"""
+    data = boot_log(CONSOLE_BYTES)
+    index = LogIndex(context.work_dir / "logs")
+
+    def call():
+        decoder = ConsoleDecoder()
+        session = index.open_session("vm", "bench")
+        for offset in range(0, len(data), CHUNK):
+            for line in decoder.feed(data[offset:offset + CHUNK]):
+                session.feed_line(line)
+        session.close()
+        assert index.flush(timeout=300)
+
+    return call
+
+
+@benchmark("console.widget", rounds=10, needs_tk=True)
+def widget(context: Context):
+    """Emulator GUI: add_console_line() of 2,000 decoded lines into the console view"""
+    text = context.widgets.text()
+    configure_tags(text)
+    lines = ConsoleDecoder().feed(boot_log(256 * 1024))[:WIDGET_LINES]
+    form = SimpleNamespace(console_text=text)
+
+    def call():
+        text.delete("1.0", "end")
+        text.mark_set("partial", "end-1c")
+        text.mark_gravity("partial", "left")
+        for line in lines:
+            CyberOSEmulatorGUI.add_console_line(form, line)
+
+    return call
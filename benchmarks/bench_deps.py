@@ -0,0 +1,36 @@
+"""
+Dependency probing: the Dashboard's and the Dependencies tab's PATH lookups.
+"""
+
+from types import SimpleNamespace
+
+from harness import Context, benchmark
+from build_variants import load_variants
+from cyberos_control import CyberOSControlCenter
+from project_status import dependency_status
+
+
+@benchmark("deps.probe", rounds=50, tolerance=0.5)
+def probe(context: Context):
+    """dependency_status() plus the QEMU binary and firmware of every build variant"""
+    variants = list(load_variants().values())
+
+    def call():
+        dependency_status()
+        for variant in variants:
+            variant.missing()
+
+    return call
+
+
+@benchmark("deps.control_center", rounds=50, tolerance=0.5)
+def control_center(context: Context):
+    """Control Center: check_dependencies() filling the Dependencies tab"""
+    widgets = context.widgets
+    form = SimpleNamespace(deps_listbox=widgets.listbox(), system_info_label=widgets.label(),
+                           log_entry=lambda source, message: None)
+
+    def call():
+        CyberOSControlCenter.check_dependencies(form)
+
+    return call
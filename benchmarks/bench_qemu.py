@@ -0,0 +1,47 @@
+"""
+QEMU command construction for the launch paths the GUIs and tools use.
+"""
+
+from dataclasses import replace
+from pathlib import Path
+
+from harness import PROJECT_ROOT, Context, benchmark
+from build_variants import load_variants
+from direct_boot import DirectBoot
+from rootfs_share import RootfsShare
+from vm_command import VMSpec, build_qemu_command
+from vm_network import NetworkPlan
+
+# Commands built per timed call
+BUILDS = 1000
+
+
+def specs(work_dir: Path):
+    """One spec per kind of launch: ISO, disk, direct boot, shared rootfs, VNC, QMP, cluster links, variants."""
+    iso = PROJECT_ROOT / "iso" / "cyberos-0.1.0-alpha.iso"
+    direct = DirectBoot.for_project(PROJECT_ROOT)
+    base = VMSpec(name="bench", cores=2, memory=1024, iso_file=iso)
+    plan = NetworkPlan(["a", "b", "c"], "lan", "switch", work_dir)
+    variants = load_variants(PROJECT_ROOT).values()
+    return [
+        base,
+        replace(base, disk_file=work_dir / "disk.qcow2", network=True, balloon=True),
+        replace(base, direct_boot=direct, display="serial", qmp_socket=work_dir / "qmp.sock"),
+        replace(base, direct_boot=direct, rootfs_share=RootfsShare.for_project(PROJECT_ROOT, "9p")),
+        replace(base, direct_boot=direct, rootfs_share=RootfsShare.for_project(PROJECT_ROOT, "virtiofs",
+                                                                              socket=work_dir / "fs.sock")),
+        replace(base, display="vnc", vnc_display=3, vnc_websocket=5703, memory_backend="memfd", mem_prealloc=True),
+        replace(base, display="serial", net_args=plan.qemu_args("b")),
+    ] + [variant.apply(replace(base, disk_file=work_dir / "disk.qcow2")) for variant in variants]
+
+
+@benchmark("qemu.command", rounds=20)
+def command(context: Context):
+    """build_qemu_command(): 1,000 command lines across every kind of launch"""
+    launches = specs(context.work_dir)
+
+    def call():
+        for i in range(BUILDS):
+            build_qemu_command(launches[i % len(launches)])
+
+    return call
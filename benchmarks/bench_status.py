@@ -0,0 +1,45 @@
+"""
+Dashboard status refresh on this project tree.
+"""
+
+from types import SimpleNamespace
+
+from harness import PROJECT_ROOT, Context, benchmark
+from cyberos_control import CyberOSControlCenter
+from project_status import StatusService, render_status
+
+ISO_FILE = PROJECT_ROOT / "iso" / "cyberos-0.1.0-alpha.iso"
+
+
+@benchmark("status.refresh", rounds=50, tolerance=0.5)
+def refresh(context: Context):
+    """StatusService.refresh(): collect and render the Dashboard status"""
+    service = StatusService(PROJECT_ROOT, ISO_FILE, lambda lines: None)
+
+    def call():
+        service.lines = []
+        service.refresh()
+
+    return call
+
+
+@benchmark("status.fingerprint", rounds=200, tolerance=0.5)
+def fingerprint(context: Context):
+    """StatusService.fingerprint(): the mtime poll run every two seconds"""
+    service = StatusService(PROJECT_ROOT, ISO_FILE, lambda lines: None)
+    return service.fingerprint
+
+
+@benchmark("status.repaint", rounds=50, needs_tk=True)
+def repaint(context: Context):
+    """Control Center: apply_status_lines() alternating between two statuses that differ in one line"""
+    lines = render_status(PROJECT_ROOT, ISO_FILE)
+    changed = list(lines)
+    changed[3] += " (changed)"
+    form = SimpleNamespace(status_text=context.widgets.text(), status_lines=[])
+    CyberOSControlCenter.apply_status_lines(form, lines)
+
+    def call():
+        CyberOSControlCenter.apply_status_lines(form, changed if form.status_lines is lines else lines)
+
+    return call
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS Benchmark Harness
+Registry, timing, JSON baselines and comparison for the host-side benchmarks.
+
+A benchmark is a setup function registered with @benchmark. It gets a
+Context (a scratch directory and a widget factory) and returns the call to
+time. Each call is timed `rounds` times after one warm-up call, with the
+garbage collector off as timeit does, and the median, minimum and mean are
+kept. The whole suite can be repeated; repeated runs are interleaved so a
+slow patch on the host hits one run of each benchmark, not every run of one.
+
+GUI code paths run against real Tk widgets when a display is available
+(such as under xvfb-run) and against the stand-ins below otherwise, so the
+suite also runs on a build box with no X server. Results record which was
+used, since the two are not comparable.
+"""
+
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "emulator" / "gui"))
+sys.path.insert(0, str(PROJECT_ROOT / "tools"))
+
+RESULTS_VERSION = 1
+DEFAULT_TOLERANCE = 0.25
+# Differences below this are noise whatever the ratio (seconds)
+MIN_DELTA = 50e-6
+
+
+# ==================== Widgets ====================
+
+class FakeVar:
+    """Stand-in for a Tk variable."""
+
+    def __init__(self, value: Any = None):
+        self.value = value
+
+    def get(self) -> Any:
+        return self.value
+
+    def set(self, value: Any):
+        self.value = value
+
+
+class FakeWidget:
+    """Stand-in for a Tk widget that only keeps its options."""
+
+    def __init__(self):
+        self.options: Dict[str, Any] = {}
+
+    def config(self, cnf: Optional[Dict] = None, **options):
+        self.options.update(cnf or {}, **options)
+
+    configure = config
+
+    def cget(self, option: str) -> Any:
+        return self.options.get(option)
+
+
+class FakeListbox(FakeWidget):
+    """Stand-in for a Tk Listbox."""
+
+    def __init__(self):
+        super().__init__()
+        self.items: List[str] = []
+
+    def delete(self, first, last=None):
+        first = 0 if first == "end" else int(first)
+        if last is None:
+            del self.items[first:first + 1]
+        else:
+            del self.items[first:None if last == "end" else int(last) + 1]
+
+    def insert(self, index, *items: str):
+        position = len(self.items) if index == "end" else int(index)
+        self.items[position:position] = items
+
+    def size(self) -> int:
+        return len(self.items)
+
+
+class Widgets:
+    """Makes real Tk widgets when there is a display, stand-ins otherwise."""
+
+    def __init__(self, fake: bool = False):
+        self.root = None
+        if not fake:
+            try:
+                import tkinter
+                self.root = tkinter.Tk()
+                self.root.withdraw()
+            except Exception:
+                self.root = None
+
+    @property
+    def real(self) -> bool:
+        return self.root is not None
+
+    def var(self, value: Any = None):
+        if not self.real:
+            return FakeVar(value)
+        import tkinter
+        kind = {bool: tkinter.BooleanVar, int: tkinter.IntVar}.get(type(value), tkinter.StringVar)
+        return kind(self.root, value=value)
+
+    def listbox(self):
+        if not self.real:
+            return FakeListbox()
+        import tkinter
+        return tkinter.Listbox(self.root)
+
+    def combobox(self):
+        if not self.real:
+            return FakeWidget()
+        from tkinter import ttk
+        return ttk.Combobox(self.root)
+
+    def label(self):
+        if not self.real:
+            return FakeWidget()
+        from tkinter import ttk
+        return ttk.Label(self.root)
+
+    def text(self):
+        """A Text widget (there is no stand-in: benchmarks of it need a display)."""
+        import tkinter
+        return tkinter.Text(self.root)
+
+    def update(self):
+        """Let Tk process pending work, so its cost lands in the timed call."""
+        if self.real:
+            self.root.update_idletasks()
+
+    def close(self):
+        if self.root is not None:
+            self.root.destroy()
+            self.root = None
+
+
+# ==================== Registry ====================
+
+@dataclass
+class Context:
+    """What a benchmark's setup gets: a scratch directory and widgets."""
+    work_dir: Path
+    widgets: Widgets
+    _cleanups: List[Callable[[], None]] = field(default_factory=list)
+
+    def on_cleanup(self, fn: Callable[[], None]):
+        """Run fn once the benchmark is done (after the last round)."""
+        self._cleanups.append(fn)
+
+    def setenv(self, name: str, value: str):
+        """Set an environment variable for the benchmark's duration."""
+        previous = os.environ.get(name)
+        os.environ[name] = value
+        self.on_cleanup(lambda: os.environ.__setitem__(name, previous) if previous is not None
+                        else os.environ.pop(name, None))
+
+    def cleanup(self):
+        for fn in reversed(self._cleanups):
+            fn()
+        self._cleanups.clear()
+
+
+@dataclass
+class Benchmark:
+    """A registered benchmark."""
+    name: str
+    setup: Callable[[Context], Callable[[], Any]]
+    description: str
+    rounds: int = 20
+    needs_tk: bool = False
+    # Overrides the comparison tolerance for noisy paths
+    tolerance: Optional[float] = None
+
+
+BENCHMARKS: Dict[str, Benchmark] = {}
+
+
+def benchmark(name: str, rounds: int = 20, needs_tk: bool = False, tolerance: Optional[float] = None):
+    """Register a setup function; its docstring's first line describes the benchmark."""
+    def register(setup: Callable[[Context], Callable[[], Any]]):
+        description = (setup.__doc__ or name).strip().splitlines()[0]
+        BENCHMARKS[name] = Benchmark(name, setup, description, rounds, needs_tk, tolerance)
+        return setup
+    return register
+
+
+def load_suite():
+    """Import every bench_*.py next to this file so they register themselves."""
+    import importlib
+    for module in sorted(Path(__file__).resolve().parent.glob("bench_*.py")):
+        importlib.import_module(module.stem)
+
+
+# ==================== Running ====================
+
+@dataclass
+class Result:
+    """Timings of one benchmark, in seconds per call."""
+    name: str
+    description: str
+    median: float = 0.0
+    min: float = 0.0
+    mean: float = 0.0
+    rounds: int = 0
+    skipped: str = ""
+
+
+def run_benchmark(bench: Benchmark, widgets: Widgets, rounds: Optional[int] = None) -> Result:
+    """Set a benchmark up in a scratch directory and time its call."""
+    result = Result(bench.name, bench.description)
+    if bench.needs_tk and not widgets.real:
+        result.skipped = "needs a display (run under xvfb-run)"
+        return result
+    work_dir = Path(tempfile.mkdtemp(prefix=f"cyberos-bench-{bench.name}-"))
+    context = Context(work_dir, widgets)
+    try:
+        call = bench.setup(context)
+        call()
+        widgets.update()
+        times = []
+        gc.collect()
+        gc.disable()
+        try:
+            for _ in range(rounds or bench.rounds):
+                started = time.perf_counter()
+                call()
+                widgets.update()
+                times.append(time.perf_counter() - started)
+        finally:
+            gc.enable()
+    finally:
+        context.cleanup()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    result.median = statistics.median(times)
+    result.min = min(times)
+    result.mean = statistics.fmean(times)
+    result.rounds = len(times)
+    return result
+
+
+def combine_results(runs: List[Result]) -> Result:
+    """Merge repeated runs of one benchmark: the median of their medians, the fastest round."""
+    timed = [run for run in runs if not run.skipped]
+    if not timed:
+        return runs[0]
+    return Result(timed[0].name, timed[0].description,
+                  median=statistics.median(run.median for run in timed),
+                  min=min(run.min for run in timed),
+                  mean=statistics.fmean(run.mean for run in timed),
+                  rounds=sum(run.rounds for run in timed))
+
+
+def host_info(widgets: Widgets) -> Dict[str, Any]:
+    return {"platform": platform.platform(), "machine": platform.machine(), "python": platform.python_version(),
+            "cpus": os.cpu_count(), "widgets": "tk" if widgets.real else "stand-in"}
+
+
+def save_results(path: Path, results: List[Result], host: Dict[str, Any]):
+    """Write results as a JSON baseline (skipped benchmarks are left out)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {"version": RESULTS_VERSION, "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "host": host,
+            "results": {r.name: {k: v for k, v in asdict(r).items() if k not in ("name", "skipped")}
+                        for r in results if not r.skipped}}
+    path.write_text(json.dumps(data, indent=2) + "\n")
+
+
+def load_results(path: Path) -> Dict[str, Any]:
+    data = json.loads(path.read_text())
+    if data.get("version") != RESULTS_VERSION:
+        raise ValueError(f"{path}: unsupported results version {data.get('version')!r}")
+    return data
+
+
+# ==================== Comparison ====================
+
+@dataclass
+class Comparison:
+    """One benchmark in a baseline compared with a new run."""
+    name: str
+    status: str  # ok, regressed, improved, new or missing
+    baseline: Optional[float] = None
+    current: Optional[float] = None
+    tolerance: float = DEFAULT_TOLERANCE
+
+    @property
+    def ratio(self) -> Optional[float]:
+        if self.baseline and self.current is not None:
+            return self.current / self.baseline
+        return None
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float = DEFAULT_TOLERANCE,
+            metric: str = "median") -> List[Comparison]:
+    """Compare two sets of results; a path regresses when it is slower by more than its tolerance."""
+    tolerances = {name: bench.tolerance for name, bench in BENCHMARKS.items() if bench.tolerance is not None}
+    old, new = baseline["results"], current["results"]
+    rows = []
+    for name in sorted(set(old) | set(new)):
+        limit = tolerances.get(name, tolerance)
+        if name not in new:
+            rows.append(Comparison(name, "missing", old[name][metric], tolerance=limit))
+            continue
+        if name not in old:
+            rows.append(Comparison(name, "new", current=new[name][metric], tolerance=limit))
+            continue
+        before, after = old[name][metric], new[name][metric]
+        status = "ok"
+        if after > before * (1 + limit) and after - before > MIN_DELTA:
+            status = "regressed"
+        elif after < before / (1 + limit) and before - after > MIN_DELTA:
+            status = "improved"
+        rows.append(Comparison(name, status, before, after, limit))
+    return rows
+
+
+def format_seconds(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "-"
+    if seconds >= 1:
+        return f"{seconds:.2f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.0f} µs"
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS Benchmarks
+Times the host-side Python code paths and gates on regressions against a baseline.
+
+Covers configuration loading, the VM catalog with 10,000 images, console
+ingestion, dependency probing, the Dashboard status refresh and QEMU
+command construction (bench_*.py). Results are saved as JSON; comparing a
+run with a baseline fails when any path got slower by more than the
+tolerance (25% of the median by default, more for paths that depend on
+the filesystem). The suite runs several times, interleaved, and each
+benchmark's runs are combined; a regression only counts if it still shows
+once the benchmark has been run again. Baselines only mean something on
+the host they were recorded on.
+
+Usage:
+    python3 benchmarks/run.py                          # run everything, print a table
+    python3 benchmarks/run.py -k catalog --rounds 3
+    python3 benchmarks/run.py --save baseline.json     # record a baseline
+    python3 benchmarks/run.py --check baseline.json    # run and fail on regressions
+    python3 benchmarks/run.py compare old.json new.json --tolerance 0.1
+    xvfb-run python3 benchmarks/run.py                 # with real Tk widgets
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from harness import (BENCHMARKS, DEFAULT_TOLERANCE, Comparison, Result, Widgets, combine_results, compare,
+                     format_seconds, host_info, load_results, load_suite, run_benchmark, save_results)
+
+
+def print_comparison(rows: List[Comparison], metric: str) -> int:
+    """Print a comparison table; the number of regressions."""
+    print(f"{'benchmark':<36} {'baseline':>10} {'current':>10} {'change':>8}  status ({metric})")
+    for row in rows:
+        change = f"{(row.ratio - 1) * 100:+.0f}%" if row.ratio is not None else "-"
+        status = row.status
+        if row.status == "regressed":
+            status += f" (over {row.tolerance * 100:.0f}%)"
+        print(f"{row.name:<36} {format_seconds(row.baseline):>10} {format_seconds(row.current):>10} "
+              f"{change:>8}  {status}")
+    regressions = sum(1 for row in rows if row.status == "regressed")
+    print(f"\n{regressions} regression(s) in {len(rows)} benchmark(s)")
+    return regressions
+
+
+def print_result(result: Result):
+    if result.skipped:
+        print(f"{result.name:<36} skipped: {result.skipped}")
+    else:
+        print(f"{result.name:<36} {format_seconds(result.median):>10} median  "
+              f"{format_seconds(result.min):>10} min  ({result.rounds} rounds)  {result.description}")
+
+
+def as_results(results: List[Result], host: Dict) -> Dict:
+    """Results in the shape compare() takes."""
+    return {"host": host, "results": {r.name: vars(r) for r in results if not r.skipped}}
+
+
+def confirm_regressions(runs: Dict[str, List[Result]], baseline: Dict, host: Dict, widgets: Widgets,
+                        rounds: Optional[int], tolerance: float, metric: str, retries: int):
+    """Run benchmarks that look regressed again and fold the new runs in.
+
+    Filesystem-heavy paths can be slowed for a while by unrelated work on the
+    host; a real regression shows up in every run.
+    """
+    for _ in range(retries):
+        results = [combine_results(timings) for timings in runs.values()]
+        regressed = [row.name for row in compare(baseline, as_results(results, host), tolerance, metric)
+                     if row.status == "regressed"]
+        if not regressed:
+            return
+        print(f"\nRe-running {len(regressed)} benchmark(s) that look regressed")
+        for name in regressed:
+            rerun = run_benchmark(BENCHMARKS[name], widgets, rounds)
+            runs[name].append(rerun)
+            print_result(rerun)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run the CyberOS host-side benchmarks")
+    parser.add_argument("-k", dest="keyword", help="only run benchmarks whose name contains this")
+    parser.add_argument("--rounds", type=int, help="timed calls per benchmark (default: each benchmark's own)")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks")
+    parser.add_argument("--fake-widgets", action="store_true", help="use stand-in widgets even with a display")
+    parser.add_argument("--save", type=Path, metavar="JSON", help="save the results (a new baseline)")
+    parser.add_argument("--check", type=Path, metavar="BASELINE", help="compare the results with a baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help=f"allowed slowdown as a fraction (default: {DEFAULT_TOLERANCE})")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs of the whole suite, combined per benchmark (default: 3)")
+    parser.add_argument("--metric", choices=["median", "min", "mean"], default="median",
+                        help="timing to compare (default: median of the runs' medians)")
+    parser.add_argument("--retries", type=int, default=2,
+                        help="times to re-run a benchmark that looks regressed before failing (default: 2)")
+    commands = parser.add_subparsers(dest="command")
+    diff = commands.add_parser("compare", help="compare two saved results")
+    diff.add_argument("baseline", type=Path)
+    diff.add_argument("current", type=Path)
+    diff.add_argument("--tolerance", type=float, default=argparse.SUPPRESS)
+    diff.add_argument("--metric", choices=["median", "min", "mean"], default=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    load_suite()
+    if args.command == "compare":
+        try:
+            baseline, current = load_results(args.baseline), load_results(args.current)
+        except (OSError, ValueError) as e:
+            print(f"Cannot read results: {e}", file=sys.stderr)
+            return 2
+        if baseline["host"].get("widgets") != current["host"].get("widgets"):
+            print("Warning: the results were taken with different widgets (Tk vs stand-in)", file=sys.stderr)
+        rows = compare(baseline, current, args.tolerance, args.metric)
+        return 1 if print_comparison(rows, args.metric) else 0
+
+    selected = [bench for name, bench in BENCHMARKS.items() if not args.keyword or args.keyword in name]
+    if args.list:
+        for bench in selected:
+            print(f"{bench.name:<36} {bench.description}")
+        return 0
+    if not selected:
+        parser.error("no benchmarks selected")
+    baseline = None
+    if args.check:
+        try:
+            baseline = load_results(args.check)
+        except (OSError, ValueError) as e:
+            parser.error(f"cannot read baseline {args.check}: {e}")
+
+    widgets = Widgets(fake=args.fake_widgets)
+    host = host_info(widgets)
+    print(f"Running {len(selected)} benchmark(s) with {host['widgets']} widgets, Python {host['python']}\n")
+    runs: Dict[str, List[Result]] = {bench.name: [] for bench in selected}
+    repeat = max(args.repeat, 1)
+    try:
+        for run in range(repeat):
+            if repeat > 1:
+                print(f"Run {run + 1}/{repeat}" if run == 0 else f"\nRun {run + 1}/{repeat}")
+            for bench in selected:
+                result = run_benchmark(bench, widgets, args.rounds)
+                runs[bench.name].append(result)
+                print_result(result)
+        if baseline:
+            if args.keyword:
+                # Benchmarks left out on purpose are not missing
+                baseline = {**baseline, "results": {name: values for name, values in baseline["results"].items()
+                                                    if args.keyword in name}}
+            confirm_regressions(runs, baseline, host, widgets, args.rounds, args.tolerance, args.metric,
+                                args.retries)
+    finally:
+        widgets.close()
+    results = [combine_results(timings) for timings in runs.values()]
+
+    if args.save:
+        save_results(args.save, results, host)
+        print(f"\nResults saved to {args.save}")
+    if baseline:
+        if baseline["host"].get("widgets") != host["widgets"]:
+            print("Warning: the baseline was taken with different widgets (Tk vs stand-in)", file=sys.stderr)
+        print()
+        rows = compare(baseline, as_results(results, host), args.tolerance, args.metric)
+        return 1 if print_comparison(rows, args.metric) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS Admission Control
+Keeps concurrent VMs from oversubscribing the host.
+
+The controller tracks the vCPUs and memory committed to every VM on the host,
+whichever program started it (GUIs, cyberosd, run_cyberos.sh, warm pool
+guests and the test tools share one table in ~/.cyberos/run/vms.sqlite). A
+launch that would exceed the host's capacity is rejected, or queued until
+enough resources are released.
+On Linux, VMs can additionally have their vCPU threads pinned to dedicated
+host cores, keeping each VM on a single NUMA node when one has room.
+
+Usage:
+    python3 admission.py                                    # committed resources
+    python3 admission.py admit CyberOS-VM --cores 2 --memory 2048 --pid $$
+    python3 admission.py release CyberOS-VM
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from qmp import QMPClient, QMPError
+from vm_registry import DB_PATH, process_running, process_start
+
+# Seconds between capacity checks while a launch is queued
+QUEUE_POLL = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS allocations (
+    name TEXT PRIMARY KEY,
+    cores INTEGER NOT NULL,
+    memory_mb INTEGER NOT NULL,
+    pinned_cpus TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    start_ticks INTEGER,
+    created REAL NOT NULL
+);
+"""
+
+
+class AdmissionError(Exception):
+    """Raised when a VM cannot be admitted on this host."""
+
+
+def _parse_cpulist(text: str) -> List[int]:
+    """Parse a kernel cpulist such as "0-3,8-11"."""
+    cpus: List[int] = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-")
+            cpus.extend(range(int(start), int(end) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+@dataclass
+class HostResources:
+    """CPU, memory and NUMA layout available to guests."""
+    cpus: List[int]
+    memory_mb: int
+    numa_nodes: Dict[int, List[int]] = field(default_factory=dict)
+
+    @classmethod
+    def detect(cls) -> "HostResources":
+        """Inspect the host this process runs on."""
+        if hasattr(os, "sched_getaffinity"):
+            cpus = sorted(os.sched_getaffinity(0))
+        else:
+            cpus = list(range(os.cpu_count() or 1))
+
+        memory_mb = 0
+        meminfo = Path("/proc/meminfo")
+        if meminfo.exists():
+            match = re.search(r"^MemTotal:\s+(\d+) kB", meminfo.read_text(), re.MULTILINE)
+            if match:
+                memory_mb = int(match.group(1)) // 1024
+        elif sys.platform == "darwin":
+            result = subprocess.run(["sysctl", "-n", "hw.memsize"], capture_output=True, text=True)
+            if result.returncode == 0:
+                memory_mb = int(result.stdout.strip()) // (1024 ** 2)
+        if not memory_mb and hasattr(os, "sysconf"):
+            try:
+                memory_mb = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 ** 2)
+            except (ValueError, OSError):
+                memory_mb = 0
+
+        numa_nodes: Dict[int, List[int]] = {}
+        for node in sorted(Path("/sys/devices/system/node").glob("node[0-9]*")):
+            try:
+                node_cpus = [cpu for cpu in _parse_cpulist((node / "cpulist").read_text()) if cpu in cpus]
+            except OSError:
+                continue
+            if node_cpus:
+                numa_nodes[int(node.name[4:])] = node_cpus
+
+        return cls(cpus=cpus, memory_mb=memory_mb, numa_nodes=numa_nodes)
+
+
+@dataclass
+class Allocation:
+    """Resources committed to one VM."""
+    name: str
+    cores: int
+    memory_mb: int
+    pinned_cpus: List[int] = field(default_factory=list)
+    pid: int = 0
+
+
+class AdmissionController:
+    """Admits, queues or rejects VMs against resources committed host-wide.
+
+    Allocations live in the run registry database (~/.cyberos/run/vms.sqlite)
+    and are checked and taken in a BEGIN IMMEDIATE transaction, so the
+    Emulator GUI, cyberosd, the Control Center's launchers, the warm pool and
+    the test tools all count each other's VMs. An allocation belongs to a
+    process (QEMU or its launcher, once adopt() is called) and is reclaimed
+    when that process is gone.
+    """
+
+    def __init__(self, host: Optional[HostResources] = None, cpu_overcommit: float = 1.0,
+                 reserved_memory_mb: int = 1024, db_path: Path = DB_PATH):
+        self.host = host or HostResources.detect()
+        self.cpu_overcommit = cpu_overcommit
+        self.reserved_memory_mb = reserved_memory_mb
+        self.db_path = db_path
+        self._local = threading.local()
+        self._cancelled: set = set()
+        self._cond = threading.Condition()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = self._connect()
+        return db
+
+    @property
+    def cpu_capacity(self) -> int:
+        """vCPUs that may be committed at once."""
+        return max(int(len(self.host.cpus) * self.cpu_overcommit), 1)
+
+    @property
+    def memory_capacity(self) -> int:
+        """Guest memory in MB that may be committed at once."""
+        return max(self.host.memory_mb - self.reserved_memory_mb, 0)
+
+    def _allocations(self, db: sqlite3.Connection, prune: bool = True) -> Dict[str, Allocation]:
+        """Live allocations; with prune, the ones whose process has exited are deleted (call in a transaction)."""
+        allocations = {}
+        stale = []
+        for name, cores, memory_mb, pinned, pid, ticks in db.execute(
+                "SELECT name, cores, memory_mb, pinned_cpus, pid, start_ticks FROM allocations"):
+            if not process_running(pid, ticks):
+                stale.append((name,))
+                continue
+            allocations[name] = Allocation(name, cores, memory_mb, _parse_cpulist(pinned or ""), pid)
+        if prune:
+            db.executemany("DELETE FROM allocations WHERE name = ?", stale)
+        return allocations
+
+    @property
+    def allocations(self) -> Dict[str, Allocation]:
+        """Resources committed to VMs across the host, by VM name.
+
+        A read-only query that never waits for an admitter's write lock;
+        stale rows are skipped here and deleted by the next admission.
+        """
+        return self._allocations(self._db, prune=False)
+
+    def committed(self) -> Dict[str, int]:
+        """Totals currently committed to VMs."""
+        allocations = self.allocations.values()
+        return {
+            "vms": len(allocations),
+            "cores": sum(a.cores for a in allocations),
+            "memory_mb": sum(a.memory_mb for a in allocations),
+        }
+
+    def _check(self, allocations: Dict[str, Allocation], cores: int, memory_mb: int) -> Optional[str]:
+        """Reason a request does not fit right now, or None."""
+        if cores > self.cpu_capacity:
+            return f"{cores} vCPUs exceeds the host's {self.cpu_capacity}"
+        if memory_mb > self.memory_capacity:
+            return f"{memory_mb} MB exceeds the {self.memory_capacity} MB available to guests"
+        used_cores = sum(a.cores for a in allocations.values())
+        used_memory = sum(a.memory_mb for a in allocations.values())
+        if used_cores + cores > self.cpu_capacity:
+            return f"{used_cores}/{self.cpu_capacity} vCPUs already committed"
+        if used_memory + memory_mb > self.memory_capacity:
+            return f"{used_memory}/{self.memory_capacity} MB already committed"
+        return None
+
+    def _try_admit(self, name: str, cores: int, memory_mb: int, pid: int) -> Tuple[Optional[Allocation], str]:
+        """Commit resources if they fit right now; (allocation, "") or (None, reason)."""
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            allocations = self._allocations(db)
+            if name in allocations:
+                raise AdmissionError(f"{name} is already running")
+            reason = self._check(allocations, cores, memory_mb)
+            if reason is None:
+                db.execute("INSERT INTO allocations (name, cores, memory_mb, pinned_cpus, pid, start_ticks, created) "
+                           "VALUES (?, ?, ?, '', ?, ?, ?)",
+                           (name, cores, memory_mb, pid, process_start(pid), time.time()))
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+        return (Allocation(name, cores, memory_mb, pid=pid), "") if reason is None else (None, reason)
+
+    def admit(self, name: str, cores: int, memory_mb: int, queue: bool = False,
+              timeout: Optional[float] = None, pid: Optional[int] = None) -> Allocation:
+        """Commit resources to a VM or raise AdmissionError.
+
+        The caller's PID owns the allocation until adopt(). With queue=True
+        the call blocks until other VMs (of any process) release enough
+        resources, the timeout expires or cancel(name) is called. Requests
+        that could never fit on this host are rejected immediately.
+        """
+        pid = pid or os.getpid()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            allocation, reason = self._try_admit(name, cores, memory_mb, pid)
+            if allocation:
+                return allocation
+            never_fits = cores > self.cpu_capacity or memory_mb > self.memory_capacity
+            if not queue or never_fits:
+                raise AdmissionError(reason)
+            with self._cond:
+                if name in self._cancelled:
+                    self._cancelled.discard(name)
+                    raise AdmissionError(f"{name} was cancelled while queued")
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise AdmissionError(f"Timed out waiting for resources: {reason}")
+                # Releases by other processes are only seen by polling
+                self._cond.wait(QUEUE_POLL if remaining is None else min(remaining, QUEUE_POLL))
+
+    def adopt(self, name: str, pid: int):
+        """Hand a VM's allocation to the process that runs it (QEMU or its launcher)."""
+        with self._db as db:
+            db.execute("UPDATE allocations SET pid = ?, start_ticks = ? WHERE name = ?",
+                       (pid, process_start(pid), name))
+
+    def cancel(self, name: str):
+        """Abandon a queued admission."""
+        with self._cond:
+            self._cancelled.add(name)
+            self._cond.notify_all()
+
+    def release(self, name: str):
+        """Return a VM's resources to the pool and wake queued launches."""
+        with self._db as db:
+            db.execute("DELETE FROM allocations WHERE name = ?", (name,))
+        with self._cond:
+            self._cancelled.discard(name)
+            self._cond.notify_all()
+
+    def allocate_cpus(self, name: str) -> List[int]:
+        """Reserve dedicated host CPUs for a VM's vCPUs.
+
+        A NUMA node with enough free CPUs is preferred so the guest's
+        threads and memory stay local; otherwise free CPUs are taken in
+        order across nodes. Returns an empty list if not enough are free.
+        """
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            allocations = self._allocations(db)
+            allocation = allocations.get(name)
+            if allocation is None or allocation.pinned_cpus:
+                db.commit()
+                return allocation.pinned_cpus if allocation else []
+
+            taken = {cpu for a in allocations.values() for cpu in a.pinned_cpus}
+            nodes = self.host.numa_nodes or {0: self.host.cpus}
+            candidates = sorted(
+                ([cpu for cpu in cpus if cpu not in taken] for cpus in nodes.values()),
+                key=len
+            )
+            pinned = next((free[:allocation.cores] for free in candidates if len(free) >= allocation.cores), [])
+            if not pinned:
+                free = [cpu for cpu in self.host.cpus if cpu not in taken]
+                if len(free) >= allocation.cores:
+                    pinned = free[:allocation.cores]
+            if pinned:
+                db.execute("UPDATE allocations SET pinned_cpus = ? WHERE name = ?",
+                           (",".join(map(str, pinned)), name))
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+        return pinned
+
+    def summary(self) -> str:
+        """One-line description of the current allocation."""
+        totals = self.committed()
+        return (f"Host allocation: {totals['cores']}/{self.cpu_capacity} vCPUs · "
+                f"{totals['memory_mb']}/{self.memory_capacity} MB · {totals['vms']} VM(s)")
+
+
+def pin_vcpus(qmp_socket: Path, cpus: List[int]) -> Dict[int, int]:
+    """Pin each vCPU thread of a running guest to one host CPU.
+
+    Returns a mapping of vCPU index to host CPU. Requires Linux.
+    """
+    if not hasattr(os, "sched_setaffinity"):
+        raise AdmissionError("vCPU pinning is only supported on Linux")
+    client = QMPClient(qmp_socket)
+    try:
+        client.connect()
+        vcpus = client.execute("query-cpus-fast")
+    except QMPError as e:
+        raise AdmissionError(f"Could not query vCPU threads: {e}")
+    finally:
+        client.close()
+
+    pinned = {}
+    for vcpu, cpu in zip(sorted(vcpus, key=lambda v: v["cpu-index"]), cpus):
+        os.sched_setaffinity(vcpu["thread-id"], {cpu})
+        pinned[vcpu["cpu-index"]] = cpu
+    return pinned
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Host-wide VM admission")
+    parser.add_argument("--db", type=Path, default=DB_PATH, help=f"registry database (default: {DB_PATH})")
+    commands = parser.add_subparsers(dest="command")
+    admit = commands.add_parser("admit", help="commit resources to a VM")
+    admit.add_argument("name")
+    admit.add_argument("--cores", type=int, required=True, help="vCPUs of the VM")
+    admit.add_argument("--memory", type=int, required=True, help="memory of the VM in MB")
+    admit.add_argument("--pid", type=int, help="process owning the allocation (default: the parent)")
+    admit.add_argument("--wait", type=float, help="queue up to this many seconds for resources")
+    release = commands.add_parser("release", help="return a VM's resources")
+    release.add_argument("name")
+    args = parser.parse_args()
+
+    controller = AdmissionController(db_path=args.db)
+    if args.command == "admit":
+        try:
+            controller.admit(args.name, args.cores, args.memory, queue=args.wait is not None,
+                             timeout=args.wait, pid=args.pid or os.getppid())
+        except AdmissionError as e:
+            print(f"{args.name} not admitted: {e}", file=sys.stderr)
+            return 1
+        return 0
+    if args.command == "release":
+        controller.release(args.name)
+        return 0
+
+    print(controller.summary())
+    for allocation in sorted(controller.allocations.values(), key=lambda a: a.name):
+        pinned = f" on CPUs {','.join(map(str, allocation.pinned_cpus))}" if allocation.pinned_cpus else ""
+        print(f"{allocation.name:<24} {allocation.cores} vCPU(s), {allocation.memory_mb} MB, PID {allocation.pid}{pinned}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS Boot Screens
+Captures a guest's screen over QMP during boot and tells which stage it reached.
+
+BootScreenSupervisor takes a `screendump` of every registered guest once per
+interval, reduces it to a 512-bit perceptual hash (a 16x16 grid of block
+means, with a bit for "brighter than the screen's mean" and one for
+"brighter than the cell to the left" per cell) and keeps only frames that
+differ from the previous one. A frame is assigned to a boot stage either from the
+serial console (recording: the stage markers below) or by its nearest
+reference frame in a baseline recorded from a known-good build (checking).
+Comparing a run with the baseline flags stages that are never reached, are
+reached much later, or whose settled screen looks different.
+
+Hashing sums the green channel of every fourth row of the PPM that QEMU
+writes per grid cell, so a 1024x768 frame costs a few milliseconds; QMP is
+connected only for the capture itself, so the launcher, ballooning and
+shutdown can still use the socket.
+
+Usage:
+    python3 boot_screens.py hash screen.ppm...          # perceptual hashes
+    python3 boot_screens.py diff old.json new.json      # regressions between two builds
+    python3 boot_screens.py --bench                     # hashing cost per frame
+"""
+
+import argparse
+import json
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from qmp import QMPClient, QMPError
+
+BASELINE_DIR = Path.home() / ".cyberos" / "screens"
+# Hash grid: HASH_SIZE x HASH_SIZE cells, a layout and a gradient bit each
+HASH_SIZE = 16
+HASH_BITS = 2 * HASH_SIZE * HASH_SIZE
+# Rows sampled per cell (every ROW_STEP-th row)
+ROW_STEP = 4
+# Frames this close to the previous one are the same screen
+SAME_DISTANCE = 12
+# A frame belongs to a reference stage if its nearest reference is this close
+MATCH_DISTANCE = 112
+# Settled screens of the same stage further apart than this are a regression
+DIFF_DISTANCE = 96
+# Keep capturing this long after the last stage is reached (it may still draw)
+SETTLE_SECONDS = 3.0
+
+# Stages in boot order with the serial console output that starts them
+BOOT_STAGES: List[Tuple[str, Optional[str]]] = [
+    ("firmware", None),
+    ("bootloader", r"GNU GRUB"),
+    ("kernel", r"Booting `|Linux version|^\[\s*\d+\.\d+\]"),
+    ("userspace", r"Type 'help' for available commands"),
+    ("login", r"login:"),
+]
+
+_PPM_FIELD = re.compile(rb"\s*(#[^\n]*\n\s*)*(\S+)")
+
+
+def read_ppm(path: Path) -> Tuple[int, int, bytes]:
+    """Width, height and RGB bytes of a binary PPM (as QEMU's screendump writes it)."""
+    data = path.read_bytes()
+    fields: List[bytes] = []
+    offset = 0
+    while len(fields) < 4:
+        match = _PPM_FIELD.match(data, offset)
+        if not match:
+            raise ValueError(f"{path}: truncated PPM header")
+        fields.append(match.group(2))
+        offset = match.end()
+    if fields[0] != b"P6" or fields[3] != b"255":
+        raise ValueError(f"{path}: not an 8-bit binary PPM")
+    width, height = int(fields[1]), int(fields[2])
+    pixels = data[offset + 1:offset + 1 + width * height * 3]
+    if len(pixels) != width * height * 3:
+        raise ValueError(f"{path}: truncated PPM data")
+    return width, height, pixels
+
+
+def dhash(width: int, height: int, pixels: bytes, size: int = HASH_SIZE) -> int:
+    """Perceptual hash of an RGB image from a grid of block means.
+
+    The high half has one bit per cell brighter than the image's mean
+    (layout: where the text or pictures are), the low half one bit per cell
+    brighter than its left neighbour (gradients). Brightness is taken from
+    the green channel (most of perceived luminance) of every ROW_STEP-th
+    row, which keeps the work per frame small.
+    """
+    if width <= size or height < size:
+        return 0
+    columns = size + 1
+    stride = width * 3
+    xs = [width * i // columns for i in range(columns + 1)]
+    widths = [xs[i + 1] - xs[i] for i in range(columns)]
+    means: List[float] = []
+    for band in range(size):
+        top, bottom = height * band // size, height * (band + 1) // size
+        sums = [0] * columns
+        for y in range(top, bottom, ROW_STEP):
+            green = pixels[y * stride + 1:(y + 1) * stride:3]
+            for i in range(columns):
+                sums[i] += sum(green[xs[i]:xs[i + 1]])
+        # Cells differ in width by up to a pixel
+        means.extend(sums[i] / widths[i] for i in range(columns))
+    average = sum(means) / len(means)
+    layout = gradient = 0
+    for band in range(size):
+        row = means[band * columns:(band + 1) * columns]
+        for i in range(size):
+            layout = (layout << 1) | (row[i] > average)
+            gradient = (gradient << 1) | (row[i + 1] > row[i])
+    return (layout << (size * size)) | gradient
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def hash_hex(value: int) -> str:
+    return f"{value:0{HASH_BITS // 4}x}"
+
+
+@dataclass
+class StageRecord:
+    """When a stage was reached and the distinct screens it showed."""
+    name: str
+    reached: float
+    frames: List[int] = field(default_factory=list)
+
+    @property
+    def settled(self) -> Optional[int]:
+        """The last screen of the stage, before the next one started."""
+        return self.frames[-1] if self.frames else None
+
+
+@dataclass
+class BootRecord:
+    """Stage timeline of one boot; saved as a baseline for later runs."""
+    stages: List[StageRecord] = field(default_factory=list)
+    captures: int = 0
+    unrecognised: int = 0
+    source: Dict[str, str] = field(default_factory=dict)
+
+    def stage(self, name: str) -> Optional[StageRecord]:
+        return next((stage for stage in self.stages if stage.name == name), None)
+
+    @property
+    def reached(self) -> Optional[str]:
+        return self.stages[-1].name if self.stages else None
+
+    def classify(self, value: int) -> Tuple[Optional[str], int]:
+        """Nearest reference stage of a frame hash, and its distance (None if too far)."""
+        best, distance = None, HASH_BITS
+        for stage in self.stages:
+            for frame in stage.frames:
+                d = hamming(value, frame)
+                if d < distance:
+                    best, distance = stage.name, d
+        return (best if distance <= MATCH_DISTANCE else None), distance
+
+    def summary(self) -> str:
+        timeline = ", ".join(f"{stage.name} {stage.reached:.1f} s" for stage in self.stages)
+        return (f"{timeline or 'no stage reached'} ({self.captures} captures, "
+                f"{sum(len(stage.frames) for stage in self.stages)} distinct"
+                f"{f', {self.unrecognised} unrecognised' if self.unrecognised else ''})")
+
+    def to_dict(self) -> Dict:
+        return {
+            "version": 1,
+            "hash_size": HASH_SIZE,
+            "source": self.source,
+            "captures": self.captures,
+            "unrecognised": self.unrecognised,
+            "stages": [{"name": stage.name, "reached": round(stage.reached, 3),
+                        "frames": [hash_hex(frame) for frame in stage.frames]} for stage in self.stages],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "BootRecord":
+        if data.get("hash_size", HASH_SIZE) != HASH_SIZE:
+            raise ValueError(f"Baseline uses {data['hash_size']}x{data['hash_size']} hashes, "
+                             f"expected {HASH_SIZE}x{HASH_SIZE}")
+        return cls(
+            stages=[StageRecord(stage["name"], float(stage["reached"]), [int(frame, 16) for frame in stage["frames"]])
+                    for stage in data.get("stages", [])],
+            captures=int(data.get("captures", 0)),
+            unrecognised=int(data.get("unrecognised", 0)),
+            source=dict(data.get("source", {})),
+        )
+
+    def save(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.to_dict(), indent=2))
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "BootRecord":
+        return cls.from_dict(json.loads(path.read_text()))
+
+
+def baseline_path(variant: str = "default") -> Path:
+    """Where the launchers look for the baseline of a build variant."""
+    return BASELINE_DIR / f"{variant}.json"
+
+
+def load_baseline(path: Path) -> Optional[BootRecord]:
+    """A saved baseline, or None if there is none (or it is unreadable)."""
+    try:
+        return BootRecord.load(path)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def compare(baseline: BootRecord, run: BootRecord, slow_factor: float = 2.0,
+            slack: float = 5.0) -> List[str]:
+    """Visual regressions of a run against a baseline, as readable messages."""
+    issues = []
+    for expected in baseline.stages:
+        actual = run.stage(expected.name)
+        if actual is None:
+            issues.append(f"never reached {expected.name} (stopped at {run.reached or 'no recognised screen'})")
+            break
+        if actual.reached > expected.reached * slow_factor + slack:
+            issues.append(f"{expected.name} reached after {actual.reached:.1f} s "
+                          f"(baseline {expected.reached:.1f} s)")
+        if expected.settled is not None and actual.settled is not None:
+            distance = hamming(expected.settled, actual.settled)
+            if distance > DIFF_DISTANCE:
+                issues.append(f"{expected.name} screen differs from the baseline "
+                              f"({distance}/{HASH_BITS} bits)")
+    order = [stage.name for stage in baseline.stages]
+    seen = [stage.name for stage in run.stages if stage.name in order]
+    if seen != sorted(seen, key=order.index):
+        issues.append(f"stages out of order: {', '.join(seen)}")
+    return issues
+
+
+@dataclass
+class BootWatch:
+    """A guest whose boot is being captured."""
+    name: str
+    qmp_socket: Path
+    shot: Path
+    baseline: Optional[BootRecord]
+    on_stage: Optional[Callable[[str, float], None]]
+    started: float = field(default_factory=time.monotonic)
+    record: BootRecord = field(default_factory=BootRecord)
+    last: Optional[int] = None
+    console_stage: int = 0
+    finished_at: Optional[float] = None
+    errors: int = 0
+
+    @property
+    def stage_names(self) -> List[str]:
+        if self.baseline:
+            return [stage.name for stage in self.baseline.stages]
+        return [name for name, _ in BOOT_STAGES]
+
+
+class BootScreenSupervisor(threading.Thread):
+    """Captures and classifies the screens of booting guests.
+
+    Without a baseline each distinct frame is filed under the stage the
+    serial console last announced (feed it with mark()); with one, under
+    the nearest reference frame. Stages only move forward, so a blank frame
+    during a mode switch does not send a guest back to "firmware".
+    """
+
+    def __init__(self, shot_dir: Path, interval: float = 1.0,
+                 log: Callable[[str], None] = lambda message: None):
+        super().__init__(daemon=True, name="cyberos-boot-screens")
+        self.shot_dir = shot_dir
+        self.interval = interval
+        self.log = log
+        self.watches: Dict[str, BootWatch] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._markers = [(name, re.compile(pattern, re.MULTILINE) if pattern else None)
+                         for name, pattern in BOOT_STAGES]
+
+    def register(self, name: str, qmp_socket: Path, baseline: Optional[BootRecord] = None,
+                 on_stage: Optional[Callable[[str, float], None]] = None, **source: str):
+        """Start capturing a guest (right after QEMU was started)."""
+        self.shot_dir.mkdir(parents=True, exist_ok=True)
+        watch = BootWatch(name, qmp_socket, self.shot_dir / f"{name}.ppm", baseline, on_stage)
+        watch.record.source = dict(source)
+        with self._lock:
+            self.watches[name] = watch
+
+    def mark(self, name: str, line: str):
+        """Serial console output of a guest (labels stages while recording)."""
+        with self._lock:
+            watch = self.watches.get(name)
+            if not watch or watch.baseline:
+                return
+            for index in range(watch.console_stage + 1, len(self._markers)):
+                pattern = self._markers[index][1]
+                if pattern and pattern.search(line):
+                    watch.console_stage = index
+
+    def unregister(self, name: str) -> Optional[BootRecord]:
+        """Stop capturing a guest and return what was seen."""
+        with self._lock:
+            watch = self.watches.pop(name, None)
+        if not watch:
+            return None
+        try:
+            watch.shot.unlink()
+        except FileNotFoundError:
+            pass
+        return watch.record
+
+    def stage(self, name: str) -> Optional[str]:
+        with self._lock:
+            watch = self.watches.get(name)
+            return watch.record.reached if watch else None
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            with self._lock:
+                watches = [watch for watch in self.watches.values() if watch.finished_at is None
+                           or time.monotonic() - watch.finished_at < SETTLE_SECONDS]
+            for watch in watches:
+                self.capture(watch)
+
+    def capture(self, watch: BootWatch):
+        """Take one screendump of a guest and file it under a stage."""
+        client = QMPClient(watch.qmp_socket, timeout=5.0)
+        try:
+            client.connect(wait=0.5)
+            client.execute("screendump", filename=str(watch.shot))
+            value = dhash(*read_ppm(watch.shot))
+        except (QMPError, OSError, ValueError) as e:
+            watch.errors += 1
+            if watch.errors == 3:
+                self.log(f"Boot screens {watch.name}: {e}")
+            return
+        finally:
+            client.close()
+        elapsed = time.monotonic() - watch.started
+        record = watch.record
+        record.captures += 1
+        if watch.last is not None and hamming(value, watch.last) <= SAME_DISTANCE:
+            return
+        watch.last = value
+
+        names = watch.stage_names
+        current = names.index(record.reached) if record.reached in names else -1
+        if watch.baseline:
+            name, _ = watch.baseline.classify(value)
+            if name is None:
+                record.unrecognised += 1
+            index = max(current, names.index(name)) if name else current
+        else:
+            with self._lock:
+                index = max(current, watch.console_stage)
+        if index < 0:
+            return
+        if index > current:
+            record.stages.append(StageRecord(names[index], elapsed))
+            if watch.on_stage:
+                watch.on_stage(names[index], elapsed)
+            if index == len(names) - 1:
+                watch.finished_at = time.monotonic()
+        record.stages[-1].frames.append(value)
+
+
+def benchmark(rounds: int = 20):
+    """Cost of reading and hashing one screendump at common resolutions."""
+    import tempfile
+    with tempfile.TemporaryDirectory() as directory:
+        for width, height in ((720, 400), (1024, 768), (1280, 800), (1920, 1080)):
+            # Text-like content: bright glyph strokes on black
+            row = bytes((255 if (x // 3) % 9 < 2 else 0) for x in range(width * 3))
+            pixels = b"".join(row if y % 16 < 12 else bytes(width * 3) for y in range(height))
+            path = Path(directory) / f"{width}x{height}.ppm"
+            path.write_bytes(b"P6\n%d %d\n255\n" % (width, height) + pixels)
+            started = time.perf_counter()
+            for _ in range(rounds):
+                dhash(*read_ppm(path))
+            elapsed = (time.perf_counter() - started) / rounds
+            print(f"{width:>5}x{height:<5} {elapsed * 1000:6.2f} ms per frame "
+                  f"({1 / elapsed:5.0f} frames/s on one core)")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Boot screen hashing and baselines")
+    parser.add_argument("--bench", action="store_true", help="measure the cost of hashing a frame")
+    commands = parser.add_subparsers(dest="command")
+    hash_cmd = commands.add_parser("hash", help="print the perceptual hash of PPM screenshots")
+    hash_cmd.add_argument("files", nargs="+", type=Path)
+    diff_cmd = commands.add_parser("diff", help="compare a boot record with a baseline")
+    diff_cmd.add_argument("baseline", type=Path)
+    diff_cmd.add_argument("run", type=Path)
+    args = parser.parse_args()
+
+    if args.bench:
+        benchmark()
+        return 0
+    if args.command == "hash":
+        previous = None
+        for path in args.files:
+            value = dhash(*read_ppm(path))
+            note = f"  ({hamming(value, previous)} bits from previous)" if previous is not None else ""
+            print(f"{hash_hex(value)}  {path}{note}")
+            previous = value
+        return 0
+    if args.command == "diff":
+        baseline, run = BootRecord.load(args.baseline), BootRecord.load(args.run)
+        print(f"baseline: {baseline.summary()}")
+        print(f"run:      {run.summary()}")
+        issues = compare(baseline, run)
+        for issue in issues:
+            print(f"✗ {issue}")
+        if not issues:
+            print("✓ no visual regressions")
+        return 1 if issues else 0
+    parser.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
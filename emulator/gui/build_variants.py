@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS Build Variants
+Maps the build variants in config/variants/ to their outputs and QEMU setup.
+
+A variant is a set of overrides for config/build.conf (TARGET_ARCH, CFLAGS,
+GRUB platform, launcher settings). `./scripts/build.sh --variants all` builds
+every variant at once into build/variants/<name>, sharing the cached rootfs;
+launchers use a variant's QEMU_* keys to pick the system binary, machine type
+and CPU. The "default" variant is the plain build in build/ and iso/.
+
+Usage:
+    python3 emulator/gui/build_variants.py          # Variants and what is built
+    python3 emulator/gui/build_variants.py aarch64  # QEMU command for one variant
+"""
+
+import argparse
+import os
+import platform
+import shutil
+import sys
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from direct_boot import DirectBoot
+from vm_command import VMSpec, build_qemu_command
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+BUILD_CONFIG = Path("config") / "build.conf"
+VARIANTS_DIR = Path("config") / "variants"
+DEFAULT_VARIANT = "default"
+DEFAULT_ISO_NAME = "cyberos-0.1.0-alpha.iso"
+
+# Host machines (platform.machine()) that can run each target with KVM
+KVM_HOSTS = {
+    "x86_64": ("x86_64", "amd64"),
+    "i686": ("x86_64", "amd64", "i686", "i386"),
+    "aarch64": ("aarch64", "arm64"),
+}
+
+
+def parse_conf(text: str) -> Dict[str, str]:
+    """KEY=VALUE lines, as build.sh reads them (values may contain spaces)."""
+    values = {}
+    for line in text.splitlines():
+        key, sep, value = line.partition("=")
+        key = key.strip()
+        if sep and key and not key.startswith("#"):
+            values[key] = value.strip()
+    return values
+
+
+def read_conf(path: Path) -> Dict[str, str]:
+    try:
+        return parse_conf(path.read_text())
+    except OSError:
+        return {}
+
+
+@dataclass
+class BuildVariant:
+    """One variant's target, output locations and launcher settings."""
+    name: str
+    arch: str = "x86_64"
+    qemu_binary: str = "qemu-system-x86_64"
+    machine: str = "q35"
+    cpu: Optional[str] = None
+    console: str = "ttyS0"
+    firmware: Optional[Path] = None
+    iso_name: str = DEFAULT_ISO_NAME
+
+    @classmethod
+    def from_conf(cls, name: str, values: Dict[str, str]) -> "BuildVariant":
+        """A variant from config/build.conf merged with its overrides."""
+        iso_name = values.get("ISO_NAME") or DEFAULT_ISO_NAME
+        if name != DEFAULT_VARIANT:
+            # Same naming as build.sh --variant
+            iso_name = f"{iso_name[:-4] if iso_name.endswith('.iso') else iso_name}-{name}.iso"
+        firmware = values.get("QEMU_FIRMWARE")
+        return cls(
+            name=name,
+            arch=values.get("TARGET_ARCH") or cls.arch,
+            qemu_binary=values.get("QEMU_BINARY") or cls.qemu_binary,
+            machine=values.get("QEMU_MACHINE") or cls.machine,
+            cpu=values.get("QEMU_CPU") or None,
+            console=values.get("KERNEL_CONSOLE") or cls.console,
+            firmware=Path(firmware) if firmware else None,
+            iso_name=iso_name,
+        )
+
+    def build_dir(self, project_root: Path) -> Path:
+        if self.name == DEFAULT_VARIANT:
+            return project_root / "build"
+        return project_root / "build" / "variants" / self.name
+
+    def iso_file(self, project_root: Path) -> Path:
+        return project_root / "iso" / self.iso_name
+
+    def direct_boot(self, project_root: Path) -> DirectBoot:
+        """This variant's kernel and initramfs, with its serial console."""
+        build_dir = self.build_dir(project_root)
+        return DirectBoot(build_dir / "kernel" / "vmlinuz", build_dir / "initramfs.cpio.gz",
+                          f"console=tty0 console={self.console},115200")
+
+    @property
+    def native(self) -> bool:
+        """Whether this host can run the variant under KVM."""
+        return platform.machine().lower() in KVM_HOSTS.get(self.arch, (self.arch,))
+
+    def accel(self) -> str:
+        """kvm for a native variant when /dev/kvm is usable, tcg otherwise."""
+        if self.native and os.access("/dev/kvm", os.R_OK | os.W_OK):
+            return "kvm"
+        return "tcg"
+
+    def apply(self, spec: VMSpec) -> VMSpec:
+        """Point a VM spec at this variant's QEMU binary, machine and firmware."""
+        firmware = self.firmware if self.firmware and self.firmware.exists() else None
+        return replace(spec, qemu_binary=self.qemu_binary, machine=self.machine, cpu=self.cpu,
+                       firmware=firmware, accel=spec.accel if self.native else "tcg")
+
+    def missing(self) -> List[str]:
+        """Host tools the launcher needs but cannot find."""
+        missing = [] if shutil.which(self.qemu_binary) else [self.qemu_binary]
+        if self.firmware and not self.firmware.exists():
+            missing.append(str(self.firmware))
+        return missing
+
+    def describe(self) -> str:
+        text = f"{self.arch}, {self.qemu_binary} -machine {self.machine}"
+        if self.cpu:
+            text += f" -cpu {self.cpu}"
+        return text
+
+
+def load_variants(project_root: Path = PROJECT_ROOT) -> Dict[str, BuildVariant]:
+    """The default build followed by every config/variants/*.conf, by name."""
+    base = read_conf(project_root / BUILD_CONFIG)
+    variants = {DEFAULT_VARIANT: BuildVariant.from_conf(DEFAULT_VARIANT, base)}
+    directory = project_root / VARIANTS_DIR
+    if directory.is_dir():
+        for conf in sorted(directory.glob("*.conf")):
+            if conf.stem != DEFAULT_VARIANT:
+                variants[conf.stem] = BuildVariant.from_conf(conf.stem, {**base, **read_conf(conf)})
+    return variants
+
+
+def get_variant(name: str, project_root: Path = PROJECT_ROOT) -> BuildVariant:
+    """A variant by name, falling back to the default build."""
+    variants = load_variants(project_root)
+    return variants.get(name) or variants[DEFAULT_VARIANT]
+
+
+def build_args(no_iso: bool = False, variant: str = DEFAULT_VARIANT, variants: str = "") -> List[str]:
+    """scripts/build.sh options for one variant, or several ("all") built at once."""
+    args = ["--no-iso"] if no_iso else []
+    if variants:
+        args += ["--variants", variants]
+    elif variant != DEFAULT_VARIANT:
+        args += ["--variant", variant]
+    return args
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="List CyberOS build variants")
+    parser.add_argument("variant", nargs="?", help="show the QEMU command line for this variant")
+    parser.add_argument("--direct", action="store_true", help="with a variant: direct kernel boot")
+    args = parser.parse_args()
+
+    variants = load_variants(PROJECT_ROOT)
+    if args.variant:
+        if args.variant not in variants:
+            print(f"Unknown variant: {args.variant} (available: {', '.join(variants)})", file=sys.stderr)
+            return 1
+        variant = variants[args.variant]
+        spec = VMSpec(name=f"CyberOS-{variant.name}", cores=2, memory=512,
+                      iso_file=variant.iso_file(PROJECT_ROOT), display="serial", accel=variant.accel(),
+                      direct_boot=variant.direct_boot(PROJECT_ROOT) if args.direct else None)
+        print(" ".join(build_qemu_command(variant.apply(spec))))
+        return 0
+
+    for variant in variants.values():
+        built = []
+        if (variant.build_dir(PROJECT_ROOT) / "initramfs.cpio.gz").exists():
+            built.append("initramfs")
+        if variant.iso_file(PROJECT_ROOT).exists():
+            built.append("ISO")
+        missing = variant.missing()
+        print(f"{variant.name:<10} {variant.describe()}")
+        print(f"{'':<10} built: {', '.join(built) or 'nothing'}"
+              f"{'; missing ' + ', '.join(missing) if missing else ''}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
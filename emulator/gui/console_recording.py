@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS Console Recording
+Compact timestamped recordings of VM console sessions with a seek index.
+
+A recording (.cyrec) holds the raw bytes a VM printed, chunk by chunk, each
+with the milliseconds elapsed since the previous chunk:
+
+    header   b"CYREC1\\n" + varint(len) + JSON {"name", "started"}
+    record   varint(delta_ms) + varint(len) + bytes
+    index    b"CYIX" + entries of <QQ (time_ms, offset)
+    footer   <Q index offset + b"CYIX"
+
+An index entry is written at most every INDEX_INTERVAL_MS or INDEX_BYTES,
+giving the absolute time of the last record before an offset, so a player
+can start decoding near any point in time without reading from the start.
+Recordings cut short (the GUI crashed) have no index; readers rebuild it by
+skipping from record header to record header.
+
+Usage:
+    python3 console_recording.py info FILE
+    python3 console_recording.py play FILE [--speed 4]
+    python3 console_recording.py export FILE OUT.cast   # asciicast v2
+"""
+
+import argparse
+import bisect
+import codecs
+import io
+import json
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+RECORDINGS_DIR = Path.home() / ".cyberos" / "recordings"
+MAGIC = b"CYREC1\n"
+INDEX_MAGIC = b"CYIX"
+INDEX_INTERVAL_MS = 1000
+INDEX_BYTES = 64 * 1024
+# Oldest recordings beyond this many are deleted when a new one starts
+KEEP_RECORDINGS = 100
+
+
+def _varint(value: int) -> bytes:
+    """Encode an unsigned LEB128 integer."""
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _read_varint(stream: BinaryIO) -> Optional[int]:
+    """Decode an unsigned LEB128 integer; None at end of file."""
+    value = shift = 0
+    while True:
+        byte = stream.read(1)
+        if not byte:
+            return None
+        value |= (byte[0] & 0x7F) << shift
+        if byte[0] < 0x80:
+            return value
+        shift += 7
+
+
+def recording_path(name: str, directory: Path = RECORDINGS_DIR) -> Path:
+    """New recording file for a VM session."""
+    safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in name)
+    return directory / f"{safe}-{time.strftime('%Y%m%d-%H%M%S')}.cyrec"
+
+
+def list_recordings(directory: Path = RECORDINGS_DIR) -> List[Path]:
+    """Recordings, newest first."""
+    if not directory.exists():
+        return []
+    return sorted(directory.glob("*.cyrec"), key=lambda p: p.stat().st_mtime, reverse=True)
+
+
+class ConsoleRecorder:
+    """Appends timestamped output chunks to a recording; safe from any thread."""
+
+    def __init__(self, path: Path, name: str):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        for old in list_recordings(path.parent)[KEEP_RECORDINGS - 1:]:
+            old.unlink(missing_ok=True)
+        self.path = path
+        self._file = open(path, "wb")
+        self._start = time.monotonic()
+        self._last_ms = 0
+        self._index: List[Tuple[int, int]] = [(0, 0)]
+        self._since_index = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+        header = json.dumps({"name": name, "started": time.time()}).encode()
+        self._file.write(MAGIC + _varint(len(header)) + header)
+        self._index[0] = (0, self._file.tell())
+        self.closed = False
+
+    def write(self, data: bytes):
+        """Record one chunk of output as of now."""
+        if not data:
+            return
+        with self._lock:
+            if self.closed:
+                return
+            now_ms = int((time.monotonic() - self._start) * 1000)
+            if self._since_index >= INDEX_BYTES or now_ms - self._index[-1][0] >= INDEX_INTERVAL_MS:
+                self._index.append((self._last_ms, self._file.tell()))
+                self._since_index = 0
+            self._file.write(_varint(now_ms - self._last_ms) + _varint(len(data)) + data)
+            self._last_ms = now_ms
+            self._since_index += len(data)
+            self.bytes += len(data)
+
+    def close(self):
+        """Write the seek index and close the file; empty recordings are deleted."""
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            if not self.bytes:
+                self._file.close()
+                self.path.unlink(missing_ok=True)
+                return
+            index_offset = self._file.tell()
+            self._file.write(INDEX_MAGIC)
+            for entry in self._index:
+                self._file.write(struct.pack("<QQ", *entry))
+            self._file.write(struct.pack("<Q", index_offset) + INDEX_MAGIC)
+            self._file.close()
+
+
+class RecordingReader:
+    """Random access to a recording."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = open(path, "rb")
+        if self._file.read(len(MAGIC)) != MAGIC:
+            self._file.close()
+            raise ValueError(f"{path.name} is not a console recording")
+        header = json.loads(self._file.read(_read_varint(self._file) or 0))
+        self.name: str = header.get("name", path.stem)
+        self.started: float = header.get("started", 0.0)
+        self.data_start = self._file.tell()
+        self.data_end, self.index = self._load_index()
+        self.duration_ms = self._last_time()
+
+    def close(self):
+        self._file.close()
+
+    def _load_index(self) -> Tuple[int, List[Tuple[int, int]]]:
+        """Read the trailing index, or rebuild it for an unfinished recording."""
+        self._file.seek(0, io.SEEK_END)
+        size = self._file.tell()
+        if size >= self.data_start + 12:
+            self._file.seek(size - 12)
+            footer = self._file.read(12)
+            if footer[8:] == INDEX_MAGIC:
+                index_offset = struct.unpack("<Q", footer[:8])[0]
+                self._file.seek(index_offset + len(INDEX_MAGIC))
+                raw = self._file.read(size - 12 - index_offset - len(INDEX_MAGIC))
+                return index_offset, [struct.unpack_from("<QQ", raw, i) for i in range(0, len(raw), 16)]
+
+        index = [(0, self.data_start)]
+        self._file.seek(self.data_start)
+        time_ms = since = 0
+        while True:
+            offset = self._file.tell()
+            delta = _read_varint(self._file)
+            length = _read_varint(self._file)
+            if delta is None or length is None:
+                return offset, index
+            if since >= INDEX_BYTES or time_ms + delta - index[-1][0] >= INDEX_INTERVAL_MS:
+                index.append((time_ms, offset))
+                since = 0
+            self._file.seek(length, io.SEEK_CUR)
+            if self._file.tell() > size:
+                return offset, index
+            time_ms += delta
+            since += length
+
+    def _last_time(self) -> int:
+        """Time of the last record, reading only from the last index entry."""
+        last = 0
+        for last, _, _ in self.chunks(self.index[-1][1], self.index[-1][0]):
+            pass
+        return last
+
+    def chunks(self, offset: Optional[int] = None, base_ms: int = 0) -> Iterator[Tuple[int, int, bytes]]:
+        """Yield (time_ms, next_offset, data) from an offset whose preceding record is at base_ms."""
+        self._file.seek(self.data_start if offset is None else offset)
+        time_ms = base_ms
+        while self._file.tell() < self.data_end:
+            delta = _read_varint(self._file)
+            length = _read_varint(self._file)
+            if delta is None or length is None:
+                return
+            data = self._file.read(length)
+            if len(data) < length:
+                return
+            time_ms += delta
+            yield time_ms, self._file.tell(), data
+
+    def locate(self, time_ms: int, context_bytes: int = 0) -> Tuple[int, int]:
+        """(offset, base_ms) to start reading from to reach time_ms.
+
+        With context_bytes, starts early enough to include at least that much
+        output before the index entry (for redrawing the screen after a seek).
+        """
+        i = max(bisect.bisect_right([entry[0] for entry in self.index], time_ms) - 1, 0)
+        target = self.index[i][1] - context_bytes
+        while i > 0 and self.index[i][1] > target:
+            i -= 1
+        return self.index[i][1], self.index[i][0]
+
+
+def export_asciicast(path: Path, out: Path, width: int = 80, height: int = 24):
+    """Convert a recording to asciicast v2 (asciinema)."""
+    reader = RecordingReader(path)
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    with open(out, "w") as f:
+        f.write(json.dumps({"version": 2, "width": width, "height": height,
+                            "timestamp": int(reader.started), "title": reader.name}) + "\n")
+        for time_ms, _, data in reader.chunks():
+            text = decoder.decode(data)
+            if text:
+                f.write(json.dumps([time_ms / 1000, "o", text]) + "\n")
+    reader.close()
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="CyberOS console recordings")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="list recordings")
+    info = sub.add_parser("info", help="show a recording's details")
+    info.add_argument("file", type=Path)
+    play = sub.add_parser("play", help="replay a recording to this terminal")
+    play.add_argument("file", type=Path)
+    play.add_argument("--speed", type=float, default=1.0)
+    play.add_argument("--start", type=float, default=0.0, help="start at this many seconds")
+    export = sub.add_parser("export", help="export to asciicast v2")
+    export.add_argument("file", type=Path)
+    export.add_argument("out", type=Path)
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for path in list_recordings():
+            print(path)
+    elif args.command == "info":
+        reader = RecordingReader(args.file)
+        print(f"Name:     {reader.name}")
+        print(f"Started:  {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(reader.started))}")
+        print(f"Duration: {reader.duration_ms / 1000:.1f} s")
+        print(f"Output:   {reader.data_end - reader.data_start} bytes, {len(reader.index)} index entries")
+    elif args.command == "play":
+        reader = RecordingReader(args.file)
+        start_ms = int(args.start * 1000)
+        offset, base = reader.locate(start_ms)
+        clock = time.monotonic()
+        for time_ms, _, data in reader.chunks(offset, base):
+            if time_ms >= start_ms:
+                delay = (time_ms - start_ms) / 1000 / args.speed - (time.monotonic() - clock)
+                if delay > 0:
+                    time.sleep(delay)
+            sys.stdout.buffer.write(data)
+            sys.stdout.flush()
+    elif args.command == "export":
+        export_asciicast(args.file, args.out)
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS Console Replay Panel
+Tk panel that plays console recordings back at any speed.
+
+Playback decodes the recording's raw chunks with the same ConsoleDecoder as
+the live console, driven by a Tk timer. Seeking uses the recording's index:
+decoding restarts a little before the target time (enough output to fill
+the view), so jumping anywhere in a long session is instant.
+"""
+
+import time
+import tkinter as tk
+from pathlib import Path
+from tkinter import ttk, scrolledtext, filedialog, messagebox
+from typing import Iterator, List, Optional, Tuple
+
+from console_stream import ConsoleDecoder, ConsoleLine, configure_tags, insert_line
+from console_recording import RecordingReader, export_asciicast, list_recordings
+
+SPEEDS = {"0.25×": 0.25, "0.5×": 0.5, "1×": 1.0, "2×": 2.0, "4×": 4.0, "16×": 16.0, "Max": None}
+# Lines kept in the view and output decoded before a seek target
+MAX_LINES = 3000
+CONTEXT_BYTES = 256 * 1024
+TICK_MS = 30
+# Output replayed per tick at maximum speed
+MAX_TICK_BYTES = 512 * 1024
+
+
+def _clock(ms: float) -> str:
+    """Format milliseconds as m:ss.s."""
+    seconds = ms / 1000
+    return f"{int(seconds // 60)}:{seconds % 60:04.1f}"
+
+
+class ReplayPanel(ttk.Frame):
+    """Recording picker, transport controls and a console view."""
+
+    def __init__(self, parent, directory: Path):
+        super().__init__(parent)
+        self.directory = directory
+        self.reader: Optional[RecordingReader] = None
+        self.paths: List[Path] = []
+        self.playing = False
+        self.position = 0.0
+        self._chunks: Optional[Iterator[Tuple[int, int, bytes]]] = None
+        self._pending: Optional[Tuple[int, int, bytes]] = None
+        self._decoder = ConsoleDecoder()
+        self._last_tick = 0.0
+        self._timer: Optional[str] = None
+
+        picker = ttk.Frame(self)
+        picker.pack(fill=tk.X, pady=(0, 5))
+        ttk.Label(picker, text="Recording:").pack(side=tk.LEFT)
+        self.recording_var = tk.StringVar()
+        self.recording_combo = ttk.Combobox(picker, textvariable=self.recording_var, state="readonly", width=45)
+        self.recording_combo.pack(side=tk.LEFT, padx=5)
+        self.recording_combo.bind("<<ComboboxSelected>>", lambda event: self.load(self.paths[
+            self.recording_combo.current()]))
+        ttk.Button(picker, text="🔄", width=3, command=self.refresh).pack(side=tk.LEFT, padx=2)
+        ttk.Button(picker, text="📂 Open...", command=self.open_file).pack(side=tk.LEFT, padx=2)
+        ttk.Button(picker, text="💾 Export asciicast", command=self.export).pack(side=tk.LEFT, padx=2)
+
+        transport = ttk.Frame(self)
+        transport.pack(fill=tk.X, pady=(0, 5))
+        self.play_btn = ttk.Button(transport, text="▶ Play", width=8, command=self.toggle_play)
+        self.play_btn.pack(side=tk.LEFT)
+        self.speed_var = tk.StringVar(value="1×")
+        ttk.Combobox(transport, textvariable=self.speed_var, values=list(SPEEDS), state="readonly",
+                     width=6).pack(side=tk.LEFT, padx=5)
+        self.time_var = tk.DoubleVar(value=0.0)
+        self.scale = ttk.Scale(transport, from_=0, to=1, variable=self.time_var,
+                               command=lambda value: self._show_time(float(value)))
+        self.scale.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        self.scale.bind("<ButtonRelease-1>", lambda event: self.seek(self.time_var.get()))
+        self.time_label = ttk.Label(transport, text="0:00.0 / 0:00.0", width=18)
+        self.time_label.pack(side=tk.LEFT)
+
+        self.view = scrolledtext.ScrolledText(self, height=18, width=100, state=tk.DISABLED, font=("Courier", 10))
+        self.view.pack(fill=tk.BOTH, expand=True)
+        configure_tags(self.view)
+        self.view.mark_set("partial", "end-1c")
+        self.view.mark_gravity("partial", tk.LEFT)
+
+        self.refresh()
+
+    # ==================== Recordings ====================
+
+    def refresh(self):
+        """List the recordings in the directory."""
+        self.paths = list_recordings(self.directory)
+        labels = []
+        for path in self.paths:
+            stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(path.stat().st_mtime))
+            labels.append(f"{path.stem}  ({stamp}, {path.stat().st_size / 1024:.0f} KB)")
+        self.recording_combo.config(values=labels)
+
+    def open_file(self):
+        """Load a recording from anywhere."""
+        filename = filedialog.askopenfilename(initialdir=str(self.directory),
+                                              filetypes=[("Console recordings", "*.cyrec"), ("All files", "*")])
+        if filename:
+            self.load(Path(filename))
+
+    def load(self, path: Path):
+        """Open a recording and show its beginning."""
+        self.pause()
+        if self.reader:
+            self.reader.close()
+        try:
+            self.reader = RecordingReader(path)
+        except (OSError, ValueError) as e:
+            self.reader = None
+            messagebox.showerror("Replay", f"Cannot open recording:\n{e}")
+            return
+        self.recording_var.set(path.stem)
+        self.scale.config(to=max(self.reader.duration_ms, 1))
+        self.seek(0)
+
+    def export(self):
+        """Export the loaded recording to asciicast v2."""
+        if not self.reader:
+            return
+        filename = filedialog.asksaveasfilename(defaultextension=".cast",
+                                                initialfile=self.reader.path.stem + ".cast",
+                                                filetypes=[("asciicast", "*.cast")])
+        if filename:
+            try:
+                export_asciicast(self.reader.path, Path(filename))
+            except (OSError, ValueError) as e:
+                messagebox.showerror("Replay", f"Export failed:\n{e}")
+
+    # ==================== Playback ====================
+
+    def toggle_play(self):
+        if self.playing:
+            self.pause()
+        elif self.reader:
+            if self.position >= self.reader.duration_ms:
+                self.seek(0)
+            self.playing = True
+            self.play_btn.config(text="⏸ Pause")
+            self._last_tick = time.monotonic()
+            self._timer = self.after(TICK_MS, self._tick)
+
+    def pause(self):
+        self.playing = False
+        self.play_btn.config(text="▶ Play")
+        if self._timer:
+            self.after_cancel(self._timer)
+            self._timer = None
+
+    def seek(self, ms: float):
+        """Redraw the view as it was at ms into the recording."""
+        if not self.reader:
+            return
+        offset, base = self.reader.locate(int(ms), CONTEXT_BYTES)
+        self._chunks = self.reader.chunks(offset, base)
+        self._pending = None
+        self._decoder = ConsoleDecoder()
+        self.position = ms
+        lines = self._advance(ms, None)
+        self.view.config(state=tk.NORMAL)
+        self.view.delete("1.0", tk.END)
+        self.view.config(state=tk.DISABLED)
+        self._render(lines[-MAX_LINES:])
+        self._show_time(ms)
+
+    def _advance(self, until_ms: float, budget: Optional[int]) -> List[ConsoleLine]:
+        """Decode chunks up to a time (or byte budget); returns completed lines."""
+        lines: List[ConsoleLine] = []
+        used = 0
+        while True:
+            chunk = self._pending or next(self._chunks, None)
+            self._pending = None
+            if chunk is None:
+                self.position = self.reader.duration_ms
+                break
+            if budget is None and chunk[0] > until_ms:
+                self._pending = chunk
+                break
+            lines.extend(self._decoder.feed(chunk[2]))
+            used += len(chunk[2])
+            if budget is not None:
+                self.position = chunk[0]
+                if used >= budget:
+                    break
+        return lines
+
+    def _tick(self):
+        self._timer = None
+        if not self.playing or not self.reader:
+            return
+        now = time.monotonic()
+        speed = SPEEDS.get(self.speed_var.get(), 1.0)
+        if speed is None:
+            lines = self._advance(0, MAX_TICK_BYTES)
+        else:
+            self.position += (now - self._last_tick) * 1000 * speed
+            lines = self._advance(self.position, None)
+        self._last_tick = now
+        self._render(lines)
+        self.time_var.set(min(self.position, self.reader.duration_ms))
+        self._show_time(self.position)
+        if self.position >= self.reader.duration_ms:
+            self.pause()
+        else:
+            self._timer = self.after(TICK_MS, self._tick)
+
+    def _render(self, lines: List[ConsoleLine]):
+        """Append completed lines and show the pending partial line."""
+        self.view.config(state=tk.NORMAL)
+        self.view.delete("partial", "end-1c")
+        for line in lines:
+            insert_line(self.view, "end-1c", line, "\n")
+        self.view.mark_set("partial", "end-1c")
+        partial = self._decoder.partial
+        if partial is not None:
+            insert_line(self.view, "end-1c", partial)
+        excess = int(self.view.index("end-1c").split(".")[0]) - MAX_LINES
+        if excess > 0:
+            self.view.delete("1.0", f"{excess + 1}.0")
+        self.view.see(tk.END)
+        self.view.config(state=tk.DISABLED)
+
+    def _show_time(self, ms: float):
+        total = self.reader.duration_ms if self.reader else 0
+        self.time_label.config(text=f"{_clock(min(ms, total))} / {_clock(total)}")
+
+    def close(self):
+        """Stop playback and release the file."""
+        self.pause()
+        if self.reader:
+            self.reader.close()
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS Console Stream
+Binary-safe incremental decoding of VM serial consoles and build output.
+
+Output is consumed as raw byte chunks of any size. ConsoleDecoder decodes
+them incrementally (invalid UTF-8 from serial noise becomes U+FFFD), splits
+complete lines, applies carriage returns, backspaces and erase-line
+sequences the way a terminal would (so progress bars collapse into their
+last state) and turns ANSI SGR colour codes into style spans. Every other
+escape sequence is dropped. The unterminated tail, such as a login prompt,
+is available as a partial line so consumers can show it immediately.
+
+Usage:
+    python3 console_stream.py --bench      # decoder throughput and prompt latency
+"""
+
+import argparse
+import codecs
+import functools
+import re
+import time
+from typing import List, Optional, Tuple
+
+# Complete escape sequences: CSI, OSC (BEL or ST terminated) and two-byte ESC
+_ESCAPE = re.compile(r"\x1b\[([0-?]*)[ -/]*([@-~])|\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)|\x1b[@-Z\\-_]")
+# Anything the fast path cannot pass through unchanged
+_SPECIAL = re.compile(r"[\x00-\x08\x0b-\x1f\x7f]")
+# The start of an escape sequence that may still complete: a lone ESC, CSI
+# parameter and intermediate bytes, or an OSC payload awaiting its terminator
+_INCOMPLETE = re.compile(r"\x1b(?:\[[0-?]*[ -/]*|\][^\x07\x1b\n]*\x1b?)?\Z")
+# An incomplete escape sequence is held back at most this long
+_MAX_ESCAPE = 256
+
+_COLORS = ["black", "red", "green", "yellow", "blue", "magenta", "cyan", "white"]
+
+Span = Tuple[int, int, Tuple[str, ...]]
+
+
+class ConsoleLine(str):
+    """A line of console text with its escape sequences removed.
+
+    spans lists (start, end, styles) for styled runs; styles are names such
+    as "bold", "fg-red" or "bg-blue".
+    """
+
+    spans: List[Span]
+
+    def __new__(cls, text: str = "", spans: Optional[List[Span]] = None):
+        line = super().__new__(cls, text)
+        line.spans = spans or []
+        return line
+
+
+@functools.lru_cache(maxsize=512)
+def _sgr(params: str, style: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Apply an SGR (Select Graphic Rendition) parameter list to a style."""
+    current = list(style)
+    codes = [int(code) if code.isdigit() else 0 for code in params.split(";")] if params else [0]
+    i = 0
+    while i < len(codes):
+        code = codes[i]
+        if code == 0:
+            current = []
+        elif code in (1, 4):
+            name = "bold" if code == 1 else "underline"
+            if name not in current:
+                current.append(name)
+        elif code in (22, 24):
+            name = "bold" if code == 22 else "underline"
+            current = [s for s in current if s != name]
+        elif 30 <= code <= 37 or 90 <= code <= 97 or code == 39:
+            current = [s for s in current if not s.startswith("fg-")]
+            if code != 39:
+                current.append(f"fg-{_COLORS[code % 10]}")
+        elif 40 <= code <= 47 or 100 <= code <= 107 or code == 49:
+            current = [s for s in current if not s.startswith("bg-")]
+            if code != 49:
+                current.append(f"bg-{_COLORS[code % 10]}")
+        elif code in (38, 48) and i + 1 < len(codes):
+            # 256-colour and true-colour forms are consumed but not rendered
+            i += 2 if codes[i + 1] == 5 else 4
+        i += 1
+    return tuple(current)
+
+
+class ConsoleDecoder:
+    """Turns raw console bytes into lines the way a simple terminal would."""
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._held = ""
+        self._text = ""
+        self._column = 0
+        self._spans: List[Span] = []
+        self._style: Tuple[str, ...] = ()
+
+    @property
+    def partial(self) -> Optional[ConsoleLine]:
+        """The current unterminated line, or None if it is empty."""
+        if not self._text:
+            return None
+        return ConsoleLine(self._text, list(self._spans))
+
+    def feed(self, data: bytes, final: bool = False) -> List[ConsoleLine]:
+        """Decode a chunk and return the lines it completed."""
+        text = self._held + self._decoder.decode(data, final=final)
+        self._held = ""
+        if not final:
+            # A stray ESC that can never complete is left for _render to drop
+            incomplete = _INCOMPLETE.search(text, max(len(text) - _MAX_ESCAPE, 0))
+            if incomplete:
+                text, self._held = text[:incomplete.start()], text[incomplete.start():]
+
+        lines: List[ConsoleLine] = []
+        pieces = text.split("\n")
+        if not self._style and self._column == len(self._text) and not _SPECIAL.search(text):
+            # Fast path: plain text needs no terminal emulation
+            if len(pieces) > 1:
+                lines.append(ConsoleLine(self._text + pieces[0], self._spans))
+                lines.extend(map(ConsoleLine, pieces[1:-1]))
+                self._text, self._spans = pieces[-1], []
+            else:
+                self._text += pieces[0]
+            self._column = len(self._text)
+            if final and self._text:
+                lines.append(self._finish_line())
+            return lines
+
+        for index, piece in enumerate(pieces):
+            if index:
+                lines.append(self._finish_line())
+            if not piece:
+                continue
+            if self._column == len(self._text) and not self._style and not _SPECIAL.search(piece):
+                self._text += piece
+                self._column = len(self._text)
+            else:
+                self._render(piece)
+        if final and self._text:
+            lines.append(self._finish_line())
+        return lines
+
+    def _finish_line(self) -> ConsoleLine:
+        """Complete the current line."""
+        line = ConsoleLine(self._text, self._spans)
+        self._text = ""
+        self._column = 0
+        self._spans = []
+        return line
+
+    def _write(self, text: str):
+        """Write text at the cursor, overwriting what is there."""
+        start, end = self._column, self._column + len(text)
+        if start >= len(self._text):
+            self._text += " " * (start - len(self._text)) + text
+        else:
+            self._text = self._text[:start] + text + self._text[end:]
+            if self._spans:
+                self._clip(start, end)
+        self._column = end
+        if self._style:
+            self._spans.append((start, end, self._style))
+
+    def _clip(self, start: int, end: int):
+        """Remove styling from [start, end)."""
+        spans = []
+        for span_start, span_end, style in self._spans:
+            if span_end <= start or span_start >= end:
+                spans.append((span_start, span_end, style))
+                continue
+            if span_start < start:
+                spans.append((span_start, start, style))
+            if span_end > end:
+                spans.append((end, span_end, style))
+        self._spans = spans
+
+    def _render(self, piece: str):
+        """Interpret control characters and escape sequences within one line."""
+        position = 0
+        for match in _SPECIAL.finditer(piece):
+            index = match.start()
+            if index < position:
+                continue
+            if index > position:
+                self._write(piece[position:index])
+            char = piece[index]
+            position = index + 1
+            if char == "\r":
+                self._column = 0
+            elif char == "\b":
+                self._column = max(self._column - 1, 0)
+            elif char == "\x1b":
+                escape = _ESCAPE.match(piece, index)
+                if escape is None:
+                    continue
+                position = escape.end()
+                if escape.group(2):
+                    self._csi(escape.group(1), escape.group(2))
+        if position < len(piece):
+            self._write(piece[position:])
+
+    def _csi(self, params: str, command: str):
+        """Apply the CSI sequences that affect a single line."""
+        count = int(params) if params.isdigit() else None
+        if command == "m":
+            self._style = _sgr(params, self._style)
+        elif command == "K":
+            if count in (None, 0):
+                self._text = self._text[:self._column]
+                self._clip(self._column, 1 << 30)
+            elif count == 1:
+                self._write(" " * self._column)
+            elif count == 2:
+                self._text, self._spans = "", []
+        elif command == "C":
+            self._column += count or 1
+        elif command == "D":
+            self._column = max(self._column - (count or 1), 0)
+        elif command == "G":
+            self._column = max((count or 1) - 1, 0)
+
+
+_PALETTE = {"black": "#000000", "red": "#c0392b", "green": "#1e8449", "yellow": "#b7950b",
+            "blue": "#2471a3", "magenta": "#884ea0", "cyan": "#17a589", "white": "#bfc9ca"}
+
+
+def configure_tags(widget, font=("Courier", 10)):
+    """Create the style tags ConsoleLine spans refer to on a Tk Text widget."""
+    widget.tag_config("bold", font=(*font[:2], "bold"))
+    widget.tag_config("underline", underline=True)
+    for name, color in _PALETTE.items():
+        widget.tag_config(f"fg-{name}", foreground=color)
+        widget.tag_config(f"bg-{name}", background=color)
+
+
+def insert_line(widget, index: str, line: str, suffix: str = ""):
+    """Insert a line into a Tk Text widget with its ConsoleLine styling."""
+    start = widget.index(index)
+    widget.insert(start, line + suffix)
+    for span_start, span_end, styles in getattr(line, "spans", ()):
+        for style in styles:
+            widget.tag_add(style, f"{start} + {span_start} chars", f"{start} + {span_end} chars")
+
+
+def benchmark(megabytes: int = 20):
+    """Measure decoder throughput and how fast an unterminated prompt shows up."""
+    samples = {
+        "plain": b"[    1.234567] usb 1-1: new high-speed USB device number 2 using ehci-pci\n",
+        "ansi": b"\x1b[1;32m[  OK  ]\x1b[0m Started \x1b[0;1;39mJournal Service\x1b[0m.\n",
+        "progress": b"".join(b"\rCopying rootfs %3d%% [%-20s]" % (p, b"#" * (p // 5)) for p in range(0, 101, 5))
+                    + b"\n",
+        "noise": bytes(range(256)) + b"\n",
+        "stray-esc": b"noise \x1b\n",
+    }
+    for name, sample in samples.items():
+        data = sample * (megabytes * 1024 * 1024 // len(sample))
+        decoder = ConsoleDecoder()
+        started = time.perf_counter()
+        lines = 0
+        for offset in range(0, len(data), 65536):
+            lines += len(decoder.feed(data[offset:offset + 65536]))
+        elapsed = time.perf_counter() - started
+        print(f"{name:>9}: {len(data) / 1024 / 1024 / elapsed:7.1f} MB/s, {lines} lines")
+
+    # A stray ESC must not hold back the finished line or the prompt after it
+    decoder = ConsoleDecoder()
+    assert decoder.feed(b"noise \x1b\nlogin: ") == ["noise "], "stray ESC held back a complete line"
+    assert decoder.partial == "login: ", "stray ESC held back the prompt"
+
+    from process_engine import ProcessEngine
+    engine = ProcessEngine().start()
+    latencies = []
+    seen = []
+
+    def on_partial(line: ConsoleLine):
+        if line.startswith("login@") and line not in seen:
+            seen.append(line)
+            latencies.append(time.time() - float(line[6:].split(":")[0]))
+
+    script = ("import sys, time\n"
+              "for _ in range(20):\n"
+              "    time.sleep(0.05)\n"
+              "    sys.stdout.write('\\x1b\\nlogin@%.6f: ' % time.time()); sys.stdout.flush()\n")
+    handle = engine.spawn(["python3", "-c", script], on_partial=on_partial)
+    handle.wait(30)
+    engine.stop()
+    if latencies:
+        latencies.sort()
+        print(f"   prompt: {len(latencies)} unterminated prompts, median {latencies[len(latencies) // 2] * 1000:.2f} ms, "
+              f"max {latencies[-1] * 1000:.2f} ms")
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="CyberOS console stream decoder")
+    parser.add_argument("--bench", type=int, nargs="?", const=20, metavar="MB",
+                        help="measure decoder throughput (MB per sample) and prompt latency")
+    args = parser.parse_args()
+    if args.bench:
+        benchmark(args.bench)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
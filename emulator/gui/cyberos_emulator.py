@@ -7,15 +7,47 @@ A cross-platform graphical interface for running CyberOS in QEMU.
 Supports macOS, Linux, and Windows with a native-looking interface.
 """
 
+import asyncio
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
-import subprocess
 import os
 import sys
 import threading
 import json
+import shutil
+import sqlite3
+import time
 from pathlib import Path
-from typing import Optional, List, Dict
+from typing import Callable, Optional, List, Dict
+
+from disk_profiles import DISK_PROFILES, DEFAULT_PROFILE, get_profile, create_command
+from disk_maintenance import (MaintenanceJob, MaintenanceReport, DuplicateGroup, deduplicate, allocated_bytes,
+                              format_bytes)
+from vm_command import VMSpec, build_qemu_command
+from vm_pool import BOOT_BANNER, WarmPool, PoolConfig, PoolMember
+from direct_boot import BootTimes, skipped_report, savings_report
+from build_variants import DEFAULT_VARIANT, BuildVariant, load_variants
+from rootfs_share import (SHARE_MECHANISMS, SHARE_MODES, DEFAULT_MODE, RootfsShare, ShareSupport, device_help_command,
+                          find_virtiofsd, share_support_from_help, wait_for_socket)
+from admission import AdmissionController, AdmissionError, pin_vcpus
+from memory_backend import MEMORY_BACKENDS, DEFAULT_BACKEND, BalloonSupervisor, resident_memory_mb
+from cyberosd import DaemonClient, DaemonError
+from process_engine import ProcessEngine, ProcessHandle, TkBridge
+from console_stream import ConsoleLine, configure_tags, insert_line
+from console_recording import ConsoleRecorder, recording_path
+from console_replay import ReplayPanel
+from log_index import LogIndex
+from vm_config import DEFAULT_NAME, VMConfig, VMStore, parse_snapshots, snapshot_info_command
+from log_search import LogSearchPanel
+from ui_profiler import UIProfiler, SlowCallback, install_hook
+from profiler_panel import ProfilerPanel
+from vnc_ports import VNCAllocator, VNCLease
+from vm_registry import RunningVM, VMRegistry, shutdown_all
+from boot_screens import BootScreenSupervisor, baseline_path, compare, load_baseline
+from rfb_viewer import RFBViewer
+
+# Run background disk maintenance every 30 minutes
+MAINTENANCE_INTERVAL_MS = 30 * 60 * 1000
 
 
 class CyberOSEmulatorGUI:
@@ -34,6 +66,9 @@ class CyberOSEmulatorGUI:
         # Configuration
         self.config_dir = Path.home() / ".cyberos"
         self.vm_dir = self.config_dir / "vms"
+        self.base_dir = self.config_dir / "bases"
+        self.pool_dir = self.config_dir / "pool"
+        self.run_dir = self.config_dir / "run"
         self.config_file = Path.home() / ".cyberos_vm.conf"
         self.project_root = Path(__file__).parent.parent.parent
         self.iso_file = self.project_root / "iso" / "cyberos-0.1.0-alpha.iso"
@@ -42,8 +77,74 @@ class CyberOSEmulatorGUI:
         self.config_dir.mkdir(exist_ok=True)
         self.vm_dir.mkdir(exist_ok=True)
         
-        # Current VM process
-        self.vm_process: Optional[subprocess.Popen] = None
+        # Current VM process; every subprocess runs on one event loop
+        self.bridge = TkBridge(self.root)
+        self.engine = ProcessEngine(dispatch=self.bridge.post).start()
+        self.vm_process: Optional[ProcessHandle] = None
+        self.pool_member: Optional[PoolMember] = None
+        self.vm_disk: Optional[Path] = None
+        
+        # Background disk maintenance
+        self.maintenance_job: Optional[MaintenanceJob] = None
+        
+        # Host capacity shared by every VM this window starts
+        self.admission = AdmissionController()
+        self.pending_admission: Optional[str] = None
+        self.allocation_refreshing = False
+        # Rootfs sharing support per QEMU binary, probed once
+        self.share_supports: Dict[str, ShareSupport] = {}
+        
+        # Reclaims memory from idle ballooned guests under host pressure
+        self.balloon_supervisor = BalloonSupervisor(
+            log=lambda message: self.bridge.post(self.add_status, message + "\n")
+        )
+        self.balloon_supervisor.start()
+        
+        # Boot stage detection from screendumps (when the variant has a baseline)
+        self.boot_screens = BootScreenSupervisor(
+            self.run_dir / "screens", log=lambda message: self.bridge.post(self.add_status, message + "\n")
+        )
+        self.boot_screens.start()
+        self.vm_memory: Optional[int] = None
+        self.running_name: Optional[str] = None
+        
+        # Pre-booted guests for instant launches
+        self.vm_pool = WarmPool(self.engine, self.pool_dir, self.run_dir, self.iso_file,
+                                log=lambda message: self.bridge.post(self.add_status, message + "\n"),
+                                admission=self.admission)
+        
+        # VMs can be owned by cyberosd so they outlive this window; launches
+        # may queue for host resources, so calls wait as long as they need
+        self.daemon = DaemonClient(timeout=None)
+        self.daemon_vm: Optional[str] = None
+        self.daemon_vm_pid: Optional[int] = None
+        
+        # Console history of every session, searchable across restarts
+        self.log_index = LogIndex(self.config_dir / "logs")
+        self.recordings_dir = self.config_dir / "recordings"
+        
+        # Launch-to-banner time per boot mode, to report what direct boot saves
+        self.boot_times = BootTimes(self.config_dir / "boot_times.json")
+        
+        # Per-VM settings and boot history; the old flat config is imported once
+        self.vm_store = VMStore(self.config_dir / "vms.sqlite")
+        self.vm_store.import_flat_config(self.config_file, self.vm_dir)
+        self.vm_names: List[str] = []
+        
+        # Build variants (config/variants/) and the QEMU each one runs on
+        self.variants = load_variants(self.project_root)
+        
+        # VNC displays are leased per VM so several VNC-mode guests can run at once
+        self.vnc_ports = VNCAllocator(self.run_dir / "vnc.sqlite")
+        
+        # Guests are recorded so a later session can re-attach to ones left running
+        self.vm_registry = VMRegistry(self.run_dir / "vms.sqlite")
+        self.attached_vms: List[RunningVM] = []
+        self.closing = False
+        
+        # Callback latency watchdog and profiler (Settings tab or CYBEROS_PROFILE)
+        self.profiler = UIProfiler("emulator", self.root, self.bridge.post, on_event=self.on_slow_callback)
+        self.profiler.start_from_environment()
         
         # Build GUI
         self.setup_styles()
@@ -53,6 +154,19 @@ class CyberOSEmulatorGUI:
         
         # Window close handler
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # Periodic background maintenance
+        self.root.after(MAINTENANCE_INTERVAL_MS, self.scheduled_maintenance)
+        
+        # Start the warm pool if configured and keep its stats current
+        self.apply_pool_settings()
+        self.update_runtime_stats()
+        
+        # Re-attach to a VM the daemon kept running since the last session
+        threading.Thread(target=self.reattach_daemon_vm, args=(self.vm_name_var.get(),), daemon=True).start()
+        
+        # and to guests an earlier window was closed with
+        threading.Thread(target=self.reattach_guests, daemon=True).start()
     
     def setup_styles(self):
         """Configure ttk styles for the application."""
@@ -84,6 +198,8 @@ class CyberOSEmulatorGUI:
         self.create_launcher_tab()
         self.create_vm_manager_tab()
         self.create_console_tab()
+        self.create_display_tab()
+        self.create_settings_tab()
         self.create_about_tab()
     
     def create_launcher_tab(self):
@@ -101,9 +217,13 @@ class CyberOSEmulatorGUI:
         
         # VM Name
         ttk.Label(config_frame, text="VM Name:", style="Heading.TLabel").grid(row=0, column=0, sticky="w", pady=5)
-        self.vm_name_var = tk.StringVar(value="CyberOS-VM")
-        vm_name_entry = ttk.Entry(config_frame, textvariable=self.vm_name_var, width=30)
-        vm_name_entry.grid(row=0, column=1, sticky="w", pady=5, padx=10)
+        self.vm_name_var = tk.StringVar(value=DEFAULT_NAME)
+        self.vm_name_combo = ttk.Combobox(config_frame, textvariable=self.vm_name_var, width=28)
+        self.vm_name_combo.grid(row=0, column=1, sticky="w", pady=5, padx=10)
+        self.vm_name_combo.bind("<<ComboboxSelected>>", lambda _: self.load_config(self.vm_name_var.get()))
+        self.vm_name_combo.bind("<Return>", lambda _: self.load_config(self.vm_name_var.get()))
+        ttk.Label(config_frame, text="Settings are saved per VM",
+                  style="Info.TLabel").grid(row=0, column=2, sticky="w", padx=5)
         
         # CPU Cores
         ttk.Label(config_frame, text="CPU Cores:", style="Heading.TLabel").grid(row=1, column=0, sticky="w", pady=5)
@@ -134,10 +254,110 @@ class CyberOSEmulatorGUI:
         display_combo.grid(row=4, column=1, sticky="w", pady=5, padx=10)
         ttk.Label(config_frame, text="SDL = GUI, VNC = Remote, Serial = Text", style="Info.TLabel").grid(row=4, column=2, sticky="w", padx=5)
         
+        # Disk Profile
+        ttk.Label(config_frame, text="Disk Profile:", style="Heading.TLabel").grid(row=5, column=0, sticky="w", pady=5)
+        self.disk_profile_var = tk.StringVar(value=DEFAULT_PROFILE)
+        profile_combo = ttk.Combobox(config_frame, textvariable=self.disk_profile_var,
+                                     values=list(DISK_PROFILES), state="readonly", width=10)
+        profile_combo.grid(row=5, column=1, sticky="w", pady=5, padx=10)
+        self.disk_profile_info = ttk.Label(config_frame, text=get_profile(DEFAULT_PROFILE).description,
+                                           style="Info.TLabel")
+        self.disk_profile_info.grid(row=5, column=2, sticky="w", padx=5)
+        self.disk_profile_var.trace_add(
+            "write", lambda *_: self.disk_profile_info.config(text=get_profile(self.disk_profile_var.get()).description)
+        )
+        
         # Networking
         self.network_var = tk.BooleanVar(value=False)
         network_check = ttk.Checkbutton(config_frame, text="Enable Networking", variable=self.network_var)
-        network_check.grid(row=5, column=1, sticky="w", pady=10)
+        network_check.grid(row=6, column=1, sticky="w", pady=10)
+        
+        self.direct_boot_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(config_frame, text="Direct kernel boot (skip ISO and GRUB)",
+                        variable=self.direct_boot_var).grid(row=6, column=2, sticky="w", padx=5)
+        
+        # Host resources
+        self.queue_launch_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(config_frame, text="Queue launch when the host is full",
+                        variable=self.queue_launch_var).grid(row=7, column=1, sticky="w")
+        
+        self.pin_vcpus_var = tk.BooleanVar(value=False)
+        pin_check = ttk.Checkbutton(config_frame, text="Pin vCPUs to dedicated host cores",
+                                    variable=self.pin_vcpus_var)
+        pin_check.grid(row=7, column=2, sticky="w", padx=5)
+        if not hasattr(os, "sched_setaffinity"):
+            pin_check.config(state=tk.DISABLED)
+        
+        # Memory backend
+        ttk.Label(config_frame, text="Memory Backend:",
+                  style="Heading.TLabel").grid(row=8, column=0, sticky="w", pady=5)
+        self.memory_backend_var = tk.StringVar(value=DEFAULT_BACKEND)
+        ttk.Combobox(config_frame, textvariable=self.memory_backend_var, values=MEMORY_BACKENDS,
+                     state="readonly", width=10).grid(row=8, column=1, sticky="w", pady=5, padx=10)
+        ttk.Label(config_frame, text="memfd = shareable, hugepages = fewer TLB misses",
+                  style="Info.TLabel").grid(row=8, column=2, sticky="w", padx=5)
+        
+        self.mem_prealloc_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(config_frame, text="Preallocate guest RAM",
+                        variable=self.mem_prealloc_var).grid(row=9, column=1, sticky="w")
+        
+        self.balloon_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(config_frame, text="Balloon (reclaim when host is short)",
+                        variable=self.balloon_var).grid(row=9, column=2, sticky="w", padx=5)
+        
+        # Root filesystem share (dev boots without repacking)
+        ttk.Label(config_frame, text="Share build/rootfs:",
+                  style="Heading.TLabel").grid(row=10, column=0, sticky="w", pady=5)
+        share_frame = ttk.Frame(config_frame)
+        share_frame.grid(row=10, column=1, sticky="w", pady=5, padx=10)
+        self.share_var = tk.StringVar(value="off")
+        ttk.Combobox(share_frame, textvariable=self.share_var, values=["off"] + SHARE_MECHANISMS,
+                     state="readonly", width=8).pack(side=tk.LEFT)
+        self.share_mode_var = tk.StringVar(value=DEFAULT_MODE)
+        ttk.Combobox(share_frame, textvariable=self.share_mode_var, values=SHARE_MODES,
+                     state="readonly", width=8).pack(side=tk.LEFT, padx=5)
+        self.share_info = ttk.Label(config_frame, text="Direct boot from a 9p/virtiofs share, no repack",
+                                    style="Info.TLabel")
+        self.share_info.grid(row=10, column=2, sticky="w", padx=5)
+        self.share_var.trace_add("write", lambda *_: self.check_share_support())
+        
+        self.allocation_label = ttk.Label(config_frame, text="", style="Info.TLabel")
+        self.allocation_label.grid(row=11, column=0, columnspan=3, sticky="w", pady=5)
+        
+        self.vm_memory_label = ttk.Label(config_frame, text="", style="Info.TLabel")
+        self.vm_memory_label.grid(row=12, column=0, columnspan=3, sticky="w")
+        
+        # Build variant: which architecture's ISO/kernel and QEMU binary
+        ttk.Label(config_frame, text="Build Variant:",
+                  style="Heading.TLabel").grid(row=13, column=0, sticky="w", pady=5)
+        self.variant_var = tk.StringVar(value=DEFAULT_VARIANT)
+        ttk.Combobox(config_frame, textvariable=self.variant_var, values=list(self.variants),
+                     state="readonly", width=10).grid(row=13, column=1, sticky="w", pady=5, padx=10)
+        self.variant_info = ttk.Label(config_frame, text=self.current_variant().describe(), style="Info.TLabel")
+        self.variant_info.grid(row=13, column=2, sticky="w", padx=5)
+        self.variant_var.trace_add("write", lambda *_: self.variant_info.config(text=self.current_variant().describe()))
+        
+        # Warm pool
+        pool_frame = ttk.LabelFrame(frame, text="Warm Pool", padding=10)
+        pool_frame.pack(fill=tk.X, padx=20, pady=5)
+        
+        ttk.Label(pool_frame, text="Pre-booted VMs:", style="Heading.TLabel").grid(row=0, column=0, sticky="w", pady=5)
+        self.pool_size_var = tk.IntVar(value=0)
+        pool_spin = ttk.Spinbox(pool_frame, from_=0, to=8, textvariable=self.pool_size_var, width=10,
+                                command=self.apply_pool_settings)
+        pool_spin.grid(row=0, column=1, sticky="w", pady=5, padx=10)
+        
+        self.use_pool_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(pool_frame, text="Instant launch from pool (disposable disk, serial console)",
+                        variable=self.use_pool_var,
+                        command=self.apply_pool_settings).grid(row=0, column=2, sticky="w", padx=5)
+        
+        self.pool_stats_label = ttk.Label(pool_frame, text="Pool disabled", style="Info.TLabel")
+        self.pool_stats_label.grid(row=1, column=0, columnspan=3, sticky="w")
+        
+        self.use_daemon_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(pool_frame, text="Run through cyberosd (VM keeps running when this window closes)",
+                        variable=self.use_daemon_var).grid(row=2, column=0, columnspan=3, sticky="w", pady=5)
         
         # Button section
         button_frame = ttk.Frame(frame)
@@ -200,6 +420,19 @@ class CyberOSEmulatorGUI:
         open_dir_btn = ttk.Button(button_frame, text="📁 Open VM Folder", command=self.open_vm_directory)
         open_dir_btn.pack(side=tk.LEFT, padx=5)
         
+        maintain_btn = ttk.Button(button_frame, text="🧹 Compact && Deduplicate", command=self.start_maintenance)
+        maintain_btn.pack(side=tk.LEFT, padx=5)
+        
+        # Maintenance progress
+        maintenance_frame = ttk.LabelFrame(frame, text="Disk Maintenance", padding=10)
+        maintenance_frame.pack(fill=tk.X, padx=20, pady=10)
+        
+        self.maintenance_progress = ttk.Progressbar(maintenance_frame, mode="determinate", maximum=1.0)
+        self.maintenance_progress.pack(fill=tk.X, pady=5)
+        
+        self.maintenance_label = ttk.Label(maintenance_frame, text="Idle", style="Info.TLabel")
+        self.maintenance_label.pack(anchor="w")
+        
         # Info section
         info_frame = ttk.LabelFrame(frame, text="VM Information", padding=10)
         info_frame.pack(fill=tk.X, padx=20, pady=10)
@@ -209,22 +442,45 @@ class CyberOSEmulatorGUI:
         
         # Bind selection
         self.vm_listbox.bind("<<ListboxSelect>>", self.on_vm_selected)
+        self.vm_listbox.bind("<Double-Button-1>", self.load_selected_vm)
     
     def create_console_tab(self):
         """Create the console/output tab."""
         frame = ttk.Frame(self.notebook)
         self.notebook.add(frame, text="📺 Console")
         
-        # Title
-        title_label = ttk.Label(frame, text="Console Output", style="Title.TLabel")
-        title_label.pack(pady=20, padx=20, anchor="w")
+        # Title and live/replay switch
+        title_row = ttk.Frame(frame)
+        title_row.pack(fill=tk.X, pady=20, padx=20)
+        title_label = ttk.Label(title_row, text="Console Output", style="Title.TLabel")
+        title_label.pack(side=tk.LEFT)
+        self.console_mode_var = tk.StringVar(value="live")
+        ttk.Radiobutton(title_row, text="⏺ Replay", variable=self.console_mode_var, value="replay",
+                        command=self.switch_console_mode).pack(side=tk.RIGHT, padx=5)
+        ttk.Radiobutton(title_row, text="📡 Live", variable=self.console_mode_var, value="live",
+                        command=self.switch_console_mode).pack(side=tk.RIGHT, padx=5)
         
         # Console output
         console_frame = ttk.LabelFrame(frame, text="VM Output", padding=10)
         console_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
+        self.console_frame = console_frame
+        
+        # Recorded sessions, shown instead of the live output in replay mode
+        self.replay_frame = ttk.LabelFrame(frame, text="Session Replay", padding=10)
+        self.replay_panel = ReplayPanel(self.replay_frame, self.recordings_dir)
+        self.replay_panel.pack(fill=tk.BOTH, expand=True)
         
-        self.console_text = scrolledtext.ScrolledText(console_frame, height=25, width=100, state=tk.DISABLED)
+        self.console_text = scrolledtext.ScrolledText(console_frame, height=18, width=100, state=tk.DISABLED,
+                                                      font=("Courier", 10))
         self.console_text.pack(fill=tk.BOTH, expand=True)
+        configure_tags(self.console_text)
+        # Start of the unterminated line (prompt) currently shown
+        self.console_text.mark_set("partial", "end-1c")
+        self.console_text.mark_gravity("partial", tk.LEFT)
+        
+        # Search across the consoles and builds of every session
+        self.search_panel = LogSearchPanel(frame, self.log_index, self.bridge.post, scope="VM consoles")
+        self.search_panel.pack(fill=tk.X, padx=20, pady=(0, 10))
         
         # Clear button
         button_frame = ttk.Frame(frame)
@@ -233,6 +489,40 @@ class CyberOSEmulatorGUI:
         clear_btn = ttk.Button(button_frame, text="🧹 Clear Console", command=self.clear_console)
         clear_btn.pack(side=tk.LEFT, padx=5)
     
+    def switch_console_mode(self):
+        """Show the live console or the replay panel."""
+        if self.console_mode_var.get() == "replay":
+            self.console_frame.pack_forget()
+            self.replay_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10, before=self.search_panel)
+            self.replay_panel.refresh()
+        else:
+            self.replay_panel.pause()
+            self.replay_frame.pack_forget()
+            self.console_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10, before=self.search_panel)
+    
+    def create_display_tab(self):
+        """Create the embedded VNC viewer tab."""
+        self.display_view = RFBViewer(self.notebook, self.bridge.post)
+        self.notebook.add(self.display_view, text="🖥️  Display")
+    
+    def show_display(self, lease_display: int):
+        """Connect the Display tab to a VM's VNC server as it starts."""
+        self.display_view.connect(f"127.0.0.1:{lease_display}", wait=15)
+    
+    def create_settings_tab(self):
+        """Create the settings tab."""
+        frame = ttk.Frame(self.notebook)
+        self.notebook.add(frame, text="⚙️  Settings")
+        
+        self.profiler_panel = ProfilerPanel(frame, self.profiler)
+        self.profiler_panel.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
+    
+    def on_slow_callback(self, event: SlowCallback):
+        """Show profiler events; stalls also go to the status log."""
+        self.profiler_panel.on_event(event)
+        if event.level != "slow":
+            self.add_status(f"UI {event.describe()}\n")
+    
     def create_about_tab(self):
         """Create the about tab."""
         frame = ttk.Frame(self.notebook)
@@ -293,15 +583,34 @@ ARCHITECTURE:
         self.status_text.insert(tk.END, text)
         self.status_text.see(tk.END)
         self.status_text.config(state=tk.DISABLED)
-        self.root.update()
     
     def add_console(self, text: str):
-        """Add text to the console window."""
+        """Add text to the console window, keeping a pending prompt last."""
+        self.console_text.config(state=tk.NORMAL)
+        pending = self.console_text.get("partial", "end-1c")
+        self.console_text.delete("partial", "end-1c")
+        self.console_text.insert("end-1c", text)
+        self.console_text.mark_set("partial", "end-1c")
+        self.console_text.insert("end-1c", pending)
+        self.console_text.see(tk.END)
+        self.console_text.config(state=tk.DISABLED)
+    
+    def add_console_line(self, line: str):
+        """Add a complete VM output line, replacing the prompt it finishes."""
         self.console_text.config(state=tk.NORMAL)
-        self.console_text.insert(tk.END, text)
+        self.console_text.delete("partial", "end-1c")
+        insert_line(self.console_text, "end-1c", line, "\n")
+        self.console_text.mark_set("partial", "end-1c")
+        self.console_text.see(tk.END)
+        self.console_text.config(state=tk.DISABLED)
+    
+    def show_console_partial(self, line: str):
+        """Show the VM's unterminated last line (a prompt or progress bar)."""
+        self.console_text.config(state=tk.NORMAL)
+        self.console_text.delete("partial", "end-1c")
+        insert_line(self.console_text, "end-1c", line)
         self.console_text.see(tk.END)
         self.console_text.config(state=tk.DISABLED)
-        self.root.update()
     
     def clear_console(self):
         """Clear the console window."""
@@ -309,274 +618,872 @@ ARCHITECTURE:
         self.console_text.delete(1.0, tk.END)
         self.console_text.config(state=tk.DISABLED)
     
+    def config_from_form(self) -> VMConfig:
+        """The launcher's current settings."""
+        return VMConfig(
+            name=self.vm_name_var.get().strip() or DEFAULT_NAME,
+            cores=self.cores_var.get(),
+            memory=self.memory_var.get(),
+            disk_size=self.disk_size_var.get(),
+            network=self.network_var.get(),
+            display=self.display_var.get(),
+            disk_profile=get_profile(self.disk_profile_var.get()).name,
+            memory_backend=self.memory_backend_var.get(),
+            mem_prealloc=self.mem_prealloc_var.get(),
+            balloon=self.balloon_var.get(),
+            direct_boot=self.direct_boot_var.get(),
+            share_rootfs=self.share_var.get(),
+            share_mode=self.share_mode_var.get(),
+            variant=self.variant_var.get(),
+        )
+    
     def save_config(self):
-        """Save current configuration to file."""
-        config = {
-            "cores": self.cores_var.get(),
-            "memory": self.memory_var.get(),
-            "disk_size": self.disk_size_var.get(),
-            "enable_network": self.network_var.get(),
-            "display": self.display_var.get(),
-        }
-        
-        config_content = f"""# CyberOS VM Configuration
-CORES={config['cores']}
-MEMORY={config['memory']}
-DISK_SIZE={config['disk_size']}
-ENABLE_NETWORK={'true' if config['enable_network'] else 'false'}
-DISPLAY={config['display']}
-"""
-        
+        """Save the current settings for this VM and as the defaults for new ones."""
+        config = self.config_from_form()
         try:
-            self.config_file.write_text(config_content)
+            self.vm_store.save(config)
+            self.vm_store.save_defaults(config)
+            self.vm_store.set_setting("pool_size", self.pool_size_var.get())
+            self.vm_store.set_setting("last_vm", config.name)
             messagebox.showinfo("Success", "Configuration saved successfully!")
-            self.add_status(f"Configuration saved to {self.config_file}\n")
+            self.add_status(f"Configuration of {config.name} saved to {self.vm_store.db_path}\n")
+            self.refresh_vm_list()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save configuration: {e}")
             self.add_status(f"Error saving configuration: {e}\n")
     
-    def load_config(self):
-        """Load configuration from file."""
-        if self.config_file.exists():
-            try:
-                config_content = self.config_file.read_text()
-                for line in config_content.split('\n'):
-                    if line.startswith('CORES='):
-                        self.cores_var.set(int(line.split('=')[1]))
-                    elif line.startswith('MEMORY='):
-                        self.memory_var.set(int(line.split('=')[1]))
-                    elif line.startswith('DISK_SIZE='):
-                        self.disk_size_var.set(int(line.split('=')[1]))
-                    elif line.startswith('ENABLE_NETWORK='):
-                        self.network_var.set(line.split('=')[1].lower() == 'true')
-                    elif line.startswith('DISPLAY='):
-                        self.display_var.set(line.split('=')[1].strip())
-            except Exception as e:
-                self.add_status(f"Warning: Could not load configuration: {e}\n")
+    def load_config(self, name: Optional[str] = None):
+        """Load a VM's settings (the last used VM by default) into the launcher."""
+        try:
+            name = name or self.vm_store.get_setting("last_vm", DEFAULT_NAME)
+            config = self.vm_store.config_for(name)
+            self.vm_name_var.set(config.name)
+            self.cores_var.set(config.cores)
+            self.memory_var.set(config.memory)
+            self.disk_size_var.set(config.disk_size)
+            self.network_var.set(config.network)
+            self.display_var.set(config.display)
+            self.disk_profile_var.set(get_profile(config.disk_profile).name)
+            if config.memory_backend in MEMORY_BACKENDS:
+                self.memory_backend_var.set(config.memory_backend)
+            self.mem_prealloc_var.set(config.mem_prealloc)
+            self.balloon_var.set(config.balloon)
+            self.direct_boot_var.set(config.direct_boot)
+            if config.share_rootfs in ["off"] + SHARE_MECHANISMS:
+                self.share_var.set(config.share_rootfs)
+            if config.share_mode in SHARE_MODES:
+                self.share_mode_var.set(config.share_mode)
+            self.variant_var.set(config.variant if config.variant in self.variants else DEFAULT_VARIANT)
+            self.pool_size_var.set(int(self.vm_store.get_setting("pool_size", "0")))
+        except Exception as e:
+            self.add_status(f"Warning: Could not load configuration: {e}\n")
+    
+    def current_variant(self) -> BuildVariant:
+        """The build variant selected in the launcher."""
+        return self.variants.get(self.variant_var.get()) or self.variants[DEFAULT_VARIANT]
     
     def check_dependencies(self) -> bool:
-        """Check if QEMU is installed."""
-        try:
-            subprocess.run(["which", "qemu-system-x86_64"], check=True, capture_output=True)
+        """Check if the variant's QEMU system binary is installed."""
+        qemu_binary = self.current_variant().qemu_binary
+        if shutil.which(qemu_binary):
             return True
-        except subprocess.CalledProcessError:
-            messagebox.showerror(
-                "Missing Dependency",
-                "QEMU is not installed.\n\nPlease install it:\n"
-                "• macOS: brew install qemu\n"
-                "• Linux: sudo apt-get install qemu-system-x86-64\n"
-                "• Windows: https://www.qemu.org/download/"
-            )
-            return False
+        messagebox.showerror(
+            "Missing Dependency",
+            f"QEMU ({qemu_binary}) is not installed.\n\nPlease install it:\n"
+            "• macOS: brew install qemu\n"
+            "• Linux: sudo apt-get install qemu-system-x86-64\n"
+            "• Windows: https://www.qemu.org/download/"
+        )
+        return False
+    
+    def build_hint(self, *options: str) -> str:
+        """The build.sh command that produces the selected variant's outputs."""
+        variant = self.current_variant()
+        if variant.name != DEFAULT_VARIANT:
+            options += ("--variant", variant.name)
+        return " ".join(("./scripts/build.sh",) + options)
     
     def check_iso(self) -> bool:
         """Check if ISO file exists."""
-        if not self.iso_file.exists():
+        iso_file = self.current_variant().iso_file(self.project_root)
+        if not iso_file.exists():
             messagebox.showerror(
                 "ISO Not Found",
-                f"CyberOS ISO not found at:\n{self.iso_file}\n\n"
+                f"CyberOS ISO not found at:\n{iso_file}\n\n"
                 "Please build CyberOS first:\n"
                 f"cd {self.project_root}\n"
-                "./scripts/build.sh"
+                f"{self.build_hint()}"
+            )
+            return False
+        return True
+    
+    def check_direct_boot(self) -> bool:
+        """Check that the kernel and initramfs for a direct boot exist."""
+        missing = self.current_variant().direct_boot(self.project_root).missing()
+        if missing:
+            messagebox.showerror(
+                "Kernel Not Found",
+                "Direct kernel boot needs:\n" + "\n".join(str(path) for path in missing) + "\n\n"
+                "Build them first (no ISO needed):\n"
+                f"cd {self.project_root}\n"
+                f"{self.build_hint('--no-iso')}"
             )
             return False
         return True
     
+    def check_share_support(self):
+        """Probe which rootfs sharing mechanisms the host QEMU supports."""
+        if self.share_var.get() == "off":
+            return
+        self.share_info.config(text="Checking QEMU for virtiofs and 9p...")
+        
+        qemu_binary = self.current_variant().qemu_binary
+        
+        async def probe():
+            support = await self.share_support(qemu_binary)
+            self.bridge.post(self.share_info.config, {"text": support.report()})
+            self.bridge.post(self.add_status, f"Rootfs sharing support: {support.report()}\n")
+        
+        self.engine.submit(probe())
+    
+    async def share_support(self, qemu_binary: str) -> ShareSupport:
+        """Ask QEMU and virtiofsd what they support, on the process engine (cached per binary)."""
+        if qemu_binary not in self.share_supports:
+            _, devices = await self.engine.run(device_help_command(qemu_binary), timeout=10)
+            virtiofsd = find_virtiofsd()
+            daemon_help = (await self.engine.run([virtiofsd, "--help"], timeout=10))[1] if virtiofsd else ""
+            self.share_supports[qemu_binary] = share_support_from_help(qemu_binary, devices, virtiofsd,
+                                                                       daemon_help)
+        return self.share_supports[qemu_binary]
+    
     def launch_vm(self):
         """Launch the CyberOS VM."""
         # Check dependencies
         if not self.check_dependencies():
             return
         
-        # Check ISO
-        if not self.check_iso():
+        # Check the ISO, or the kernel and initramfs for a direct boot
+        share = self.share_var.get()
+        direct_boot = self.direct_boot_var.get() or share != "off"
+        if not (self.check_direct_boot() if direct_boot else self.check_iso()):
             return
         
         # Disable launch button
         self.notebook.tab(0, state="disabled")
         self.stop_btn.config(state=tk.NORMAL)
         
-        self.add_status(f"Launching {self.vm_name_var.get()}...\n")
+        settings = {
+            "name": self.vm_name_var.get(),
+            "cores": self.cores_var.get(),
+            "memory": self.memory_var.get(),
+            "disk_size": self.disk_size_var.get(),
+            "display": self.display_var.get(),
+            "network": self.network_var.get(),
+            "disk_profile": get_profile(self.disk_profile_var.get()).name,
+            "memory_backend": self.memory_backend_var.get(),
+            "mem_prealloc": self.mem_prealloc_var.get(),
+            "balloon": self.balloon_var.get(),
+            "pin": self.pin_vcpus_var.get(),
+            "queue": self.queue_launch_var.get(),
+            "direct_boot": direct_boot,
+            "share": share,
+            "share_mode": self.share_mode_var.get(),
+            "variant": self.current_variant().name,
+        }
+        self.add_status(f"Launching {settings['name']}...\n")
+        
+        # Remember what this VM was launched with
+        self.vm_store.save(self.config_from_form())
+        self.vm_store.set_setting("last_vm", settings["name"])
         
-        # Run in thread to avoid blocking GUI
-        thread = threading.Thread(target=self._run_vm_thread)
-        thread.daemon = True
-        thread.start()
+        if self.use_daemon_var.get() and share != "off":
+            self.add_status("Rootfs sharing runs from this window, not through cyberosd.\n")
+        if self.use_daemon_var.get() and share == "off":
+            threading.Thread(target=self._run_vm_daemon, args=(settings,), daemon=True).start()
+        else:
+            self.engine.submit(self._run_vm(settings, self.use_pool_var.get()))
     
-    def _run_vm_thread(self):
-        """Run VM in a separate thread."""
+    async def _run_vm(self, settings: Dict, use_pool: bool):
+        """Launch a VM on the process engine and wait for it to exit."""
+        ui = self.bridge.post
+        loop = asyncio.get_running_loop()
+        vm_name = settings["name"]
+        cores, memory = settings["cores"], settings["memory"]
+        network, display = settings["network"], settings["display"]
+        variant = self.variants[settings["variant"]]
+        admitted = None
+        virtiofsd: Optional[ProcessHandle] = None
+        vnc: Optional[VNCLease] = None
+        registered: Optional[RunningVM] = None
+        screen_baseline = None
         try:
-            cores = self.cores_var.get()
-            memory = self.memory_var.get()
-            disk_size = self.disk_size_var.get()
-            vm_name = self.vm_name_var.get()
-            network = self.network_var.get()
-            display = self.display_var.get()
+            # Serve the launch from the warm pool when possible (pool guests boot the default ISO)
+            if use_pool and self.vm_pool.size and not settings["direct_boot"] and variant.name == DEFAULT_VARIANT:
+                member = await loop.run_in_executor(None, self.vm_pool.acquire, cores, memory, network, display,
+                                                    settings["disk_size"], settings["disk_profile"])
+                if member:
+                    await self._run_pool_member(member)
+                    return
+                ui(self.add_status, "Warm pool miss, booting normally.\n")
+                ui(self.apply_pool_settings)
             
+            # Reserve host resources before touching the disk
+            try:
+                self.pending_admission = vm_name
+                if self.admission.committed()["vms"] and settings["queue"]:
+                    ui(self.add_status, "Waiting for host resources if needed...\n")
+                await loop.run_in_executor(None, lambda: self.admission.admit(
+                    vm_name, cores, memory, queue=settings["queue"], timeout=600))
+            except AdmissionError as e:
+                ui(self.add_status, f"Launch rejected: {e}\n")
+                ui(messagebox.showwarning, "Host Resources", f"Cannot launch {vm_name}:\n{e}")
+                return
+            finally:
+                self.pending_admission = None
+            admitted = vm_name
+            
+            profile = get_profile(settings["disk_profile"])
             disk_file = self.vm_dir / f"{vm_name}.qcow2"
+            self.vm_disk = disk_file
             
-            self.add_status(f"Configuration:\n")
-            self.add_status(f"  CPU Cores: {cores}\n")
-            self.add_status(f"  RAM: {memory} MB\n")
-            self.add_status(f"  Disk: {disk_size} GB\n")
-            self.add_status(f"  Networking: {'Enabled' if network else 'Disabled'}\n")
-            self.add_status(f"  Display: {display}\n\n")
+            ui(self.add_status,
+               f"Configuration:\n"
+               f"  CPU Cores: {cores}\n"
+               f"  RAM: {memory} MB ({settings['memory_backend']}"
+               f"{', preallocated' if settings['mem_prealloc'] else ''}"
+               f"{', balloon' if settings['balloon'] else ''})\n"
+               f"  Disk: {settings['disk_size']} GB ({profile.name} profile)\n"
+               f"  Networking: {'Enabled' if network else 'Disabled'}\n"
+               f"  Display: {display}\n"
+               f"  Variant: {variant.name} ({variant.describe()})\n"
+               f"  Boot: {'kernel + initramfs' if settings['direct_boot'] else 'ISO'}"
+               f"{' + build/rootfs share' if settings['share'] != 'off' else ''}\n\n")
+            if settings["direct_boot"]:
+                ui(self.add_status, skipped_report(self.project_root) + "\n")
             
             # Create disk image if needed
             if not disk_file.exists():
-                self.add_status(f"Creating disk image: {disk_size} GB\n")
-                subprocess.run(["qemu-img", "create", "-f", "qcow2", str(disk_file), f"{disk_size}G"], check=True)
-                self.add_status(f"Disk image created.\n\n")
+                ui(self.add_status, f"Creating disk image: {settings['disk_size']} GB\n")
+                code, output = await self.engine.run(create_command(disk_file, settings["disk_size"], profile),
+                                                     timeout=120)
+                if code != 0:
+                    raise RuntimeError(f"qemu-img create failed: {output}")
+                ui(self.add_status, f"Disk image created.\n\n")
             
-            # Build QEMU command
-            qemu_cmd = [
-                "qemu-system-x86_64",
-                "-name", vm_name,
-                "-machine", "type=q35,accel=tcg",
-                "-smp", f"cores={cores}",
-                "-m", str(memory),
-                "-boot", "d",
-                "-cdrom", str(self.iso_file),
-                "-drive", f"file={disk_file},format=qcow2",
-            ]
+            # Export build/rootfs, starting virtiofsd first when needed
+            share = None
+            if settings["share"] != "off":
+                support = await self.share_support(variant.qemu_binary)
+                ui(self.add_status, f"Rootfs sharing support: {support.report()}\n")
+                share = RootfsShare.for_project(self.project_root, support.resolve(settings["share"]),
+                                                settings["share_mode"],
+                                                socket=self.run_dir / f"{vm_name}.virtiofs.sock")
+                if not share.source.is_dir():
+                    raise RuntimeError(f"{share.source} not found; run ./scripts/build.sh --stages rootfs")
+                daemon_cmd = share.daemon_command(support)
+                if daemon_cmd:
+                    self.run_dir.mkdir(exist_ok=True)
+                    if share.socket.exists():
+                        share.socket.unlink()
+                    virtiofsd = self.engine.spawn(daemon_cmd, name=f"{vm_name}-virtiofsd",
+                                                  on_line=lambda line: self.add_status(f"virtiofsd: {line}\n"))
+                    if not await wait_for_socket(share.socket, lambda: virtiofsd.running):
+                        raise RuntimeError("virtiofsd did not create its socket")
+                ui(self.add_status, f"Sharing {share.source} over {share.mechanism} ({share.mode})\n")
             
-            # Add display mode
             if display == "vnc":
-                qemu_cmd.extend(["-vnc", ":0"])
-            elif display == "serial":
-                qemu_cmd.extend(["-nographic", "-serial", "stdio"])
-            else:
-                qemu_cmd.extend(["-display", "default"])
+                vnc = await loop.run_in_executor(None, self.vnc_ports.allocate, vm_name)
             
-            # Add networking
-            if network:
-                qemu_cmd.extend(["-nic", "user,model=virtio"])
-            else:
-                qemu_cmd.extend(["-nic", "none"])
+            # Build QEMU command
+            spec = VMSpec(
+                name=vm_name,
+                cores=cores,
+                memory=memory,
+                iso_file=variant.iso_file(self.project_root),
+                disk_file=disk_file,
+                display=display,
+                network=network,
+                disk_profile=profile.name,
+                memory_backend=settings["memory_backend"],
+                mem_prealloc=settings["mem_prealloc"],
+                balloon=settings["balloon"],
+                qmp_socket=self.run_dir / f"{vm_name}.qmp",
+                direct_boot=variant.direct_boot(self.project_root) if settings["direct_boot"] else None,
+                rootfs_share=share,
+                vnc_display=vnc.display if vnc else 0,
+                vnc_websocket=vnc.websocket if vnc else None,
+            )
+            spec = variant.apply(spec)
+            self.run_dir.mkdir(exist_ok=True)
+            qemu_cmd = build_qemu_command(spec)
             
-            self.add_status(f"Starting QEMU...\n")
-            self.add_console(f"Starting CyberOS in QEMU...\n")
-            self.add_console(f"Command: {' '.join(qemu_cmd)}\n\n")
+            ui(self.add_status, f"Starting QEMU...\n")
+            ui(self.add_console, f"Starting CyberOS in QEMU...\nCommand: {' '.join(qemu_cmd)}\n\n")
             
-            self.vm_process = subprocess.Popen(
-                qemu_cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1
-            )
+            log = self.log_index.open_session("vm", vm_name)
+            recorder = ConsoleRecorder(recording_path(vm_name, self.recordings_dir), vm_name)
+            
+            boot_mode = "direct" if settings["direct_boot"] else "iso"
+            banner_seen = False
+            
+            def check_booted(line: str):
+                nonlocal banner_seen
+                if not banner_seen and BOOT_BANNER in line and self.vm_process:
+                    banner_seen = True
+                    self.on_boot_banner(vm_name, boot_mode, self.vm_process.duration)
+            
+            def on_console(line: ConsoleLine):
+                log.feed_line(line)
+                self.add_console_line(line)
+                check_booted(line)
+            
+            def on_partial(line: ConsoleLine):
+                self.show_console_partial(line)
+                check_booted(line)
+            
+            def on_exit(handle: ProcessHandle):
+                log.close()
+                recorder.close()
             
-            self.add_status(f"VM launched with PID {self.vm_process.pid}\n")
+            self.vm_process = self.engine.spawn(qemu_cmd, name=vm_name, on_line=on_console,
+                                                on_partial=on_partial,
+                                                on_chunk=recorder.write, on_exit=on_exit)
+            pid = await self.vm_process.started()
+            if pid is None:
+                raise RuntimeError("QEMU could not be started")
+            ui(self.add_status, f"VM launched with PID {pid}\n")
+            self.admission.adopt(vm_name, pid)
+            if vnc:
+                vnc.adopt(pid)
+                ui(self.add_status, f"Display on {vnc.describe()}\n")
+                ui(self.show_display, vnc.display)
+            registered = self.vm_registry.register(vm_name, pid, spec.qmp_socket, vnc.display if vnc else None,
+                                                   owner="emulator")
             
-            # Read output
-            if self.vm_process.stdout:
-                for line in self.vm_process.stdout:
-                    self.add_console(line)
+            self.vm_memory = memory
+            self.running_name = vm_name
             
-            self.vm_process.wait()
+            if settings["pin"]:
+                await loop.run_in_executor(None, self.pin_vm_vcpus, vm_name, spec.qmp_socket)
+            
+            if spec.balloon:
+                self.balloon_supervisor.register(vm_name, pid, spec.qmp_socket, memory)
+            
+            screen_baseline = load_baseline(baseline_path(variant.name))
+            if screen_baseline:
+                self.boot_screens.register(vm_name, spec.qmp_socket, screen_baseline, on_stage=lambda stage, seconds:
+                                           ui(self.add_status, f"Boot stage: {stage} after {seconds:.1f} s\n"))
+            
+            await self.vm_process.finished()
             
         except Exception as e:
-            self.add_status(f"Error: {e}\n")
-            self.add_console(f"Error: {e}\n")
-            messagebox.showerror("Launch Error", f"Failed to launch VM:\n{e}")
+            ui(self.add_status, f"Error: {e}\n")
+            ui(self.add_console, f"Error: {e}\n")
+            ui(messagebox.showerror, "Launch Error", f"Failed to launch VM:\n{e}")
         finally:
+            # A guest left running on quit keeps its display and registry entry
+            detached = self.vm_process is not None and self.vm_process.detached
+            record = self.boot_screens.unregister(vm_name)
+            if record and screen_baseline:
+                issues = compare(screen_baseline, record)
+                ui(self.add_status, f"Boot screens: {record.summary()}\n" +
+                   "".join(f"  ⚠️  {issue}\n" for issue in issues))
+            if registered and not detached:
+                self.vm_registry.unregister(registered.pid)
+            if vnc and not detached:
+                vnc.release()
+            if admitted:
+                if not detached:
+                    self.admission.release(admitted)
+                self.balloon_supervisor.unregister(admitted)
+            if virtiofsd and virtiofsd.running:
+                virtiofsd.cancel()
             self.vm_process = None
-            self.notebook.tab(0, state="normal")
-            self.stop_btn.config(state=tk.DISABLED)
-            self.add_status(f"VM stopped.\n")
+            self.vm_disk = None
+            self.vm_memory = None
+            ui(self.on_vm_stopped)
+    
+    def on_boot_banner(self, vm_name: str, mode: str, seconds: float):
+        """Record how long a boot took and report what direct boot saves."""
+        self.boot_times.record(mode, seconds)
+        self.vm_store.record_boot(vm_name, mode, seconds)
+        if mode == "direct":
+            self.add_status(savings_report(self.project_root, self.boot_times, seconds) + "\n")
+        else:
+            self.add_status(f"Reached the boot banner in {seconds:.1f} s booting from the ISO\n")
+    
+    def on_vm_stopped(self):
+        """Re-enable the launcher once the VM has exited."""
+        self.notebook.tab(0, state="normal")
+        self.stop_btn.config(state=tk.DISABLED)
+        self.add_status(f"VM stopped.\n")
+    
+    def _run_vm_daemon(self, settings: Dict):
+        """Launch the VM in cyberosd and stream its console (worker thread)."""
+        vm_name = settings["name"]
+        try:
+            # Rootfs sharing never goes through the daemon
+            params = {key: value for key, value in settings.items() if key not in ("share", "share_mode")}
+            job = self.daemon.call("vm.launch", **params)
+        except DaemonError as e:
+            self.bridge.post(self.add_status, f"Launch rejected: {e}\n")
+            self.bridge.post(messagebox.showwarning, "cyberosd", f"Cannot launch {vm_name}:\n{e}")
+            self.bridge.post(self.on_vm_stopped)
+            return
+        self.bridge.post(self.add_status, f"cyberosd launched {vm_name} with PID {job['pid']}\n")
+        if job.get("vnc_display") is not None:
+            self.bridge.post(self.show_display, job["vnc_display"])
+        self._attach_daemon_vm(job)
+    
+    def _attach_daemon_vm(self, job: Dict):
+        """Follow the console of a VM owned by cyberosd until it exits (worker thread)."""
+        self.daemon_vm = job["name"]
+        self.running_name = job["name"]
+        self.vm_memory = job.get("memory")
+        self.daemon_vm_pid = job["pid"]
+        try:
+            self.daemon.follow(job["id"], lambda line: self.bridge.post(self.add_console_line, line),
+                               on_partial=lambda line: self.bridge.post(self.show_console_partial, line))
+        except DaemonError as e:
+            self.bridge.post(self.add_status, f"Lost console of {job['name']}: {e}\n")
+        finally:
+            self.daemon_vm = None
+            self.daemon_vm_pid = None
+            self.vm_memory = None
+            self.bridge.post(self.on_vm_stopped)
+    
+    def reattach_daemon_vm(self, vm_name: str):
+        """Attach to this window's VM if cyberosd is still running it (worker thread).
+
+        VMs cyberosd runs for other clients are left alone, and the daemon-mode
+        setting is not changed.
+        """
+        try:
+            vms = [vm for vm in self.daemon.call("vm.list") if vm["running"] and vm["name"] == vm_name]
+            job = self.daemon.call("job.info", job=vms[0]["job"]) if vms else None
+        except DaemonError:
+            return
+        if job is None:
+            return
+        self.bridge.post(self.notebook.tab, 0, {"state": "disabled"})
+        self.bridge.post(self.stop_btn.config, {"state": tk.NORMAL})
+        self.bridge.post(self.add_status, f"Re-attached to {job['name']} running in cyberosd (PID {job['pid']})\n")
+        self._attach_daemon_vm(job)
+    
+    def reattach_guests(self):
+        """Adopt guests an earlier session of the emulator left running (worker thread)."""
+        vms = self.vm_registry.orphans(owner="emulator")
+        if vms:
+            self.bridge.post(self.on_guests_reattached, self.vm_registry.adopt(vms))
+    
+    def on_guests_reattached(self, vms: List[RunningVM]):
+        """Show re-attached guests; they take the launcher's place if it is free."""
+        self.attached_vms = vms
+        self.add_status(f"Re-attached to {len(vms)} VM(s) left running: " +
+                        ", ".join(vm.describe() for vm in vms) + "\n")
+        self.add_status("Their serial consoles stay with the earlier session; VNC displays and Stop VM work.\n")
+        owns_launcher = not (self.vm_process or self.pool_member or self.daemon_vm or self.pending_admission)
+        if owns_launcher:
+            self.running_name = vms[0].name
+            self.vm_name_var.set(vms[0].name)
+            self.notebook.tab(0, state="disabled")
+            self.stop_btn.config(state=tk.NORMAL)
+        display = next((vm.vnc_display for vm in vms if vm.vnc_display is not None), None)
+        if display is not None:
+            self.show_display(display)
+        threading.Thread(target=self._watch_attached, args=(owns_launcher,), daemon=True).start()
+    
+    def _watch_attached(self, owns_launcher: bool):
+        """Wait for the re-attached guests to exit (worker thread)."""
+        while self.attached_vms:
+            time.sleep(1.0)
+            self.attached_vms = [vm for vm in self.attached_vms if vm.running]
+        if owns_launcher:
+            self.bridge.post(self.on_vm_stopped)
+    
+    def power_down(self, vms: List[RunningVM], then: Optional[Callable[[], None]] = None):
+        """Power VMs down in parallel off the UI thread, then call then() on it."""
+        self.add_status(f"Powering down {', '.join(vm.name for vm in vms)}...\n")
+        
+        def worker():
+            shutdown_all(vms, on_progress=lambda message: self.bridge.post(self.add_status, message + "\n"))
+            if then:
+                self.bridge.post(then)
+        
+        threading.Thread(target=worker, daemon=True).start()
+    
+    def pin_vm_vcpus(self, vm_name: str, qmp_socket: Path):
+        """Pin a VM's vCPU threads to the host cores reserved for it (executor thread)."""
+        cpus = self.admission.allocate_cpus(vm_name)
+        if not cpus:
+            self.bridge.post(self.add_status, "Not enough free host cores to pin vCPUs.\n")
+            return
+        try:
+            pinned = pin_vcpus(qmp_socket, cpus)
+            mapping = ", ".join(f"vCPU{vcpu}→CPU{cpu}" for vcpu, cpu in pinned.items())
+            self.bridge.post(self.add_status, f"Pinned {mapping}\n")
+        except (AdmissionError, OSError) as e:
+            self.bridge.post(self.add_status, f"vCPU pinning failed: {e}\n")
+    
+    async def _run_pool_member(self, member: PoolMember):
+        """Attach the console to a warm pool guest and recycle it afterwards."""
+        ui = self.bridge.post
+        self.pool_member = member
+        self.vm_memory = self.vm_pool.config.memory
+        self.running_name = member.name
+        ui(self.add_status, f"Resumed pre-booted VM {member.name} (PID {member.pid}) from the warm pool\n")
+        ui(self.add_console, f"Attached to pre-booted CyberOS guest {member.name}...\n\n")
+        if member.vnc:
+            ui(self.add_status, f"Display on {member.vnc.describe()}\n")
+            ui(self.show_display, member.vnc.display)
+        log = self.log_index.open_session("vm", member.name)
+        recorder = ConsoleRecorder(recording_path(member.name, self.recordings_dir), member.name)
+        
+        def on_console(line: ConsoleLine):
+            log.feed_line(line)
+            self.bridge.post(self.add_console_line, line)
+        
+        try:
+            member.attach(on_console, lambda line: self.bridge.post(self.show_console_partial, line),
+                          recorder.write)
+            await member.handle.finished()
+        finally:
+            log.close()
+            recorder.close()
+            self.pool_member = None
+            self.vm_memory = None
+            self.vm_pool.release(member)
+            ui(self.on_vm_stopped)
+    
+    def apply_pool_settings(self):
+        """Resize the warm pool to match the launcher settings."""
+        try:
+            size = self.pool_size_var.get() if self.use_pool_var.get() else 0
+        except tk.TclError:
+            return
+        if size and not (self.iso_file.exists() and shutil.which("qemu-system-x86_64")):
+            size = 0
+        self.vm_pool.reconfigure(PoolConfig(
+            cores=self.cores_var.get(),
+            memory=self.memory_var.get(),
+            disk_size=self.disk_size_var.get(),
+            network=self.network_var.get(),
+            display="serial",
+            disk_profile=get_profile(self.disk_profile_var.get()).name,
+        ))
+        self.vm_pool.resize(size)
+    
+    def update_runtime_stats(self):
+        """Refresh pool counters, host allocation and VM memory once a second."""
+        stats = self.vm_pool.stats()
+        if stats["size"]:
+            self.pool_stats_label.config(
+                text=f"Ready {stats['ready']}/{stats['size']} · warming {stats['warming']} · "
+                     f"hits {stats['hits']} · misses {stats['misses']} · "
+                     f"refill {stats['last_refill_s']:.1f} s (avg {stats['avg_refill_s']:.1f} s)"
+            )
+        else:
+            self.pool_stats_label.config(text=f"Pool disabled · hits {stats['hits']} · misses {stats['misses']}")
+        if not self.allocation_refreshing:
+            self.allocation_refreshing = True
+            self.engine.submit(self._refresh_allocation())
+        
+        if self.vm_process:
+            pid = self.vm_process.pid
+        elif self.pool_member:
+            pid = self.pool_member.pid
+        else:
+            pid = self.daemon_vm_pid
+        if pid and self.vm_memory:
+            rss = resident_memory_mb(pid)
+            text = (f"{self.running_name}: {rss if rss is not None else '?'} MB resident "
+                    f"of {self.vm_memory} MB configured")
+            target = self.balloon_supervisor.target(self.running_name)
+            if target is not None and target != self.vm_memory:
+                text += f" (balloon target {target} MB)"
+            self.vm_memory_label.config(text=text)
+        else:
+            self.vm_memory_label.config(text="")
+        self.root.after(1000, self.update_runtime_stats)
+    
+    async def _refresh_allocation(self):
+        """Read the host allocation off the UI thread and show it."""
+        try:
+            text = await asyncio.get_running_loop().run_in_executor(None, self.admission.summary)
+        except sqlite3.Error as e:
+            text = f"Host allocation unavailable: {e}"
+        self.bridge.post(self._show_allocation, text)
+    
+    def _show_allocation(self, text: str):
+        """Show a host allocation summary read by _refresh_allocation."""
+        self.allocation_refreshing = False
+        self.allocation_label.config(text=text)
     
     def stop_vm(self):
         """Stop the running VM."""
+        if self.pending_admission:
+            self.admission.cancel(self.pending_admission)
+        if self.daemon_vm:
+            name = self.daemon_vm
+            self.add_status(f"Asking cyberosd to power down {name}...\n")
+            threading.Thread(target=lambda: self.daemon.call("vm.stop", name=name), daemon=True).start()
+            return
         if self.vm_process:
-            try:
-                self.vm_process.terminate()
-                self.vm_process.wait(timeout=5)
-                self.add_status("VM stopped.\n")
-            except subprocess.TimeoutExpired:
-                self.vm_process.kill()
-                self.add_status("VM killed.\n")
+            # SIGTERM, escalating to SIGKILL; the launcher resets once QEMU exits
+            self.add_status("Stopping VM...\n")
+            self.vm_process.cancel()
+        elif self.pool_member:
+            self.add_status("Stopping VM...\n")
+            self.pool_member.handle.cancel()
+        elif self.attached_vms:
+            self.power_down(list(self.attached_vms))
     
     def refresh_vm_list(self):
-        """Refresh the list of saved VMs."""
+        """Refresh the list of saved VMs (stored settings plus any other disks)."""
         self.vm_listbox.delete(0, tk.END)
+        records = {record.name: record for record in self.vm_store.list()}
+        disks = {vm_file.stem: vm_file for vm_file in self.vm_dir.glob("*.qcow2")} if self.vm_dir.exists() else {}
+        self.vm_names = sorted(set(records) | set(disks))
+        self.vm_name_combo.config(values=sorted(records))
         
-        if not self.vm_dir.exists():
-            self.vm_listbox.insert(tk.END, "(No VMs saved yet)")
-            return
-        
-        vms = list(self.vm_dir.glob("*.qcow2"))
-        if not vms:
+        if not self.vm_names:
             self.vm_listbox.insert(tk.END, "(No VMs saved yet)")
             return
         
-        for vm_file in sorted(vms):
-            size_bytes = vm_file.stat().st_size
-            size_gb = size_bytes / (1024 ** 3)
-            vm_name = vm_file.stem
-            self.vm_listbox.insert(tk.END, f"{vm_name} ({size_gb:.2f} GB)")
+        for vm_name in self.vm_names:
+            vm_file = disks.get(vm_name)
+            size = f"{allocated_bytes(vm_file) / (1024 ** 3):.2f} GB on disk" if vm_file else "no disk yet"
+            record = records.get(vm_name)
+            details = f" · {record.describe()}" if record else ""
+            self.vm_listbox.insert(tk.END, f"{vm_name} ({size}){details}")
+    
+    def selected_vm(self) -> Optional[str]:
+        selection = self.vm_listbox.curselection()
+        if not selection or selection[0] >= len(self.vm_names):
+            return None
+        return self.vm_names[selection[0]]
     
     def on_vm_selected(self, event):
         """Handle VM selection from listbox."""
-        selection = self.vm_listbox.curselection()
-        if not selection:
+        vm_name = self.selected_vm()
+        if not vm_name:
             return
         
-        index = selection[0]
-        vms = list(self.vm_dir.glob("*.qcow2"))
-        if index < len(vms):
-            vm_file = sorted(vms)[index]
-            vm_name = vm_file.stem
-            size_bytes = vm_file.stat().st_size
-            size_gb = size_bytes / (1024 ** 3)
-            
-            info = f"VM: {vm_name}\n"
-            info += f"Size: {size_gb:.2f} GB\n"
+        info = f"VM: {vm_name}\n"
+        vm_file = self.vm_dir / f"{vm_name}.qcow2"
+        if vm_file.exists():
+            size_gb = vm_file.stat().st_size / (1024 ** 3)
+            on_disk_gb = allocated_bytes(vm_file) / (1024 ** 3)
+            info += f"Size: {size_gb:.2f} GB ({on_disk_gb:.2f} GB on disk)\n"
             info += f"Path: {vm_file}\n"
-            info += f"Modified: {vm_file.stat().st_mtime}"
+        record = self.vm_store.record(vm_name)
+        if record:
+            info += f"Settings: {record.describe()}\n"
+            boots = self.vm_store.boot_history(vm_name, limit=5)
+            if boots:
+                info += "Recent boots: " + ", ".join(f"{boot['seconds']:.1f} s ({boot['mode']})"
+                                                     for boot in boots) + "\n"
+            snapshots = self.vm_store.snapshots(vm_name)
+            if snapshots:
+                info += "Snapshots: " + ", ".join(snapshot["name"] for snapshot in snapshots) + "\n"
+        info += "Double-click to load its settings into the launcher."
+        self.vm_info_label.config(text=info)
+        
+        # Snapshot names live in the qcow2 image; refresh them off the UI thread
+        if vm_file.exists() and vm_file != self.vm_disk:
+            async def sync():
+                code, output = await self.engine.run(snapshot_info_command(vm_file), timeout=30)
+                snapshots = parse_snapshots(output) if code == 0 else []
+                loop = asyncio.get_running_loop()
+                known = [snapshot["name"] for snapshot in await loop.run_in_executor(
+                    None, self.vm_store.snapshots, vm_name)]
+                if [name for name, _, _ in snapshots] != known:
+                    await loop.run_in_executor(None, self.vm_store.set_snapshots, vm_name, snapshots)
+                    self.bridge.post(self.on_vm_selected, None)
             
-            self.vm_info_label.config(text=info)
+            self.engine.submit(sync())
+    
+    def load_selected_vm(self, event):
+        """Load the selected VM's settings into the launcher."""
+        vm_name = self.selected_vm()
+        if vm_name:
+            self.load_config(vm_name)
+            self.notebook.select(0)
     
     def delete_vm(self):
         """Delete the selected VM."""
-        selection = self.vm_listbox.curselection()
-        if not selection:
+        vm_name = self.selected_vm()
+        if not vm_name:
             messagebox.showwarning("Selection", "Please select a VM to delete.")
             return
         
-        index = selection[0]
-        vms = list(self.vm_dir.glob("*.qcow2"))
-        if index < len(vms):
-            vm_file = sorted(vms)[index]
-            
-            if messagebox.askyesno("Confirm", f"Delete VM: {vm_file.stem}?\nThis cannot be undone."):
+        if messagebox.askyesno("Confirm", f"Delete VM: {vm_name}?\nThis cannot be undone."):
+            vm_file = self.vm_dir / f"{vm_name}.qcow2"
+            if vm_file.exists():
                 vm_file.unlink()
-                self.add_status(f"Deleted VM: {vm_file.stem}\n")
-                self.refresh_vm_list()
+            self.vm_store.delete(vm_name)
+            self.add_status(f"Deleted VM: {vm_name}\n")
+            self.refresh_vm_list()
+    
+    def running_disks(self) -> List[Path]:
+        """Disks attached to VMs started from this window."""
+        return [self.vm_disk] if self.vm_disk else []
+    
+    def start_maintenance(self, find_dupes: bool = True):
+        """Compact idle disk images and look for duplicates in the background."""
+        if self.maintenance_job and self.maintenance_job.is_alive():
+            self.add_status("Disk maintenance is already running.\n")
+            return
+        
+        self.add_status("Starting disk maintenance...\n")
+        self.maintenance_job = MaintenanceJob(
+            self.vm_dir,
+            self.base_dir,
+            in_use=self.running_disks,
+            progress=lambda message, fraction: self.bridge.post(self.update_maintenance_progress, message, fraction),
+            done=lambda report: self.bridge.post(self.on_maintenance_done, report),
+            find_dupes=find_dupes,
+        )
+        self.maintenance_job.start()
+    
+    def scheduled_maintenance(self):
+        """Periodic compaction of idle images."""
+        if not (self.maintenance_job and self.maintenance_job.is_alive()):
+            self.start_maintenance(find_dupes=False)
+        self.root.after(MAINTENANCE_INTERVAL_MS, self.scheduled_maintenance)
+    
+    def update_maintenance_progress(self, message: str, fraction: float):
+        """Show maintenance progress in the VM Manager tab."""
+        self.maintenance_progress.config(value=fraction)
+        self.maintenance_label.config(text=message)
+    
+    def on_maintenance_done(self, report: MaintenanceReport):
+        """Report what a maintenance run did and offer deduplication."""
+        for name, reclaimed in report.compacted.items():
+            self.add_status(f"Compacted {name}: {format_bytes(reclaimed)} reclaimed\n")
+        for name in report.skipped_in_use:
+            self.add_status(f"Skipped {name}: disk is in use\n")
+        for name, error in report.errors.items():
+            self.add_status(f"Maintenance error ({name}): {error}\n")
+        for base in report.removed_bases:
+            self.add_status(f"Removed unused shared base {base}\n")
+        
+        summary = f"Reclaimed {format_bytes(report.reclaimed)}"
+        self.maintenance_label.config(text=summary)
+        self.add_status(f"Disk maintenance finished. {summary}.\n")
+        self.refresh_vm_list()
+        
+        for group in report.duplicates:
+            names = ", ".join(p.stem for p in group.images)
+            kind = "identical" if group.identical else f"{group.similarity:.0%} similar"
+            if messagebox.askyesno(
+                "Duplicate Disks",
+                f"These VM disks are {kind}:\n{names}\n\n"
+                f"Move them onto a shared base image to save about {format_bytes(group.reclaimable)}?"
+            ):
+                self.start_deduplicate(group)
+    
+    def start_deduplicate(self, group: DuplicateGroup):
+        """Rebase a group of duplicate disks onto a shared base in the background."""
+        in_use = self.running_disks()
+        
+        def progress(message: str, fraction: float):
+            self.bridge.post(self.update_maintenance_progress, message, fraction)
+        
+        async def run():
+            loop = asyncio.get_running_loop()
+            try:
+                reclaimed = await loop.run_in_executor(None, deduplicate, group, self.base_dir, in_use, progress)
+                message = f"Deduplicated {len(group.images)} disks: {format_bytes(reclaimed)} reclaimed"
+            except Exception as e:
+                message = f"Deduplication failed: {e}"
+            self.bridge.post(self.update_maintenance_progress, message, 1.0)
+            self.bridge.post(self.add_status, message + "\n")
+            self.bridge.post(self.refresh_vm_list)
+        
+        self.engine.submit(run())
+    
+    def run_helper(self, cmd: List[str]):
+        """Run a short helper command (open, xdg-open) and report failures."""
+        def on_exit(handle: ProcessHandle):
+            if handle.returncode != 0:
+                messagebox.showerror("Error", f"Could not open directory: {' '.join(output) or handle.state}")
+        
+        output: List[str] = []
+        self.engine.spawn(cmd, on_line=output.append, on_exit=on_exit)
     
     def open_vm_directory(self):
         """Open the VM directory in file explorer."""
         try:
             if sys.platform == "darwin":
-                subprocess.run(["open", str(self.vm_dir)], check=True)
+                self.run_helper(["open", str(self.vm_dir)])
             elif sys.platform == "linux":
-                subprocess.run(["xdg-open", str(self.vm_dir)], check=True)
+                self.run_helper(["xdg-open", str(self.vm_dir)])
             elif sys.platform == "win32":
                 os.startfile(str(self.vm_dir))
         except Exception as e:
             messagebox.showerror("Error", f"Could not open directory: {e}")
     
     def on_close(self):
-        """Handle window close event."""
-        if self.vm_process:
-            if messagebox.askyesno("Confirm", "A VM is running. Do you want to stop it and quit?"):
+        """Handle window close event; running VMs are powered down in the background or left running."""
+        if self.closing:
+            self.add_status("Still powering down; the window closes once the VMs are gone.\n")
+            return
+        guests = self.vm_registry.supervised(owner="emulator")
+        if guests or self.vm_process or self.pool_member:
+            count = len(guests) or 1
+            answer = messagebox.askyesnocancel(
+                "Quit", f"{count} VM(s) running. Power them down before quitting?\n\n"
+                        "No leaves them running; the emulator re-attaches to them next time.")
+            if answer is None:
+                return
+            if not answer:
+                # Warm pool guests are still discarded
+                for handle in self.engine.active():
+                    handle.detach()
+            else:
+                self.closing = True
+                self.stop_btn.config(state=tk.DISABLED)
+                self.root.title("CyberOS Emulator (powering down VMs...)")
+                if self.pending_admission:
+                    self.admission.cancel(self.pending_admission)
+                if self.pool_member:
+                    self.pool_member.handle.cancel()
+                if guests:
+                    self.power_down(guests, then=self.finish_close)
+                    return
+                # A VM still starting up is not registered yet
                 self.stop_vm()
-                self.root.destroy()
-        else:
-            self.root.destroy()
+        self.finish_close()
+    
+    def finish_close(self):
+        """Tear the window down once its VMs are gone or left running.
+
+        Waiting for cancelled processes and warm guests happens off the UI
+        thread; the window is destroyed once they are gone.
+        """
+        self.closing = True
+        self.replay_panel.close()
+        self.profiler.close()
+        self.display_view.disconnect()
+        
+        def worker():
+            # Warm guests first: the pool needs the engine to stop the ones still booting
+            self.vm_pool.shutdown()
+            self.engine.stop()
+            self.bridge.post(self._destroy_window)
+        
+        threading.Thread(target=worker, daemon=True, name="cyberos-close").start()
+    
+    def _destroy_window(self):
+        """Final teardown on the UI thread."""
+        self.bridge.close()
+        self.root.destroy()
 
 
 def main():
     """Main entry point."""
+    install_hook()
     root = tk.Tk()
     app = CyberOSEmulatorGUI(root)
     root.mainloop()
@@ -0,0 +1,762 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS Control Daemon (cyberosd)
+Owns builds and VMs and serves them to any number of local clients.
+
+The daemon runs a single asyncio event loop and listens on a Unix socket
+(~/.cyberos/run/cyberosd.sock by default). Clients speak JSON-RPC 2.0, one
+JSON object per line. Builds, cleans and VMs run as jobs owned by the daemon,
+so they keep running when a GUI is closed and can be re-attached later.
+logs.follow turns a connection into a stream of "log" notifications carrying
+a job's output (build log or VM serial console) until the job ends.
+
+Usage:
+    python3 cyberosd.py [--socket PATH] [--project-root PATH]
+
+Example session (with socat):
+    echo '{"jsonrpc":"2.0","id":1,"method":"jobs.list"}' | socat - UNIX-CONNECT:~/.cyberos/run/cyberosd.sock
+"""
+
+import argparse
+import asyncio
+import inspect
+import itertools
+import json
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Set
+
+from admission import AdmissionController, AdmissionError, pin_vcpus
+from build_variants import DEFAULT_VARIANT, build_args, get_variant
+from disk_maintenance import allocated_bytes
+from disk_profiles import create_command, get_profile
+from console_stream import ConsoleDecoder
+from console_recording import ConsoleRecorder, recording_path
+from log_index import LogIndex, LogSession
+from qmp import QMPClient, QMPError
+from vm_command import VMSpec, build_qemu_command
+from vnc_ports import VNCAllocator, VNCError
+
+CONFIG_DIR = Path.home() / ".cyberos"
+SOCKET_PATH = CONFIG_DIR / "run" / "cyberosd.sock"
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+
+# Output lines kept per job for clients that attach late
+BACKLOG_LINES = 5000
+# Lines queued for one follower before the oldest are dropped
+FOLLOW_QUEUE = 1000
+# VM names become file names under ~/.cyberos
+VM_NAME = re.compile(r"^[A-Za-z0-9_-][A-Za-z0-9._-]*$")
+
+
+class DaemonError(Exception):
+    """Raised for failed daemon requests, on both sides of the socket."""
+
+
+class InvalidParams(DaemonError):
+    """Raised by a handler for a parameter it cannot accept (JSON-RPC -32602)."""
+
+
+class Job:
+    """A build, clean or VM process owned by the daemon."""
+
+    def __init__(self, job_id: str, kind: str, name: str):
+        self.id = job_id
+        self.kind = kind
+        self.name = name
+        self.state = "starting"
+        self.pid: Optional[int] = None
+        self.returncode: Optional[int] = None
+        self.started = time.time()
+        self.ended: Optional[float] = None
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.lines: Deque[str] = deque(maxlen=BACKLOG_LINES)
+        self.followers: Set[asyncio.Queue] = set()
+        self.done = asyncio.Event()
+        self.details: Dict[str, Any] = {}
+        self.log: Optional[LogSession] = None
+        self.partial: Optional[str] = None
+        self.recorder: Optional[ConsoleRecorder] = None
+
+    @property
+    def running(self) -> bool:
+        """Whether the job has not finished yet."""
+        return not self.done.is_set()
+
+    def publish(self, line: str):
+        """Record a line of output and pass it to every follower."""
+        self.lines.append(line)
+        self.partial = None
+        if self.log:
+            self.log.feed_line(line)
+        for queue in self.followers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(line)
+
+    def publish_partial(self, line: str):
+        """Pass the pending unterminated line (a prompt) to every follower."""
+        self.partial = line
+        for queue in self.followers:
+            if not queue.full():
+                queue.put_nowait(("partial", line))
+
+    def finish(self, returncode: Optional[int], state: Optional[str] = None):
+        """Mark the job as finished and release its followers."""
+        self.returncode = returncode
+        self.state = state or ("succeeded" if returncode == 0 else "failed")
+        self.ended = time.time()
+        if self.log:
+            self.log.close()
+        if self.recorder:
+            self.recorder.close()
+        self.done.set()
+        for queue in self.followers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(None)
+
+    def info(self) -> Dict[str, Any]:
+        """JSON-serialisable description of the job."""
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "name": self.name,
+            "state": self.state,
+            "pid": self.pid,
+            "returncode": self.returncode,
+            "started": self.started,
+            "ended": self.ended,
+            **self.details,
+        }
+
+
+class Daemon:
+    """JSON-RPC server that runs builds and VMs."""
+
+    def __init__(self, project_root: Path = PROJECT_ROOT, socket_path: Path = SOCKET_PATH,
+                 config_dir: Path = CONFIG_DIR):
+        self.project_root = project_root
+        self.socket_path = socket_path
+        self.vm_dir = config_dir / "vms"
+        self.run_dir = config_dir / "run"
+        self.iso_file = project_root / "iso" / "cyberos-0.1.0-alpha.iso"
+        self.admission = AdmissionController()
+        self.vnc_ports = VNCAllocator(self.run_dir / "vnc.sqlite")
+        self.log_index = LogIndex(config_dir / "logs")
+        self.recordings_dir = config_dir / "recordings"
+        self.jobs: Dict[str, Job] = {}
+        self.clients = 0
+        self.started = time.time()
+        self._ids = itertools.count(1)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self.methods: Dict[str, Callable] = {
+            "ping": self.ping,
+            "status": self.status,
+            "jobs.list": self.list_jobs,
+            "job.info": self.job_info,
+            "job.stop": self.stop_job,
+            "build.start": self.start_build,
+            "clean.start": self.start_clean,
+            "vm.list": self.list_vms,
+            "vm.launch": self.launch_vm,
+            "vm.stop": self.stop_vm,
+            "vm.input": self.vm_input,
+            "logs.follow": self.follow,
+        }
+
+    # ==================== Server ====================
+
+    async def serve(self):
+        """Listen on the Unix socket until SIGINT/SIGTERM or shutdown."""
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.socket_path.exists():
+            if DaemonClient(self.socket_path).available():
+                raise DaemonError(f"cyberosd is already running on {self.socket_path}")
+            self.socket_path.unlink()
+
+        self._stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, self._stopping.set)
+
+        self._server = await asyncio.start_unix_server(self.handle_client, path=str(self.socket_path),
+                                                       limit=1024 * 1024)
+        # Group members may use the daemon on a shared build box
+        os.chmod(self.socket_path, 0o660)
+        print(f"cyberosd listening on {self.socket_path}", flush=True)
+        try:
+            await self._stopping.wait()
+        finally:
+            self._server.close()
+            await self._server.wait_closed()
+            await self.stop_all()
+            try:
+                self.socket_path.unlink()
+            except FileNotFoundError:
+                pass
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve requests from one connection until it closes."""
+        self.clients += 1
+        try:
+            while True:
+                try:
+                    raw = await reader.readline()
+                except (ConnectionError, ValueError):
+                    break
+                if not raw:
+                    break
+                if not raw.strip():
+                    continue
+                response = await self.dispatch(raw, writer)
+                if response is not None:
+                    writer.write(json.dumps(response).encode() + b"\n")
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.clients -= 1
+            writer.close()
+
+    async def dispatch(self, raw: bytes, writer: asyncio.StreamWriter) -> Optional[Dict[str, Any]]:
+        """Run one JSON-RPC request and build its response."""
+        try:
+            request = json.loads(raw)
+        except ValueError:
+            return {"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "Parse error"}}
+        request_id = request.get("id")
+        method = self.methods.get(request.get("method"))
+        if method is None:
+            return {"jsonrpc": "2.0", "id": request_id,
+                    "error": {"code": -32601, "message": f"Unknown method {request.get('method')}"}}
+        params = request.get("params") or {}
+        args = (writer,) if method == self.follow else ()
+        try:
+            if not isinstance(params, dict):
+                raise TypeError("params must be an object")
+            inspect.signature(method).bind(*args, **params)
+        except TypeError as e:
+            return {"jsonrpc": "2.0", "id": request_id, "error": {"code": -32602, "message": str(e)}}
+        try:
+            result = await method(*args, **params)
+        except InvalidParams as e:
+            return {"jsonrpc": "2.0", "id": request_id, "error": {"code": -32602, "message": str(e)}}
+        except (DaemonError, AdmissionError, OSError, ValueError) as e:
+            return {"jsonrpc": "2.0", "id": request_id, "error": {"code": -32000, "message": str(e)}}
+        except Exception as e:
+            return {"jsonrpc": "2.0", "id": request_id,
+                    "error": {"code": -32603, "message": f"Internal error: {type(e).__name__}: {e}"}}
+        if request_id is None:
+            return None
+        return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+    # ==================== Jobs ====================
+
+    def _job(self, job_id: str) -> Job:
+        """Look up a job by ID, or the latest job with that name."""
+        job = self.jobs.get(job_id)
+        if job is None:
+            matches = [j for j in self.jobs.values() if j.name == job_id]
+            if not matches:
+                raise DaemonError(f"No such job: {job_id}")
+            job = matches[-1]
+        return job
+
+    def _running(self, kind: str, name: Optional[str] = None) -> Optional[Job]:
+        """A running job of a kind (and name), if any."""
+        for job in self.jobs.values():
+            if job.running and job.kind == kind and (name is None or job.name == name):
+                return job
+        return None
+
+    def _new_job(self, kind: str, name: str) -> Job:
+        """Register a new job; finished jobs beyond the last 50 are forgotten."""
+        job = Job(f"{kind}-{next(self._ids)}", kind, name)
+        if kind in ("build", "vm"):
+            job.log = self.log_index.open_session(kind, name)
+            job.details["log_session"] = job.log.id
+        self.jobs[job.id] = job
+        finished = [j for j in self.jobs.values() if not j.running]
+        for old in finished[:-50]:
+            del self.jobs[old.id]
+        return job
+
+    async def _spawn(self, job: Job, command: List[str], cwd: Optional[Path] = None,
+                     stdin: bool = False):
+        """Start a job's process and pump its output into the job."""
+        job.publish(f"$ {' '.join(command)}")
+        job.process = await asyncio.create_subprocess_exec(
+            *command,
+            cwd=str(cwd) if cwd else None,
+            stdin=subprocess.PIPE if stdin else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+        job.pid = job.process.pid
+        job.state = "running"
+
+    async def _pump(self, job: Job) -> int:
+        """Forward a job's output line by line and wait for it to exit."""
+        process = job.process
+        decoder = ConsoleDecoder()
+        while True:
+            chunk = await process.stdout.read(65536)
+            if job.recorder and chunk:
+                job.recorder.write(chunk)
+            for line in decoder.feed(chunk, final=not chunk):
+                job.publish(line)
+            if not chunk:
+                break
+            partial = decoder.partial
+            if partial is not None and len(chunk) < 65536 and partial != job.partial:
+                job.publish_partial(partial)
+        return await process.wait()
+
+    async def _terminate(self, job: Job, timeout: float = 5.0):
+        """Terminate a job's process group, killing it after timeout."""
+        if job.process is None or job.process.returncode is not None:
+            return
+        try:
+            os.killpg(job.process.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return
+        try:
+            await asyncio.wait_for(job.process.wait(), timeout)
+        except asyncio.TimeoutError:
+            try:
+                os.killpg(job.process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    async def stop_all(self):
+        """Stop every running job (daemon shutdown)."""
+        running = [job for job in self.jobs.values() if job.running]
+        for job in running:
+            if job.kind == "vm":
+                await self.stop_vm(job.name, timeout=10.0)
+            else:
+                await self.stop_job(job.id)
+
+    # ==================== Methods ====================
+
+    async def ping(self) -> str:
+        """Liveness check."""
+        return "pong"
+
+    async def status(self) -> Dict[str, Any]:
+        """Daemon uptime, clients, jobs and host allocation."""
+        allocation = await asyncio.get_running_loop().run_in_executor(None, self.admission.summary)
+        return {
+            "pid": os.getpid(),
+            "uptime": time.time() - self.started,
+            "clients": self.clients,
+            "project_root": str(self.project_root),
+            "jobs": [job.info() for job in self.jobs.values() if job.running],
+            "allocation": allocation,
+        }
+
+    async def list_jobs(self) -> List[Dict[str, Any]]:
+        """Every known job, newest last."""
+        return [job.info() for job in self.jobs.values()]
+
+    async def job_info(self, job: str) -> Dict[str, Any]:
+        """Description of one job."""
+        return self._job(job).info()
+
+    async def stop_job(self, job: str) -> Dict[str, Any]:
+        """Terminate a running job."""
+        target = self._job(job)
+        if target.running:
+            target.publish("⏹️  Stopped by client")
+            await self._terminate(target)
+            await target.done.wait()
+            target.state = "stopped"
+        return target.info()
+
+    async def _run_script(self, kind: str, script: Path, args: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Start a project script as a job."""
+        if self._running("build") or self._running("clean"):
+            raise DaemonError("A build or clean is already running")
+        if not script.exists():
+            raise DaemonError(f"{script.name} not found at {script}")
+        os.chmod(script, 0o755)
+        job = self._new_job(kind, kind)
+        await self._spawn(job, [str(script), *(args or [])], cwd=self.project_root)
+
+        async def run():
+            returncode = await self._pump(job)
+            job.publish(f"{'✓' if returncode == 0 else '✗'} {kind} exited with code {returncode}")
+            job.finish(returncode)
+
+        asyncio.get_running_loop().create_task(run())
+        return job.info()
+
+    async def start_build(self, no_iso: bool = False, variant: str = DEFAULT_VARIANT,
+                          variants: str = "") -> Dict[str, Any]:
+        """Run scripts/build.sh (without the ISO stage for direct kernel boot), for one
+        build variant or several ("all") at once."""
+        return await self._run_script("build", self.project_root / "scripts" / "build.sh",
+                                      build_args(no_iso, variant, variants))
+
+    async def start_clean(self) -> Dict[str, Any]:
+        """Run scripts/clean.sh."""
+        return await self._run_script("clean", self.project_root / "scripts" / "clean.sh")
+
+    async def list_vms(self) -> List[Dict[str, Any]]:
+        """Saved VM disks and whether the daemon is running each of them."""
+        vms = []
+        if self.vm_dir.exists():
+            for disk in sorted(self.vm_dir.glob("*.qcow2")):
+                job = self._running("vm", disk.stem)
+                vms.append({
+                    "name": disk.stem,
+                    "disk": str(disk),
+                    "allocated_bytes": allocated_bytes(disk),
+                    "running": job is not None,
+                    "job": job.id if job else None,
+                    "pid": job.pid if job else None,
+                })
+        return vms
+
+    async def launch_vm(self, name: str, cores: int = 2, memory: int = 512, disk_size: int = 2,
+                        display: str = "sdl", network: bool = False, disk_profile: str = "default",
+                        memory_backend: str = "anonymous", mem_prealloc: bool = False,
+                        balloon: bool = False, pin: bool = False, queue: bool = False,
+                        direct_boot: bool = False, variant: str = DEFAULT_VARIANT) -> Dict[str, Any]:
+        """Create the disk if needed and start a VM owned by the daemon."""
+        if not isinstance(name, str) or not VM_NAME.match(name):
+            raise InvalidParams(f"Invalid VM name {name!r}: use letters, digits, '.', '_' and '-', "
+                                "not starting with '.'")
+        if self._running("vm", name):
+            raise DaemonError(f"{name} is already running")
+        build = get_variant(variant, self.project_root)
+        boot = build.direct_boot(self.project_root) if direct_boot else None
+        if boot and boot.missing():
+            raise DaemonError(f"Direct kernel boot needs {', '.join(map(str, boot.missing()))} "
+                              "(run ./scripts/build.sh --no-iso)")
+        iso_file = build.iso_file(self.project_root)
+        if not boot and not iso_file.exists():
+            raise DaemonError(f"CyberOS ISO not found at {iso_file}")
+
+        loop = asyncio.get_running_loop()
+        vnc = None
+        job = self._new_job("vm", name)
+        job.details.update({"cores": cores, "memory": memory, "display": display,
+                            "boot": "direct" if boot else "iso", "variant": build.name})
+        job.recorder = ConsoleRecorder(recording_path(name, self.recordings_dir), name)
+        job.details["recording"] = str(job.recorder.path)
+        job.state = "queued" if queue else "starting"
+        try:
+            await loop.run_in_executor(
+                None, lambda: self.admission.admit(name, cores, memory, queue=queue, timeout=600)
+            )
+        except AdmissionError as e:
+            job.finish(None, "rejected")
+            raise DaemonError(f"Cannot launch {name}: {e}")
+
+        try:
+            profile = get_profile(disk_profile)
+            disk_file = self.vm_dir / f"{name}.qcow2"
+            if not disk_file.exists():
+                self.vm_dir.mkdir(parents=True, exist_ok=True)
+                job.publish(f"Creating disk image: {disk_size} GB ({profile.name} profile)")
+                create = await asyncio.create_subprocess_exec(
+                    *create_command(disk_file, disk_size, profile),
+                    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                )
+                _, stderr = await create.communicate()
+                if create.returncode != 0:
+                    raise DaemonError(f"qemu-img create failed: {stderr.decode(errors='replace').strip()}")
+
+            self.run_dir.mkdir(parents=True, exist_ok=True)
+            if display == "vnc":
+                try:
+                    vnc = await loop.run_in_executor(None, self.vnc_ports.allocate, name)
+                except VNCError as e:
+                    raise DaemonError(str(e))
+                job.details.update({"vnc_display": vnc.display, "vnc_websocket": vnc.websocket})
+            spec = build.apply(VMSpec(
+                name=name, cores=cores, memory=memory, iso_file=iso_file, disk_file=disk_file,
+                display=display, network=network, disk_profile=profile.name,
+                memory_backend=memory_backend, mem_prealloc=mem_prealloc, balloon=balloon,
+                qmp_socket=self.run_dir / f"{name}.qmp", direct_boot=boot,
+                vnc_display=vnc.display if vnc else 0, vnc_websocket=vnc.websocket if vnc else None,
+            ))
+            job.details["qmp_socket"] = str(spec.qmp_socket)
+            await self._spawn(job, build_qemu_command(spec), stdin=display == "serial")
+            self.admission.adopt(name, job.pid)
+            if vnc:
+                vnc.adopt(job.pid)
+                job.publish(f"Display on {vnc.describe()}")
+        except Exception:
+            if vnc:
+                vnc.release()
+            self.admission.release(name)
+            job.finish(None, "failed")
+            raise
+
+        async def run():
+            try:
+                # Keep draining QEMU's output while the QMP round-trip runs
+                pump = loop.create_task(self._pump(job))
+                if pin:
+                    job.publish(await loop.run_in_executor(None, self._pin, name, spec.qmp_socket))
+                returncode = await pump
+                job.publish(f"VM exited with code {returncode}")
+                job.finish(returncode, "exited")
+            finally:
+                self.admission.release(name)
+                if vnc:
+                    vnc.release()
+
+        loop.create_task(run())
+        return job.info()
+
+    def _pin(self, name: str, qmp_socket: Path) -> str:
+        """Pin a daemon VM's vCPUs to reserved host cores (executor thread); returns what happened."""
+        cpus = self.admission.allocate_cpus(name)
+        if not cpus:
+            return "Not enough free host cores to pin vCPUs."
+        try:
+            pinned = pin_vcpus(qmp_socket, cpus)
+        except (AdmissionError, OSError) as e:
+            return f"vCPU pinning failed: {e}"
+        return "Pinned " + ", ".join(f"vCPU{vcpu}→CPU{cpu}" for vcpu, cpu in pinned.items())
+
+    async def stop_vm(self, name: str, timeout: float = 30.0) -> Dict[str, Any]:
+        """Ask a VM to power down over QMP, terminating it after timeout."""
+        job = self._running("vm", name)
+        if job is None:
+            raise DaemonError(f"{name} is not running")
+        qmp_socket = job.details.get("qmp_socket")
+
+        def powerdown():
+            client = QMPClient(Path(qmp_socket))
+            try:
+                client.connect(wait=1.0)
+                client.powerdown()
+                return True
+            except QMPError:
+                return False
+            finally:
+                client.close()
+
+        if qmp_socket and await asyncio.get_running_loop().run_in_executor(None, powerdown):
+            job.publish("ACPI power down requested")
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        if job.running:
+            await self._terminate(job)
+            await job.done.wait()
+        return job.info()
+
+    async def vm_input(self, name: str, text: str) -> int:
+        """Send text to the serial console of a VM started with display=serial."""
+        job = self._running("vm", name)
+        if job is None or job.process is None or job.process.stdin is None:
+            raise DaemonError(f"{name} has no serial console")
+        data = text.encode()
+        job.process.stdin.write(data)
+        await job.process.stdin.drain()
+        return len(data)
+
+    async def follow(self, writer: asyncio.StreamWriter, job: str, backlog: bool = True) -> Dict[str, Any]:
+        """Stream a job's output as "log" notifications until it finishes."""
+        target = self._job(job)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=FOLLOW_QUEUE)
+        lines = list(target.lines) if backlog else []
+        if target.running:
+            target.followers.add(queue)
+        try:
+            for line in lines:
+                await self._notify(writer, target, line)
+            if backlog and target.partial:
+                await self._notify(writer, target, target.partial, partial=True)
+            while target.running or not queue.empty():
+                line = await queue.get()
+                if line is None:
+                    break
+                if isinstance(line, tuple):
+                    await self._notify(writer, target, line[1], partial=True)
+                else:
+                    await self._notify(writer, target, line)
+        finally:
+            target.followers.discard(queue)
+        return target.info()
+
+    @staticmethod
+    async def _notify(writer: asyncio.StreamWriter, job: Job, line: str, partial: bool = False):
+        """Send one output line (or the pending partial line) to a following client."""
+        params = {"job": job.id, "line": line}
+        if partial:
+            params["partial"] = True
+        message = {"jsonrpc": "2.0", "method": "log", "params": params}
+        writer.write(json.dumps(message).encode() + b"\n")
+        await writer.drain()
+
+
+class DaemonClient:
+    """Blocking client for cyberosd, safe to share between threads."""
+
+    def __init__(self, socket_path: Path = SOCKET_PATH, timeout: Optional[float] = 10.0):
+        self.socket_path = Path(socket_path)
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._file = None
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _connect(self) -> socket.socket:
+        """Open a new connection to the daemon."""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(str(self.socket_path))
+        except OSError as e:
+            sock.close()
+            raise DaemonError(f"cyberosd is not reachable at {self.socket_path}: {e}")
+        return sock
+
+    def available(self) -> bool:
+        """Whether a daemon answers on the socket."""
+        try:
+            return self.call("ping") == "pong"
+        except DaemonError:
+            return False
+
+    def close(self):
+        """Close the shared connection."""
+        with self._lock:
+            self._drop()
+
+    @staticmethod
+    def _result(message: Dict[str, Any]) -> Any:
+        """Unwrap a JSON-RPC response."""
+        if "error" in message:
+            raise DaemonError(message["error"].get("message", "Unknown error"))
+        return message.get("result")
+
+    def _drop(self):
+        """Forget the shared connection (lock held)."""
+        if self._sock:
+            self._file.close()
+            self._sock.close()
+        self._sock = self._file = None
+
+    def call(self, method: str, **params) -> Any:
+        """Call a daemon method and return its result.
+
+        Only a failed connect, or a failed send on a connection the daemon
+        may have closed since the last call, is retried: once the request
+        is out, running it twice could start a second VM or build.
+        """
+        request = {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params}
+        data = json.dumps(request).encode() + b"\n"
+        with self._lock:
+            for attempt in range(2):
+                reused = self._sock is not None
+                try:
+                    if not reused:
+                        self._sock = self._connect()
+                        self._file = self._sock.makefile("rb")
+                    self._sock.sendall(data)
+                    break
+                except DaemonError:
+                    if attempt:
+                        raise
+                except OSError as e:
+                    self._drop()
+                    if attempt or not reused:
+                        raise DaemonError(f"cyberosd request {method} failed: {e}")
+            try:
+                raw = self._file.readline()
+                if not raw:
+                    raise ConnectionError("connection closed by cyberosd")
+                message = json.loads(raw)
+            except (OSError, ValueError) as e:
+                self._drop()
+                raise DaemonError(f"cyberosd request {method} failed: {e}")
+        return self._result(message)
+
+    def follow(self, job: str, on_line: Callable[[str], None], backlog: bool = True,
+               on_partial: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """Stream a job's output into on_line until the job ends.
+
+        on_partial, if given, receives the pending unterminated line (such
+        as a login prompt). Uses a dedicated connection and blocks, so call
+        it from a worker thread. Returns the finished job's description.
+        """
+        sock = self._connect()
+        sock.settimeout(None)
+        try:
+            request = {"jsonrpc": "2.0", "id": 1, "method": "logs.follow",
+                       "params": {"job": job, "backlog": backlog}}
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            with sock.makefile("rb") as stream:
+                for raw in stream:
+                    message = json.loads(raw)
+                    if message.get("method") == "log":
+                        params = message["params"]
+                        if not params.get("partial"):
+                            on_line(params["line"])
+                        elif on_partial:
+                            on_partial(params["line"])
+                    elif message.get("id") == 1:
+                        return self._result(message)
+            raise DaemonError("cyberosd closed the log stream")
+        except OSError as e:
+            raise DaemonError(f"Log stream for {job} failed: {e}")
+        finally:
+            sock.close()
+
+
+def start_daemon(socket_path: Path = SOCKET_PATH, wait: float = 5.0) -> bool:
+    """Start cyberosd in the background unless it is running already."""
+    client = DaemonClient(socket_path, timeout=1.0)
+    if client.available():
+        return True
+    socket_path.parent.mkdir(parents=True, exist_ok=True)
+    log = open(socket_path.parent / "cyberosd.log", "ab")
+    subprocess.Popen([sys.executable, str(Path(__file__).resolve()), "--socket", str(socket_path)],
+                     stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+                     start_new_session=True)
+    log.close()
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        if client.available():
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="CyberOS control daemon")
+    parser.add_argument("--socket", type=Path, default=SOCKET_PATH, help="Unix socket to listen on")
+    parser.add_argument("--project-root", type=Path, default=PROJECT_ROOT, help="CyberOS source tree")
+    args = parser.parse_args()
+
+    daemon = Daemon(project_root=args.project_root.resolve(), socket_path=args.socket)
+    try:
+        asyncio.run(daemon.serve())
+    except DaemonError as e:
+        print(f"cyberosd: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
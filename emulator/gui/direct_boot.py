@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS Direct Kernel Boot
+Boots build/kernel/vmlinuz and the initramfs with -kernel/-initrd/-append.
+
+Direct boot skips both ISO creation (create_iso.sh, iso_writer.py) and the
+GRUB menu, so a dev iteration only needs `./scripts/build.sh --no-iso`.
+build.sh records how long each stage took in build/timings, and launchers
+record how long each boot mode takes to reach the boot banner, so the time
+saved per rebuild can be reported.
+"""
+
+import json
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+KERNEL_PATH = Path("build") / "kernel" / "vmlinuz"
+INITRAMFS_PATH = Path("build") / "initramfs.cpio.gz"
+TIMINGS_PATH = Path("build") / "timings"
+# Same consoles as the GRUB entries in create_iso.sh
+DEFAULT_APPEND = "console=tty0 console=ttyS0,115200"
+# "set timeout=3" in the generated grub.cfg
+GRUB_TIMEOUT = 3.0
+
+BOOT_TIMES_FILE = Path.home() / ".cyberos" / "boot_times.json"
+
+
+@dataclass
+class DirectBoot:
+    """Kernel, initramfs and command line for a direct boot."""
+    kernel: Path
+    initrd: Path
+    append: str = DEFAULT_APPEND
+
+    @classmethod
+    def for_project(cls, project_root: Path, append: str = DEFAULT_APPEND) -> "DirectBoot":
+        return cls(project_root / KERNEL_PATH, project_root / INITRAMFS_PATH, append)
+
+    def missing(self) -> List[Path]:
+        """Files that have not been built yet."""
+        return [path for path in (self.kernel, self.initrd) if not path.exists()]
+
+    def qemu_args(self) -> List[str]:
+        args = ["-kernel", str(self.kernel), "-initrd", str(self.initrd)]
+        if self.append:
+            args.extend(["-append", self.append])
+        return args
+
+
+def build_timings(project_root: Path) -> Dict[str, float]:
+    """Seconds each stage of the last build took, from build/timings."""
+    timings = {}
+    try:
+        text = (project_root / TIMINGS_PATH).read_text()
+    except OSError:
+        return timings
+    for line in text.splitlines():
+        stage, _, value = line.partition("=")
+        if value.strip().isdigit():
+            timings[stage.strip()] = int(value) / 1000
+    return timings
+
+
+class BootTimes:
+    """Seconds from launch to the boot banner, last measured per boot mode."""
+
+    def __init__(self, path: Path = BOOT_TIMES_FILE):
+        self.path = path
+        try:
+            self.times: Dict[str, Dict] = json.loads(path.read_text())
+        except (OSError, ValueError):
+            self.times = {}
+
+    def record(self, mode: str, seconds: float):
+        self.times[mode] = {"seconds": round(seconds, 3), "at": time.time()}
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps(self.times, indent=2))
+        except OSError:
+            pass
+
+    def last(self, mode: str) -> Optional[float]:
+        entry = self.times.get(mode)
+        return entry["seconds"] if entry else None
+
+
+def skipped_report(project_root: Path) -> str:
+    """What a direct boot skips, before it starts."""
+    iso = build_timings(project_root).get("iso")
+    iso_text = f"ISO creation (last took {iso:.1f} s)" if iso is not None else "ISO creation"
+    return f"Direct kernel boot: skipping {iso_text} and the GRUB menu ({GRUB_TIMEOUT:g} s timeout)"
+
+
+def savings_report(project_root: Path, times: BootTimes, direct_seconds: float) -> str:
+    """Compare a direct boot with the last ISO boot, including the ISO build stage."""
+    report = f"Reached the boot banner in {direct_seconds:.1f} s with direct kernel boot"
+    iso_boot = times.last("iso")
+    if iso_boot is None:
+        return report + " (boot from the ISO once to compare)"
+    iso_build = build_timings(project_root).get("iso", 0.0)
+    saved = iso_boot - direct_seconds + iso_build
+    return (f"{report}; ISO boot took {iso_boot:.1f} s and ISO creation {iso_build:.1f} s, "
+            f"saving {saved:.1f} s per rebuild-to-shell")
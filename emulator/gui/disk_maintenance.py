@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS Disk Maintenance
+Background compaction and deduplication of VM disk images.
+
+Compaction rewrites an idle image with qemu-img convert, keeping its backing
+file reference so overlay chains stay intact. Deduplication fingerprints the
+data clusters of every standalone image, groups images that are identical or
+nearly identical, and can rebase a group onto a shared read-only base image.
+
+Images that are open by any process (a running QEMU, a backup tool, ...) are
+never touched.
+"""
+
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+ProgressCallback = Callable[[str, float], None]
+
+FINGERPRINT_CHUNK = 64 * 1024
+ZERO_CHUNK_HASH = hashlib.blake2b(bytes(FINGERPRINT_CHUNK), digest_size=8).digest()
+PROGRESS_RE = re.compile(r"\((\d+(?:\.\d+)?)/100%\)")
+
+
+@dataclass
+class ImageInfo:
+    """Facts about a disk image gathered from qemu-img."""
+    path: Path
+    virtual_size: int
+    allocated: int
+    backing_file: Optional[Path] = None
+    backing_format: Optional[str] = None
+    cluster_size: int = 65536
+    lazy_refcounts: bool = False
+
+    @property
+    def name(self) -> str:
+        return self.path.stem
+
+    @property
+    def preallocated(self) -> bool:
+        """True when the host holds the whole virtual size, as with the fast profile."""
+        return self.virtual_size > 0 and self.allocated >= self.virtual_size
+
+
+@dataclass
+class DuplicateGroup:
+    """Images whose data clusters largely overlap."""
+    images: List[Path]
+    similarity: float
+    identical: bool
+    reclaimable: int = 0
+
+
+@dataclass
+class MaintenanceReport:
+    """Outcome of a maintenance run."""
+    compacted: Dict[str, int] = field(default_factory=dict)
+    skipped_in_use: List[str] = field(default_factory=list)
+    errors: Dict[str, str] = field(default_factory=dict)
+    duplicates: List[DuplicateGroup] = field(default_factory=list)
+    removed_bases: List[str] = field(default_factory=list)
+
+    @property
+    def reclaimed(self) -> int:
+        return sum(self.compacted.values())
+
+
+def allocated_bytes(path: Path) -> int:
+    """Space actually used on the host filesystem by a file."""
+    st = path.stat()
+    blocks = getattr(st, "st_blocks", None)
+    return blocks * 512 if blocks is not None else st.st_size
+
+
+def image_info(path: Path) -> ImageInfo:
+    """Read image metadata without taking QEMU's image lock."""
+    result = subprocess.run(
+        ["qemu-img", "info", "--force-share", "--output=json", str(path)],
+        check=True, capture_output=True, text=True
+    )
+    data = json.loads(result.stdout)
+    specific = data.get("format-specific", {}).get("data", {})
+
+    backing = data.get("full-backing-filename") or data.get("backing-filename")
+    backing_path = None
+    if backing:
+        backing_path = Path(backing)
+        if not backing_path.is_absolute():
+            backing_path = (path.parent / backing_path).resolve()
+
+    return ImageInfo(
+        path=path,
+        virtual_size=data.get("virtual-size", 0),
+        allocated=allocated_bytes(path),
+        backing_file=backing_path,
+        backing_format=data.get("backing-filename-format"),
+        cluster_size=data.get("cluster-size", 65536),
+        lazy_refcounts=bool(specific.get("lazy-refcounts", False)),
+    )
+
+
+def open_files() -> Set[Path]:
+    """Return every regular file currently held open by any process."""
+    in_use: Set[Path] = set()
+    if sys.platform == "linux":
+        for fd_dir in Path("/proc").glob("[0-9]*/fd"):
+            try:
+                entries = list(fd_dir.iterdir())
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    target = os.readlink(entry)
+                except OSError:
+                    continue
+                if target.startswith("/"):
+                    in_use.add(Path(target))
+    else:
+        result = subprocess.run(["lsof", "-Fn", "-w"], capture_output=True, text=True)
+        for line in result.stdout.splitlines():
+            if line.startswith("n/"):
+                in_use.add(Path(line[1:]))
+    return in_use
+
+
+def image_in_use(path: Path, extra: Iterable[Path] = ()) -> bool:
+    """Check whether an image is open by any process or listed in extra."""
+    resolved = path.resolve()
+    if resolved in {Path(p).resolve() for p in extra}:
+        return True
+    return resolved in open_files()
+
+
+def _run_convert(cmd: List[str], progress: Optional[ProgressCallback], label: str):
+    """Run qemu-img convert -p, forwarding its percentage to progress."""
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    assert process.stdout is not None
+    tail = b""
+    while True:
+        chunk = process.stdout.read1(4096)
+        if not chunk:
+            break
+        tail = (tail + chunk)[-1024:]
+        matches = PROGRESS_RE.findall(tail[-256:].decode(errors="replace"))
+        if matches and progress:
+            progress(label, float(matches[-1]) / 100.0)
+    if process.wait() != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, output=tail.decode(errors="replace"))
+
+
+def _create_options(info: ImageInfo) -> str:
+    """qcow2 creation options that preserve an image's disk profile."""
+    options = [f"cluster_size={info.cluster_size}"]
+    if info.lazy_refcounts:
+        options.append("lazy_refcounts=on")
+    if info.preallocated:
+        options.append("preallocation=falloc")
+    return ",".join(options)
+
+
+def compact_image(path: Path, in_use: Iterable[Path] = (),
+                  progress: Optional[ProgressCallback] = None) -> int:
+    """Rewrite an image to drop unused clusters; returns bytes reclaimed.
+
+    The image keeps its backing file, so only data that differs from the
+    backing chain is written. The original is replaced atomically and only
+    if nothing opened it while the copy was being made.
+    """
+    in_use = list(in_use)
+    if image_in_use(path, in_use):
+        raise RuntimeError(f"{path.name} is in use")
+
+    info = image_info(path)
+    tmp = path.with_name(f".{path.name}.compact")
+    cmd = ["qemu-img", "convert", "-p", "-O", "qcow2", "-o", _create_options(info)]
+    if info.backing_file:
+        cmd.extend(["-B", str(info.backing_file), "-F", info.backing_format or "qcow2"])
+    cmd.extend([str(path), str(tmp)])
+
+    try:
+        _run_convert(cmd, progress, f"Compacting {path.name}")
+        if image_in_use(path, in_use):
+            raise RuntimeError(f"{path.name} was opened during compaction")
+        before = info.allocated
+        after = allocated_bytes(tmp)
+        if after >= before:
+            tmp.unlink()
+            return 0
+        os.replace(tmp, path)
+        return before - after
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def fingerprint(path: Path, stop: Optional[threading.Event] = None) -> Set[bytes]:
+    """Hash every non-zero 64 KiB chunk of an image file.
+
+    Every disk profile uses clusters of 64 KiB or larger, so data clusters
+    are chunk aligned and two images holding the same guest data produce the
+    same chunk hashes regardless of where each file placed its clusters.
+    """
+    hashes: Set[bytes] = set()
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            if stop is not None and stop.is_set():
+                break
+            chunk = f.read(FINGERPRINT_CHUNK)
+            if not chunk:
+                break
+            digest = hashlib.blake2b(chunk, digest_size=8).digest()
+            if digest != ZERO_CHUNK_HASH:
+                hashes.add(digest)
+    return hashes
+
+
+def images_identical(a: Path, b: Path) -> bool:
+    """Compare the guest-visible contents of two images."""
+    result = subprocess.run(["qemu-img", "compare", "--force-share", "-q", str(a), str(b)],
+                            capture_output=True)
+    return result.returncode == 0
+
+
+def find_duplicates(infos: List[ImageInfo], threshold: float = 0.9,
+                    progress: Optional[ProgressCallback] = None,
+                    stop: Optional[threading.Event] = None) -> List[DuplicateGroup]:
+    """Group standalone images whose fingerprints overlap by at least threshold."""
+    candidates = [info for info in infos if info.backing_file is None]
+    prints: Dict[Path, Set[bytes]] = {}
+    for i, info in enumerate(candidates):
+        if progress:
+            progress(f"Fingerprinting {info.path.name}", i / max(len(candidates), 1))
+        prints[info.path] = fingerprint(info.path, stop)
+
+    groups: List[DuplicateGroup] = []
+    grouped: Set[Path] = set()
+    for i, a in enumerate(candidates):
+        if a.path in grouped or not prints[a.path]:
+            continue
+        members = [a.path]
+        scores = []
+        for b in candidates[i + 1:]:
+            if b.path in grouped or a.virtual_size != b.virtual_size:
+                continue
+            pa, pb = prints[a.path], prints[b.path]
+            similarity = len(pa & pb) / len(pa | pb) if pa | pb else 0.0
+            if similarity >= threshold:
+                members.append(b.path)
+                scores.append(similarity)
+        if len(members) < 2:
+            continue
+
+        grouped.update(members)
+        identical = all(images_identical(members[0], other) for other in members[1:])
+        shared = set.intersection(*(prints[p] for p in members))
+        reclaimable = len(shared) * FINGERPRINT_CHUNK * (len(members) - 1)
+        groups.append(DuplicateGroup(members, min(scores), identical, reclaimable))
+    return groups
+
+
+def deduplicate(group: DuplicateGroup, base_dir: Path, in_use: Iterable[Path] = (),
+                progress: Optional[ProgressCallback] = None) -> int:
+    """Move a duplicate group onto a shared base image; returns bytes reclaimed.
+
+    The first image becomes the read-only base, and every member is rewritten
+    as an overlay holding only the clusters that differ from it. The base is
+    built under a temporary name and only moved into place once every overlay
+    is ready, so a failed run leaves the images untouched and can be retried.
+    """
+    in_use = list(in_use)
+    busy = [p.name for p in group.images if image_in_use(p, in_use)]
+    if busy:
+        raise RuntimeError(f"In use: {', '.join(busy)}")
+
+    base_dir.mkdir(parents=True, exist_ok=True)
+    source = group.images[0]
+    digest = hashlib.sha1("\0".join(str(p) for p in group.images).encode()).hexdigest()[:12]
+    base = base_dir / f"base-{digest}.qcow2"
+    building = base_dir / f".{base.name}.tmp"
+    if base.exists():
+        if base.resolve() in _referenced_bases(source.parent) or image_in_use(base):
+            raise RuntimeError(f"{base.name} already backs other images")
+        # Left behind by an earlier run that failed before any image moved onto it
+        base.chmod(0o644)
+        base.unlink()
+    before = sum(allocated_bytes(p) for p in group.images)
+
+    overlays = [(member, member.with_name(f".{member.name}.dedup")) for member in group.images]
+    try:
+        _run_convert(["qemu-img", "convert", "-p", "-O", "qcow2", str(source), str(building)],
+                     progress, f"Creating shared base {base.name}")
+        for member, tmp in overlays:
+            _run_convert(["qemu-img", "convert", "-p", "-O", "qcow2", "-B", str(building), "-F", "qcow2",
+                          str(member), str(tmp)], progress, f"Rebasing {member.name}")
+            # Point the overlay at the final name; its clusters stay valid
+            subprocess.run(["qemu-img", "rebase", "-u", "-b", str(base), "-F", "qcow2", str(tmp)],
+                           check=True, capture_output=True)
+        busy = [member.name for member, _ in overlays if image_in_use(member, in_use)]
+        if busy:
+            raise RuntimeError(f"Opened during deduplication: {', '.join(busy)}")
+
+        os.chmod(building, 0o444)
+        os.replace(building, base)
+        for member, tmp in overlays:
+            os.replace(tmp, member)
+    finally:
+        for _, tmp in overlays:
+            if tmp.exists():
+                tmp.unlink()
+        if building.exists():
+            building.unlink()
+
+    after = allocated_bytes(base) + sum(allocated_bytes(p) for p in group.images)
+    return max(before - after, 0)
+
+
+def _referenced_bases(vm_dir: Path) -> Set[Path]:
+    """Backing files the VM images in a directory refer to."""
+    referenced = set()
+    for image in vm_dir.glob("*.qcow2"):
+        try:
+            info = image_info(image)
+        except (subprocess.CalledProcessError, ValueError):
+            continue
+        if info.backing_file:
+            referenced.add(info.backing_file.resolve())
+    return referenced
+
+
+def remove_unused_bases(vm_dir: Path, base_dir: Path) -> List[str]:
+    """Delete shared bases that no VM image refers to any more."""
+    if not base_dir.exists():
+        return []
+    referenced = _referenced_bases(vm_dir)
+    removed = []
+    for base in base_dir.glob("base-*.qcow2"):
+        if base.resolve() not in referenced and not image_in_use(base):
+            base.chmod(0o644)
+            base.unlink()
+            removed.append(base.name)
+    return removed
+
+
+class MaintenanceJob(threading.Thread):
+    """Background thread that compacts idle images and looks for duplicates.
+
+    in_use is called before every image is touched and should return the disks
+    of VMs the caller is running; open_files() covers everything else.
+    """
+
+    def __init__(self, vm_dir: Path, base_dir: Path,
+                 in_use: Callable[[], Iterable[Path]] = lambda: (),
+                 progress: Optional[ProgressCallback] = None,
+                 done: Optional[Callable[[MaintenanceReport], None]] = None,
+                 idle_seconds: int = 600, min_reclaim: int = 64 * 1024 * 1024,
+                 find_dupes: bool = True):
+        super().__init__(daemon=True, name="cyberos-disk-maintenance")
+        self.vm_dir = vm_dir
+        self.base_dir = base_dir
+        self.in_use = in_use
+        self.progress = progress or (lambda message, fraction: None)
+        self.done = done
+        self.idle_seconds = idle_seconds
+        self.min_reclaim = min_reclaim
+        self.find_dupes = find_dupes
+        self.stop_event = threading.Event()
+        self.report = MaintenanceReport()
+
+    def stop(self):
+        """Ask the job to finish after the current image."""
+        self.stop_event.set()
+
+    def run(self):
+        try:
+            self._run()
+        except Exception as e:
+            self.report.errors["job"] = str(e)
+        finally:
+            if self.done:
+                self.done(self.report)
+
+    def _run(self):
+        images = sorted(self.vm_dir.glob("*.qcow2"))
+        infos: List[ImageInfo] = []
+        now = time.time()
+
+        for i, image in enumerate(images):
+            if self.stop_event.is_set():
+                return
+            self.progress(f"Inspecting {image.name}", i / max(len(images), 1))
+            busy = list(self.in_use())
+            if image_in_use(image, busy):
+                self.report.skipped_in_use.append(image.stem)
+                continue
+            try:
+                info = image_info(image)
+            except (subprocess.CalledProcessError, ValueError) as e:
+                self.report.errors[image.stem] = str(e)
+                continue
+            infos.append(info)
+
+            if now - image.stat().st_mtime < self.idle_seconds:
+                continue
+            # Preallocation is deliberate (fast profile); reclaiming it would
+            # turn the image back into a sparse one.
+            if info.preallocated:
+                continue
+            if info.allocated - self._data_bytes(info) < self.min_reclaim:
+                continue
+            try:
+                reclaimed = compact_image(image, busy, self.progress)
+            except (subprocess.CalledProcessError, RuntimeError) as e:
+                self.report.errors[image.stem] = str(e)
+                continue
+            if reclaimed:
+                self.report.compacted[image.stem] = reclaimed
+                info.allocated -= reclaimed
+
+        self.report.removed_bases = remove_unused_bases(self.vm_dir, self.base_dir)
+
+        if self.find_dupes and not self.stop_event.is_set():
+            self.report.duplicates = find_duplicates(infos, progress=self.progress, stop=self.stop_event)
+        self.progress("Maintenance complete", 1.0)
+
+    @staticmethod
+    def _data_bytes(info: ImageInfo) -> int:
+        """Bytes of guest data allocated in the top layer of an image."""
+        result = subprocess.run(
+            ["qemu-img", "map", "--force-share", "--output=json", str(info.path)],
+            capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            return info.allocated
+        total = 0
+        for extent in json.loads(result.stdout or "[]"):
+            if extent.get("data") and extent.get("depth", 0) == 0:
+                total += extent.get("length", 0)
+        return total
+
+
+def format_bytes(size: int) -> str:
+    """Human readable byte count."""
+    value = float(size)
+    for unit in ("B", "KB", "MB"):
+        if abs(value) < 1024:
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.2f} {unit}"
+        value /= 1024
+    return f"{value:.2f} GB"
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS Disk Profiles
+Named performance profiles for VM disk images.
+
+A profile decides how a disk image is created (qcow2 options such as
+preallocation, cluster size and lazy refcounts) and how it is attached to
+QEMU (device model, cache mode, AIO engine and iothread). The same profile
+names are understood by the GUI launcher and by run_cyberos.sh.
+
+Run this module directly to benchmark the profiles on the host:
+    python3 disk_profiles.py --benchmark
+"""
+
+import argparse
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+@dataclass(frozen=True)
+class DiskProfile:
+    """Creation and attachment settings for a VM disk image."""
+    name: str
+    description: str
+    create_options: Dict[str, str] = field(default_factory=dict)
+    virtio: bool = False
+    cache: Optional[str] = None
+    aio: Optional[str] = None
+    iothread: bool = False
+    discard: bool = False
+
+
+DISK_PROFILES: Dict[str, DiskProfile] = {
+    "default": DiskProfile(
+        name="default",
+        description="Plain qcow2 with QEMU defaults",
+    ),
+    "fast": DiskProfile(
+        name="fast",
+        description="Preallocated qcow2, virtio-blk on an iothread, host cache bypassed",
+        create_options={"preallocation": "falloc"},
+        virtio=True,
+        cache="none",
+        aio="io_uring",
+        iothread=True,
+    ),
+    "compact": DiskProfile(
+        name="compact",
+        description="Sparse qcow2 with lazy refcounts and 2 MB clusters, discard enabled",
+        create_options={"lazy_refcounts": "on", "cluster_size": "2M"},
+        virtio=True,
+        cache="writeback",
+        discard=True,
+    ),
+}
+
+DEFAULT_PROFILE = "default"
+
+
+def get_profile(name: Optional[str]) -> DiskProfile:
+    """Look up a profile by name, falling back to the default profile."""
+    return DISK_PROFILES.get((name or DEFAULT_PROFILE).lower(), DISK_PROFILES[DEFAULT_PROFILE])
+
+
+def _io_uring_available() -> bool:
+    """Check whether the host kernel allows io_uring."""
+    if sys.platform != "linux":
+        return False
+    try:
+        major, minor = (int(part) for part in platform.release().split(".")[:2])
+    except ValueError:
+        return False
+    if (major, minor) < (5, 1):
+        return False
+    disabled = Path("/proc/sys/kernel/io_uring_disabled")
+    try:
+        return disabled.read_text().strip() != "2"
+    except OSError:
+        return True
+
+
+def resolve_aio(profile: DiskProfile) -> Optional[str]:
+    """Pick the AIO engine the host can actually use for a profile."""
+    if profile.aio == "io_uring" and not _io_uring_available():
+        # Linux native AIO needs O_DIRECT; everything else uses the thread pool
+        if sys.platform == "linux" and profile.cache == "none":
+            return "native"
+        return "threads"
+    return profile.aio
+
+
+def create_command(disk_file: Path, size_gb: int, profile: DiskProfile) -> List[str]:
+    """Build the qemu-img command that creates an image for a profile."""
+    cmd = ["qemu-img", "create", "-f", "qcow2"]
+    if profile.create_options:
+        options = ",".join(f"{key}={value}" for key, value in profile.create_options.items())
+        cmd.extend(["-o", options])
+    cmd.extend([str(disk_file), f"{size_gb}G"])
+    return cmd
+
+
+def drive_args(disk_file: Path, profile: DiskProfile, index: int = 0) -> List[str]:
+    """Build the QEMU arguments that attach a disk image with a profile."""
+    drive = f"file={disk_file},format=qcow2"
+    if not profile.virtio:
+        return ["-drive", drive]
+
+    args = []
+    drive_id = f"disk{index}"
+    drive += f",if=none,id={drive_id}"
+    if profile.cache:
+        drive += f",cache={profile.cache}"
+    aio = resolve_aio(profile)
+    if aio:
+        drive += f",aio={aio}"
+    if profile.discard:
+        drive += ",discard=unmap"
+
+    device = f"virtio-blk-pci,drive={drive_id}"
+    if profile.iothread:
+        iothread_id = f"iothread{index}"
+        args.extend(["-object", f"iothread,id={iothread_id}"])
+        device += f",iothread={iothread_id}"
+
+    args.extend(["-drive", drive, "-device", device])
+    return args
+
+
+def benchmark_profiles(work_dir: Path, size_gb: int = 1, requests: int = 20000,
+                       profiles: Optional[List[str]] = None) -> List[Dict[str, object]]:
+    """Compare image creation time and I/O cost between profiles.
+
+    Each profile gets a fresh image in work_dir. Creation is timed around
+    qemu-img create, and I/O cost is measured with qemu-img bench using the
+    profile's cache mode and AIO engine for a write pass and a read pass.
+    A profile the host cannot run (cache=none needs O_DIRECT, which tmpfs
+    lacks) is reported with an "error" entry instead of timings.
+    """
+    results = []
+    for name in profiles or list(DISK_PROFILES):
+        profile = get_profile(name)
+        disk_file = work_dir / f"bench-{profile.name}.qcow2"
+        if disk_file.exists():
+            disk_file.unlink()
+
+        start = time.perf_counter()
+        subprocess.run(create_command(disk_file, size_gb, profile), check=True, capture_output=True)
+        create_seconds = time.perf_counter() - start
+
+        bench = ["qemu-img", "bench", "-f", "qcow2", "-c", str(requests), "-d", "16", "-s", "64k"]
+        bench.extend(["-t", profile.cache or "writeback"])
+        aio = resolve_aio(profile)
+        if aio:
+            bench.extend(["-i", aio])
+
+        timings = {}
+        try:
+            for mode, extra in (("write", ["-w"]), ("read", [])):
+                start = time.perf_counter()
+                subprocess.run(bench + extra + [str(disk_file)], check=True, capture_output=True)
+                timings[mode] = time.perf_counter() - start
+        except subprocess.CalledProcessError as e:
+            message = (e.stderr or b"").decode(errors="replace").strip().splitlines()
+            results.append({"profile": profile.name,
+                            "error": message[-1] if message else f"exit {e.returncode}"})
+            disk_file.unlink()
+            continue
+
+        mib = requests * 64 / 1024
+        results.append({
+            "profile": profile.name,
+            "create_s": create_seconds,
+            "write_s": timings["write"],
+            "read_s": timings["read"],
+            "write_mib_s": mib / timings["write"] if timings["write"] else 0.0,
+            "read_mib_s": mib / timings["read"] if timings["read"] else 0.0,
+            "allocated_mib": disk_file.stat().st_blocks * 512 / (1024 ** 2),
+        })
+        disk_file.unlink()
+
+    return results
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="CyberOS disk profiles")
+    parser.add_argument("--list", action="store_true", help="List available profiles")
+    parser.add_argument("--benchmark", action="store_true", help="Benchmark profiles on this host")
+    parser.add_argument("--size", type=int, default=1, help="Benchmark image size in GB (default: 1)")
+    parser.add_argument("--requests", type=int, default=20000, help="64 KiB requests per I/O pass")
+    parser.add_argument("--dir", type=Path, default=None, help="Directory for benchmark images")
+    parser.add_argument("--profile", action="append", help="Only benchmark the given profile(s)")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        if not shutil.which("qemu-img"):
+            print("qemu-img not found in PATH", file=sys.stderr)
+            return 1
+        work_dir = args.dir or Path(tempfile.mkdtemp(prefix="cyberos-disk-bench-"))
+        work_dir.mkdir(parents=True, exist_ok=True)
+        print(f"Benchmarking disk profiles in {work_dir} ({args.size} GB images)\n")
+        print(f"{'Profile':10} {'Create':>9} {'Write':>11} {'Read':>11} {'Allocated':>11}")
+        for row in benchmark_profiles(work_dir, args.size, args.requests, args.profile):
+            if "error" in row:
+                print(f"{row['profile']:10} unsupported on this host: {row['error']}")
+                continue
+            print(f"{row['profile']:10} {row['create_s']:8.3f}s "
+                  f"{row['write_mib_s']:7.1f}MB/s {row['read_mib_s']:7.1f}MB/s "
+                  f"{row['allocated_mib']:9.1f}MB")
+        if args.dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return 0
+
+    for profile in DISK_PROFILES.values():
+        print(f"{profile.name:10} {profile.description}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
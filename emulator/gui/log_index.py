@@ -0,0 +1,508 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS Log Index
+Full-text search over every VM console capture and build log.
+
+Each console session or build is appended to its own file in
+~/.cyberos/logs/ while a writer thread indexes it incrementally. Lines are
+grouped into blocks of a few KiB; every block records its session, first
+line number and byte range, and its text goes into a contentless SQLite FTS5
+table with the trigram tokenizer, so any substring of three or more
+characters narrows a search to a handful of blocks. Those blocks are read
+back from the log files and matched exactly, which yields each hit's line
+number and byte offset for showing it in context.
+
+Query syntax:
+    kernel panic            substring (case-insensitive)
+    /EXT4-fs error \\(\\w+\\)/  regular expression
+    vm:dev panic            only sessions of VM "dev"
+    build: error            only build logs
+    id:42                   only session 42 (alone: the whole session)
+
+Usage:
+    python3 log_index.py "kernel panic"          # search from the command line
+    python3 log_index.py --bench                 # measure ingest and query speed
+"""
+
+import argparse
+import queue
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+LOG_DIR = Path.home() / ".cyberos" / "logs"
+
+# Writer batching: lines are committed at least this often
+FLUSH_INTERVAL = 0.25
+FLUSH_LINES = 20000
+# Target size of one indexed block
+BLOCK_BYTES = 8192
+# Most trigrams used to narrow one literal
+MAX_TRIGRAMS = 24
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    started REAL NOT NULL,
+    ended REAL,
+    lines INTEGER NOT NULL DEFAULT 0,
+    bytes INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS sessions_name ON sessions (kind, name);
+CREATE TABLE IF NOT EXISTS blocks (
+    id INTEGER PRIMARY KEY,
+    session INTEGER NOT NULL,
+    line INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS blocks_session ON blocks (session, id);
+CREATE VIRTUAL TABLE IF NOT EXISTS terms USING fts5(
+    text, tokenize = 'trigram', content = '', detail = none
+);
+"""
+
+_REGEX_META = set(".^$*+?{}[]\\|()")
+
+
+@dataclass
+class SearchHit:
+    """One matching line."""
+    session: int
+    kind: str
+    name: str
+    started: float
+    line: int
+    offset: int
+    text: str
+    start: int
+    end: int
+
+
+class _Span(tuple):
+    """Match position in a line (mirrors re.Match.span)."""
+
+    def __new__(cls, start: int, end: int):
+        return super().__new__(cls, (start, end))
+
+    def span(self) -> Tuple[int, int]:
+        return self
+
+
+def parse_query(query: str) -> Tuple[Dict[str, str], str, bool]:
+    """Split a query into filters, the search pattern and whether it is a regex."""
+    filters: Dict[str, str] = {}
+    rest = []
+    for token in query.split(" "):
+        prefix, sep, value = token.partition(":")
+        if sep and prefix in ("vm", "build", "id") and not rest:
+            filters[prefix] = value
+        else:
+            rest.append(token)
+    pattern = " ".join(rest).strip()
+    is_regex = len(pattern) > 1 and pattern.startswith("/") and pattern.endswith("/")
+    if is_regex:
+        pattern = pattern[1:-1]
+    return filters, pattern, is_regex
+
+
+def required_literals(pattern: str) -> List[str]:
+    """Literal fragments every match of a regex must contain.
+
+    Conservative: alternations and groups give up rather than risk
+    excluding a match. Used to narrow regex searches through the index.
+    """
+    if "|" in pattern or "(" in pattern or ")" in pattern:
+        return []
+    literals: List[str] = []
+    run = ""
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\" and i + 1 < len(pattern):
+            escaped = pattern[i + 1]
+            i += 2
+            if escaped.isalnum():
+                literals.append(run)
+                run = ""
+            else:
+                run += escaped
+            continue
+        if char in "?*{":
+            run = run[:-1]
+            literals.append(run)
+            run = ""
+            if char == "{":
+                i = pattern.find("}", i) + 1 or len(pattern)
+                continue
+        elif char == "[":
+            literals.append(run)
+            run = ""
+            end = pattern.find("]", i + 2)
+            i = end + 1 if end != -1 else len(pattern)
+            continue
+        elif char in _REGEX_META:
+            literals.append(run)
+            run = ""
+        else:
+            run += char
+        i += 1
+    literals.append(run)
+    return [literal for literal in literals if len(literal) >= 3]
+
+
+def trigram_query(literals: List[str]) -> str:
+    """FTS5 query matching blocks that contain every trigram of the literals."""
+    grams: List[str] = []
+    for literal in literals:
+        literal = literal.lower()
+        for gram in (literal[i:i + 3] for i in range(len(literal) - 2)):
+            if gram not in grams:
+                grams.append(gram)
+    step = max(len(grams) // MAX_TRIGRAMS, 1)
+    return " AND ".join('"' + gram.replace('"', '""') + '"' for gram in grams[::step])
+
+
+class LogSession:
+    """Output of one VM console or build being recorded and indexed."""
+
+    def __init__(self, index: "LogIndex", session_id: int, kind: str, name: str):
+        self.index = index
+        self.id = session_id
+        self.kind = kind
+        self.name = name
+        self._partial = ""
+        self.closed = False
+
+    def feed(self, text: str):
+        """Record a chunk of output that may end in the middle of a line."""
+        text = self._partial + text
+        *lines, self._partial = text.split("\n")
+        for line in lines:
+            self.index._queue.put((self.id, line.rstrip("\r")))
+
+    def feed_line(self, line: str):
+        """Record one complete line (without its newline)."""
+        self.index._queue.put((self.id, line))
+
+    def close(self):
+        """Finish the session; the last partial line is kept."""
+        if self.closed:
+            return
+        self.closed = True
+        if self._partial:
+            self.index._queue.put((self.id, self._partial))
+            self._partial = ""
+        self.index._queue.put((self.id, None))
+
+
+class LogIndex:
+    """Recorded sessions plus an incremental inverted index over their output."""
+
+    def __init__(self, log_dir: Path = LOG_DIR):
+        self.log_dir = log_dir
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = log_dir / "index.sqlite"
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._local = threading.local()
+        self._writer = threading.Thread(target=self._write_loop, daemon=True, name="cyberos-log-index")
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection in WAL mode (readers never block the writer)."""
+        db = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    @property
+    def _reader(self) -> sqlite3.Connection:
+        """Per-thread connection for queries."""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = self._connect()
+        return db
+
+    def log_path(self, session_id: int) -> Path:
+        """File holding a session's raw output."""
+        return self.log_dir / f"{session_id}.log"
+
+    def open_session(self, kind: str, name: str) -> LogSession:
+        """Start recording a session of the given kind ("vm" or "build")."""
+        with self._connect() as db:
+            cursor = db.execute("INSERT INTO sessions (kind, name, started) VALUES (?, ?, ?)",
+                                (kind, name, time.time()))
+            session_id = cursor.lastrowid
+        return LogSession(self, session_id, kind, name)
+
+    # ==================== Writer ====================
+
+    def _write_loop(self):
+        """Append queued lines to session files and index them in blocks."""
+        db = self._connect()
+        files: Dict[int, BinaryIO] = {}
+        positions: Dict[int, List[int]] = {}
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while len(batch) < FLUSH_LINES and batch[-1][0] is not None:
+                try:
+                    batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+
+            pending: Dict[int, List[str]] = {}
+            finished = []
+            markers = []
+            for session_id, line in batch:
+                if session_id is None:
+                    markers.append(line)
+                elif line is None:
+                    finished.append(session_id)
+                else:
+                    pending.setdefault(session_id, []).append(line)
+
+            with db:
+                for session_id, lines in pending.items():
+                    if session_id not in positions:
+                        row = db.execute("SELECT lines, bytes FROM sessions WHERE id = ?",
+                                         (session_id,)).fetchone()
+                        positions[session_id] = [row[0], row[1]] if row else [0, 0]
+                        files[session_id] = open(self.log_path(session_id), "ab")
+                    self._index_lines(db, files[session_id], session_id, positions[session_id], lines)
+                    db.execute("UPDATE sessions SET lines = ?, bytes = ? WHERE id = ?",
+                               (*positions[session_id], session_id))
+                for session_id in finished:
+                    db.execute("UPDATE sessions SET ended = ? WHERE id = ?", (time.time(), session_id))
+
+            for session_id in finished:
+                handle = files.pop(session_id, None)
+                if handle:
+                    handle.close()
+                positions.pop(session_id, None)
+            for marker in markers:
+                marker.set()
+
+    @staticmethod
+    def _index_lines(db: sqlite3.Connection, log_file: BinaryIO, session_id: int,
+                     position: List[int], lines: List[str]):
+        """Append lines to a session file and index them block by block."""
+        start = 0
+        while start < len(lines):
+            end = start
+            size = 0
+            while end < len(lines) and size < BLOCK_BYTES:
+                size += len(lines[end]) + 1
+                end += 1
+            text = "\n".join(lines[start:end]) + "\n"
+            data = text.encode("utf-8", errors="replace")
+            log_file.write(data)
+            cursor = db.execute("INSERT INTO blocks (session, line, offset, length) VALUES (?, ?, ?, ?)",
+                                (session_id, position[0] + 1, position[1], len(data)))
+            db.execute("INSERT INTO terms (rowid, text) VALUES (?, ?)", (cursor.lastrowid, text))
+            position[0] += end - start
+            position[1] += len(data)
+            start = end
+        log_file.flush()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until everything fed so far is searchable."""
+        marker = threading.Event()
+        self._queue.put((None, marker))
+        return marker.wait(timeout)
+
+    # ==================== Queries ====================
+
+    def sessions(self, kind: Optional[str] = None, name: Optional[str] = None) -> List[Dict]:
+        """Recorded sessions, newest first."""
+        sql = "SELECT id, kind, name, started, ended, lines, bytes FROM sessions"
+        clauses, args = [], []
+        if kind:
+            clauses.append("kind = ?")
+            args.append(kind)
+        if name:
+            clauses.append("name = ?")
+            args.append(name)
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        rows = self._reader.execute(sql + " ORDER BY id DESC", args).fetchall()
+        keys = ("id", "kind", "name", "started", "ended", "lines", "bytes")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def _session_filter(self, filters: Dict[str, str]) -> Optional[List[int]]:
+        """Session IDs selected by vm:/build:/id: filters, or None for all."""
+        if not filters:
+            return None
+        if "id" in filters:
+            return [int(filters["id"])] if filters["id"].isdigit() else []
+        ids: List[int] = []
+        for kind in ("vm", "build"):
+            if kind in filters:
+                ids.extend(s["id"] for s in self.sessions(kind, filters[kind] or None))
+        return ids
+
+    def search(self, query: str, limit: int = 200, kind: Optional[str] = None) -> List[SearchHit]:
+        """Find lines matching a query, newest first.
+
+        Patterns shorter than three characters and regexes without a
+        required literal cannot use the index and scan the logs instead.
+        """
+        filters, pattern, is_regex = parse_query(query)
+        if kind and "id" not in filters and "vm" not in filters and "build" not in filters:
+            filters[kind] = ""
+        session_ids = self._session_filter(filters)
+        if session_ids == []:
+            return []
+        if not pattern:
+            return self._session_hits(session_ids, limit)
+
+        if is_regex:
+            try:
+                matcher = re.compile(pattern, re.IGNORECASE).search
+            except re.error:
+                return []
+            literals = required_literals(pattern)
+        else:
+            needle = pattern.lower()
+            literals = [pattern] if len(pattern) >= 3 else []
+
+            def matcher(text: str):
+                start = text.lower().find(needle)
+                return None if start < 0 else _Span(start, start + len(needle))
+
+        sql = "SELECT blocks.id, session, line, offset, length FROM blocks"
+        where, args = [], []
+        if literals:
+            sql += " JOIN terms ON terms.rowid = blocks.id"
+            where.append("terms MATCH ?")
+            args.append(trigram_query(literals))
+        if session_ids is not None:
+            # Unary + keeps SQLite from scanning blocks by session before the MATCH
+            where.append(f"+session IN ({','.join('?' * len(session_ids))})")
+            args.extend(session_ids)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY blocks.id DESC"
+
+        info = {s["id"]: s for s in self.sessions()}
+        files: Dict[int, BinaryIO] = {}
+        hits: List[SearchHit] = []
+        try:
+            cursor = self._reader.execute(sql, args)
+            while len(hits) < limit:
+                rows = cursor.fetchmany(64)
+                if not rows:
+                    break
+                for _, session, first_line, offset, length in rows:
+                    if session not in files:
+                        try:
+                            files[session] = open(self.log_path(session), "rb")
+                        except OSError:
+                            continue
+                    files[session].seek(offset)
+                    block = files[session].read(length)
+                    meta = info.get(session, {"kind": "?", "name": "?", "started": 0.0})
+                    found = []
+                    position = offset
+                    for number, raw in enumerate(block.split(b"\n")[:-1], first_line):
+                        text = raw.decode("utf-8", errors="replace")
+                        match = matcher(text)
+                        if match is not None:
+                            found.append(SearchHit(session, meta["kind"], meta["name"], meta["started"],
+                                                   number, position, text, *match.span()))
+                        position += len(raw) + 1
+                    hits.extend(reversed(found))
+                    if len(hits) >= limit:
+                        break
+        finally:
+            for handle in files.values():
+                handle.close()
+        return hits[:limit]
+
+    def _session_hits(self, session_ids: Optional[List[int]], limit: int) -> List[SearchHit]:
+        """The first line of each selected session."""
+        hits = []
+        for meta in self.sessions():
+            if session_ids is not None and meta["id"] not in session_ids:
+                continue
+            text, _ = self.context(meta["id"], 0, radius=512)
+            hits.append(SearchHit(meta["id"], meta["kind"], meta["name"], meta["started"],
+                                  1, 0, text.split("\n", 1)[0], 0, 0))
+            if len(hits) >= limit:
+                break
+        return hits
+
+    def context(self, session_id: int, offset: int, radius: int = 4096) -> Tuple[str, int]:
+        """Text around a byte offset of a session log and the offset's position in it."""
+        # Read from one byte early so a block starting on a line boundary keeps that line
+        start = max(offset - radius - 1, 0)
+        try:
+            with open(self.log_path(session_id), "rb") as f:
+                f.seek(start)
+                data = f.read(offset - start + radius)
+                if start:
+                    cut = data.find(b"\n") + 1
+                    data = data[cut:]
+                    start += cut
+        except OSError:
+            return "", 0
+        before = data[:offset - start].decode("utf-8", errors="replace")
+        return data.decode("utf-8", errors="replace"), len(before)
+
+
+def benchmark(log_dir: Path, megabytes: int = 50):
+    """Measure ingest throughput and query latency on synthetic console output."""
+    index = LogIndex(log_dir)
+    words = ["kernel", "usb", "eth0", "ext4", "systemd", "mount", "cpu", "irq", "acpi", "pci"]
+    lines = [f"[{i * 0.001:12.6f}] {words[i % 10]}: device {i % 977} event {i * 7919 % 100003}"
+             for i in range(20000)]
+    session = index.open_session("vm", "bench")
+    total = 0
+    started = time.perf_counter()
+    while total < megabytes * 1024 * 1024:
+        for line in lines:
+            session.feed_line(line)
+            total += len(line) + 1
+    session.feed_line("Kernel panic - not syncing: VFS: Unable to mount root fs")
+    session.close()
+    index.flush(timeout=600)
+    elapsed = time.perf_counter() - started
+    print(f"Ingest: {total / 1024 / 1024:.0f} MB in {elapsed:.1f} s ({total / 1024 / 1024 / elapsed:.1f} MB/s)")
+
+    for query in ["kernel panic", "event 4242", "/panic.*root fs/", f"id:{session.id} unable to mount"]:
+        started = time.perf_counter()
+        hits = index.search(query, limit=50)
+        print(f"Query {query!r}: {len(hits)} hit(s) in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Search CyberOS console and build logs")
+    parser.add_argument("query", nargs="?", help="search query")
+    parser.add_argument("--limit", type=int, default=50, help="maximum number of hits")
+    parser.add_argument("--log-dir", type=Path, default=LOG_DIR, help="log directory")
+    parser.add_argument("--bench", type=int, nargs="?", const=50, metavar="MB",
+                        help="benchmark ingest and queries with MB of synthetic output (in --log-dir)")
+    args = parser.parse_args()
+
+    if args.bench:
+        benchmark(args.log_dir, args.bench)
+        return
+    if not args.query:
+        parser.error("a query is required")
+    for hit in LogIndex(args.log_dir).search(args.query, limit=args.limit):
+        stamp = time.strftime("%Y-%m-%d %H:%M", time.localtime(hit.started))
+        print(f"{hit.kind}:{hit.name} #{hit.session} ({stamp}) line {hit.line}: {hit.text}")
+
+
+if __name__ == "__main__":
+    main()
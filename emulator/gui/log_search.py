@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS Log Search Panel
+Tk panel for searching recorded console and build history.
+
+Queries run on a worker thread against the shared LogIndex; results are
+listed newest first and opening one shows the session log around the hit,
+read straight from its byte offset.
+"""
+
+import threading
+import time
+import tkinter as tk
+from tkinter import ttk, scrolledtext
+from typing import Callable, List, Optional
+
+from log_index import LogIndex, SearchHit
+
+SCOPES = {"All sessions": None, "VM consoles": "vm", "Builds": "build"}
+
+
+class LogSearchPanel(ttk.LabelFrame):
+    """Search box, scope selector and result list for a LogIndex.
+
+    dispatch(fn, *args) must run fn on the Tk thread (TkBridge.post).
+    """
+
+    def __init__(self, parent, index: LogIndex, dispatch: Callable[..., None],
+                 scope: str = "All sessions", text: str = "Search History"):
+        super().__init__(parent, text=text, padding=10)
+        self.index = index
+        self.dispatch = dispatch
+        self.hits: List[SearchHit] = []
+        self._generation = 0
+
+        row = ttk.Frame(self)
+        row.pack(fill=tk.X)
+        self.query_var = tk.StringVar()
+        entry = ttk.Entry(row, textvariable=self.query_var)
+        entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 5))
+        entry.bind("<Return>", lambda event: self.search())
+        self.scope_var = tk.StringVar(value=scope)
+        ttk.Combobox(row, textvariable=self.scope_var, values=list(SCOPES), state="readonly",
+                     width=14).pack(side=tk.LEFT, padx=5)
+        ttk.Button(row, text="🔍 Search", command=self.search).pack(side=tk.LEFT, padx=5)
+
+        self.status_label = ttk.Label(self, text='Text, /regex/, vm:NAME, build:, id:N')
+        self.status_label.pack(anchor="w", pady=(5, 0))
+
+        results = ttk.Frame(self)
+        results.pack(fill=tk.BOTH, expand=True, pady=(5, 0))
+        self.results = tk.Listbox(results, height=6, font=("Courier", 9))
+        self.results.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar = ttk.Scrollbar(results, orient=tk.VERTICAL, command=self.results.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.results.config(yscrollcommand=scrollbar.set)
+        self.results.bind("<Double-Button-1>", lambda event: self.open_selected())
+        self.results.bind("<Return>", lambda event: self.open_selected())
+
+    def search(self):
+        """Run the query on a worker thread."""
+        query = self.query_var.get().strip()
+        if not query:
+            return
+        self._generation += 1
+        generation = self._generation
+        kind = SCOPES.get(self.scope_var.get())
+        self.status_label.config(text="Searching...")
+
+        def worker():
+            started = time.perf_counter()
+            try:
+                hits = self.index.search(query, kind=kind)
+                error = None
+            except Exception as e:
+                hits, error = [], str(e)
+            self.dispatch(self.show_results, generation, hits, time.perf_counter() - started, error)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def show_results(self, generation: int, hits: List[SearchHit], elapsed: float, error: Optional[str]):
+        """List the hits of the latest query."""
+        if generation != self._generation:
+            return
+        self.hits = hits
+        self.results.delete(0, tk.END)
+        for hit in hits:
+            stamp = time.strftime("%m-%d %H:%M", time.localtime(hit.started))
+            self.results.insert(tk.END, f"{hit.kind}:{hit.name} #{hit.session} {stamp} "
+                                        f"L{hit.line}: {hit.text.strip()[:200]}")
+        if error:
+            self.status_label.config(text=f"Search failed: {error}")
+        else:
+            self.status_label.config(text=f"{len(hits)} match(es) in {elapsed * 1000:.0f} ms")
+
+    def open_selected(self):
+        """Show the selected hit in its session log."""
+        selection = self.results.curselection()
+        if selection:
+            self.open_hit(self.hits[selection[0]])
+
+    def open_hit(self, hit: SearchHit):
+        """Open a window with the log around a hit and the match highlighted."""
+        text, position = self.index.context(hit.session, hit.offset, radius=32768)
+        window = tk.Toplevel(self)
+        window.title(f"{hit.kind}:{hit.name} #{hit.session} — line {hit.line}")
+        window.geometry("900x500")
+        view = scrolledtext.ScrolledText(window, font=("Courier", 10), wrap=tk.NONE)
+        view.pack(fill=tk.BOTH, expand=True)
+        view.insert(tk.END, text)
+        view.tag_config("hit", background="#fff3b0")
+        view.tag_config("match", background="#ffb000")
+        line_start = f"1.0 + {position} chars"
+        view.tag_add("hit", line_start, f"{line_start} lineend")
+        if hit.end > hit.start:
+            view.tag_add("match", f"{line_start} + {hit.start} chars", f"{line_start} + {hit.end} chars")
+        view.see(line_start)
+        view.config(state=tk.DISABLED)
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS Guest Memory
+Memory backend options for guests and a balloon supervisor.
+
+Guests can be backed by plain anonymous memory, a memfd, or hugetlbfs
+hugepages (the latter two on Linux only), optionally preallocated at
+start. With a virtio-balloon device the supervisor reclaims memory from
+idle guests while the host is under memory pressure and gives it back
+once the pressure is gone.
+"""
+
+import os
+import re
+import subprocess
+import sys
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from qmp import QMPClient, QMPError
+
+# memfd and hugetlbfs are Linux-only; QEMU on macOS has neither
+MEMORY_BACKENDS = ["anonymous", "memfd", "hugepages"] if sys.platform == "linux" else ["anonymous"]
+DEFAULT_BACKEND = "anonymous"
+
+BALLOON_ID = "balloon0"
+
+
+def hugetlbfs_mount() -> Optional[Path]:
+    """Mount point of a hugetlbfs filesystem, if any."""
+    try:
+        mounts = Path("/proc/mounts").read_text()
+    except OSError:
+        return None
+    for line in mounts.splitlines():
+        fields = line.split()
+        if len(fields) >= 3 and fields[2] == "hugetlbfs":
+            return Path(fields[1])
+    return None
+
+
+def hugepages_free_mb() -> int:
+    """Free memory in the default hugepage pool, in MB."""
+    try:
+        meminfo = Path("/proc/meminfo").read_text()
+    except OSError:
+        return 0
+    free = re.search(r"^HugePages_Free:\s+(\d+)", meminfo, re.MULTILINE)
+    size = re.search(r"^Hugepagesize:\s+(\d+) kB", meminfo, re.MULTILINE)
+    if not free or not size:
+        return 0
+    return int(free.group(1)) * int(size.group(1)) // 1024
+
+
+def memory_args(backend: str, memory_mb: int, prealloc: bool = False) -> Tuple[str, List[str]]:
+    """QEMU arguments for a memory backend.
+
+    Returns a suffix for the -machine option and extra arguments. Plain
+    anonymous memory without preallocation needs neither.
+    """
+    if backend not in MEMORY_BACKENDS:
+        raise ValueError(f"The {backend} memory backend is not available on {sys.platform}")
+    if backend == "memfd":
+        options = f"memory-backend-memfd,id=ram0,size={memory_mb}M,share=on"
+    elif backend == "hugepages":
+        mount = hugetlbfs_mount()
+        if mount is None:
+            raise ValueError("No hugetlbfs mount found (mount -t hugetlbfs none /dev/hugepages)")
+        if hugepages_free_mb() < memory_mb:
+            raise ValueError(f"Only {hugepages_free_mb()} MB of hugepages free, {memory_mb} MB needed "
+                             "(raise vm.nr_hugepages)")
+        options = f"memory-backend-file,id=ram0,size={memory_mb}M,mem-path={mount},share=on"
+    elif prealloc:
+        options = f"memory-backend-ram,id=ram0,size={memory_mb}M"
+    else:
+        return "", []
+
+    if prealloc:
+        options += ",prealloc=on"
+    return ",memory-backend=ram0", ["-object", options]
+
+
+def balloon_args() -> List[str]:
+    """QEMU arguments that add a virtio-balloon device."""
+    return ["-device", f"virtio-balloon-pci,id={BALLOON_ID},deflate-on-oom=on"]
+
+
+def resident_memory_mb(pid: int) -> Optional[int]:
+    """Resident set size of a process in MB, or None if it has exited."""
+    status = Path(f"/proc/{pid}/status")
+    if status.exists():
+        try:
+            match = re.search(r"^VmRSS:\s+(\d+) kB", status.read_text(), re.MULTILINE)
+        except OSError:
+            return None
+        return int(match.group(1)) // 1024 if match else None
+    if sys.platform == "darwin":
+        result = subprocess.run(["ps", "-o", "rss=", "-p", str(pid)], capture_output=True, text=True)
+        if result.returncode == 0 and result.stdout.strip():
+            return int(result.stdout.strip()) // 1024
+    return None
+
+
+def cpu_seconds(pid: int) -> Optional[float]:
+    """User plus system CPU time consumed by a process."""
+    try:
+        stat = Path(f"/proc/{pid}/stat").read_text()
+    except OSError:
+        return None
+    fields = stat[stat.rindex(")") + 2:].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def memory_pressure() -> Dict[str, float]:
+    """Fraction of host memory available and the PSI "some" 10 s average."""
+    result = {"available": 1.0, "psi_some_avg10": 0.0}
+    try:
+        meminfo = Path("/proc/meminfo").read_text()
+        total = int(re.search(r"^MemTotal:\s+(\d+)", meminfo, re.MULTILINE).group(1))
+        available = int(re.search(r"^MemAvailable:\s+(\d+)", meminfo, re.MULTILINE).group(1))
+        result["available"] = available / total
+    except (OSError, AttributeError):
+        pass
+    try:
+        psi = Path("/proc/pressure/memory").read_text()
+        match = re.search(r"^some avg10=(\d+(?:\.\d+)?)", psi, re.MULTILINE)
+        if match:
+            result["psi_some_avg10"] = float(match.group(1))
+    except OSError:
+        pass
+    return result
+
+
+@dataclass
+class BalloonedVM:
+    """A guest the supervisor may inflate the balloon of."""
+    name: str
+    pid: int
+    qmp_socket: Path
+    memory_mb: int
+    target_mb: int
+    last_cpu: Optional[float] = None
+
+
+class BalloonSupervisor(threading.Thread):
+    """Lowers balloon targets of idle guests while the host is short of memory.
+
+    Under pressure (available memory below low_water or PSI above psi_limit)
+    each idle guest gives back a step of its memory, down to min_fraction of
+    its configured size. Once available memory recovers past high_water the
+    guests are restored to their full size.
+    """
+
+    def __init__(self, interval: float = 5.0, low_water: float = 0.10, high_water: float = 0.25,
+                 psi_limit: float = 10.0, idle_cpu: float = 0.05, step: float = 0.25,
+                 min_fraction: float = 0.5, log: Callable[[str], None] = lambda message: None):
+        super().__init__(daemon=True, name="cyberos-balloon")
+        self.interval = interval
+        self.low_water = low_water
+        self.high_water = high_water
+        self.psi_limit = psi_limit
+        self.idle_cpu = idle_cpu
+        self.step = step
+        self.min_fraction = min_fraction
+        self.log = log
+        self.vms: Dict[str, BalloonedVM] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def register(self, name: str, pid: int, qmp_socket: Path, memory_mb: int):
+        """Start supervising a guest that has a balloon device."""
+        with self._lock:
+            self.vms[name] = BalloonedVM(name, pid, qmp_socket, memory_mb, memory_mb)
+
+    def unregister(self, name: str):
+        """Stop supervising a guest."""
+        with self._lock:
+            self.vms.pop(name, None)
+
+    def target(self, name: str) -> Optional[int]:
+        """Current balloon target of a guest in MB."""
+        with self._lock:
+            vm = self.vms.get(name)
+            return vm.target_mb if vm else None
+
+    def stop(self):
+        """Stop supervising after the current pass."""
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            pressure = memory_pressure()
+            under_pressure = (pressure["available"] < self.low_water
+                              or pressure["psi_some_avg10"] > self.psi_limit)
+            relieved = pressure["available"] > self.high_water
+
+            with self._lock:
+                vms = list(self.vms.values())
+            for vm in vms:
+                cpu = cpu_seconds(vm.pid)
+                idle = (cpu is not None and vm.last_cpu is not None
+                        and (cpu - vm.last_cpu) / self.interval < self.idle_cpu)
+                vm.last_cpu = cpu
+
+                if under_pressure and idle:
+                    floor = int(vm.memory_mb * self.min_fraction)
+                    target = max(int(vm.target_mb - vm.memory_mb * self.step), floor)
+                elif relieved:
+                    target = vm.memory_mb
+                else:
+                    continue
+                if target != vm.target_mb:
+                    self._set_target(vm, target)
+
+    def _set_target(self, vm: BalloonedVM, target_mb: int):
+        """Ask a guest's balloon driver to resize to target_mb."""
+        client = QMPClient(vm.qmp_socket)
+        try:
+            client.connect(wait=1.0)
+            client.execute("balloon", value=target_mb * 1024 * 1024)
+            self.log(f"Balloon {vm.name}: {vm.target_mb} MB → {target_mb} MB")
+            vm.target_mb = target_mb
+        except QMPError as e:
+            self.log(f"Balloon {vm.name}: {e}")
+        finally:
+            client.close()
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS Process Engine
+Runs every subprocess of a GUI on one asyncio event loop in one thread.
+
+Builds, VM launches and helper commands are started with
+asyncio.create_subprocess_exec on a single background loop instead of a
+dedicated thread per process. Output is read in raw chunks, decoded by a
+ConsoleDecoder and handed to callbacks through a dispatcher; TkBridge
+delivers them on the Tk main loop in time-boxed batches. When the UI
+falls behind, the engine stops reading from the pipe (backpressure) so
+the child blocks instead of memory growing. Every process can be given a
+timeout and cancelled from any thread.
+"""
+
+import asyncio
+import concurrent.futures
+import itertools
+import os
+import queue
+import signal
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, Coroutine, Dict, List, Optional, Tuple
+
+from console_stream import ConsoleDecoder, ConsoleLine
+from ui_profiler import call as profiled_call
+
+# Lines waiting for the UI before a process's pipe stops being read
+HIGH_WATER = 2000
+LOW_WATER = 500
+# Grace period between SIGTERM and SIGKILL
+TERMINATE_GRACE = 5.0
+# Bytes requested per read from a process's output pipe
+CHUNK_SIZE = 65536
+
+
+class ProcessHandle:
+    """A process started by the engine; its methods are safe from any thread."""
+
+    def __init__(self, engine: "ProcessEngine", name: str, command: List[str],
+                 dispatch: Optional[Callable[..., None]] = None):
+        self.engine = engine
+        self.dispatch = dispatch
+        self.name = name
+        self.command = command
+        self.pid: Optional[int] = None
+        self.returncode: Optional[int] = None
+        self.state = "starting"
+        self.start_time = time.monotonic()
+        self.end_time: Optional[float] = None
+        self.future: concurrent.futures.Future = concurrent.futures.Future()
+        self.ready: concurrent.futures.Future = concurrent.futures.Future()
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self._outstanding = 0
+        self._resume: Optional[asyncio.Event] = None
+        self._stop_reason: Optional[str] = None
+        self.detached = False
+
+    @property
+    def running(self) -> bool:
+        """Whether the process has not finished yet."""
+        return not self.future.done()
+
+    async def started(self) -> Optional[int]:
+        """Wait (on the engine loop) until the process has started; returns its PID."""
+        return await asyncio.wrap_future(self.ready)
+
+    async def finished(self) -> Optional[int]:
+        """Wait (on the engine loop) until the process has exited; returns its exit code."""
+        return await asyncio.wrap_future(self.future)
+
+    @property
+    def duration(self) -> float:
+        """Seconds the process has been (or was) running."""
+        return (self.end_time or time.monotonic()) - self.start_time
+
+    def cancel(self):
+        """Terminate the process (SIGTERM, then SIGKILL after a grace period)."""
+        self.engine.call_soon(self._stop, "cancelled")
+
+    def detach(self):
+        """Leave the process running when the engine stops (its output is no longer read)."""
+        self.detached = True
+
+    def write(self, data: bytes):
+        """Write to the process's stdin (started with stdin=True)."""
+        self.engine.call_soon(self._write, data)
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[int]:
+        """Block until the process exits and return its exit code.
+
+        Returns None if the timeout expires first.
+        """
+        try:
+            return self.future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            return None
+
+    def _write(self, data: bytes):
+        """Loop-side stdin write."""
+        if self.process and self.process.stdin and not self.process.stdin.is_closing():
+            self.process.stdin.write(data)
+
+    def _stop(self, reason: str):
+        """Loop-side termination."""
+        if self.process is None or self.process.returncode is not None or self._stop_reason:
+            return
+        self._stop_reason = reason
+        self.engine.loop.create_task(self._terminate())
+
+    async def _terminate(self):
+        """Signal the process group, escalating to SIGKILL."""
+        for signum, grace in ((signal.SIGTERM, TERMINATE_GRACE), (signal.SIGKILL, None)):
+            try:
+                if self.engine.new_session:
+                    os.killpg(self.process.pid, signum)
+                else:
+                    self.process.send_signal(signum)
+            except ProcessLookupError:
+                return
+            if grace is None:
+                return
+            try:
+                await asyncio.wait_for(asyncio.shield(self.process.wait()), grace)
+                return
+            except asyncio.TimeoutError:
+                continue
+
+    def _delivered(self):
+        """Called by the dispatcher after a line reached its callback."""
+        self._outstanding -= 1
+        if self._outstanding == LOW_WATER and self._resume is not None:
+            self.engine.call_soon(self._resume.set)
+
+
+class TkBridge:
+    """Runs callbacks from other threads on the Tk main loop.
+
+    Callbacks are queued without touching Tk and drained every interval_ms,
+    spending at most budget_ms per pass so bursts of output never freeze
+    the window.
+    """
+
+    def __init__(self, root, interval_ms: int = 15, budget_ms: float = 8.0):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.budget = budget_ms / 1000
+        self._queue: "queue.SimpleQueue[Tuple[Callable, tuple]]" = queue.SimpleQueue()
+        self._closed = False
+        self.root.after(self.interval_ms, self._drain)
+
+    def post(self, fn: Callable, *args):
+        """Queue fn(*args) for the Tk thread."""
+        self._queue.put((fn, args))
+
+    def close(self):
+        """Stop draining (the window is going away)."""
+        self._closed = True
+
+    def _drain(self):
+        if self._closed:
+            return
+        deadline = time.perf_counter() + self.budget
+        while time.perf_counter() < deadline:
+            try:
+                fn, args = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            profiled_call(fn, *args)
+        self.root.after(self.interval_ms, self._drain)
+
+
+class ProcessEngine:
+    """One event loop in one background thread for all subprocesses.
+
+    dispatch(fn, *args) decides where callbacks run; TkBridge.post runs them
+    on the Tk thread. Without a dispatcher they run on the loop thread.
+    """
+
+    def __init__(self, dispatch: Optional[Callable[..., None]] = None, new_session: bool = True):
+        self.dispatch = dispatch
+        self.new_session = new_session
+        self.loop = asyncio.new_event_loop()
+        self.handles: Dict[int, ProcessHandle] = {}
+        self._ids = itertools.count(1)
+        self._thread = threading.Thread(target=self._run_loop, daemon=True, name="cyberos-engine")
+        self._started = threading.Event()
+
+    def start(self) -> "ProcessEngine":
+        """Start the loop thread."""
+        self._thread.start()
+        self._started.wait()
+        return self
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self._install_child_watcher()
+        self._started.set()
+        self.loop.run_forever()
+
+    def _install_child_watcher(self):
+        """Avoid the thread-per-child watcher of Python < 3.12 where pidfds exist."""
+        if sys.platform == "win32" or sys.version_info >= (3, 12):
+            return
+        if not hasattr(asyncio, "PidfdChildWatcher"):
+            return
+        try:
+            os.close(os.pidfd_open(os.getpid()))
+        except (AttributeError, OSError):
+            return
+        watcher = asyncio.PidfdChildWatcher()
+        watcher.attach_loop(self.loop)
+        asyncio.set_child_watcher(watcher)
+
+    def call_soon(self, fn: Callable, *args):
+        """Run fn(*args) on the loop thread."""
+        self.loop.call_soon_threadsafe(fn, *args)
+
+    def submit(self, coro: Coroutine) -> concurrent.futures.Future:
+        """Run a coroutine on the loop; returns a thread-safe future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    @staticmethod
+    def _dispatch(handle: ProcessHandle, fn: Optional[Callable], *args):
+        """Run a callback where the handle's dispatcher wants it."""
+        if fn is None:
+            return
+        if handle.dispatch:
+            handle.dispatch(fn, *args)
+        else:
+            fn(*args)
+
+    def spawn(self, command: List[str], *, name: Optional[str] = None,
+              cwd: Optional[str] = None, env: Optional[Dict[str, str]] = None,
+              on_line: Optional[Callable[[str], None]] = None,
+              on_exit: Optional[Callable[[ProcessHandle], None]] = None,
+              timeout: Optional[float] = None, stdin: bool = False, capture: bool = True,
+              on_partial: Optional[Callable[[ConsoleLine], None]] = None,
+              on_chunk: Optional[Callable[[bytes], None]] = None,
+              direct: bool = False) -> ProcessHandle:
+        """Start a process; callable from any thread.
+
+        on_line receives each output line (stdout and stderr merged, without
+        the newline) as a ConsoleLine: escape sequences removed, colours in
+        its spans. on_partial receives the unterminated last line (a prompt
+        or progress bar) whenever the pipe runs dry with one pending.
+        on_chunk receives the raw output bytes on the loop thread, before
+        decoding (for recording); it must not block. on_exit receives the
+        handle once the process has exited. With capture=False the process
+        inherits this program's stdio. With direct=True every callback runs
+        on the loop thread instead of through the dispatcher, unpaced; such
+        callbacks must not block either.
+        """
+        handle = ProcessHandle(self, name or f"job-{next(self._ids)}",
+                               [str(arg) for arg in command], None if direct else self.dispatch)
+        self.submit(self._supervise(handle, cwd, env, on_line, on_exit, timeout, stdin, capture,
+                                    on_partial, on_chunk))
+        return handle
+
+    async def _supervise(self, handle: ProcessHandle, cwd, env, on_line, on_exit, timeout, stdin,
+                         capture, on_partial=None, on_chunk=None):
+        """Run one process to completion."""
+        handle._resume = asyncio.Event()
+        try:
+            handle.process = await asyncio.create_subprocess_exec(
+                *handle.command,
+                cwd=cwd,
+                env=env,
+                stdin=subprocess.PIPE if stdin else (subprocess.DEVNULL if capture else None),
+                stdout=subprocess.PIPE if capture else None,
+                stderr=subprocess.STDOUT if capture else None,
+                start_new_session=self.new_session,
+            )
+        except OSError as e:
+            handle.state = "failed"
+            handle.returncode = None
+            handle.end_time = time.monotonic()
+            self._dispatch(handle, on_line, f"Failed to start {handle.command[0]}: {e}")
+            handle.ready.set_result(None)
+            handle.future.set_result(None)
+            self._dispatch(handle, on_exit, handle)
+            return
+
+        handle.pid = handle.process.pid
+        handle.state = "running"
+        self.handles[handle.pid] = handle
+        handle.ready.set_result(handle.pid)
+        timer = self.loop.call_later(timeout, handle._stop, "timeout") if timeout else None
+        try:
+            if capture:
+                await self._pump(handle, on_line, on_partial, on_chunk)
+            handle.returncode = await handle.process.wait()
+        finally:
+            if timer:
+                timer.cancel()
+            self.handles.pop(handle.pid, None)
+            handle.end_time = time.monotonic()
+            handle.state = handle._stop_reason or "exited"
+            handle.future.set_result(handle.returncode)
+            self._dispatch(handle, on_exit, handle)
+
+    async def _pump(self, handle: ProcessHandle, on_line: Optional[Callable[[str], None]],
+                    on_partial: Optional[Callable[[ConsoleLine], None]] = None,
+                    on_chunk: Optional[Callable[[bytes], None]] = None):
+        """Read output in chunks, split it into lines and pace it to the consumer."""
+        stream = handle.process.stdout
+        decoder = ConsoleDecoder()
+        shown: Optional[str] = None
+        while True:
+            chunk = await stream.read(CHUNK_SIZE)
+            final = not chunk
+            if on_chunk and chunk:
+                on_chunk(chunk)
+            for line in decoder.feed(chunk, final=final):
+                self._emit(handle, on_line, line)
+                shown = None
+            if final:
+                return
+            # A short read means the pipe is drained: show the pending prompt now
+            partial = decoder.partial
+            if on_partial and partial is not None and len(chunk) < CHUNK_SIZE and partial != shown:
+                shown = partial
+                self._emit(handle, on_partial, partial)
+            if handle._outstanding >= HIGH_WATER:
+                handle._resume.clear()
+                await handle._resume.wait()
+
+    def _emit(self, handle: ProcessHandle, on_line: Optional[Callable[[str], None]], line: str):
+        """Deliver one line, counting it until the consumer has run."""
+        if on_line is None:
+            return
+        if handle.dispatch is None:
+            on_line(line)
+            return
+        handle._outstanding += 1
+
+        def deliver():
+            try:
+                on_line(line)
+            finally:
+                self.loop.call_soon_threadsafe(handle._delivered)
+
+        handle.dispatch(deliver)
+
+    async def run(self, command: List[str], timeout: Optional[float] = None,
+                  cwd: Optional[str] = None) -> Tuple[Optional[int], str]:
+        """Run a helper command from a coroutine on the loop; returns (code, output)."""
+        output: List[str] = []
+        handle = ProcessHandle(self, f"helper-{next(self._ids)}", [str(arg) for arg in command])
+        await self._supervise(handle, cwd, None, output.append, None, timeout, False, True)
+        return handle.returncode, "\n".join(output)
+
+    def active(self) -> List[ProcessHandle]:
+        """Processes that are still running."""
+        return list(self.handles.values())
+
+    def stop(self, timeout: float = 5.0):
+        """Cancel every process that was not detached and stop the loop."""
+        handles = [handle for handle in self.active() if not handle.detached]
+        for handle in handles:
+            handle.cancel()
+        deadline = time.monotonic() + timeout
+        for handle in handles:
+            handle.wait(max(deadline - time.monotonic(), 0))
+        self.loop.call_soon_threadsafe(self.loop.stop)
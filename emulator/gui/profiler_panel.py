@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS Profiler Panel
+Tk panel that switches the UI profiler on and off and shows its results.
+
+The report (callback table, slow callbacks with stacks, cProfile top
+functions, memory growth) is rebuilt on demand and every few seconds while
+profiling, so watching it does not itself slow the main loop.
+"""
+
+import tkinter as tk
+from pathlib import Path
+from tkinter import ttk, scrolledtext, filedialog, messagebox
+from typing import Optional
+
+from ui_profiler import MODES, UIProfiler, SlowCallback
+
+# Report refresh while profiling
+REFRESH_MS = 3000
+
+
+class ProfilerPanel(ttk.LabelFrame):
+    """Controls and report view for a UIProfiler."""
+
+    def __init__(self, parent, profiler: UIProfiler, text: str = "Profiling and UI Latency"):
+        super().__init__(parent, text=text, padding=10)
+        self.profiler = profiler
+        self._timer: Optional[str] = None
+
+        row = ttk.Frame(self)
+        row.pack(fill=tk.X)
+        self.enabled_var = tk.BooleanVar(value=profiler.running)
+        ttk.Checkbutton(row, text="Enable profiling", variable=self.enabled_var,
+                        command=self.toggle).pack(side=tk.LEFT)
+        ttk.Label(row, text="Mode:").pack(side=tk.LEFT, padx=(10, 0))
+        self.mode_var = tk.StringVar(value=profiler.mode)
+        ttk.Combobox(row, textvariable=self.mode_var, values=MODES, state="readonly",
+                     width=10).pack(side=tk.LEFT, padx=5)
+        self.memory_var = tk.BooleanVar(value=profiler.memory)
+        ttk.Checkbutton(row, text="Track memory (tracemalloc)", variable=self.memory_var).pack(side=tk.LEFT, padx=5)
+
+        buttons = ttk.Frame(self)
+        buttons.pack(fill=tk.X, pady=(5, 0))
+        ttk.Button(buttons, text="🔄 Refresh", command=self.refresh).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(buttons, text="📸 Memory Snapshot", command=self.snapshot).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons, text="💾 Export...", command=self.export).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons, text="🗑️  Reset", command=self.reset).pack(side=tk.LEFT, padx=5)
+
+        self.status_label = ttk.Label(self, text=profiler.summary())
+        self.status_label.pack(anchor="w", pady=(5, 0))
+        ttk.Label(self, text=f"Callbacks over {profiler.slow * 1000:g} ms are logged as slow, over "
+                             f"{profiler.stall * 1000:g} ms as stalls (with the UI thread's stack). "
+                             "Also: CYBEROS_PROFILE=watchdog|cprofile|sampling").pack(anchor="w")
+
+        self.report_text = scrolledtext.ScrolledText(self, height=12, width=100, state=tk.DISABLED,
+                                                     font=("Courier", 9), wrap=tk.NONE)
+        self.report_text.pack(fill=tk.BOTH, expand=True, pady=(5, 0))
+        if profiler.running:
+            self._schedule()
+
+    def toggle(self):
+        """Start or stop profiling with the selected options."""
+        if self.enabled_var.get():
+            self.profiler.start(self.mode_var.get(), memory=self.memory_var.get())
+            self._schedule()
+        else:
+            self.profiler.stop()
+            self._cancel()
+        self.refresh()
+
+    def on_event(self, event: SlowCallback):
+        """Keep the summary current as slow callbacks arrive."""
+        self.status_label.config(text=self.profiler.summary())
+
+    def refresh(self):
+        """Rebuild the report view."""
+        self.status_label.config(text=self.profiler.summary())
+        self.report_text.config(state=tk.NORMAL)
+        self.report_text.delete("1.0", tk.END)
+        self.report_text.insert(tk.END, self.profiler.report())
+        self.report_text.config(state=tk.DISABLED)
+
+    def snapshot(self):
+        """Take a tracemalloc snapshot and show the growth since the first one."""
+        self.profiler.snapshot_memory()
+        self.refresh()
+
+    def export(self):
+        """Write the report, pstats/folded profiles and memory snapshot to a folder."""
+        directory = filedialog.askdirectory(title="Export profile to", initialdir=str(self.profiler.directory),
+                                            mustexist=False)
+        if not directory:
+            return
+        try:
+            written = self.profiler.export(Path(directory))
+        except OSError as e:
+            messagebox.showerror("Export Failed", str(e))
+            return
+        messagebox.showinfo("Profile Exported", "\n".join(str(path) for path in written))
+
+    def reset(self):
+        self.profiler.reset()
+        self.refresh()
+
+    def _schedule(self):
+        self._cancel()
+        self._timer = self.after(REFRESH_MS, self._tick)
+
+    def _cancel(self):
+        if self._timer:
+            self.after_cancel(self._timer)
+            self._timer = None
+
+    def _tick(self):
+        self._timer = None
+        if not self.profiler.running:
+            return
+        if self.winfo_viewable():
+            self.refresh()
+        self._schedule()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS QMP Client
+Minimal client for the QEMU Machine Protocol over a Unix socket.
+
+Launchers start QEMU with -qmp unix:<path>,server=on,wait=off and use this
+client to pause, resume, query and shut down guests.
+"""
+
+import json
+import socket
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+class QMPError(Exception):
+    """Raised when QEMU rejects a QMP command or the connection fails."""
+
+
+class QMPClient:
+    """Synchronous QMP connection to a single QEMU instance."""
+
+    def __init__(self, socket_path: Path, timeout: float = 5.0):
+        self.socket_path = Path(socket_path)
+        self.timeout = timeout
+        self.sock: Optional[socket.socket] = None
+        self.events: List[Dict[str, Any]] = []
+        self._buffer = b""
+
+    @staticmethod
+    def qemu_args(socket_path: Path) -> List[str]:
+        """QEMU arguments that expose a QMP server on socket_path."""
+        return ["-qmp", f"unix:{socket_path},server=on,wait=off"]
+
+    def connect(self, wait: float = 10.0):
+        """Connect and negotiate capabilities, retrying while QEMU starts."""
+        deadline = time.monotonic() + wait
+        while True:
+            try:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.settimeout(self.timeout)
+                sock.connect(str(self.socket_path))
+                break
+            except OSError as e:
+                sock.close()
+                if time.monotonic() >= deadline:
+                    raise QMPError(f"Could not connect to {self.socket_path}: {e}")
+                time.sleep(0.05)
+
+        self.sock = sock
+        greeting = self._read_message()
+        if "QMP" not in greeting:
+            raise QMPError(f"Unexpected QMP greeting: {greeting}")
+        self.execute("qmp_capabilities")
+
+    def close(self):
+        """Close the connection."""
+        if self.sock:
+            try:
+                self.sock.close()
+            finally:
+                self.sock = None
+
+    def __enter__(self) -> "QMPClient":
+        self.connect()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def execute(self, command: str, **arguments) -> Any:
+        """Run a QMP command and return its result."""
+        if not self.sock:
+            raise QMPError("Not connected")
+        message: Dict[str, Any] = {"execute": command}
+        if arguments:
+            message["arguments"] = arguments
+        try:
+            self.sock.sendall(json.dumps(message).encode() + b"\n")
+        except OSError as e:
+            raise QMPError(f"{command}: {e}")
+
+        while True:
+            reply = self._read_message()
+            if "event" in reply:
+                self.events.append(reply)
+                continue
+            if "error" in reply:
+                raise QMPError(f"{command}: {reply['error'].get('desc', reply['error'])}")
+            return reply.get("return")
+
+    def _read_message(self) -> Dict[str, Any]:
+        """Read one newline-delimited JSON message."""
+        assert self.sock is not None
+        while b"\n" not in self._buffer:
+            try:
+                chunk = self.sock.recv(65536)
+            except OSError as e:
+                raise QMPError(f"QMP read failed: {e}")
+            if not chunk:
+                raise QMPError("QMP connection closed")
+            self._buffer += chunk
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return json.loads(line)
+
+    # Convenience wrappers
+
+    def pause(self):
+        """Stop the guest's vCPUs."""
+        self.execute("stop")
+
+    def resume(self):
+        """Resume a paused guest."""
+        self.execute("cont")
+
+    def status(self) -> str:
+        """Run state of the guest, e.g. "running" or "paused"."""
+        return self.execute("query-status").get("status", "unknown")
+
+    def powerdown(self):
+        """Send an ACPI power button press."""
+        self.execute("system_powerdown")
+
+    def quit(self):
+        """Terminate QEMU immediately."""
+        try:
+            self.execute("quit")
+        except QMPError:
+            # QEMU may close the socket before replying
+            pass
@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS RFB Client
+Minimal VNC (RFB 3.3-3.8) client that keeps a framebuffer and reports dirty rectangles.
+
+QEMU's VNC server only sends what changed since the last incremental
+FramebufferUpdateRequest, so the client keeps exactly one request
+outstanding: after an update has been decoded the dirty rectangles go to
+on_frame() as PPM patches, and the next request is only sent once the viewer
+calls frame_done() and at most max_fps times a second. A busy guest is
+therefore sampled rather than streamed, and neither the socket nor the UI
+queue can build up a backlog.
+
+The pixel format is fixed at 32 bpp with red, green and blue in the first
+three bytes, so Raw rectangles are copied into the framebuffer row by row
+without per-pixel work. Raw is preferred on the local host; remote servers
+are asked for Zlib first. CopyRect and DesktopSize are handled as well.
+This module does not import Tk (see rfb_viewer.py).
+
+Usage:
+    python3 rfb_client.py 127.0.0.1:5901 --snapshot screen.ppm
+    python3 rfb_client.py --bench          # frame rate and CPU against a fake server
+"""
+
+import argparse
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+
+from vnc_ports import VNC_BASE
+
+ENCODING_RAW = 0
+ENCODING_COPYRECT = 1
+ENCODING_ZLIB = 6
+ENCODING_DESKTOP_SIZE = -223
+ENCODING_NAMES = {ENCODING_RAW: "raw", ENCODING_COPYRECT: "copyrect", ENCODING_ZLIB: "zlib",
+                  ENCODING_DESKTOP_SIZE: "desktop-size"}
+
+SECURITY_NONE = 1
+SECURITY_VNC_AUTH = 2
+
+# Bytes per pixel of the pixel format we ask for (R, G, B, padding)
+BPP = 4
+PIXEL_FORMAT = struct.pack(">BBBBHHHBBB3x", 32, 24, 0, 1, 255, 255, 255, 0, 8, 16)
+# Beyond this many rectangles, or when they cover most of their bounding
+# box, one patch of the bounding box is cheaper to draw than many small ones
+MAX_PATCHES = 32
+MERGE_COVERAGE = 0.6
+
+Rect = Tuple[int, int, int, int]
+# x, y, width, height and a binary PPM image of that area
+Patch = Tuple[int, int, int, int, bytes]
+
+
+class RFBError(Exception):
+    """Raised when the handshake fails or the server breaks the protocol."""
+
+
+def parse_address(text: str) -> Tuple[str, int]:
+    """host:display (":1", "host:1") or host::port, as VNC clients accept them."""
+    host, sep, rest = text.rpartition(":")
+    if not sep:
+        return text or "127.0.0.1", VNC_BASE
+    if host.endswith(":"):
+        return host[:-1] or "127.0.0.1", int(rest)
+    number = int(rest)
+    return host or "127.0.0.1", number if number >= VNC_BASE else VNC_BASE + number
+
+
+def merge_rects(rects: List[Rect]) -> List[Rect]:
+    """The rectangles to redraw: as received, or their bounding box."""
+    if len(rects) <= 1:
+        return rects
+    left = min(r[0] for r in rects)
+    top = min(r[1] for r in rects)
+    right = max(r[0] + r[2] for r in rects)
+    bottom = max(r[1] + r[3] for r in rects)
+    area = sum(r[2] * r[3] for r in rects)
+    if len(rects) > MAX_PATCHES or area >= MERGE_COVERAGE * (right - left) * (bottom - top):
+        return [(left, top, right - left, bottom - top)]
+    return rects
+
+
+class RFBClient:
+    """One RFB connection, read on a background thread.
+
+    on_frame(patches) and on_resize(width, height) are called from that
+    thread; the receiver must call frame_done() once the patches are drawn.
+    on_close(reason) is called when the connection ends (reason is None
+    after close()).
+    """
+
+    def __init__(self, host: str, port: int,
+                 on_frame: Callable[[List[Patch]], None],
+                 on_resize: Optional[Callable[[int, int], None]] = None,
+                 on_close: Optional[Callable[[Optional[str]], None]] = None,
+                 max_fps: float = 30.0, encodings: Optional[List[int]] = None):
+        self.host = host
+        self.port = port
+        self.on_frame = on_frame
+        self.on_resize = on_resize
+        self.on_close = on_close
+        self.max_fps = max_fps
+        if encodings is None:
+            local = host in ("127.0.0.1", "localhost", "::1")
+            encodings = [ENCODING_RAW, ENCODING_ZLIB] if local else [ENCODING_ZLIB, ENCODING_RAW]
+        self.encodings = encodings + [ENCODING_COPYRECT, ENCODING_DESKTOP_SIZE]
+        self.width = 0
+        self.height = 0
+        self.name = ""
+        self.framebuffer = bytearray()
+        self.sock: Optional[socket.socket] = None
+        self._reader = None
+        self._send_lock = threading.Lock()
+        self._drawn = threading.Event()
+        self._closed = False
+        self._inflate = zlib.decompressobj()
+        self._thread: Optional[threading.Thread] = None
+        # Statistics for the status line and the benchmark
+        self.frames = 0
+        self.rects = 0
+        self.bytes_received = 0
+        self.encoding_counts: Dict[str, int] = {}
+
+    # -- connection ----------------------------------------------------------
+
+    def connect(self, timeout: float = 5.0):
+        """Connect, handshake and start reading updates in the background."""
+        sock = socket.create_connection((self.host, self.port), timeout=timeout)
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.sock = sock
+            self._reader = sock.makefile("rb", buffering=1 << 20)
+            self._handshake()
+        except (OSError, struct.error) as e:
+            sock.close()
+            self.sock = None
+            raise RFBError(f"Handshake with {self.host}:{self.port} failed: {e}")
+        except RFBError:
+            sock.close()
+            self.sock = None
+            raise
+        sock.settimeout(None)
+        self._thread = threading.Thread(target=self._run, name=f"rfb-{self.port}", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Disconnect; on_close(None) follows from the reader thread."""
+        self._closed = True
+        self._drawn.set()
+        if self.sock:
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    @property
+    def connected(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _read(self, count: int) -> bytes:
+        data = self._reader.read(count)
+        if len(data) != count:
+            raise RFBError("Connection closed by the server")
+        self.bytes_received += count
+        return data
+
+    def _send(self, data: bytes):
+        with self._send_lock:
+            if self.sock:
+                self.sock.sendall(data)
+
+    def _reason(self) -> str:
+        length, = struct.unpack(">I", self._read(4))
+        return self._read(length).decode("utf-8", "replace")
+
+    def _handshake(self):
+        banner = self._read(12)
+        if not banner.startswith(b"RFB "):
+            raise RFBError(f"Not an RFB server: {banner!r}")
+        major, minor = int(banner[4:7]), int(banner[8:11])
+        minor = 8 if (major, minor) >= (3, 8) else 7 if (major, minor) >= (3, 7) else 3
+        self._send(b"RFB 003.%03d\n" % minor)
+
+        if minor == 3:
+            security, = struct.unpack(">I", self._read(4))
+            if security == 0:
+                raise RFBError(f"Server refused the connection: {self._reason()}")
+            offered = [security]
+        else:
+            count = self._read(1)[0]
+            if count == 0:
+                raise RFBError(f"Server refused the connection: {self._reason()}")
+            offered = list(self._read(count))
+        if SECURITY_NONE not in offered:
+            if SECURITY_VNC_AUTH in offered:
+                raise RFBError("The server requires a VNC password, which is not supported; "
+                               "start QEMU's VNC server without password=on")
+            raise RFBError(f"No supported security type (server offers {offered})")
+        if minor != 3:
+            self._send(bytes([SECURITY_NONE]))
+            if minor == 8:
+                result, = struct.unpack(">I", self._read(4))
+                if result != 0:
+                    raise RFBError(f"Security handshake failed: {self._reason()}")
+
+        self._send(b"\x01")  # ClientInit: share the desktop with other viewers
+        width, height = struct.unpack(">HH", self._read(4))
+        self._read(16)  # the server's pixel format; ours replaces it
+        name_length, = struct.unpack(">I", self._read(4))
+        self.name = self._read(name_length).decode("utf-8", "replace")
+        self._resize(width, height)
+
+        self._send(b"\x00\x00\x00\x00" + PIXEL_FORMAT)
+        self._send(struct.pack(">BxH", 2, len(self.encodings))
+                   + b"".join(struct.pack(">i", encoding) for encoding in self.encodings))
+        self._request(incremental=False)
+
+    # -- input ---------------------------------------------------------------
+
+    def key_event(self, keysym: int, down: bool):
+        self._send(struct.pack(">BBxxI", 4, int(down), keysym))
+
+    def pointer_event(self, x: int, y: int, buttons: int):
+        """buttons: bit 0-2 left/middle/right, bit 3/4 wheel up/down."""
+        x = max(0, min(x, self.width - 1))
+        y = max(0, min(y, self.height - 1))
+        self._send(struct.pack(">BBHH", 5, buttons, x, y))
+
+    # -- updates -------------------------------------------------------------
+
+    def frame_done(self):
+        """The last patches have been drawn; the next update may be requested."""
+        self._drawn.set()
+
+    def _request(self, incremental: bool = True):
+        self._send(struct.pack(">BBHHHH", 3, int(incremental), 0, 0, self.width, self.height))
+
+    def _resize(self, width: int, height: int):
+        self.width, self.height = width, height
+        self.framebuffer = bytearray(width * height * BPP)
+        if self.on_resize:
+            self.on_resize(width, height)
+
+    def _run(self):
+        reason = None
+        try:
+            while not self._closed:
+                message = self._read(1)[0]
+                if message == 0:
+                    requested = time.monotonic()
+                    dirty = self._read_update()
+                    if dirty:
+                        self.frames += 1
+                        self._drawn.clear()
+                        self.on_frame(self.patches(dirty))
+                        self._drawn.wait()
+                    # Sample the guest at most max_fps times a second
+                    interval = 1.0 / self.max_fps if self.max_fps else 0.0
+                    delay = interval - (time.monotonic() - requested)
+                    if delay > 0 and not self._closed:
+                        time.sleep(delay)
+                    if not self._closed:
+                        self._request()
+                elif message == 1:  # SetColourMapEntries (unused in true colour)
+                    _, count = struct.unpack(">xHH", self._read(5))
+                    self._read(count * 6)
+                elif message == 2:  # Bell
+                    pass
+                elif message == 3:  # ServerCutText
+                    self._reason_skip()
+                else:
+                    raise RFBError(f"Unknown server message {message}")
+        except (RFBError, OSError, struct.error, zlib.error) as e:
+            if not self._closed:
+                reason = str(e)
+        finally:
+            self._closed = True
+            if self.sock:
+                self.sock.close()
+            if self.on_close:
+                self.on_close(reason)
+
+    def _reason_skip(self):
+        self._read(3)
+        length, = struct.unpack(">I", self._read(4))
+        self._read(length)
+
+    def _read_update(self) -> List[Rect]:
+        """Apply one FramebufferUpdate and return the rectangles it changed."""
+        count, = struct.unpack(">xH", self._read(3))
+        dirty: List[Rect] = []
+        for _ in range(count):
+            x, y, w, h, encoding = struct.unpack(">HHHHi", self._read(12))
+            name = ENCODING_NAMES.get(encoding, str(encoding))
+            self.encoding_counts[name] = self.encoding_counts.get(name, 0) + 1
+            if encoding == ENCODING_DESKTOP_SIZE:
+                self._resize(w, h)
+                dirty = [(0, 0, w, h)]
+                continue
+            if encoding == ENCODING_RAW:
+                self._put(x, y, w, h, self._read(w * h * BPP))
+            elif encoding == ENCODING_ZLIB:
+                length, = struct.unpack(">I", self._read(4))
+                self._put(x, y, w, h, self._inflate.decompress(self._read(length)))
+            elif encoding == ENCODING_COPYRECT:
+                src_x, src_y = struct.unpack(">HH", self._read(4))
+                self._put(x, y, w, h, self._get(src_x, src_y, w, h))
+            else:
+                raise RFBError(f"Server sent unrequested encoding {encoding}")
+            if w and h:
+                dirty.append((x, y, w, h))
+        self.rects += len(dirty)
+        return dirty
+
+    def _put(self, x: int, y: int, w: int, h: int, pixels: bytes):
+        """Copy w*h pixels into the framebuffer."""
+        if x + w > self.width or y + h > self.height or len(pixels) != w * h * BPP:
+            raise RFBError(f"Rectangle {w}x{h}+{x}+{y} does not fit the framebuffer")
+        stride = self.width * BPP
+        row = w * BPP
+        start = y * stride + x * BPP
+        if x == 0 and w == self.width:
+            self.framebuffer[start:start + h * stride] = pixels
+            return
+        fb = self.framebuffer
+        for line in range(h):
+            offset = start + line * stride
+            fb[offset:offset + row] = pixels[line * row:(line + 1) * row]
+
+    def _get(self, x: int, y: int, w: int, h: int) -> bytes:
+        """w*h pixels of the framebuffer, row by row."""
+        stride = self.width * BPP
+        start = y * stride + x * BPP
+        if x == 0 and w == self.width:
+            return bytes(self.framebuffer[start:start + h * stride])
+        row = w * BPP
+        fb = self.framebuffer
+        return b"".join(fb[start + line * stride:start + line * stride + row] for line in range(h))
+
+    def patches(self, dirty: List[Rect]) -> List[Patch]:
+        """PPM images of the dirty areas, merged when that is cheaper to draw."""
+        patches = []
+        for x, y, w, h in merge_rects(dirty):
+            pixels = bytearray(self._get(x, y, w, h))
+            del pixels[3::4]
+            patches.append((x, y, w, h, b"P6 %d %d 255\n" % (w, h) + pixels))
+        return patches
+
+    def snapshot(self) -> bytes:
+        """The whole framebuffer as a PPM image."""
+        return self.patches([(0, 0, self.width, self.height)])[0][4]
+
+    def summary(self) -> str:
+        encodings = ", ".join(f"{name} {count}" for name, count in sorted(self.encoding_counts.items()))
+        return (f"{self.width}x{self.height}, {self.frames} frames, {self.rects} rects, "
+                f"{self.bytes_received / 1024 / 1024:.1f} MB ({encodings or 'no updates'})")
+
+
+def fake_server(port: int, width: int = 1024, height: int = 768):
+    """Serve one client an animated screen, like a busy guest (for --bench)."""
+    listener = socket.create_server(("127.0.0.1", port))
+    print("ready", flush=True)
+    conn, _ = listener.accept()
+    conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    reader = conn.makefile("rb")
+    conn.sendall(b"RFB 003.008\n")
+    reader.read(12)
+    conn.sendall(b"\x01\x01")
+    reader.read(1)
+    conn.sendall(struct.pack(">I", 0))
+    reader.read(1)
+    name = b"fake guest"
+    conn.sendall(struct.pack(">HH", width, height) + PIXEL_FORMAT + struct.pack(">I", len(name)) + name)
+    deflate = zlib.compressobj(1)
+    encodings = [ENCODING_RAW]
+    frame = 0
+    try:
+        while True:
+            message = reader.read(1)
+            if not message:
+                return
+            if message[0] == 0:
+                reader.read(19)
+            elif message[0] == 2:
+                count, = struct.unpack(">xH", reader.read(3))
+                encodings = list(struct.unpack(">%di" % count, reader.read(4 * count)))
+            elif message[0] == 3:
+                incremental = reader.read(9)[0]
+                frame += 1
+                if not incremental:
+                    rects = [(0, 0, width, height)]
+                else:
+                    # A moving window plus a blinking cursor and a clock
+                    box = (frame * 7) % (width - 320)
+                    rects = [(box, 200, 320, 240), (40 + frame % 80 * 8, 700, 8, 16), (width - 100, 0, 100, 20)]
+                out = [struct.pack(">BxH", 0, len(rects))]
+                for x, y, w, h in rects:
+                    pixels = bytes([frame % 256, x % 256, y % 256, 0]) * (w * h)
+                    if encodings[0] == ENCODING_ZLIB:
+                        data = deflate.compress(pixels) + deflate.flush(zlib.Z_SYNC_FLUSH)
+                        out.append(struct.pack(">HHHHiI", x, y, w, h, ENCODING_ZLIB, len(data)) + data)
+                    else:
+                        out.append(struct.pack(">HHHHi", x, y, w, h, ENCODING_RAW) + pixels)
+                conn.sendall(b"".join(out))
+            elif message[0] == 4:
+                reader.read(7)
+            elif message[0] == 5:
+                reader.read(5)
+    except OSError:
+        return
+
+
+def benchmark(seconds: float = 5.0):
+    """Frame rate and client CPU against a fake server, with and without the frame cap."""
+    for label, max_fps, encodings in (("raw, 30 fps cap", 30.0, [ENCODING_RAW]),
+                                      ("zlib, 30 fps cap", 30.0, [ENCODING_ZLIB]),
+                                      ("raw, uncapped", 0.0, [ENCODING_RAW])):
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+        server = subprocess.Popen([sys.executable, __file__, "--fake-server", str(port)],
+                                  stdout=subprocess.PIPE)
+        try:
+            server.stdout.readline()  # listening
+            drawn = []
+
+            def on_frame(patches: List[Patch]):
+                # Stands in for the viewer: count the pixels it would draw
+                drawn.append(sum(patch[2] * patch[3] for patch in patches))
+                client.frame_done()
+
+            client = RFBClient("127.0.0.1", port, on_frame, max_fps=max_fps, encodings=encodings)
+            client.connect()
+            cpu, wall = time.process_time(), time.perf_counter()
+            time.sleep(seconds)
+            cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+            client.close()
+            print(f"{label:>17}: {client.frames / wall:6.1f} fps, {sum(drawn) / len(drawn or [1]) / 1000:6.1f} "
+                  f"kpixel/frame, {client.bytes_received / wall / 1024 / 1024:6.1f} MB/s, "
+                  f"client CPU {cpu / wall * 100:5.1f}%")
+        finally:
+            server.kill()
+            server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Minimal RFB (VNC) client")
+    parser.add_argument("address", nargs="?", default=":0", help="host:display or host::port (default :0)")
+    parser.add_argument("--snapshot", metavar="PPM", help="save the screen to a PPM file and exit")
+    parser.add_argument("--bench", type=float, nargs="?", const=5.0, metavar="SECONDS",
+                        help="measure frame rate and client CPU against a fake busy guest")
+    parser.add_argument("--fake-server", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.fake_server:
+        fake_server(args.fake_server)
+        return 0
+    if args.bench:
+        benchmark(args.bench)
+        return 0
+
+    host, port = parse_address(args.address)
+    first = threading.Event()
+    client = RFBClient(host, port, lambda patches: first.set(), on_close=lambda reason: first.set())
+    try:
+        client.connect()
+    except (RFBError, OSError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    first.wait(10)
+    client.close()
+    print(f"{host}:{port} \"{client.name}\": {client.summary()}")
+    if args.snapshot:
+        with open(args.snapshot, "wb") as f:
+            f.write(client.snapshot())
+        print(f"Saved {args.snapshot}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
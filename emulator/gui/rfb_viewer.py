@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS Display Viewer
+Tk panel that shows a VM's VNC display using rfb_client.
+
+Only the dirty rectangles of each update are written into the PhotoImage
+(one `put` per merged rectangle), and the next update is requested only
+after they are drawn, so a busy guest costs at most max_fps redraws a
+second. While the panel is not visible nothing is drawn and no updates are
+requested; the whole screen is drawn once when it is shown again.
+"""
+
+import threading
+import time
+import tkinter as tk
+from tkinter import ttk
+from typing import Callable, List, Optional
+
+from rfb_client import Patch, RFBClient, RFBError, parse_address
+
+FPS_CHOICES = ["10", "15", "30", "60"]
+STATUS_MS = 1000
+
+# X11 keysyms for keys whose Tk keysym_num is not one on every platform
+KEYSYMS = {
+    "BackSpace": 0xff08, "Tab": 0xff09, "Return": 0xff0d, "Escape": 0xff1b, "Delete": 0xffff,
+    "Home": 0xff50, "Left": 0xff51, "Up": 0xff52, "Right": 0xff53, "Down": 0xff54,
+    "Prior": 0xff55, "Next": 0xff56, "End": 0xff57, "Insert": 0xff63,
+    "Shift_L": 0xffe1, "Shift_R": 0xffe2, "Control_L": 0xffe3, "Control_R": 0xffe4,
+    "Alt_L": 0xffe9, "Alt_R": 0xffea, "Super_L": 0xffeb, "Super_R": 0xffec,
+    **{f"F{n}": 0xffbe + n - 1 for n in range(1, 13)},
+}
+# Tk mouse buttons to RFB button-mask bits
+BUTTONS = {1: 1, 2: 2, 3: 4}
+WHEEL_UP, WHEEL_DOWN = 8, 16
+
+
+def keysym(event) -> int:
+    """The X11 keysym for a Tk key event."""
+    if event.keysym in KEYSYMS:
+        return KEYSYMS[event.keysym]
+    if len(event.char) == 1 and ord(event.char) >= 0x20:
+        code = ord(event.char)
+        # Latin-1 keysyms are the code points; the rest use the Unicode range
+        return code if code < 0x100 else 0x01000000 | code
+    return event.keysym_num
+
+
+class RFBViewer(ttk.Frame):
+    """Connect controls, a status line and the guest's screen."""
+
+    def __init__(self, parent, post: Callable, address: str = "127.0.0.1:0"):
+        super().__init__(parent, padding=10)
+        self.post = post
+        self.client: Optional[RFBClient] = None
+        self.photo: Optional[tk.PhotoImage] = None
+        self._waiting = False
+        self._buttons = 0
+        self._pointer = (-1, -1)
+        self._timer: Optional[str] = None
+        self._last = (0, 0, time.monotonic())
+        self._attempt = 0
+
+        bar = ttk.Frame(self)
+        bar.pack(fill=tk.X)
+        ttk.Label(bar, text="Display:").pack(side=tk.LEFT)
+        self.address_var = tk.StringVar(value=address)
+        ttk.Entry(bar, textvariable=self.address_var, width=22).pack(side=tk.LEFT, padx=5)
+        self.connect_btn = ttk.Button(bar, text="🔌 Connect", command=self.connect)
+        self.connect_btn.pack(side=tk.LEFT, padx=5)
+        self.disconnect_btn = ttk.Button(bar, text="⏏ Disconnect", command=self.disconnect, state=tk.DISABLED)
+        self.disconnect_btn.pack(side=tk.LEFT, padx=5)
+        ttk.Label(bar, text="Max FPS:").pack(side=tk.LEFT, padx=(15, 0))
+        self.fps_var = tk.StringVar(value="30")
+        fps_combo = ttk.Combobox(bar, textvariable=self.fps_var, values=FPS_CHOICES, state="readonly", width=4)
+        fps_combo.pack(side=tk.LEFT, padx=5)
+        fps_combo.bind("<<ComboboxSelected>>", self._set_fps)
+
+        self.status_label = ttk.Label(self, text="Not connected. Launch a VM with the VNC display "
+                                                 "mode, or enter host:display.")
+        self.status_label.pack(anchor="w", pady=5)
+
+        screen = ttk.Frame(self)
+        screen.pack(fill=tk.BOTH, expand=True)
+        self.canvas = tk.Canvas(screen, bg="black", highlightthickness=0, takefocus=1)
+        xscroll = ttk.Scrollbar(screen, orient=tk.HORIZONTAL, command=self.canvas.xview)
+        yscroll = ttk.Scrollbar(screen, orient=tk.VERTICAL, command=self.canvas.yview)
+        self.canvas.configure(xscrollcommand=xscroll.set, yscrollcommand=yscroll.set)
+        self.canvas.grid(row=0, column=0, sticky="nsew")
+        yscroll.grid(row=0, column=1, sticky="ns")
+        xscroll.grid(row=1, column=0, sticky="ew")
+        screen.rowconfigure(0, weight=1)
+        screen.columnconfigure(0, weight=1)
+
+        self.canvas.bind("<KeyPress>", lambda e: self._key(e, True))
+        self.canvas.bind("<KeyRelease>", lambda e: self._key(e, False))
+        self.canvas.bind("<Motion>", self._motion)
+        self.canvas.bind("<ButtonPress>", self._button_press)
+        self.canvas.bind("<ButtonRelease>", self._button_release)
+        self.canvas.bind("<MouseWheel>", self._wheel)
+        self.bind("<Map>", self._on_map)
+
+    # -- connection ----------------------------------------------------------
+
+    def connect(self, address: Optional[str] = None, wait: float = 0.0):
+        """Connect in the background, retrying for up to wait seconds (QEMU starting)."""
+        if address:
+            self.address_var.set(address)
+        self.disconnect()
+        try:
+            host, port = parse_address(self.address_var.get().strip())
+        except ValueError:
+            self.status_label.config(text=f"Invalid display address: {self.address_var.get()}")
+            return
+        self._attempt += 1
+        attempt = self._attempt
+        self.status_label.config(text=f"Connecting to {host}:{port}...")
+        self.connect_btn.config(state=tk.DISABLED)
+        self.disconnect_btn.config(state=tk.NORMAL)
+        threading.Thread(target=self._connect, args=(host, port, wait, attempt, float(self.fps_var.get())), daemon=True).start()
+
+    def _connect(self, host: str, port: int, wait: float, attempt: int, max_fps: float):
+        """Worker thread: open the connection."""
+        deadline = time.monotonic() + wait
+        while True:
+            client = RFBClient(host, port, None, max_fps=max_fps)
+            client.on_frame = lambda patches, c=client: self.post(self._draw, c, patches)
+            client.on_resize = lambda width, height: self.post(self._resize, width, height)
+            client.on_close = lambda reason, c=client: self.post(self._closed, c, reason)
+            try:
+                client.connect()
+                break
+            except (RFBError, OSError) as e:
+                if attempt != self._attempt:
+                    return
+                if time.monotonic() >= deadline:
+                    self.post(self._failed, attempt, f"Could not connect to {host}:{port}: {e}")
+                    return
+                time.sleep(0.5)
+        self.post(self._connected, client, attempt)
+
+    def _connected(self, client: RFBClient, attempt: int):
+        if attempt != self._attempt:
+            client.close()
+            self._waiting = False
+            return
+        self.client = client
+        self._last = (0, 0, time.monotonic())
+        self.canvas.focus_set()
+        if self.winfo_viewable():
+            self._on_map()
+        self._schedule()
+
+    def _failed(self, attempt: int, message: str):
+        if attempt == self._attempt:
+            self.status_label.config(text=message)
+            self.connect_btn.config(state=tk.NORMAL)
+            self.disconnect_btn.config(state=tk.DISABLED)
+
+    def disconnect(self):
+        """Close the connection (and stop any pending connect)."""
+        self._attempt += 1
+        if self.client:
+            self.client.close()
+            self.client = None
+        self._waiting = False
+        self._cancel()
+        self.connect_btn.config(state=tk.NORMAL)
+        self.disconnect_btn.config(state=tk.DISABLED)
+
+    def _set_fps(self, event=None):
+        if self.client:
+            self.client.max_fps = float(self.fps_var.get())
+
+    # -- drawing -------------------------------------------------------------
+
+    def _resize(self, width: int, height: int):
+        self.photo = tk.PhotoImage(width=width, height=height)
+        self.canvas.delete("all")
+        self.canvas.create_image(0, 0, image=self.photo, anchor="nw")
+        self.canvas.configure(scrollregion=(0, 0, width, height), width=width, height=height)
+
+    def _draw(self, client: RFBClient, patches: List[Patch]):
+        if client is not self.client or not self.photo or not self.winfo_viewable():
+            # Leave the update request unanswered until the tab is shown again
+            # (or, for the first frame, until _connected has adopted the client)
+            self._waiting = client is self.client or client.connected
+            return
+        for x, y, _, _, ppm in patches:
+            self.photo.tk.call(self.photo.name, "put", ppm, "-format", "ppm", "-to", x, y)
+        client.frame_done()
+
+    def _on_map(self, event=None):
+        """Draw the whole screen once when the panel becomes visible."""
+        client = self.client
+        if self._waiting and client and self.photo:
+            self._waiting = False
+            self.photo.tk.call(self.photo.name, "put", client.snapshot(), "-format", "ppm", "-to", 0, 0)
+            client.frame_done()
+
+    def _closed(self, client: RFBClient, reason: Optional[str]):
+        if client is self.client:
+            self.client = None
+            self._cancel()
+            self.connect_btn.config(state=tk.NORMAL)
+            self.disconnect_btn.config(state=tk.DISABLED)
+            self.status_label.config(text=f"Disconnected: {reason}" if reason else "Disconnected.")
+
+    # -- input ---------------------------------------------------------------
+
+    def _key(self, event, down: bool):
+        if self.client:
+            self.client.key_event(keysym(event), down)
+        return "break"
+
+    def _position(self, event):
+        return int(self.canvas.canvasx(event.x)), int(self.canvas.canvasy(event.y))
+
+    def _motion(self, event):
+        position = self._position(event)
+        if self.client and position != self._pointer:
+            self._pointer = position
+            self.client.pointer_event(*position, self._buttons)
+
+    def _button_press(self, event):
+        self.canvas.focus_set()
+        if event.num in (4, 5):  # X11 wheel
+            self._scroll(event, WHEEL_UP if event.num == 4 else WHEEL_DOWN)
+        elif self.client and event.num in BUTTONS:
+            self._buttons |= BUTTONS[event.num]
+            self.client.pointer_event(*self._position(event), self._buttons)
+
+    def _button_release(self, event):
+        if self.client and event.num in BUTTONS:
+            self._buttons &= ~BUTTONS[event.num]
+            self.client.pointer_event(*self._position(event), self._buttons)
+
+    def _wheel(self, event):
+        self._scroll(event, WHEEL_UP if event.delta > 0 else WHEEL_DOWN)
+
+    def _scroll(self, event, bit: int):
+        if self.client:
+            x, y = self._position(event)
+            self.client.pointer_event(x, y, self._buttons | bit)
+            self.client.pointer_event(x, y, self._buttons)
+
+    # -- status --------------------------------------------------------------
+
+    def _schedule(self):
+        self._cancel()
+        self._timer = self.after(STATUS_MS, self._tick)
+
+    def _cancel(self):
+        if self._timer:
+            self.after_cancel(self._timer)
+            self._timer = None
+
+    def _tick(self):
+        self._timer = None
+        client = self.client
+        if not client:
+            return
+        if self._waiting and self.winfo_viewable():
+            self._on_map()
+        frames, received, since = self._last
+        now = time.monotonic()
+        elapsed = max(now - since, 1e-6)
+        self._last = (client.frames, client.bytes_received, now)
+        encoding = max(client.encoding_counts, key=client.encoding_counts.get, default="-")
+        self.status_label.config(
+            text=f"{client.name or 'VNC'} at {client.host}:{client.port} — {client.width}x{client.height}, "
+                 f"{(client.frames - frames) / elapsed:.0f} fps, "
+                 f"{(client.bytes_received - received) / elapsed / 1024:.0f} KB/s, {encoding}")
+        self._schedule()
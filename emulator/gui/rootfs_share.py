@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS Root Filesystem Share
+Exports build/rootfs into a directly booted guest over 9p or virtiofs.
+
+The initramfs /init (scripts/build_initramfs.sh) looks for
+cyberos.share=<fs>:<tag> on the kernel command line, mounts the share and
+switches root into it, so edits to build/rootfs reach the guest on its next
+boot without repacking the initramfs or the ISO. The host tree is always
+exported read-only: "ro" boots it as a read-only root, "overlay" puts a
+tmpfs upper layer on top so the guest can write (copy-on-write, discarded
+at shutdown).
+
+9p only needs QEMU's virtio-9p-pci device. virtiofs is faster but needs
+vhost-user-fs-pci, a virtiofsd daemon and guest RAM that QEMU can share
+with it (a memfd backend is used when none is configured).
+"""
+
+import asyncio
+import functools
+import shutil
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, List, Optional
+
+ROOTFS_PATH = Path("build") / "rootfs"
+MOUNT_TAG = "cyberos_root"
+
+# "auto" picks virtiofs when the host supports it, else 9p
+SHARE_MECHANISMS = ["auto", "virtiofs", "9p"]
+SHARE_MODES = ["overlay", "ro"]
+DEFAULT_MODE = "overlay"
+
+# virtiofsd is rarely on PATH; distributions install it next to QEMU
+VIRTIOFSD_PATHS = [
+    "/usr/libexec/virtiofsd",
+    "/usr/lib/qemu/virtiofsd",
+    "/usr/lib/virtiofsd",
+]
+# How long virtiofsd gets to create its socket
+VIRTIOFSD_TIMEOUT = 5.0
+
+
+def find_virtiofsd() -> Optional[str]:
+    """Path of the virtiofsd binary, if installed."""
+    found = shutil.which("virtiofsd")
+    if found:
+        return found
+    for path in VIRTIOFSD_PATHS:
+        if Path(path).is_file():
+            return path
+    return None
+
+
+def _help_text(command: List[str]) -> str:
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return ""
+    return result.stdout + result.stderr
+
+
+@dataclass(frozen=True)
+class ShareSupport:
+    """Which sharing mechanisms a QEMU binary and this host support."""
+    qemu_binary: str
+    ninep: bool
+    vhost_user_fs: bool
+    virtiofsd: Optional[str]
+    # Rust virtiofsd takes --shared-dir; the C one from QEMU <= 7.2 takes -o source=
+    virtiofsd_shared_dir: bool = True
+    virtiofsd_readonly: bool = False
+
+    @property
+    def virtiofs(self) -> bool:
+        return self.vhost_user_fs and self.virtiofsd is not None
+
+    def available(self) -> List[str]:
+        return [name for name, ok in (("virtiofs", self.virtiofs), ("9p", self.ninep)) if ok]
+
+    def resolve(self, mechanism: str) -> str:
+        """The mechanism to use for a setting; raises ValueError if unsupported."""
+        available = self.available()
+        if mechanism == "auto":
+            if not available:
+                raise ValueError(f"{self.qemu_binary} supports neither virtiofs nor 9p")
+            return available[0]
+        if mechanism not in available:
+            raise ValueError(f"{mechanism} is not supported here ({self.report()})")
+        return mechanism
+
+    def report(self) -> str:
+        if self.virtiofs:
+            virtiofs = f"virtiofs: yes ({self.virtiofsd})"
+        elif self.vhost_user_fs:
+            virtiofs = "virtiofs: no (virtiofsd not found)"
+        else:
+            virtiofs = "virtiofs: no (no vhost-user-fs-pci device)"
+        ninep = "9p: yes" if self.ninep else "9p: no (no virtio-9p-pci device)"
+        return f"{virtiofs}, {ninep}"
+
+
+@functools.lru_cache(maxsize=8)
+def probe_share_support(qemu_binary: str = "qemu-system-x86_64") -> ShareSupport:
+    """Ask QEMU for its devices and look for virtiofsd (a few hundred ms; cached)."""
+    virtiofsd = find_virtiofsd()
+    return share_support_from_help(
+        qemu_binary, _help_text(device_help_command(qemu_binary)),
+        virtiofsd, _help_text([virtiofsd, "--help"]) if virtiofsd else "",
+    )
+
+
+def device_help_command(qemu_binary: str) -> List[str]:
+    """Command that lists the devices a QEMU binary supports."""
+    return [qemu_binary, "-machine", "none", "-device", "help"]
+
+
+def share_support_from_help(qemu_binary: str, devices: str, virtiofsd: Optional[str],
+                            daemon_help: str) -> ShareSupport:
+    """Build a ShareSupport from QEMU's device list and virtiofsd's --help output."""
+    return ShareSupport(
+        qemu_binary=qemu_binary,
+        ninep='"virtio-9p-pci"' in devices,
+        vhost_user_fs='"vhost-user-fs-pci"' in devices,
+        virtiofsd=virtiofsd,
+        virtiofsd_shared_dir="--shared-dir" in daemon_help or not daemon_help,
+        virtiofsd_readonly="--readonly" in daemon_help,
+    )
+
+
+@dataclass
+class RootfsShare:
+    """A host directory exported to the guest as its root filesystem."""
+    mechanism: str  # "virtiofs" or "9p", already resolved
+    source: Path
+    mode: str = DEFAULT_MODE
+    tag: str = MOUNT_TAG
+    # vhost-user socket between QEMU and virtiofsd
+    socket: Optional[Path] = None
+
+    @classmethod
+    def for_project(cls, project_root: Path, mechanism: str, mode: str = DEFAULT_MODE,
+                    socket: Optional[Path] = None) -> "RootfsShare":
+        return cls(mechanism, project_root / ROOTFS_PATH, mode, socket=socket)
+
+    @property
+    def needs_shared_memory(self) -> bool:
+        return self.mechanism == "virtiofs"
+
+    def kernel_args(self) -> str:
+        """Kernel command line read by the initramfs /init."""
+        return f"cyberos.share={self.mechanism}:{self.tag} cyberos.share_mode={self.mode}"
+
+    def qemu_args(self) -> List[str]:
+        if self.mechanism == "9p":
+            return [
+                "-fsdev", f"local,id=rootfs,path={self.source},security_model=none,readonly=on",
+                "-device", f"virtio-9p-pci,fsdev=rootfs,mount_tag={self.tag}",
+            ]
+        if self.socket is None:
+            raise ValueError("virtiofs needs a socket path")
+        return [
+            "-chardev", f"socket,id=rootfs,path={self.socket}",
+            "-device", f"vhost-user-fs-pci,chardev=rootfs,tag={self.tag}",
+        ]
+
+    def daemon_command(self, support: ShareSupport) -> Optional[List[str]]:
+        """virtiofsd command line, or None when no daemon is needed."""
+        if self.mechanism != "virtiofs":
+            return None
+        if support.virtiofsd_shared_dir:
+            command = [support.virtiofsd, f"--socket-path={self.socket}", f"--shared-dir={self.source}",
+                       "--cache=auto", "--sandbox=none"]
+            if support.virtiofsd_readonly:
+                command.append("--readonly")
+            return command
+        return [support.virtiofsd, f"--socket-path={self.socket}", "-o", f"source={self.source},cache=auto"]
+
+
+async def wait_for_socket(path: Path, running: Callable[[], bool], timeout: float = VIRTIOFSD_TIMEOUT) -> bool:
+    """Wait until virtiofsd has created its socket, or has exited."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while loop.time() < deadline:
+        if path.exists():
+            return True
+        if not running():
+            return False
+        await asyncio.sleep(0.05)
+    return path.exists()
@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS UI Profiler
+Callback timing, profiling and a main-loop watchdog for the Tk applications.
+
+Once install_hook() has run, every Tk callback (commands, bindings, after()
+timers) and every function posted through TkBridge is timed while a profiler
+is active. Callbacks that keep the main loop busy for over 16 ms are logged
+as slow and over 100 ms as stalls; a watchdog thread samples the main
+thread's stack while they run, so each entry says where the time went. The
+watchdog also catches the main loop being blocked outside any callback.
+
+On top of that the callbacks can be profiled with cProfile, or the
+watchdog's stack samples kept as a sampling profile, and tracemalloc
+snapshots show where memory grows. Profiles export as pstats (snakeviz,
+gprof2dot, python -m pstats) and folded stacks (flamegraph.pl, speedscope).
+
+Enable it from the Settings tab, or start an application with
+CYBEROS_PROFILE=watchdog|cprofile|sampling (CYBEROS_PROFILE_MEMORY=1 adds
+tracemalloc); results are then exported to ~/.cyberos/profiles on exit.
+"""
+
+import collections
+import cProfile
+import functools
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Deque, Dict, List, Optional
+
+MODES = ["watchdog", "cprofile", "sampling"]
+SLOW_MS = 16.0
+STALL_MS = 100.0
+# Watchdog period: stack samples and blocked-loop detection
+SAMPLE_INTERVAL = 0.005
+HEARTBEAT_MS = 50
+MAX_EVENTS = 500
+STACK_LIMIT = 20
+# Frames kept in tracemalloc tracebacks
+MEMORY_FRAMES = 25
+
+PROFILE_DIR = Path.home() / ".cyberos" / "profiles"
+
+_active: Optional["UIProfiler"] = None
+_original_call: Optional[Callable] = None
+
+
+def install_hook():
+    """Route Tk callbacks through the profiler; call before creating widgets.
+
+    Callbacks registered earlier keep calling Tk's original wrapper.
+    Without an active profiler the hook costs one global lookup per callback.
+    """
+    global _original_call
+    if _original_call is not None:
+        return
+    import tkinter
+    _original_call = tkinter.CallWrapper.__call__
+
+    def __call__(self, *args):
+        profiler = _active
+        if profiler is None:
+            return _original_call(self, *args)
+        return profiler.run(self.func, _original_call, self, *args)
+
+    tkinter.CallWrapper.__call__ = __call__
+
+
+def call(fn: Callable, *args):
+    """Run fn(*args) on the Tk thread, timed when a profiler is active."""
+    profiler = _active
+    if profiler is None:
+        return fn(*args)
+    return profiler.run(fn, fn, *args)
+
+
+def _unwrap(func: Callable) -> Callable:
+    """The function behind after() wrappers, partials and Tk substitutions."""
+    if getattr(func, "__qualname__", "").endswith("after.<locals>.callit"):
+        for cell in func.__closure__ or ():
+            value = cell.cell_contents
+            if callable(value) and not hasattr(value, "tk"):
+                func = value
+                break
+    while isinstance(func, functools.partial):
+        func = func.func
+    return func
+
+
+def callback_name(func: Callable) -> str:
+    """Readable name of a callback: Class.method, module.function or lambda@file:line."""
+    func = _unwrap(func)
+    code = getattr(getattr(func, "__func__", func), "__code__", None)
+    name = getattr(func, "__qualname__", None) or repr(func)
+    if name.endswith("<lambda>") and code:
+        return f"{name}@{Path(code.co_filename).name}:{code.co_firstlineno}"
+    owner = getattr(func, "__self__", None)
+    if owner is not None and "." not in name:
+        name = f"{type(owner).__name__}.{name}"
+    return name
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+@dataclass
+class SlowCallback:
+    """A callback (or main-loop block) that exceeded a latency threshold."""
+    name: str
+    milliseconds: float
+    at: float
+    level: str  # "slow", "stall" or "blocked"
+    stack: str = ""
+
+    def describe(self) -> str:
+        clock = time.strftime("%H:%M:%S", time.localtime(self.at))
+        return f"{clock} {self.level:7} {self.milliseconds:8.1f} ms  {self.name}"
+
+
+@dataclass
+class CallbackStats:
+    calls: int = 0
+    total: float = 0.0
+    longest: float = 0.0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.calls if self.calls else 0.0
+
+
+class _Frame:
+    """A callback running on the main thread."""
+    __slots__ = ("name", "start", "children", "slow_stack", "stall_stack")
+
+    def __init__(self, name: str, start: float):
+        self.name = name
+        self.start = start
+        self.children = 0.0
+        self.slow_stack = ""
+        self.stall_stack = ""
+
+
+class UIProfiler:
+    """Times the Tk callbacks of one application.
+
+    dispatch(fn, *args) must run fn on the Tk thread (TkBridge.post);
+    on_event receives each SlowCallback there.
+    """
+
+    def __init__(self, app: str, root, dispatch: Callable[..., None],
+                 on_event: Optional[Callable[[SlowCallback], None]] = None,
+                 slow_ms: float = SLOW_MS, stall_ms: float = STALL_MS,
+                 directory: Path = PROFILE_DIR):
+        self.app = app
+        self.root = root
+        self.dispatch = dispatch
+        self.on_event = on_event
+        self.slow = slow_ms / 1000
+        self.stall = stall_ms / 1000
+        self.directory = directory
+        self.mode = "watchdog"
+        self.memory = False
+        self.started_at: Optional[float] = None
+        self.from_environment = False
+        self.events: Deque[SlowCallback] = collections.deque(maxlen=MAX_EVENTS)
+        self.stats: Dict[str, CallbackStats] = {}
+        self.counts = collections.Counter()
+        self.samples = collections.Counter()
+        self.profile: Optional[cProfile.Profile] = None
+        self.baseline: Optional[tracemalloc.Snapshot] = None
+        self.snapshot: Optional[tracemalloc.Snapshot] = None
+        self._frames: List[_Frame] = []
+        self._main = threading.main_thread().ident
+        self._beat = time.perf_counter()
+        self._beat_timer: Optional[str] = None
+        self._pending: List[SlowCallback] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+        self._log_path: Optional[Path] = None
+
+    @property
+    def running(self) -> bool:
+        return _active is self
+
+    def start(self, mode: str = "watchdog", memory: bool = False):
+        """Start timing callbacks (Tk thread)."""
+        global _active
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode: {mode} (use {', '.join(MODES)})")
+        self.stop()
+        self.mode = mode
+        self.memory = memory
+        self.profile = cProfile.Profile() if mode == "cprofile" else None
+        self.reset()
+        self.started_at = time.time()
+        if memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(MEMORY_FRAMES)
+            self.baseline = self._take_snapshot()
+            self.snapshot = None
+        self._log_path = self.directory / f"{self.app}-ui.log"
+        self._stop.clear()
+        self._beat = time.perf_counter()
+        _active = self
+        self._heartbeat()
+        self._watchdog = threading.Thread(target=self._watch, daemon=True, name=f"{self.app}-ui-watchdog")
+        self._watchdog.start()
+
+    def start_from_environment(self) -> bool:
+        """Start if CYBEROS_PROFILE is set; returns whether profiling started."""
+        mode = os.environ.get("CYBEROS_PROFILE", "").strip().lower()
+        if not mode or mode == "0":
+            return False
+        if mode == "1":
+            mode = "cprofile"
+        self.start(mode, memory=os.environ.get("CYBEROS_PROFILE_MEMORY", "") not in ("", "0"))
+        self.from_environment = True
+        return True
+
+    def stop(self):
+        """Stop timing; collected results stay available (Tk thread)."""
+        global _active
+        if _active is self:
+            _active = None
+        self._stop.set()
+        if self._watchdog:
+            self._watchdog.join(timeout=1.0)
+            self._watchdog = None
+        if self._beat_timer:
+            try:
+                self.root.after_cancel(self._beat_timer)
+            except Exception:
+                pass
+            self._beat_timer = None
+        self._flush_log()
+
+    def reset(self):
+        """Forget collected timings, events and profiles."""
+        self.events.clear()
+        self.stats.clear()
+        self.counts.clear()
+        self.samples.clear()
+        if self.profile:
+            self.profile = cProfile.Profile()
+
+    def run(self, target: Callable, invoke: Callable, *args):
+        """Call invoke(*args) on behalf of the callback target and time it."""
+        target = _unwrap(target)
+        if target == self._heartbeat:
+            return invoke(*args)
+        name = callback_name(target)
+        outermost = not self._frames
+        frame = _Frame(name, time.perf_counter())
+        self._frames.append(frame)
+        if outermost and self.profile:
+            self.profile.enable()
+        try:
+            return invoke(*args)
+        finally:
+            if outermost and self.profile:
+                self.profile.disable()
+            end = time.perf_counter()
+            self._frames.pop()
+            elapsed = end - frame.start
+            if self._frames:
+                self._frames[-1].children += elapsed
+            self._record(frame, elapsed, elapsed - frame.children)
+            self._beat = end
+
+    def _record(self, frame: _Frame, elapsed: float, own: float):
+        stats = self.stats.get(frame.name)
+        if stats is None:
+            stats = self.stats[frame.name] = CallbackStats()
+        stats.calls += 1
+        stats.total += elapsed
+        stats.longest = max(stats.longest, elapsed)
+        # Time spent in nested callbacks is reported by those callbacks
+        if own < self.slow:
+            return
+        level = "stall" if own >= self.stall else "slow"
+        stack = (frame.stall_stack if level == "stall" else "") or frame.slow_stack
+        self._emit(SlowCallback(frame.name, own * 1000, time.time(), level, stack))
+
+    def _emit(self, event: SlowCallback):
+        self.events.append(event)
+        self.counts[event.level] += 1
+        with self._lock:
+            self._pending.append(event)
+        if self.on_event:
+            self.dispatch(self.on_event, event)
+
+    def _heartbeat(self):
+        self._beat = time.perf_counter()
+        if _active is self:
+            self._beat_timer = self.root.after(HEARTBEAT_MS, self._heartbeat)
+
+    def _main_stack(self) -> Optional[object]:
+        return sys._current_frames().get(self._main)
+
+    def _format_stack(self, frame) -> str:
+        lines = traceback.format_stack(frame, limit=STACK_LIMIT)
+        return "".join(line for line in lines if __file__ not in line)
+
+    def _watch(self):
+        """Watchdog thread: sample slow callbacks and detect a blocked loop."""
+        blocked = False
+        last_flush = time.monotonic()
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            now = time.perf_counter()
+            try:
+                current = self._frames[-1]
+            except IndexError:
+                current = None
+            if current is not None:
+                running = now - current.start
+                if self.mode == "sampling" or (running >= self.slow and not current.stall_stack):
+                    frame = self._main_stack()
+                    if frame is not None:
+                        if self.mode == "sampling":
+                            self._sample(frame)
+                        if running >= self.stall and not current.stall_stack:
+                            current.stall_stack = self._format_stack(frame)
+                        elif running >= self.slow and not current.slow_stack:
+                            current.slow_stack = self._format_stack(frame)
+                blocked = False
+            elif now - self._beat >= self.stall + HEARTBEAT_MS / 1000:
+                # No Python callback is running, yet the timers are late
+                if not blocked:
+                    blocked = True
+                    frame = self._main_stack()
+                    stack = self._format_stack(frame) if frame is not None else ""
+                    event = SlowCallback("main loop blocked outside callbacks", (now - self._beat) * 1000,
+                                         time.time(), "blocked", stack)
+                    self.dispatch(self._emit, event)
+            else:
+                blocked = False
+            if time.monotonic() - last_flush >= 1.0:
+                self._flush_log()
+                last_flush = time.monotonic()
+
+    def _sample(self, frame):
+        stack = []
+        while frame is not None:
+            if frame.f_code.co_filename != __file__:
+                stack.append(_frame_label(frame))
+            frame = frame.f_back
+        self.samples[";".join(reversed(stack))] += 1
+
+    def _flush_log(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending or not self._log_path:
+            return
+        try:
+            self._log_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self._log_path, "a") as log:
+                for event in pending:
+                    log.write(event.describe() + "\n")
+                    if event.stack:
+                        log.write(event.stack)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _take_snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ])
+
+    def snapshot_memory(self) -> str:
+        """Take a tracemalloc snapshot and describe growth since the first one."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(MEMORY_FRAMES)
+        self.snapshot = self._take_snapshot()
+        if self.baseline is None:
+            self.baseline = self.snapshot
+        return self.memory_report()
+
+    def memory_report(self, limit: int = 15) -> str:
+        if not tracemalloc.is_tracing():
+            return "Memory tracking is off"
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"Traced memory: {current / 1048576:.1f} MB (peak {peak / 1048576:.1f} MB)"]
+        if self.snapshot is not None and self.baseline is not None:
+            lines.append(f"Largest growth since the first snapshot (top {limit}):")
+            for stat in self.snapshot.compare_to(self.baseline, "lineno")[:limit]:
+                lines.append(f"  {stat}")
+        return "\n".join(lines)
+
+    def profile_report(self, limit: int = 25) -> str:
+        if self.profile is None:
+            return ""
+        output = io.StringIO()
+        try:
+            pstats.Stats(self.profile, stream=output).sort_stats("cumulative").print_stats(limit)
+        except TypeError:
+            return "No callbacks profiled yet"
+        return output.getvalue()
+
+    def summary(self) -> str:
+        if not self.running and self.started_at is None:
+            return "Profiling off"
+        calls = sum(stats.calls for stats in self.stats.values())
+        state = f"{self.mode}{' + memory' if self.memory else ''}" if self.running else "stopped"
+        return (f"{state}: {calls} callbacks, {self.counts['slow']} over {self.slow * 1000:g} ms, "
+                f"{self.counts['stall']} over {self.stall * 1000:g} ms, {self.counts['blocked']} blocked")
+
+    def report(self, limit: int = 30) -> str:
+        """Callback table, recent slow callbacks with stacks, profile and memory."""
+        lines = [self.summary(), "", f"{'calls':>7} {'total ms':>10} {'mean ms':>9} {'max ms':>9}  callback"]
+        ranked = sorted(self.stats.items(), key=lambda item: item[1].total, reverse=True)
+        for name, stats in ranked[:limit]:
+            lines.append(f"{stats.calls:7d} {stats.total * 1000:10.1f} {stats.mean * 1000:9.2f} "
+                         f"{stats.longest * 1000:9.1f}  {name}")
+        if self.events:
+            lines += ["", "Slow callbacks (newest first):"]
+            for event in reversed(list(self.events)[-50:]):
+                lines.append(event.describe())
+                if event.stack and event.level != "slow":
+                    lines.append(event.stack.rstrip("\n"))
+        if self.samples:
+            # Innermost frames of each sample, callee first
+            tails = collections.Counter()
+            for stack, count in self.samples.items():
+                tails[" < ".join(reversed(stack.split(";")[-3:]))] += count
+            lines += ["", f"Hottest sampled stacks ({sum(tails.values())} samples, "
+                          f"{SAMPLE_INTERVAL * 1000:g} ms apart):"]
+            for tail, count in tails.most_common(10):
+                lines.append(f"{count:6d}  {tail}")
+        profile = self.profile_report()
+        if profile:
+            lines += ["", profile]
+        if self.memory or self.snapshot is not None:
+            lines += ["", self.memory_report()]
+        return "\n".join(lines)
+
+    def export(self, directory: Optional[Path] = None) -> List[Path]:
+        """Write the report and the profiles; returns the files written.
+
+        <app>-<time>.pstats    cProfile data (pstats.Stats, snakeviz)
+        <app>-<time>.folded    sampled stacks (flamegraph.pl, speedscope)
+        <app>-<time>.tracemalloc  last memory snapshot (tracemalloc.Snapshot.load)
+        <app>-<time>.txt       the report shown in the app
+        """
+        directory = directory or self.directory
+        directory.mkdir(parents=True, exist_ok=True)
+        base = directory / f"{self.app}-{time.strftime('%Y%m%d-%H%M%S')}"
+        written = []
+        if self.profile is not None:
+            try:
+                self.profile.create_stats()
+                self.profile.dump_stats(f"{base}.pstats")
+                written.append(Path(f"{base}.pstats"))
+            except (TypeError, ValueError):
+                pass
+        if self.samples:
+            path = Path(f"{base}.folded")
+            path.write_text("".join(f"{stack} {count}\n" for stack, count in self.samples.items()))
+            written.append(path)
+        if self.snapshot is not None:
+            path = Path(f"{base}.tracemalloc")
+            self.snapshot.dump(str(path))
+            written.append(path)
+        path = Path(f"{base}.txt")
+        path.write_text(self.report(limit=200) + "\n")
+        written.append(path)
+        return written
+
+    def close(self):
+        """Stop at application exit, exporting results if started from the environment."""
+        running = self.running
+        self.stop()
+        if running and self.from_environment:
+            if self.memory:
+                self.snapshot_memory()
+            for path in self.export():
+                print(f"Profile written to {path}")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS VM Command Builder
+Turns a VM specification into a qemu-system command line.
+
+Shared by the emulator GUI, the warm VM pool and other launch paths so that
+every guest is started with the same options.
+"""
+
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import List, Optional
+
+from direct_boot import DirectBoot
+from disk_profiles import DEFAULT_PROFILE, drive_args, get_profile
+from memory_backend import DEFAULT_BACKEND, balloon_args, memory_args
+from qmp import QMPClient
+from rootfs_share import RootfsShare
+
+
+@dataclass
+class VMSpec:
+    """Everything needed to start one CyberOS guest."""
+    name: str
+    cores: int
+    memory: int
+    iso_file: Path
+    disk_file: Optional[Path] = None
+    display: str = "sdl"
+    network: bool = False
+    disk_profile: str = DEFAULT_PROFILE
+    memory_backend: str = DEFAULT_BACKEND
+    mem_prealloc: bool = False
+    balloon: bool = False
+    qmp_socket: Optional[Path] = None
+    qemu_binary: str = "qemu-system-x86_64"
+    accel: str = "tcg"
+    # Machine type, CPU model and firmware (see build_variants.py)
+    machine: str = "q35"
+    cpu: Optional[str] = None
+    firmware: Optional[Path] = None
+    # Boot a kernel and initramfs directly instead of the ISO
+    direct_boot: Optional[DirectBoot] = None
+    # Also put the serial console on stdout with a graphical display
+    serial_stdio: bool = False
+    # Boot build/rootfs from a 9p or virtiofs share (needs direct_boot)
+    rootfs_share: Optional[RootfsShare] = None
+    # VNC display number and websocket port (see vnc_ports.py)
+    vnc_display: int = 0
+    vnc_websocket: Optional[int] = None
+    # Guest-to-guest links: -netdev/-device pairs (see vm_network.py)
+    net_args: List[str] = field(default_factory=list)
+
+
+def build_qemu_command(spec: VMSpec) -> List[str]:
+    """Build the QEMU command line for a VM specification."""
+    share = spec.rootfs_share
+    if share and not spec.direct_boot:
+        raise ValueError("Sharing the root filesystem needs direct kernel boot")
+    memory_backend = spec.memory_backend
+    if share and share.needs_shared_memory and memory_backend == DEFAULT_BACKEND:
+        # virtiofsd maps guest RAM, so it has to be shareable
+        memory_backend = "memfd"
+    machine_suffix, memory_objects = memory_args(memory_backend, spec.memory, spec.mem_prealloc)
+    qemu_cmd = [
+        spec.qemu_binary,
+        "-name", spec.name,
+        "-machine", f"type={spec.machine},accel={spec.accel}{machine_suffix}",
+        "-smp", f"cores={spec.cores}",
+        "-m", str(spec.memory),
+    ]
+    if spec.cpu:
+        qemu_cmd.extend(["-cpu", spec.cpu])
+    if spec.firmware:
+        qemu_cmd.extend(["-bios", str(spec.firmware)])
+    # Only the PC machines have an IDE CD-ROM and a boot order
+    pc_machine = spec.machine in ("pc", "q35") or spec.machine.startswith(("pc-", "q35-"))
+    qemu_cmd.extend(memory_objects)
+    if spec.balloon:
+        qemu_cmd.extend(balloon_args())
+    if spec.direct_boot:
+        boot = spec.direct_boot
+        if share:
+            boot = replace(boot, append=f"{boot.append} {share.kernel_args()}".strip())
+        qemu_cmd.extend(boot.qemu_args())
+        if share:
+            qemu_cmd.extend(share.qemu_args())
+    elif pc_machine:
+        qemu_cmd.extend([
+            "-boot", "d",
+            "-cdrom", str(spec.iso_file),
+        ])
+    else:
+        qemu_cmd.extend(["-drive", f"file={spec.iso_file},media=cdrom,if=virtio,readonly=on"])
+
+    if spec.disk_file:
+        qemu_cmd.extend(drive_args(spec.disk_file, get_profile(spec.disk_profile)))
+
+    # Display mode
+    if spec.display == "vnc":
+        vnc = f":{spec.vnc_display}"
+        if spec.vnc_websocket:
+            vnc += f",websocket={spec.vnc_websocket}"
+        qemu_cmd.extend(["-vnc", vnc])
+    elif spec.display == "serial":
+        qemu_cmd.extend(["-nographic", "-serial", "stdio", "-monitor", "none"])
+    elif spec.display == "none":
+        qemu_cmd.extend(["-display", "none"])
+    else:
+        qemu_cmd.extend(["-display", "default"])
+    if not pc_machine and spec.display not in ("serial", "none"):
+        # No default graphics or keyboard on virt machines
+        qemu_cmd.extend(["-device", "virtio-gpu-pci", "-device", "qemu-xhci", "-device", "usb-kbd"])
+    if spec.serial_stdio and spec.display != "serial":
+        qemu_cmd.extend(["-serial", "stdio"])
+
+    # Networking
+    if spec.network:
+        qemu_cmd.extend(["-nic", "user,model=virtio"])
+    else:
+        qemu_cmd.extend(["-nic", "none"])
+    qemu_cmd.extend(spec.net_args)
+
+    if spec.qmp_socket:
+        qemu_cmd.extend(QMPClient.qemu_args(spec.qmp_socket))
+
+    return qemu_cmd
@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS VM Configuration Store
+Per-VM settings and runtime metadata in one SQLite database.
+
+Every VM has its own row (cores, memory, display, disk profile, boot and
+sharing options as JSON) next to what happened to it: when it last booted,
+how long each boot took to reach the banner and which snapshots its disk
+holds. New VMs start from the stored defaults. The database is in WAL mode
+with a busy timeout, so the Emulator GUI and the Control Center can read
+and write it at the same time, and names, boot times and
+snapshots are indexed so listing stays fast with thousands of VMs.
+
+The old global ~/.cyberos_vm.conf is imported once: its values become the
+defaults and every disk in ~/.cyberos/vms/ gets a record. The shell
+launchers still read that file; `export` prints a VM in its format.
+
+Usage:
+    python3 vm_config.py list                    # every VM with its last boot
+    python3 vm_config.py show CyberOS-VM         # settings, boots and snapshots
+    python3 vm_config.py export CyberOS-VM       # KEY=VALUE for run_cyberos.sh
+    python3 vm_config.py --bench 5000            # measure writes and listing
+"""
+
+import argparse
+import json
+import sqlite3
+import subprocess
+import threading
+import time
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from disk_profiles import DEFAULT_PROFILE
+from memory_backend import DEFAULT_BACKEND
+from rootfs_share import DEFAULT_MODE
+
+DB_PATH = Path.home() / ".cyberos" / "vms.sqlite"
+FLAT_CONFIG = Path.home() / ".cyberos_vm.conf"
+VM_DIR = Path.home() / ".cyberos" / "vms"
+DEFAULT_NAME = "CyberOS-VM"
+
+# Boots kept per VM; older ones are dropped when a new one is recorded
+BOOT_HISTORY = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS vms (
+    name TEXT PRIMARY KEY,
+    config TEXT NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    last_boot REAL,
+    last_boot_seconds REAL,
+    boots INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS vms_last_boot ON vms (last_boot);
+CREATE INDEX IF NOT EXISTS vms_updated ON vms (updated);
+CREATE TABLE IF NOT EXISTS boots (
+    id INTEGER PRIMARY KEY,
+    vm TEXT NOT NULL,
+    started REAL NOT NULL,
+    mode TEXT NOT NULL,
+    seconds REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS boots_vm ON boots (vm, started);
+CREATE TABLE IF NOT EXISTS snapshots (
+    vm TEXT NOT NULL,
+    name TEXT NOT NULL,
+    created REAL,
+    size INTEGER,
+    PRIMARY KEY (vm, name)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+@dataclass
+class VMConfig:
+    """Launch settings of one VM."""
+    name: str = DEFAULT_NAME
+    cores: int = 2
+    memory: int = 512
+    disk_size: int = 2
+    network: bool = False
+    display: str = "sdl"
+    disk_profile: str = DEFAULT_PROFILE
+    memory_backend: str = DEFAULT_BACKEND
+    mem_prealloc: bool = False
+    balloon: bool = False
+    direct_boot: bool = False
+    share_rootfs: str = "off"
+    share_mode: str = DEFAULT_MODE
+    # Build variant (config/variants/) whose ISO or kernel to boot
+    variant: str = "default"
+
+    @classmethod
+    def from_dict(cls, name: str, values: Dict) -> "VMConfig":
+        """Build from stored JSON, ignoring keys this version does not know."""
+        return cls(name=name, **{key: value for key, value in values.items() if key in _CONFIG_KEYS})
+
+    def to_dict(self) -> Dict:
+        values = asdict(self)
+        del values["name"]
+        return values
+
+
+_CONFIG_KEYS = frozenset(field.name for field in fields(VMConfig)) - {"name"}
+
+
+@dataclass
+class VMRecord:
+    """A VM's settings plus its runtime metadata."""
+    config: VMConfig
+    created: float
+    updated: float
+    last_boot: Optional[float]
+    last_boot_seconds: Optional[float]
+    boots: int
+    snapshots: int
+
+    @property
+    def name(self) -> str:
+        return self.config.name
+
+    def describe(self) -> str:
+        """One line for VM lists."""
+        config = self.config
+        text = f"{config.cores}c/{config.memory}MB, {config.disk_profile}"
+        if self.last_boot:
+            stamp = time.strftime("%Y-%m-%d %H:%M", time.localtime(self.last_boot))
+            text += f", last boot {stamp}"
+            if self.last_boot_seconds is not None:
+                text += f" ({self.last_boot_seconds:.1f} s)"
+        if self.snapshots:
+            text += f", {self.snapshots} snapshot(s)"
+        return text
+
+
+# ~/.cyberos_vm.conf keys and how to read them
+FLAT_KEYS = {
+    "CORES": ("cores", int),
+    "MEMORY": ("memory", int),
+    "DISK_SIZE": ("disk_size", int),
+    "ENABLE_NETWORK": ("network", lambda value: value.lower() == "true"),
+    "DISPLAY": ("display", str),
+    "DISK_PROFILE": ("disk_profile", str),
+    "MEMORY_BACKEND": ("memory_backend", str),
+    "MEM_PREALLOC": ("mem_prealloc", lambda value: value.lower() == "true"),
+    "BALLOON": ("balloon", lambda value: value.lower() == "true"),
+    "DIRECT_BOOT": ("direct_boot", lambda value: value.lower() == "true"),
+    "SHARE_ROOTFS": ("share_rootfs", str),
+    "SHARE_MODE": ("share_mode", str),
+    "VARIANT": ("variant", str),
+}
+
+
+def parse_flat_config(text: str) -> Tuple[Dict, Dict[str, str]]:
+    """VM settings and the remaining keys (such as POOL_SIZE) of a KEY=VALUE file."""
+    values, other = {}, {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        key, value = (part.strip() for part in line.split("=", 1))
+        if key in FLAT_KEYS:
+            attribute, convert = FLAT_KEYS[key]
+            try:
+                values[attribute] = convert(value)
+            except ValueError:
+                continue
+        else:
+            other[key] = value
+    return values, other
+
+
+def format_flat_config(config: VMConfig) -> str:
+    """A VM's settings in the format run_cyberos.sh sources."""
+    values = config.to_dict()
+    lines = [f"# CyberOS VM Configuration ({config.name})"]
+    for key, (attribute, _) in FLAT_KEYS.items():
+        value = values[attribute]
+        lines.append(f"{key}={str(value).lower() if isinstance(value, bool) else value}")
+    return "\n".join(lines) + "\n"
+
+
+def snapshot_info_command(disk_file: Path) -> List[str]:
+    """qemu-img command whose JSON output lists an image's snapshots."""
+    return ["qemu-img", "info", "-U", "--output=json", str(disk_file)]
+
+
+def parse_snapshots(output: str) -> List[Tuple[str, float, int]]:
+    """Snapshots in qemu-img info JSON output as (name, created, vm state size)."""
+    try:
+        info = json.loads(output)
+    except ValueError:
+        return []
+    return [(snapshot["name"], snapshot.get("date-sec", 0), snapshot.get("vm-state-size", 0))
+            for snapshot in info.get("snapshots", [])]
+
+
+def disk_snapshots(disk_file: Path) -> List[Tuple[str, float, int]]:
+    """Internal snapshots of a qcow2 image as (name, created, vm state size)."""
+    try:
+        result = subprocess.run(snapshot_info_command(disk_file), capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.SubprocessError):
+        return []
+    return parse_snapshots(result.stdout) if result.returncode == 0 else []
+
+
+class VMStore:
+    """Per-VM configuration and runtime metadata."""
+
+    def __init__(self, db_path: Path = DB_PATH):
+        self.db_path = db_path
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._db as db:
+            db.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection in WAL mode (readers never block the writer)."""
+        db = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        """Per-thread connection, reused so lookups skip the connect cost."""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = self._connect()
+        return db
+
+    # ==================== Settings ====================
+
+    def get_setting(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_setting(self, key: str, value: str):
+        with self._db as db:
+            db.execute("INSERT INTO meta (key, value) VALUES (?, ?) "
+                       "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key, str(value)))
+
+    def defaults(self, name: str = DEFAULT_NAME) -> VMConfig:
+        """Settings a new VM starts with."""
+        stored = self.get_setting("defaults")
+        return VMConfig.from_dict(name, json.loads(stored) if stored else {})
+
+    def save_defaults(self, config: VMConfig):
+        self.set_setting("defaults", json.dumps(config.to_dict()))
+
+    # ==================== VMs ====================
+
+    def get(self, name: str) -> Optional[VMConfig]:
+        row = self._db.execute("SELECT config FROM vms WHERE name = ?", (name,)).fetchone()
+        return VMConfig.from_dict(name, json.loads(row[0])) if row else None
+
+    def config_for(self, name: str) -> VMConfig:
+        """A VM's stored settings, or the defaults for a new one."""
+        return self.get(name) or self.defaults(name)
+
+    def save(self, config: VMConfig):
+        """Create or update a VM's settings, keeping its history."""
+        now = time.time()
+        with self._db as db:
+            db.execute(
+                "INSERT INTO vms (name, config, created, updated) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET config = excluded.config, updated = excluded.updated",
+                (config.name, json.dumps(config.to_dict()), now, now),
+            )
+
+    def delete(self, name: str):
+        """Forget a VM and its boots and snapshots."""
+        with self._db as db:
+            db.execute("DELETE FROM vms WHERE name = ?", (name,))
+            db.execute("DELETE FROM boots WHERE vm = ?", (name,))
+            db.execute("DELETE FROM snapshots WHERE vm = ?", (name,))
+
+    def names(self) -> List[str]:
+        return [row[0] for row in self._db.execute("SELECT name FROM vms ORDER BY name")]
+
+    def list(self, order: str = "name", limit: Optional[int] = None) -> List[VMRecord]:
+        """Every VM with its metadata, by name or most recently booted first."""
+        order_by = {"name": "v.name", "last_boot": "v.last_boot DESC, v.name",
+                    "updated": "v.updated DESC"}[order]
+        sql = ("SELECT v.name, v.config, v.created, v.updated, v.last_boot, v.last_boot_seconds, v.boots, "
+               "(SELECT COUNT(*) FROM snapshots s WHERE s.vm = v.name) FROM vms v ORDER BY " + order_by)
+        args: Tuple = ()
+        if limit is not None:
+            sql += " LIMIT ?"
+            args = (limit,)
+        return [VMRecord(VMConfig.from_dict(row[0], json.loads(row[1])), *row[2:])
+                for row in self._db.execute(sql, args)]
+
+    def record(self, name: str) -> Optional[VMRecord]:
+        row = self._db.execute(
+            "SELECT v.name, v.config, v.created, v.updated, v.last_boot, v.last_boot_seconds, v.boots, "
+            "(SELECT COUNT(*) FROM snapshots s WHERE s.vm = v.name) FROM vms v WHERE v.name = ?", (name,)
+        ).fetchone()
+        return VMRecord(VMConfig.from_dict(row[0], json.loads(row[1])), *row[2:]) if row else None
+
+    # ==================== Runtime metadata ====================
+
+    def record_boot(self, name: str, mode: str, seconds: float, started: Optional[float] = None):
+        """Store how long a boot took to reach the banner."""
+        started = started if started is not None else time.time() - seconds
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("INSERT OR IGNORE INTO vms (name, config, created, updated) VALUES (?, ?, ?, ?)",
+                       (name, json.dumps(self.defaults(name).to_dict()), started, started))
+            db.execute("UPDATE vms SET last_boot = ?, last_boot_seconds = ?, boots = boots + 1 WHERE name = ?",
+                       (started, round(seconds, 3), name))
+            db.execute("INSERT INTO boots (vm, started, mode, seconds) VALUES (?, ?, ?, ?)",
+                       (name, started, mode, round(seconds, 3)))
+            db.execute("DELETE FROM boots WHERE vm = ? AND id NOT IN "
+                       "(SELECT id FROM boots WHERE vm = ? ORDER BY started DESC LIMIT ?)",
+                       (name, name, BOOT_HISTORY))
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+
+    def boot_history(self, name: str, limit: int = 10) -> List[Dict]:
+        """Recent boots, newest first."""
+        rows = self._db.execute("SELECT started, mode, seconds FROM boots WHERE vm = ? "
+                                "ORDER BY started DESC LIMIT ?", (name, limit))
+        return [{"started": started, "mode": mode, "seconds": seconds} for started, mode, seconds in rows]
+
+    def set_snapshots(self, name: str, snapshots: List[Tuple[str, float, int]]):
+        """Replace the snapshot list of a VM's disk (see disk_snapshots)."""
+        with self._db as db:
+            db.execute("DELETE FROM snapshots WHERE vm = ?", (name,))
+            db.executemany("INSERT INTO snapshots (vm, name, created, size) VALUES (?, ?, ?, ?)",
+                           [(name, *snapshot) for snapshot in snapshots])
+
+    def snapshots(self, name: str) -> List[Dict]:
+        rows = self._db.execute("SELECT name, created, size FROM snapshots WHERE vm = ? ORDER BY created",
+                                (name,))
+        return [{"name": snapshot, "created": created, "size": size} for snapshot, created, size in rows]
+
+    # ==================== Import ====================
+
+    def import_flat_config(self, conf_path: Path = FLAT_CONFIG, vm_dir: Path = VM_DIR) -> bool:
+        """Import ~/.cyberos_vm.conf and existing disks, once per database."""
+        if self.get_setting("imported") is not None:
+            return False
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have imported while this one waited for the lock
+            if db.execute("SELECT 1 FROM meta WHERE key = 'imported'").fetchone():
+                db.rollback()
+                return False
+            try:
+                values, other = parse_flat_config(conf_path.read_text())
+            except OSError:
+                values, other = {}, {}
+            defaults = VMConfig.from_dict(DEFAULT_NAME, values)
+            now = time.time()
+            rows = [("defaults", json.dumps(defaults.to_dict())), ("imported", str(now))]
+            if "POOL_SIZE" in other:
+                rows.append(("pool_size", other["POOL_SIZE"]))
+            db.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", rows)
+            disks = sorted(vm_dir.glob("*.qcow2")) if vm_dir.is_dir() else []
+            db.executemany(
+                "INSERT OR IGNORE INTO vms (name, config, created, updated) VALUES (?, ?, ?, ?)",
+                [(disk.stem, json.dumps(defaults.to_dict()), disk.stat().st_mtime, now) for disk in disks],
+            )
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+        return True
+
+
+def benchmark(db_path: Path, count: int = 5000, writers: int = 4):
+    """Measure concurrent writes, lookups and listing with many VMs."""
+    store = VMStore(db_path)
+    per_writer = count // writers
+
+    def write(worker: int):
+        for i in range(per_writer):
+            name = f"bench-{worker}-{i:05d}"
+            store.save(VMConfig(name=name, cores=1 + i % 8, memory=256 * (1 + i % 8)))
+            store.record_boot(name, "direct" if i % 2 else "iso", 1.0 + i % 10 / 10)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    written = per_writer * writers
+    print(f"Writes: {written} VMs (save + boot) from {writers} threads in {elapsed:.2f} s "
+          f"({written * 2 / elapsed:.0f} transactions/s)")
+
+    started = time.perf_counter()
+    for i in range(1000):
+        store.get(f"bench-{i % writers}-{i % per_writer:05d}")
+    print(f"Lookup: {(time.perf_counter() - started):.3f} ms per VM (1000 lookups)")
+
+    for order in ("name", "last_boot"):
+        started = time.perf_counter()
+        records = store.list(order=order)
+        print(f"List by {order}: {len(records)} VMs in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="CyberOS per-VM configuration store")
+    parser.add_argument("command", nargs="?", choices=["list", "show", "export"], default="list")
+    parser.add_argument("name", nargs="?", help="VM name (show, export)")
+    parser.add_argument("--db", type=Path, default=DB_PATH, help="database path")
+    parser.add_argument("--bench", type=int, nargs="?", const=5000, metavar="VMS",
+                        help="benchmark with VMS synthetic VMs (use a scratch --db)")
+    args = parser.parse_args()
+
+    if args.bench:
+        benchmark(args.db, args.bench)
+        return
+    store = VMStore(args.db)
+    store.import_flat_config()
+    if args.command == "list":
+        for record in store.list():
+            print(f"{record.name}: {record.describe()}")
+        return
+    if not args.name:
+        parser.error(f"{args.command} needs a VM name")
+    config = store.config_for(args.name)
+    if args.command == "export":
+        print(format_flat_config(config), end="")
+        return
+    record = store.record(args.name)
+    print(f"{args.name}: {record.describe() if record else 'not saved yet (defaults)'}")
+    for key, value in config.to_dict().items():
+        print(f"  {key}: {value}")
+    for boot in store.boot_history(args.name):
+        stamp = time.strftime("%Y-%m-%d %H:%M", time.localtime(boot["started"]))
+        print(f"  boot {stamp}: {boot['seconds']:.1f} s ({boot['mode']})")
+    for snapshot in store.snapshots(args.name):
+        print(f"  snapshot {snapshot['name']} ({snapshot['size']} bytes of VM state)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS VM Metrics
+Low-overhead sampler and Prometheus exporter for running QEMU processes.
+
+Each sample reads /proc/<pid>/stat, /proc/<pid>/io, /proc/<pid>/status and
+the per-thread /proc/<pid>/task/*/stat of every tracked QEMU process and
+turns the deltas into CPU%, per-thread saturation, RSS and disk I/O rates.
+Metrics can be written in Prometheus text format to a file (for the node
+exporter textfile collector) or served over a local HTTP endpoint.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+HISTORY = 120
+
+
+def _label_value(value: object) -> str:
+    """Escape a label value for the Prometheus text format."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _read(path: str) -> Optional[str]:
+    """Read a small /proc file, or None if the process is gone."""
+    try:
+        with open(path, "r") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _stat_fields(text: str) -> List[str]:
+    """Fields after the comm field of a /proc stat line."""
+    return text[text.rindex(")") + 2:].split()
+
+
+def find_qemu_processes(ancestors: Optional[List[int]] = None) -> Dict[int, str]:
+    """Map QEMU process IDs to VM names.
+
+    With ancestors, only QEMU processes started (directly or through a
+    launcher script) by one of those PIDs are returned.
+    """
+    parents: Dict[int, int] = {}
+    found: Dict[int, str] = {}
+    if not os.path.isdir("/proc"):
+        return found
+    for entry in os.scandir("/proc"):
+        if not entry.name.isdigit():
+            continue
+        pid = int(entry.name)
+        stat = _read(f"/proc/{pid}/stat")
+        if not stat:
+            continue
+        parents[pid] = int(_stat_fields(stat)[1])
+        cmdline = _read(f"/proc/{pid}/cmdline")
+        if not cmdline:
+            continue
+        args = cmdline.split("\0")
+        if "qemu-system" not in os.path.basename(args[0]):
+            continue
+        name = args[args.index("-name") + 1] if "-name" in args[:-1] else f"qemu-{pid}"
+        found[pid] = name.split(",")[0]
+
+    if ancestors is None:
+        return found
+    wanted = set(ancestors)
+    result = {}
+    for pid, name in found.items():
+        cursor = pid
+        while cursor > 1:
+            if cursor in wanted:
+                result[pid] = name
+                break
+            cursor = parents.get(cursor, 0)
+    return result
+
+
+@dataclass
+class VMSample:
+    """Derived metrics for one VM at one point in time."""
+    name: str
+    pid: int
+    timestamp: float
+    cpu_percent: float
+    rss_mb: float
+    read_bytes_per_s: float
+    write_bytes_per_s: float
+    threads: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def vcpu_saturation(self) -> float:
+        """Busiest vCPU thread as a fraction of one core."""
+        vcpus = [value for name, value in self.threads.items() if name.startswith("CPU")]
+        return max(vcpus) if vcpus else 0.0
+
+
+@dataclass
+class _Counters:
+    """Raw cumulative counters of one process."""
+    timestamp: float
+    cpu_ticks: int
+    read_bytes: int
+    write_bytes: int
+    thread_ticks: Dict[int, Tuple[str, int]]
+
+
+class MetricsSampler(threading.Thread):
+    """Samples QEMU processes periodically and keeps a short history.
+
+    targets is called before every sample and returns {pid: vm_name}. When
+textfile is set, the metrics are written there after every sample; if that
+fails, textfile is cleared and on_error is called (from the sampler thread).
+    """
+
+    def __init__(self, targets: Callable[[], Dict[int, str]], interval: float = 1.0,
+                 textfile: Optional[Path] = None,
+                 on_error: Callable[[Path, OSError], None] = lambda path, error: None):
+        super().__init__(daemon=True, name="cyberos-metrics")
+        self.targets = targets
+        self.interval = interval
+        self.textfile = textfile
+        self.on_error = on_error
+        self.history: Dict[str, Deque[VMSample]] = {}
+        self.latest: Dict[str, VMSample] = {}
+        self._previous: Dict[int, _Counters] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        """Stop sampling."""
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.sample()
+            textfile = self.textfile
+            if textfile:
+                try:
+                    self.write_textfile(textfile)
+                except OSError as e:
+                    self.textfile = None
+                    self.on_error(textfile, e)
+            self._stop_event.wait(self.interval)
+
+    @staticmethod
+    def _counters(pid: int) -> Optional[Tuple[_Counters, float]]:
+        """Read raw counters for a process; returns counters and RSS in MB."""
+        stat = _read(f"/proc/{pid}/stat")
+        if stat is None:
+            return None
+        fields = _stat_fields(stat)
+        cpu_ticks = int(fields[11]) + int(fields[12])
+
+        read_bytes = write_bytes = 0
+        io = _read(f"/proc/{pid}/io")
+        if io:
+            for line in io.splitlines():
+                key, _, value = line.partition(":")
+                if key == "read_bytes":
+                    read_bytes = int(value)
+                elif key == "write_bytes":
+                    write_bytes = int(value)
+
+        rss_mb = 0.0
+        status = _read(f"/proc/{pid}/status")
+        if status:
+            for line in status.splitlines():
+                if line.startswith("VmRSS:"):
+                    rss_mb = int(line.split()[1]) / 1024
+                    break
+
+        threads: Dict[int, Tuple[str, int]] = {}
+        try:
+            tasks = os.scandir(f"/proc/{pid}/task")
+        except OSError:
+            tasks = None
+        if tasks is not None:
+            with tasks:
+                for task in tasks:
+                    task_stat = _read(f"/proc/{pid}/task/{task.name}/stat")
+                    if not task_stat:
+                        continue
+                    comm = task_stat[task_stat.index("(") + 1:task_stat.rindex(")")]
+                    task_fields = _stat_fields(task_stat)
+                    threads[int(task.name)] = (comm, int(task_fields[11]) + int(task_fields[12]))
+
+        return _Counters(time.monotonic(), cpu_ticks, read_bytes, write_bytes, threads), rss_mb
+
+    def sample(self) -> Dict[str, VMSample]:
+        """Take one sample of every target."""
+        targets = self.targets()
+        samples: Dict[str, VMSample] = {}
+        for pid, name in targets.items():
+            result = self._counters(pid)
+            if result is None:
+                continue
+            current, rss_mb = result
+            previous = self._previous.get(pid)
+            self._previous[pid] = current
+            if previous is None:
+                continue
+
+            elapsed = current.timestamp - previous.timestamp
+            if elapsed <= 0:
+                continue
+            threads: Dict[str, float] = {}
+            for tid, (comm, ticks) in current.thread_ticks.items():
+                before = previous.thread_ticks.get(tid)
+                if before is not None:
+                    label = f"{comm}-{tid}" if comm in threads else comm
+                    threads[label] = (ticks - before[1]) / CLK_TCK / elapsed
+
+            samples[name] = VMSample(
+                name=name,
+                pid=pid,
+                timestamp=time.time(),
+                cpu_percent=100.0 * (current.cpu_ticks - previous.cpu_ticks) / CLK_TCK / elapsed,
+                rss_mb=rss_mb,
+                read_bytes_per_s=(current.read_bytes - previous.read_bytes) / elapsed,
+                write_bytes_per_s=(current.write_bytes - previous.write_bytes) / elapsed,
+                threads=threads,
+            )
+
+        for pid in list(self._previous):
+            if pid not in targets:
+                del self._previous[pid]
+
+        with self._lock:
+            self.latest = samples
+            for name, sample in samples.items():
+                self.history.setdefault(name, deque(maxlen=HISTORY)).append(sample)
+            for name in list(self.history):
+                if name not in samples:
+                    del self.history[name]
+        return samples
+
+    def series(self, name: str, attribute: str) -> List[float]:
+        """History of one metric for a VM, oldest first."""
+        with self._lock:
+            return [getattr(sample, attribute) for sample in self.history.get(name, ())]
+
+    def snapshot(self) -> Dict[str, VMSample]:
+        """Most recent sample of every VM."""
+        with self._lock:
+            return dict(self.latest)
+
+    def prometheus(self) -> str:
+        """Render the latest samples in Prometheus text exposition format."""
+        samples = self.snapshot()
+        metrics = [
+            ("cyberos_vm_cpu_percent", "gauge", "QEMU process CPU usage in percent of one core",
+             lambda s: [("", s.cpu_percent)]),
+            ("cyberos_vm_vcpu_saturation", "gauge", "Busiest vCPU thread as a fraction of one core",
+             lambda s: [("", s.vcpu_saturation)]),
+            ("cyberos_vm_thread_cpu_ratio", "gauge", "Per-thread CPU usage as a fraction of one core",
+             lambda s: [(f',thread="{_label_value(thread)}"', value) for thread, value in sorted(s.threads.items())]),
+            ("cyberos_vm_rss_bytes", "gauge", "Resident memory of the QEMU process",
+             lambda s: [("", s.rss_mb * 1024 * 1024)]),
+            ("cyberos_vm_disk_read_bytes_per_second", "gauge", "Host disk read rate of the QEMU process",
+             lambda s: [("", s.read_bytes_per_s)]),
+            ("cyberos_vm_disk_write_bytes_per_second", "gauge", "Host disk write rate of the QEMU process",
+             lambda s: [("", s.write_bytes_per_s)]),
+        ]
+        lines = []
+        for metric, kind, help_text, values in metrics:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for name, sample in sorted(samples.items()):
+                for extra, value in values(sample):
+                    lines.append(f'{metric}{{vm="{_label_value(name)}",pid="{sample.pid}"{extra}}} {value:.6g}')
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: Path):
+        """Atomically write the metrics for a textfile collector."""
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(self.prometheus())
+        os.replace(tmp, path)
+
+
+class MetricsExporter:
+    """Serves a sampler's metrics at http://host:port/metrics."""
+
+    def __init__(self, sampler: MetricsSampler, host: str = "127.0.0.1", port: int = 9465):
+        sampler_ref = sampler
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = sampler_ref.prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True, name="cyberos-metrics-http")
+
+    @property
+    def url(self) -> str:
+        """Scrape URL of the endpoint."""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self):
+        """Start serving in a background thread."""
+        self.thread.start()
+
+    def stop(self):
+        """Shut the HTTP server down."""
+        self.server.shutdown()
+        self.server.server_close()
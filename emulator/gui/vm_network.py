@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS VM Networking
+Guest-to-guest links for a group of VMs, without root.
+
+`-nic user` (slirp) is slow and keeps every guest on its own. A NetworkPlan
+connects a group of VMs in one of three topologies:
+
+    pair   VMs 1-2, 3-4, ... each on a point-to-point link
+    star   the first VM (the hub) with a link to each of the others
+    lan    every VM on one shared segment
+
+Point-to-point links use QEMU's stream netdev over a Unix socket (QEMU 7.2
+and later) or a TCP socket netdev. Shared segments use NetSwitch, a
+user-space learning switch that QEMU talks to with UDP socket netdevs, or a
+multicast socket netdev. These are all ordinary sockets on 127.0.0.1, so no
+tap devices, bridges or root are needed. Every NIC gets a fixed MAC and a
+10.77.<link>.<n>/24 address that the guest is given over its console.
+
+The switch runs as its own process and prints its per-port counters as
+"stats {...}" lines, so whoever started it can report the traffic of each
+guest.
+
+Usage:
+    python3 vm_network.py plan --vms 3 --topology star   # QEMU arguments per VM
+    python3 vm_network.py switch --port 47000 --peer 47001 --peer 47002
+    python3 vm_network.py --bench                        # switch throughput and latency
+"""
+
+import argparse
+import json
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from vnc_ports import port_free
+
+TOPOLOGIES = ("pair", "star", "lan")
+BACKENDS = ("auto", "stream", "socket", "switch", "mcast")
+POINT_TO_POINT = ("stream", "socket")
+LOCALHOST = "127.0.0.1"
+# Guest addresses are 10.77.<link>.<member>/24, MACs 52:54:00:77:<link>:<member>
+SUBNET = "10.77"
+MAC_PREFIX = "52:54:00:77"
+MCAST_GROUP = "239.255.77.1"
+STATS_PREFIX = "stats "
+# Largest Ethernet frame QEMU sends over a socket netdev (with offloads off)
+FRAME_LIMIT = 65536
+
+
+class NetworkError(Exception):
+    """Raised when a topology cannot be built from the given VMs."""
+
+
+def qemu_version(binary: str) -> Tuple[int, int]:
+    """(major, minor) of a QEMU binary; (0, 0) when it cannot be run."""
+    try:
+        output = subprocess.run([binary, "--version"], capture_output=True, text=True, timeout=10).stdout
+    except (OSError, subprocess.SubprocessError):
+        return (0, 0)
+    match = re.search(r"version (\d+)\.(\d+)", output)
+    return (int(match.group(1)), int(match.group(2))) if match else (0, 0)
+
+
+def free_port(kind: int = socket.SOCK_STREAM) -> int:
+    """A port nothing on 127.0.0.1 is using right now (TCP or UDP)."""
+    with socket.socket(socket.AF_INET, kind) as probe:
+        probe.bind((LOCALHOST, 0))
+        return probe.getsockname()[1]
+
+
+@dataclass
+class NetLink:
+    """One Ethernet segment: a point-to-point link or a shared LAN."""
+    index: int
+    members: List[str]
+    backend: str
+    # Unix socket path, host:port or multicast group:port
+    endpoint: str = ""
+    # Member that listens (stream and socket links); it has to start first
+    server: Optional[str] = None
+    # UDP port of each member (switch links)
+    ports: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def subnet(self) -> str:
+        return f"{SUBNET}.{self.index}.0/24"
+
+    def describe(self) -> str:
+        return f"link {self.index} ({self.backend}, {self.subnet}): {' - '.join(self.members)}"
+
+
+@dataclass
+class GuestNIC:
+    """One VM's network card on a link."""
+    vm: str
+    link: int
+    index: int
+    mac: str
+    address: str
+    netdev: str
+
+    @property
+    def ifname(self) -> str:
+        """Interface name in the guest (NICs are probed in command-line order)."""
+        return f"eth{self.index}"
+
+    @property
+    def ip(self) -> str:
+        return self.address.split("/")[0]
+
+    def qemu_args(self) -> List[str]:
+        return ["-netdev", self.netdev, "-device", f"virtio-net-pci,netdev=link{self.link},mac={self.mac}"]
+
+    def configure_command(self) -> str:
+        """Shell command that brings the interface up in the guest (iproute2 or ifconfig)."""
+        return (f"{{ ip addr add {self.address} dev {self.ifname} && ip link set {self.ifname} up; }} 2>/dev/null"
+                f" || ifconfig {self.ifname} {self.ip} netmask 255.255.255.0 up")
+
+
+class NetworkPlan:
+    """Links, NICs and QEMU arguments for a group of VMs."""
+
+    def __init__(self, vms: List[str], topology: str = "lan", backend: str = "auto",
+                 run_dir: Path = Path("/tmp"), version: Tuple[int, int] = (0, 0)):
+        if topology not in TOPOLOGIES:
+            raise NetworkError(f"Unknown topology {topology!r} (choose from {', '.join(TOPOLOGIES)})")
+        if backend not in BACKENDS:
+            raise NetworkError(f"Unknown backend {backend!r} (choose from {', '.join(BACKENDS)})")
+        if len(set(vms)) < 2:
+            raise NetworkError("A network needs at least two VMs")
+        self.vms = list(vms)
+        self.topology = topology
+        self.backend = backend
+        self.run_dir = run_dir
+        self.version = version
+        self.links: List[NetLink] = []
+        self.nics: Dict[str, List[GuestNIC]] = {vm: [] for vm in self.vms}
+        self._ports = set()
+        for index, members in enumerate(self._segments()):
+            self._add_link(index, members)
+
+    def _segments(self) -> List[List[str]]:
+        if self.topology == "pair":
+            if len(self.vms) % 2:
+                raise NetworkError("The pair topology needs an even number of VMs")
+            return [self.vms[i:i + 2] for i in range(0, len(self.vms), 2)]
+        if self.topology == "star":
+            hub = self.vms[0]
+            return [[hub, spoke] for spoke in self.vms[1:]]
+        return [self.vms]
+
+    def _backend_for(self, members: List[str]) -> str:
+        if self.backend == "auto":
+            if len(members) > 2:
+                return "switch"
+            return "stream" if self.version >= (7, 2) else "socket"
+        if self.backend in POINT_TO_POINT and len(members) > 2:
+            raise NetworkError(f"{self.backend} links join two VMs; use switch or mcast for a LAN")
+        if self.backend == "stream" and (0, 0) < self.version < (7, 2):
+            raise NetworkError(f"The stream netdev needs QEMU 7.2 or later (found {self.version[0]}.{self.version[1]})")
+        return self.backend
+
+    def _port(self, kind: int = socket.SOCK_STREAM) -> int:
+        """A free port not yet used by this plan."""
+        while True:
+            port = free_port(kind)
+            if port not in self._ports:
+                self._ports.add(port)
+                return port
+
+    def _add_link(self, index: int, members: List[str]):
+        link = NetLink(index, members, self._backend_for(members))
+        if link.backend == "stream":
+            link.endpoint = str(self.run_dir / f"link{index}.sock")
+            link.server = members[0]
+        elif link.backend == "socket":
+            link.endpoint = f"{LOCALHOST}:{self._port()}"
+            link.server = members[0]
+        elif link.backend == "mcast":
+            link.endpoint = f"{MCAST_GROUP}:{self._port(socket.SOCK_DGRAM)}"
+        else:
+            link.endpoint = f"{LOCALHOST}:{self._port(socket.SOCK_DGRAM)}"
+            link.ports = {vm: self._port(socket.SOCK_DGRAM) for vm in members}
+        self.links.append(link)
+        for number, vm in enumerate(members, 1):
+            self.nics[vm].append(GuestNIC(vm, index, len(self.nics[vm]), f"{MAC_PREFIX}:{index:02x}:{number:02x}",
+                                          f"{SUBNET}.{index}.{number}/24", self._netdev(link, vm)))
+
+    def _netdev(self, link: NetLink, vm: str) -> str:
+        netdev = f"link{link.index}"
+        if link.backend == "stream":
+            if vm == link.server:
+                return f"stream,id={netdev},server=on,addr.type=unix,addr.path={link.endpoint}"
+            # QEMU 8.0 can retry the connection; older clients need the server up first
+            reconnect = ",reconnect=1" if self.version >= (8, 0) else ""
+            return f"stream,id={netdev},server=off,addr.type=unix,addr.path={link.endpoint}{reconnect}"
+        if link.backend == "socket":
+            role = "listen" if vm == link.server else "connect"
+            return f"socket,id={netdev},{role}={link.endpoint}"
+        if link.backend == "mcast":
+            return f"socket,id={netdev},mcast={link.endpoint},localaddr={LOCALHOST}"
+        return f"socket,id={netdev},udp={link.endpoint},localaddr={LOCALHOST}:{link.ports[vm]}"
+
+    def qemu_args(self, vm: str) -> List[str]:
+        """-netdev/-device arguments for one VM (VMSpec.net_args)."""
+        return [arg for nic in self.nics[vm] for arg in nic.qemu_args()]
+
+    def start_order(self) -> List[str]:
+        """VMs that listen on a link first, so their peers can connect."""
+        servers = {link.server for link in self.links}
+        return sorted(self.vms, key=lambda vm: vm not in servers)
+
+    def ready(self, vm: str) -> bool:
+        """Whether every link vm listens on is accepting connections."""
+        for link in self.links:
+            if link.server != vm:
+                continue
+            if link.backend == "stream" and not Path(link.endpoint).exists():
+                return False
+            # Probed by binding: a listen netdev accepts only one connection
+            if link.backend == "socket" and port_free(int(link.endpoint.rsplit(":", 1)[1])):
+                return False
+        return True
+
+    def switch_command(self, link: NetLink, interval: float = 1.0) -> List[str]:
+        """Command that runs the switch for a switch link."""
+        command = [sys.executable, str(Path(__file__).resolve()), "switch",
+                   "--port", link.endpoint.rsplit(":", 1)[1], "--interval", str(interval)]
+        for port in link.ports.values():
+            command += ["--peer", str(port)]
+        return command
+
+    def peers(self) -> List[Tuple[GuestNIC, GuestNIC]]:
+        """(from, to) NIC pairs to measure: the first member of each link to every other."""
+        pairs = []
+        for link in self.links:
+            first = self.nic(link.members[0], link.index)
+            pairs += [(first, self.nic(vm, link.index)) for vm in link.members[1:]]
+        return pairs
+
+    def nic(self, vm: str, link: int) -> GuestNIC:
+        return next(nic for nic in self.nics[vm] if nic.link == link)
+
+    def link_of_port(self, port: int) -> Optional[Tuple[NetLink, str]]:
+        """The switch link and VM a UDP port belongs to."""
+        for link in self.links:
+            for vm, vm_port in link.ports.items():
+                if vm_port == port:
+                    return link, vm
+        return None
+
+    def cleanup(self):
+        """Remove stream sockets left behind by QEMU."""
+        for link in self.links:
+            if link.backend == "stream":
+                Path(link.endpoint).unlink(missing_ok=True)
+
+    def describe(self) -> List[str]:
+        lines = [f"{self.topology} network of {len(self.vms)} VMs"]
+        for link in self.links:
+            lines.append(f"  {link.describe()}")
+            for vm in link.members:
+                nic = self.nic(vm, link.index)
+                lines.append(f"    {vm:<20} {nic.ifname} {nic.address:<16} {nic.mac}")
+        return lines
+
+
+def parse_stats(line: str) -> Optional[Dict[int, Tuple[int, int]]]:
+    """Per-port (frames, bytes) received from a switch "stats" line."""
+    if not line.startswith(STATS_PREFIX):
+        return None
+    try:
+        data = json.loads(line[len(STATS_PREFIX):])
+    except ValueError:
+        return None
+    return {int(port): (counts[0], counts[1]) for port, counts in data.items()}
+
+
+class NetSwitch:
+    """Learning Ethernet switch for QEMU socket netdevs in UDP mode.
+
+    Each guest's netdev sends its frames to the switch port and receives on
+    its own port. Frames go to the port their destination MAC was last seen
+    on; broadcasts, multicasts and unknown destinations go to every other
+    peer.
+    """
+
+    def __init__(self, port: int, peers: List[int], host: str = LOCALHOST):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        self.sock.bind((host, port))
+        self.peers = [(host, peer) for peer in peers]
+        self.table: Dict[bytes, Tuple[str, int]] = {}
+        self.counts: Dict[int, List[int]] = {peer: [0, 0] for peer in peers}
+        self._stop = threading.Event()
+
+    def serve(self, interval: float = 1.0, out=sys.stdout):
+        """Forward frames until stop(), printing the counters every interval seconds."""
+        buffer = bytearray(FRAME_LIMIT)
+        view = memoryview(buffer)
+        self.sock.settimeout(min(interval, 0.5) if interval > 0 else 0.5)
+        next_stats = time.monotonic() + interval
+        while not self._stop.is_set():
+            try:
+                size, source = self.sock.recvfrom_into(buffer)
+            except socket.timeout:
+                size = 0
+            except OSError:
+                break
+            if size >= 14:
+                self._forward(view, size, source)
+            if interval and time.monotonic() >= next_stats:
+                next_stats += interval
+                out.write(STATS_PREFIX + json.dumps(self.counts) + "\n")
+                out.flush()
+
+    def _forward(self, view: memoryview, size: int, source: Tuple[str, int]):
+        counts = self.counts.setdefault(source[1], [0, 0])
+        counts[0] += 1
+        counts[1] += size
+        if not view[6] & 1:
+            self.table[bytes(view[6:12])] = source
+        frame = view[:size]
+        target = None if view[0] & 1 else self.table.get(bytes(view[0:6]))
+        if target is not None:
+            if target != source:
+                self.sock.sendto(frame, target)
+            return
+        for peer in self.peers:
+            if peer != source:
+                try:
+                    self.sock.sendto(frame, peer)
+                except OSError:
+                    pass  # peer not started yet
+
+    def stop(self):
+        self._stop.set()
+
+    def close(self):
+        self.stop()
+        self.sock.close()
+
+
+def bench(seconds: float = 2.0, size: int = 1514, pings: int = 2000):
+    """Throughput and round-trip latency through a switch process between two fake guests."""
+    port, a_port, b_port = (free_port(socket.SOCK_DGRAM) for _ in range(3))
+    switch = subprocess.Popen([sys.executable, str(Path(__file__).resolve()), "switch", "--port", str(port),
+                               "--peer", str(a_port), "--peer", str(b_port), "--interval", "0"])
+    a = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    b = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        for sock, own in ((a, a_port), (b, b_port)):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+            sock.bind((LOCALHOST, own))
+            sock.settimeout(2)
+        mac_a, mac_b = bytes.fromhex("525400770001"), bytes.fromhex("525400770002")
+        to_b = mac_b + mac_a + b"\x08\x00" + bytes(size - 14)
+        to_a = mac_a + mac_b + b"\x08\x00" + bytes(size - 14)
+        # Let the switch start and learn both MACs
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                b.sendto(to_a, (LOCALHOST, port))
+                a.recv(FRAME_LIMIT)
+                a.sendto(to_b, (LOCALHOST, port))
+                b.recv(FRAME_LIMIT)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+
+        rtts = []
+        for _ in range(pings):
+            started = time.perf_counter()
+            a.sendto(to_b, (LOCALHOST, port))
+            b.recv(FRAME_LIMIT)
+            b.sendto(to_a, (LOCALHOST, port))
+            a.recv(FRAME_LIMIT)
+            rtts.append(time.perf_counter() - started)
+        rtts.sort()
+        print(f"Latency:    {len(rtts)} round trips of {size} B frames, "
+              f"median {rtts[len(rtts) // 2] * 1e6:.0f} µs, p99 {rtts[int(len(rtts) * 0.99)] * 1e6:.0f} µs")
+
+        # One-way stream from a to b, paced by a window so the switch is the bottleneck
+        received = [0]
+
+        def drain():
+            b.settimeout(0.5)
+            while True:
+                try:
+                    b.recv(FRAME_LIMIT)
+                except OSError:
+                    return
+                received[0] += 1
+
+        reader = threading.Thread(target=drain, daemon=True)
+        reader.start()
+        sent = 0
+        started = time.perf_counter()
+        end = started + seconds
+        while time.perf_counter() < end:
+            if sent - received[0] < 256:
+                a.sendto(to_b, (LOCALHOST, port))
+                sent += 1
+            else:
+                time.sleep(0)
+        elapsed = time.perf_counter() - started
+        reader.join()
+        print(f"Throughput: {received[0] / elapsed:,.0f} frames/s, "
+              f"{received[0] * size * 8 / elapsed / 1e6:,.0f} Mbit/s "
+              f"({sent - received[0]} of {sent} frames lost)")
+    finally:
+        a.close()
+        b.close()
+        switch.terminate()
+        switch.wait()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Guest-to-guest networking for CyberOS VMs")
+    parser.add_argument("--bench", action="store_true", help="measure a switch between two fake guests")
+    commands = parser.add_subparsers(dest="command")
+    plan = commands.add_parser("plan", help="show the links and QEMU arguments for a group of VMs")
+    plan.add_argument("--vms", type=int, default=2, help="number of VMs (default: 2)")
+    plan.add_argument("--topology", choices=TOPOLOGIES, default="lan")
+    plan.add_argument("--backend", choices=BACKENDS, default="auto")
+    plan.add_argument("--qemu", default="qemu-system-x86_64", help="QEMU binary (for the netdevs it supports)")
+    switch = commands.add_parser("switch", help="run a user-space switch")
+    switch.add_argument("--port", type=int, required=True, help="UDP port the guests send to")
+    switch.add_argument("--peer", type=int, action="append", default=[], help="UDP port of a guest")
+    switch.add_argument("--interval", type=float, default=1.0, help="seconds between stats lines (0: none)")
+    args = parser.parse_args()
+
+    if args.bench:
+        bench()
+        return 0
+    if args.command == "switch":
+        server = NetSwitch(args.port, args.peer)
+        try:
+            server.serve(args.interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+        return 0
+    if args.command == "plan":
+        try:
+            network = NetworkPlan([f"cyberos-{n}" for n in range(1, args.vms + 1)], args.topology,
+                                  args.backend, version=qemu_version(args.qemu))
+        except NetworkError as e:
+            print(e, file=sys.stderr)
+            return 1
+        print("\n".join(network.describe()))
+        for vm in network.start_order():
+            print(f"\n{vm}: {' '.join(network.qemu_args(vm))}")
+        return 0
+    parser.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS Warm VM Pool
+Keeps a number of CyberOS guests booted and paused so launches are instant.
+
+Every pool member boots headless on its own throwaway qcow2 overlay over a
+pristine base disk, is paused over QMP once the boot banner appears, and is
+resumed when handed out. Members are destroyed after use (process and overlay)
+and the pool refills in the background, so nothing leaks between sessions.
+Guests and qemu-img run on the GUI's ProcessEngine, so warming guests adds
+no threads.
+"""
+
+import asyncio
+import concurrent.futures
+import itertools
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from admission import AdmissionController, AdmissionError
+from console_stream import ConsoleLine
+from disk_profiles import DEFAULT_PROFILE
+from process_engine import TERMINATE_GRACE, ProcessEngine, ProcessHandle
+from qmp import QMPClient, QMPError
+from vm_command import VMSpec, build_qemu_command
+from vnc_ports import VNCAllocator, VNCLease
+
+# Printed by /etc/rc.local once the guest has finished booting
+BOOT_BANNER = "CyberOS v0.1.0-alpha"
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    """Shape of the guests the pool keeps warm."""
+    cores: int = 2
+    memory: int = 512
+    disk_size: int = 2
+    network: bool = False
+    display: str = "serial"
+    disk_profile: str = DEFAULT_PROFILE
+
+    def matches(self, cores: int, memory: int, network: bool, display: str,
+                disk_size: int, disk_profile: str) -> bool:
+        """Check whether a launch request can be served by a pool member."""
+        return ((self.cores, self.memory, self.network, self.display, self.disk_size, self.disk_profile) ==
+                (cores, memory, network, display, disk_size, disk_profile))
+
+
+class PoolMember:
+    """One pre-booted guest and its throwaway overlay.
+
+    Its output callbacks run on the engine loop; attach() may be called from
+    any thread.
+    """
+
+    def __init__(self, name: str, overlay: Path, qmp_socket: Path):
+        self.name = name
+        self.handle: Optional[ProcessHandle] = None
+        self.overlay = overlay
+        self.qmp_socket = qmp_socket
+        self.started_at = time.monotonic()
+        self.ready_at: Optional[float] = None
+        # Set on the engine loop once the banner appears or QEMU exits
+        self.booted = asyncio.Event()
+        # VNC display of members booted with display="vnc"
+        self.vnc: Optional[VNCLease] = None
+        self._lock = threading.Lock()
+        self._output: List[ConsoleLine] = []
+        self._partial: Optional[ConsoleLine] = None
+        self._sink: Optional[Callable[[ConsoleLine], None]] = None
+        self._partial_sink: Optional[Callable[[ConsoleLine], None]] = None
+        self._raw_sink: Optional[Callable[[bytes], None]] = None
+
+    @property
+    def pid(self) -> Optional[int]:
+        """Process ID of the member's QEMU."""
+        return self.handle.pid if self.handle else None
+
+    @property
+    def running(self) -> bool:
+        """Whether the member's QEMU is still running."""
+        return self.handle is not None and self.handle.running
+
+    def start(self, engine: ProcessEngine, command: List[str]) -> ProcessHandle:
+        """Boot the guest on the engine, buffering its output until attach()."""
+        self.handle = engine.spawn(command, name=self.name, direct=True, on_line=self._on_line,
+                                   on_partial=self._on_partial, on_chunk=self._on_chunk,
+                                   on_exit=lambda handle: self.booted.set())
+        return self.handle
+
+    def _on_chunk(self, chunk: bytes):
+        with self._lock:
+            if self._raw_sink:
+                self._raw_sink(chunk)
+
+    def _on_line(self, line: ConsoleLine):
+        if BOOT_BANNER in line:
+            self.booted.set()
+        with self._lock:
+            self._partial = None
+            if self._sink:
+                self._sink(line)
+            else:
+                self._output.append(line)
+
+    def _on_partial(self, line: ConsoleLine):
+        if BOOT_BANNER in line:
+            self.booted.set()
+        with self._lock:
+            self._partial = line
+            if self._partial_sink:
+                self._partial_sink(line)
+
+    def attach(self, sink: Callable[[ConsoleLine], None],
+               partial_sink: Optional[Callable[[ConsoleLine], None]] = None,
+               raw_sink: Optional[Callable[[bytes], None]] = None):
+        """Replay buffered output into sink and forward everything after it.
+
+        sink receives complete lines; partial_sink, if given, the pending
+        unterminated line (such as a login prompt) whenever it changes;
+        raw_sink the undecoded output from now on (for recording).
+        """
+        with self._lock:
+            for line in self._output:
+                sink(line)
+            self._output.clear()
+            self._sink = sink
+            self._partial_sink = partial_sink
+            self._raw_sink = raw_sink
+            if self._partial is not None and partial_sink:
+                partial_sink(self._partial)
+
+    def qmp(self, command: str):
+        """Run a single QMP command against this member."""
+        client = QMPClient(self.qmp_socket)
+        try:
+            client.connect()
+            return client.execute(command)
+        finally:
+            client.close()
+
+    def destroy(self):
+        """Stop the guest and delete its overlay and socket (not on the engine loop)."""
+        if self.handle:
+            # A process that is still being started cannot be signalled yet
+            try:
+                self.handle.ready.result(TERMINATE_GRACE)
+            except concurrent.futures.TimeoutError:
+                pass
+        if self.running:
+            self.handle.cancel()
+            self.handle.wait(TERMINATE_GRACE + 1)
+        for path in (self.overlay, self.qmp_socket):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+        if self.vnc:
+            self.vnc.release()
+            self.vnc = None
+
+
+class WarmPool:
+    """Pool of booted, paused guests with asynchronous refill on a ProcessEngine."""
+
+    def __init__(self, engine: ProcessEngine, pool_dir: Path, run_dir: Path, iso_file: Path,
+                 config: PoolConfig = PoolConfig(), size: int = 0,
+                 boot_timeout: float = 120.0, log: Callable[[str], None] = lambda message: None,
+                 admission: Optional[AdmissionController] = None):
+        self.engine = engine
+        self.pool_dir = pool_dir
+        self.run_dir = run_dir
+        self.iso_file = iso_file
+        self.config = config
+        self.size = size
+        self.boot_timeout = boot_timeout
+        self.log = log
+        self.admission = admission
+
+        self.ready: List[PoolMember] = []
+        self.warming = 0
+        # Members still booting, so shutdown() can stop them too
+        self._booting: Dict[str, PoolMember] = {}
+        self.hits = 0
+        self.misses = 0
+        self.refill_latencies: List[float] = []
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+        # Created on the engine loop by the first refill
+        self._base_lock: Optional[asyncio.Lock] = None
+        self._closed = False
+
+    @property
+    def base_disk(self) -> Path:
+        """Pristine disk every overlay is layered on."""
+        return self.pool_dir / f"base-{self.config.disk_size}G.qcow2"
+
+    def resize(self, size: int):
+        """Change the number of warm guests, trimming or refilling as needed."""
+        with self._lock:
+            self.size = max(size, 0)
+            surplus = self.ready[self.size:]
+            self.ready = self.ready[:self.size]
+        for member in surplus:
+            self._discard(member)
+        self.refill()
+
+    def reconfigure(self, config: PoolConfig):
+        """Switch the guest shape; existing members are recycled."""
+        with self._lock:
+            if config == self.config:
+                return
+            self.config = config
+            stale, self.ready = self.ready, []
+        for member in stale:
+            self._discard(member)
+        self.refill()
+
+    def acquire(self, cores: int, memory: int, network: bool, display: str,
+                disk_size: int, disk_profile: str) -> Optional[PoolMember]:
+        """Hand out a warm guest matching the request, or None on a miss."""
+        dead: List[PoolMember] = []
+        with self._lock:
+            member = None
+            if self.config.matches(cores, memory, network, display, disk_size, disk_profile):
+                while self.ready and member is None:
+                    candidate = self.ready.pop(0)
+                    if candidate.running:
+                        member = candidate
+                    else:
+                        dead.append(candidate)
+            if member is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        # Destroying waits for the process, so it happens outside the lock
+        for candidate in dead:
+            self._discard(candidate)
+
+        if member is not None:
+            try:
+                member.qmp("cont")
+            except QMPError as e:
+                self.log(f"Warm pool: could not resume {member.name}: {e}")
+                self._discard(member)
+                member = None
+        self.refill()
+        return member
+
+    def release(self, member: PoolMember):
+        """Recycle a member after its session ended."""
+        self._discard(member)
+        self.refill()
+
+    def _discard(self, member: PoolMember):
+        """Destroy a member and return its resources."""
+        member.destroy()
+        if self.admission:
+            self.admission.release(member.name)
+
+    def refill(self):
+        """Start booting guests until the pool is back at its target size."""
+        with self._lock:
+            if self._closed:
+                return
+            missing = self.size - len(self.ready) - self.warming
+            self.warming += max(missing, 0)
+        for _ in range(max(missing, 0)):
+            self.engine.submit(self._warm_one())
+
+    async def _ensure_base(self, config: PoolConfig) -> Path:
+        """Create the pristine base disk the overlays are layered on."""
+        base_disk = self.pool_dir / f"base-{config.disk_size}G.qcow2"
+        self.pool_dir.mkdir(parents=True, exist_ok=True)
+        if self._base_lock is None:
+            self._base_lock = asyncio.Lock()
+        async with self._base_lock:
+            if not base_disk.exists():
+                code, output = await self.engine.run(["qemu-img", "create", "-f", "qcow2", str(base_disk),
+                                                      f"{config.disk_size}G"])
+                if code != 0:
+                    raise RuntimeError(f"qemu-img create failed: {output.strip()}")
+                base_disk.chmod(0o444)
+        return base_disk
+
+    async def _warm_one(self):
+        """Boot one guest to its banner, pause it and add it to the pool (engine loop)."""
+        loop = asyncio.get_running_loop()
+        member = None
+        vnc = None
+        config = self.config
+        # Allocations are host-wide, so members of other GUIs' pools must not share names
+        name = f"pool-{os.getpid()}-{next(self._counter)}"
+        try:
+            if self.admission:
+                await loop.run_in_executor(None, self.admission.admit, name, config.cores, config.memory)
+            base_disk = await self._ensure_base(config)
+            self.run_dir.mkdir(parents=True, exist_ok=True)
+            overlay = self.pool_dir / f"{name}.qcow2"
+            qmp_socket = self.run_dir / f"{name}.qmp"
+            member = PoolMember(name, overlay, qmp_socket)
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("the pool was shut down")
+                self._booting[name] = member
+            code, output = await self.engine.run(["qemu-img", "create", "-f", "qcow2", "-b", str(base_disk),
+                                                  "-F", "qcow2", str(overlay)])
+            if code != 0:
+                raise RuntimeError(f"qemu-img create failed: {output.strip()}")
+
+            if config.display == "vnc":
+                allocator = VNCAllocator(self.run_dir / "vnc.sqlite")
+                vnc = await loop.run_in_executor(None, allocator.allocate, f"CyberOS-{name}")
+            spec = VMSpec(name=f"CyberOS-{name}", cores=config.cores, memory=config.memory,
+                          iso_file=self.iso_file, disk_file=overlay, display=config.display,
+                          network=config.network, disk_profile=config.disk_profile, qmp_socket=qmp_socket,
+                          vnc_display=vnc.display if vnc else 0, vnc_websocket=vnc.websocket if vnc else None)
+            member.vnc, vnc = vnc, None
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("the pool was shut down")
+                handle = member.start(self.engine, build_qemu_command(spec))
+            pid = await handle.started()
+            if pid is None:
+                raise RuntimeError(f"{name} could not start QEMU")
+            if self.admission:
+                await loop.run_in_executor(None, self.admission.adopt, name, pid)
+            if member.vnc:
+                await loop.run_in_executor(None, member.vnc.adopt, pid)
+
+            try:
+                await asyncio.wait_for(member.booted.wait(), self.boot_timeout)
+            except asyncio.TimeoutError:
+                raise RuntimeError(f"{name} did not boot within {self.boot_timeout:.0f} s")
+            if not member.running:
+                raise RuntimeError(f"{name} exited during boot")
+            await loop.run_in_executor(None, member.qmp, "stop")
+            member.ready_at = time.monotonic()
+
+            with self._lock:
+                self._booting.pop(name, None)
+                keep = not self._closed and config == self.config and len(self.ready) < self.size
+                if keep:
+                    self.ready.append(member)
+                    self.refill_latencies.append(member.ready_at - member.started_at)
+                    del self.refill_latencies[:-20]
+            if not keep:
+                await loop.run_in_executor(None, self._discard, member)
+        except AdmissionError as e:
+            self.log(f"Warm pool refill deferred: {e}")
+        except Exception as e:
+            if not self._closed:
+                self.log(f"Warm pool refill failed: {e}")
+            if vnc:
+                vnc.release()
+            if member:
+                await loop.run_in_executor(None, self._discard, member)
+            elif self.admission:
+                self.admission.release(name)
+        finally:
+            with self._lock:
+                self._booting.pop(name, None)
+                self.warming -= 1
+
+    def stats(self) -> Dict[str, float]:
+        """Pool size, hit/miss counters and refill latency."""
+        with self._lock:
+            latencies = list(self.refill_latencies)
+            return {
+                "size": self.size,
+                "ready": len(self.ready),
+                "warming": self.warming,
+                "hits": self.hits,
+                "misses": self.misses,
+                "last_refill_s": latencies[-1] if latencies else 0.0,
+                "avg_refill_s": sum(latencies) / len(latencies) if latencies else 0.0,
+            }
+
+    def shutdown(self):
+        """Destroy every warm guest, including the ones still booting (not on the engine loop)."""
+        with self._lock:
+            self._closed = True
+            members, self.ready = self.ready, []
+            members += self._booting.values()
+            self._booting.clear()
+        for member in members:
+            self._discard(member)
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS VM Registry
+Records running VMs so a restarted GUI re-attaches to them, and shuts many down at once.
+
+Every launcher (the Emulator GUI, run_cyberos.sh and through it the
+Control Center) records the VMs it starts in ~/.cyberos/run/vms.sqlite:
+PID, QMP socket, VNC display, which program started the guest and the
+PID of the process supervising it. A guest whose supervisor has exited
+(a GUI closed with its VMs left running) is an orphan; the next session
+of the same program adopts it. Entries are dropped when their process
+has exited; the process start time is recorded too, so a recycled PID
+is not mistaken for the guest.
+
+shutdown_all() presses the ACPI power button of every guest at once over
+QMP and waits for all of them against one shared deadline. Guests that
+are still up when it expires (or have no QMP socket) get SIGTERM, then
+SIGKILL. It blocks, so GUIs run it in a worker thread and report the
+progress callbacks on the UI thread.
+
+Usage:
+    python3 vm_registry.py                                  # running VMs
+    python3 vm_registry.py register CyberOS-VM --qmp PATH --parent $PPID   # PID defaults to the parent
+    python3 vm_registry.py unregister --pid N
+    python3 vm_registry.py find CyberOS-VM                  # exit status 1 if not running
+    python3 vm_registry.py stop --all --timeout 30
+"""
+
+import argparse
+import os
+import signal
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from process_engine import TERMINATE_GRACE
+from qmp import QMPClient, QMPError
+from vnc_ports import pid_alive
+
+DB_PATH = Path.home() / ".cyberos" / "run" / "vms.sqlite"
+# Seconds guests get to power down before they are terminated
+SHUTDOWN_TIMEOUT = 30.0
+# How often exits are checked while waiting
+POLL_INTERVAL = 0.2
+# Power button presses sent at the same time
+MAX_PARALLEL = 16
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS vms (
+    pid INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    start_ticks INTEGER,
+    qmp_socket TEXT,
+    vnc_display INTEGER,
+    owner TEXT NOT NULL,
+    parent INTEGER NOT NULL,
+    started REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS vms_owner ON vms (owner);
+"""
+
+
+def process_start(pid: int) -> Optional[int]:
+    """Start time of a process in clock ticks after boot (Linux), or None."""
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # Fields after "(comm)": state is field 3, starttime field 22
+    return int(stat[stat.rindex(")") + 2:].split()[19])
+
+
+def process_running(pid: int, start_ticks: Optional[int] = None) -> bool:
+    """Whether a process is alive, not a zombie and (when known) the one that started at start_ticks."""
+    if not pid_alive(pid):
+        return False
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            stat = f.read()
+    except OSError:
+        # No procfs (macOS): trust the signal check
+        return True
+    fields = stat[stat.rindex(")") + 2:].split()
+    if fields[0] in ("Z", "X"):
+        return False
+    return start_ticks is None or int(fields[19]) == start_ticks
+
+
+@dataclass
+class RunningVM:
+    """A VM recorded in the registry."""
+    name: str
+    pid: int
+    qmp_socket: Optional[Path] = None
+    vnc_display: Optional[int] = None
+    owner: str = ""
+    parent: int = 0
+    started: float = 0.0
+    start_ticks: Optional[int] = None
+
+    @property
+    def running(self) -> bool:
+        return process_running(self.pid, self.start_ticks)
+
+    @property
+    def orphaned(self) -> bool:
+        """Whether the process that supervised the VM is gone."""
+        # init adopts the launchers of closed terminals; it supervises nothing
+        return self.parent <= 1 or not pid_alive(self.parent)
+
+    def describe(self) -> str:
+        text = f"{self.name} (PID {self.pid}"
+        if self.vnc_display is not None:
+            text += f", VNC :{self.vnc_display}"
+        return text + ")"
+
+
+class VMRegistry:
+    """Running VMs of every CyberOS launcher on the host."""
+
+    def __init__(self, db_path: Path = DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = self._connect()
+        return db
+
+    def register(self, name: str, pid: int, qmp_socket: Optional[Path] = None,
+                 vnc_display: Optional[int] = None, owner: str = "", parent: Optional[int] = None) -> RunningVM:
+        """Record a started VM, supervised by parent (default: this process)."""
+        vm = RunningVM(name, pid, Path(qmp_socket) if qmp_socket else None, vnc_display, owner,
+                       os.getpid() if parent is None else parent, time.time(), process_start(pid))
+        with self._db as db:
+            db.execute("INSERT OR REPLACE INTO vms (pid, name, start_ticks, qmp_socket, vnc_display, owner, parent, "
+                       "started) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                       (pid, name, vm.start_ticks, str(vm.qmp_socket) if vm.qmp_socket else None,
+                        vnc_display, owner, vm.parent, vm.started))
+        return vm
+
+    def unregister(self, pid: int):
+        with self._db as db:
+            db.execute("DELETE FROM vms WHERE pid = ?", (pid,))
+
+    def running(self, owner: Optional[str] = None) -> List[RunningVM]:
+        """Live VMs (of one owner, when given), oldest first; exited ones are dropped."""
+        rows = self._db.execute("SELECT name, pid, qmp_socket, vnc_display, owner, parent, started, start_ticks "
+                                "FROM vms ORDER BY started").fetchall()
+        vms = [RunningVM(name, pid, Path(qmp) if qmp else None, display, vm_owner, parent, started, ticks)
+               for name, pid, qmp, display, vm_owner, parent, started, ticks in rows]
+        stale = [vm.pid for vm in vms if not vm.running]
+        if stale:
+            with self._db as db:
+                db.executemany("DELETE FROM vms WHERE pid = ?", [(pid,) for pid in stale])
+        return [vm for vm in vms if vm.pid not in stale and (owner is None or vm.owner == owner)]
+
+    def supervised(self, owner: Optional[str] = None, parent: Optional[int] = None) -> List[RunningVM]:
+        """Live VMs supervised by parent (default: this process)."""
+        parent = os.getpid() if parent is None else parent
+        return [vm for vm in self.running(owner) if vm.parent == parent]
+
+    def orphans(self, owner: Optional[str] = None) -> List[RunningVM]:
+        """Live VMs nobody supervises any more."""
+        return [vm for vm in self.running(owner) if vm.orphaned]
+
+    def adopt(self, vms: List[RunningVM], parent: Optional[int] = None) -> List[RunningVM]:
+        """Take over supervising orphans (default: by this process), so no other session claims them."""
+        parent = os.getpid() if parent is None else parent
+        with self._db as db:
+            db.executemany("UPDATE vms SET parent = ? WHERE pid = ?", [(parent, vm.pid) for vm in vms])
+        for vm in vms:
+            vm.parent = parent
+        return vms
+
+    def find(self, name: str) -> Optional[RunningVM]:
+        """The running VM with this name, if any."""
+        return next((vm for vm in self.running() if vm.name == name), None)
+
+
+# ==================== Shutdown ====================
+
+@dataclass
+class ShutdownResult:
+    """How one VM went down."""
+    vm: RunningVM
+    outcome: str  # powered off, terminated, killed, already gone or still running
+    seconds: float
+
+
+def request_powerdown(vm: RunningVM) -> bool:
+    """Press a VM's ACPI power button over QMP; False when QMP is unavailable."""
+    if not vm.qmp_socket:
+        return False
+    client = QMPClient(vm.qmp_socket, timeout=2.0)
+    try:
+        client.connect(wait=1.0)
+        client.powerdown()
+        return True
+    except (QMPError, OSError, ValueError):
+        return False
+    finally:
+        client.close()
+
+
+def signal_vm(vm: RunningVM, signum: int):
+    """Signal a VM, or its whole process group when it leads one (a launcher and its QEMU)."""
+    try:
+        if os.getpgid(vm.pid) == vm.pid:
+            os.killpg(vm.pid, signum)
+        else:
+            os.kill(vm.pid, signum)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def shutdown_all(vms: List[RunningVM], timeout: float = SHUTDOWN_TIMEOUT, grace: float = TERMINATE_GRACE,
+                 on_progress: Optional[Callable[[str], None]] = None) -> List[ShutdownResult]:
+    """Power VMs down in parallel under one deadline, terminating the ones still up after it.
+
+    Blocks for at most timeout + grace + 1 seconds, however many VMs there are.
+    """
+    log = on_progress or (lambda message: None)
+    began = time.monotonic()
+    results: Dict[int, ShutdownResult] = {}
+    pending = {vm.pid: vm for vm in vms if vm.running}
+    for vm in vms:
+        if vm.pid not in pending:
+            results[vm.pid] = ShutdownResult(vm, "already gone", 0.0)
+    stage: Dict[int, str] = {}
+
+    def wait(until: float):
+        while pending:
+            for pid, vm in list(pending.items()):
+                if not vm.running:
+                    del pending[pid]
+                    seconds = time.monotonic() - began
+                    results[pid] = ShutdownResult(vm, stage[pid], seconds)
+                    log(f"{vm.name} {stage[pid]} after {seconds:.1f} s")
+            if not pending or time.monotonic() >= until:
+                return
+            time.sleep(POLL_INTERVAL)
+
+    if pending:
+        targets = list(pending.values())
+        with ThreadPoolExecutor(max_workers=min(len(targets), MAX_PARALLEL)) as pool:
+            pressed = list(pool.map(request_powerdown, targets))
+        for vm, ok in zip(targets, pressed):
+            if ok:
+                stage[vm.pid] = "powered off"
+            else:
+                log(f"{vm.name} has no QMP socket, terminating it")
+                stage[vm.pid] = "terminated"
+                signal_vm(vm, signal.SIGTERM)
+        log(f"Waiting up to {timeout:.0f} s for {len(targets)} VM(s) to power down")
+        wait(began + timeout)
+
+    # Escalate for guests that ignored the power button
+    for signum, outcome, patience in ((signal.SIGTERM, "terminated", grace), (signal.SIGKILL, "killed", 1.0)):
+        if not pending:
+            break
+        stragglers = [vm for vm in pending.values() if stage[vm.pid] != outcome]
+        if stragglers:
+            log(f"Sending {signal.Signals(signum).name} to " + ", ".join(vm.name for vm in stragglers))
+        for vm in stragglers:
+            stage[vm.pid] = outcome
+            signal_vm(vm, signum)
+        wait(time.monotonic() + patience)
+
+    for pid, vm in pending.items():
+        results[pid] = ShutdownResult(vm, "still running", time.monotonic() - began)
+    return [results[vm.pid] for vm in vms if vm.pid in results]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Running CyberOS VMs")
+    parser.add_argument("--db", type=Path, default=DB_PATH, help=f"registry database (default: {DB_PATH})")
+    commands = parser.add_subparsers(dest="command")
+    register = commands.add_parser("register", help="record a started VM")
+    register.add_argument("name")
+    register.add_argument("--pid", type=int, help="process of the VM (default: the parent)")
+    register.add_argument("--qmp", type=Path, help="QMP socket of the VM")
+    register.add_argument("--vnc", type=int, help="VNC display of the VM")
+    register.add_argument("--owner", default="launcher", help="program that started it (default: launcher)")
+    register.add_argument("--parent", type=int, default=0, help="process supervising it (default: none)")
+    find = commands.add_parser("find", help="print a running VM; exit status 1 if there is none")
+    find.add_argument("name")
+    unregister = commands.add_parser("unregister", help="forget a VM")
+    unregister.add_argument("--pid", type=int, help="process of the VM (default: the parent)")
+    stop = commands.add_parser("stop", help="power VMs down in parallel")
+    stop.add_argument("names", nargs="*", help="VMs to stop")
+    stop.add_argument("--all", action="store_true", help="stop every running VM")
+    stop.add_argument("--owner", help="only VMs started by this program")
+    stop.add_argument("--timeout", type=float, default=SHUTDOWN_TIMEOUT,
+                      help=f"seconds to wait before terminating (default: {SHUTDOWN_TIMEOUT:.0f})")
+    args = parser.parse_args()
+
+    registry = VMRegistry(args.db)
+    if args.command == "register":
+        registry.register(args.name, args.pid or os.getppid(), args.qmp, args.vnc, args.owner, args.parent)
+        return 0
+    if args.command == "unregister":
+        registry.unregister(args.pid or os.getppid())
+        return 0
+    if args.command == "find":
+        vm = registry.find(args.name)
+        if vm:
+            print(vm.describe())
+        return 0 if vm else 1
+    if args.command == "stop":
+        if not args.names and not args.all:
+            parser.error("name the VMs to stop or pass --all")
+        vms = [vm for vm in registry.running(args.owner) if args.all or vm.name in args.names]
+        missing = set(args.names) - {vm.name for vm in vms}
+        for name in sorted(missing):
+            print(f"{name} is not running", file=sys.stderr)
+        results = shutdown_all(vms, args.timeout, on_progress=print)
+        for result in results:
+            if result.outcome != "still running":
+                registry.unregister(result.vm.pid)
+        return 1 if missing or any(result.outcome == "still running" for result in results) else 0
+
+    vms = registry.running()
+    if not vms:
+        print("No VMs running")
+    for vm in vms:
+        uptime = time.time() - vm.started
+        state = "orphaned" if vm.orphaned else f"supervised by PID {vm.parent}"
+        print(f"{vm.describe():<40} {vm.owner or '-':<15} up {uptime / 60:.0f} min, {state}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
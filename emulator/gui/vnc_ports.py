@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS VNC Port Allocator
+Hands out free VNC displays and websocket ports to concurrent VMs.
+
+QEMU's `-vnc :N` listens on port 5900+N and `websocket=P` adds a WebSocket
+listener for browser clients. Instead of every launcher using :0 (so a second
+VNC-mode VM fails to start), each VM leases a display here. Leases live in
+~/.cyberos/run/vnc.sqlite and are taken in a BEGIN IMMEDIATE transaction, so
+the Emulator GUI, the Control Center, cyberosd, the warm pool and
+run_cyberos.sh can allocate at the same time without handing out the same
+display twice. A lease records the PID that owns it (QEMU once it has
+started) and is reclaimed when that process is gone; ports something else on
+the host is already listening on are skipped.
+
+Usage:
+    python3 vnc_ports.py                             # current leases
+    python3 vnc_ports.py allocate CyberOS-VM --pid N # prints "DISPLAY WEBSOCKET"
+    python3 vnc_ports.py release 3
+"""
+
+import argparse
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+DB_PATH = Path.home() / ".cyberos" / "run" / "vnc.sqlite"
+VNC_BASE = 5900
+WEBSOCKET_BASE = 5700
+# :0-:99, the range QEMU and most VNC clients accept as display numbers
+MAX_DISPLAYS = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    display INTEGER PRIMARY KEY,
+    websocket INTEGER,
+    vm TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS leases_vm ON leases (vm);
+"""
+
+
+class VNCError(Exception):
+    """Raised when no VNC display can be leased."""
+
+
+def pid_alive(pid: int) -> bool:
+    """Whether a process exists (owned by anyone)."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+def port_free(port: int) -> bool:
+    """Whether nothing listens on a TCP port (checked the way QEMU binds it)."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+        # QEMU sets SO_REUSEADDR too, so ports in TIME_WAIT count as free
+        probe.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            probe.bind(("", port))
+        except OSError:
+            return False
+    return True
+
+
+@dataclass
+class VNCLease:
+    """One VM's VNC display and websocket port."""
+    display: int
+    websocket: Optional[int]
+    vm: str
+    pid: int
+    allocator: "VNCAllocator"
+
+    @property
+    def port(self) -> int:
+        """TCP port of the RFB server."""
+        return VNC_BASE + self.display
+
+    def qemu_value(self) -> str:
+        """Value for QEMU's -vnc option."""
+        value = f":{self.display}"
+        if self.websocket:
+            value += f",websocket={self.websocket}"
+        return value
+
+    def adopt(self, pid: int):
+        """Hand the lease to the process that serves the display (QEMU)."""
+        self.pid = pid
+        self.allocator.set_owner(self.display, pid)
+
+    def release(self):
+        self.allocator.release(self.display, self.vm)
+
+    def describe(self) -> str:
+        text = f"VNC :{self.display} (port {self.port}"
+        if self.websocket:
+            text += f", websocket {self.websocket}"
+        return text + ")"
+
+
+class VNCAllocator:
+    """Leases VNC displays to VMs across every CyberOS process on the host."""
+
+    def __init__(self, db_path: Path = DB_PATH, websocket: bool = True,
+                 first: int = 0, count: int = MAX_DISPLAYS):
+        self.db_path = db_path
+        self.websocket = websocket
+        self.displays = range(first, min(first + count, MAX_DISPLAYS))
+        self._local = threading.local()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = self._connect()
+        return db
+
+    def allocate(self, vm: str, pid: Optional[int] = None) -> VNCLease:
+        """Lease the lowest free display; the caller's PID owns it until adopt()."""
+        pid = pid or os.getpid()
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            self._reclaim(db)
+            taken = {row[0] for row in db.execute("SELECT display FROM leases")}
+            for display in self.displays:
+                if display in taken or not port_free(VNC_BASE + display):
+                    continue
+                websocket = WEBSOCKET_BASE + display if self.websocket else None
+                if websocket and not port_free(websocket):
+                    continue
+                db.execute("INSERT INTO leases (display, websocket, vm, pid, created) VALUES (?, ?, ?, ?, ?)",
+                           (display, websocket, vm, pid, time.time()))
+                db.commit()
+                return VNCLease(display, websocket, vm, pid, self)
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+        raise VNCError(f"No free VNC display in :{self.displays.start}-:{self.displays.stop - 1}")
+
+    def _reclaim(self, db: sqlite3.Connection):
+        """Drop leases whose owner has exited."""
+        stale = [display for display, pid in db.execute("SELECT display, pid FROM leases")
+                 if not pid_alive(pid)]
+        db.executemany("DELETE FROM leases WHERE display = ?", [(display,) for display in stale])
+
+    def set_owner(self, display: int, pid: int):
+        with self._db as db:
+            db.execute("UPDATE leases SET pid = ? WHERE display = ?", (pid, display))
+
+    def release(self, display: int, vm: Optional[str] = None):
+        """Give a display back (only if it is still leased to vm, when given)."""
+        with self._db as db:
+            if vm is None:
+                db.execute("DELETE FROM leases WHERE display = ?", (display,))
+            else:
+                db.execute("DELETE FROM leases WHERE display = ? AND vm = ?", (display, vm))
+
+    def leases(self) -> List[VNCLease]:
+        """Live leases, lowest display first."""
+        rows = self._db.execute("SELECT display, websocket, vm, pid FROM leases ORDER BY display").fetchall()
+        return [VNCLease(display, websocket, vm, pid, self)
+                for display, websocket, vm, pid in rows if pid_alive(pid)]
+
+    def find(self, vm: str) -> Optional[VNCLease]:
+        """The display a running VM was given, if any."""
+        return next((lease for lease in self.leases() if lease.vm == vm), None)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Lease VNC displays to CyberOS VMs")
+    parser.add_argument("--db", type=Path, default=DB_PATH, help=f"lease database (default: {DB_PATH})")
+    commands = parser.add_subparsers(dest="command")
+    allocate = commands.add_parser("allocate", help="lease a display; prints DISPLAY WEBSOCKET")
+    allocate.add_argument("vm")
+    allocate.add_argument("--pid", type=int, help="process that owns the lease (default: the parent)")
+    allocate.add_argument("--no-websocket", action="store_true")
+    release = commands.add_parser("release", help="give a display back")
+    release.add_argument("display", type=int)
+    args = parser.parse_args()
+
+    allocator = VNCAllocator(args.db, websocket=not getattr(args, "no_websocket", False))
+    if args.command == "allocate":
+        try:
+            lease = allocator.allocate(args.vm, args.pid or os.getppid())
+        except VNCError as e:
+            print(e, file=sys.stderr)
+            return 1
+        print(lease.display, lease.websocket or "")
+        return 0
+    if args.command == "release":
+        allocator.release(args.display)
+        return 0
+
+    leases = allocator.leases()
+    if not leases:
+        print("No VNC displays leased")
+    for lease in leases:
+        print(f"{lease.vm:<24} {lease.describe()}  PID {lease.pid}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -25,13 +25,44 @@ MEMORY=512
 DISK_SIZE=2
 ENABLE_NETWORK=false
 DISPLAY_MODE="sdl"
+DISK_PROFILE="default"
 VM_NAME="CyberOS-VM"
 VM_DIR="${HOME}/.cyberos/vms"
 CONFIG_FILE="${HOME}/.cyberos_vm.conf"
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 PROJECT_ROOT="$(cd "${SCRIPT_DIR}/../.." && pwd)"
 ISO_FILE="${PROJECT_ROOT}/iso/cyberos-0.1.0-alpha.iso"
+# Direct kernel boot (keep in sync with emulator/gui/direct_boot.py)
+DIRECT_BOOT=false
+KERNEL_FILE="${PROJECT_ROOT}/build/kernel/vmlinuz"
+INITRD_FILE="${PROJECT_ROOT}/build/initramfs.cpio.gz"
+KERNEL_APPEND="console=tty0 console=ttyS0,115200"
+TIMINGS_FILE="${PROJECT_ROOT}/build/timings"
+# build/rootfs shared into a direct boot (keep in sync with emulator/gui/rootfs_share.py)
+SHARE_ROOTFS=off
+SHARE_MODE=overlay
+SHARE_DIR="${PROJECT_ROOT}/build/rootfs"
+SHARE_TAG="cyberos_root"
+SHARE_MECH=""
+SHARE_SOCKET=""
+VIRTIOFSD_PID=""
 QEMU_BIN=""
+# Build variant from config/variants/ (keep in sync with emulator/gui/build_variants.py)
+VARIANT=default
+QEMU_SYSTEM="qemu-system-x86_64"
+QEMU_MACHINE="q35"
+QEMU_CPU=""
+QEMU_FIRMWARE=""
+# VNC display leased for this VM (keep in sync with emulator/gui/vnc_ports.py)
+VNC_DISPLAY=0
+VNC_WEBSOCKET=""
+VNC_LEASED=false
+# Running VM record and QMP socket (keep in sync with emulator/gui/vm_registry.py)
+RUN_DIR="${HOME}/.cyberos/run"
+QMP_SOCKET=""
+VM_REGISTERED=false
+# Host resources committed to this VM (keep in sync with emulator/gui/admission.py)
+VM_ADMITTED=false
 
 ################################################################################
 # Functions
@@ -74,7 +105,16 @@ OPTIONS:
     -s, --size GB          Disk size in gigabytes (default: 2)
     -n, --network          Enable networking
     -d, --display MODE     Display mode: sdl, vnc, serial (default: sdl)
+    -p, --disk-profile P   Disk profile: default, fast, compact (default: default)
     -v, --vm-name NAME     VM name (default: CyberOS-VM)
+    --direct               Boot build/kernel/vmlinuz and the initramfs directly
+                           (no ISO, no GRUB; build with ./scripts/build.sh --no-iso)
+    --append ARGS          Kernel command line for --direct
+    --share MECH           Boot build/rootfs from a host share instead of the
+                           packed initramfs (auto, virtiofs, 9p; implies --direct)
+    --share-mode MODE      overlay (guest writes kept in RAM) or ro (default: overlay)
+    --variant NAME         Boot a build variant (config/variants/NAME.conf, built
+                           with ./scripts/build.sh --variant NAME) with its QEMU
     --create NAME          Create a new named VM
     --delete NAME          Delete an existing VM
     --list                 List all saved VMs
@@ -107,6 +147,11 @@ CONFIGURATION:
         DISK_SIZE=2
         ENABLE_NETWORK=true
         DISPLAY=sdl
+        DISK_PROFILE=fast
+        DIRECT_BOOT=false
+        SHARE_ROOTFS=off
+        SHARE_MODE=overlay
+        VARIANT=default
 
 EOF
 }
@@ -119,6 +164,33 @@ load_config() {
     fi
 }
 
+# Point the launcher at a variant's outputs, QEMU binary, machine and console
+load_variant() {
+    if [[ "$VARIANT" == default ]]; then
+        return 0
+    fi
+    local conf="${PROJECT_ROOT}/config/variants/${VARIANT}.conf"
+    if [[ ! -f "$conf" ]]; then
+        print_error "Unknown build variant: $VARIANT (see config/variants/)"
+        exit 1
+    fi
+    local key value console="ttyS0"
+    while IFS='=' read -r key value || [[ -n "$key" ]]; do
+        case "$key" in
+            QEMU_BINARY) QEMU_SYSTEM="$value" ;;
+            QEMU_MACHINE) QEMU_MACHINE="$value" ;;
+            QEMU_CPU) QEMU_CPU="$value" ;;
+            QEMU_FIRMWARE) QEMU_FIRMWARE="$value" ;;
+            KERNEL_CONSOLE) console="$value" ;;
+        esac
+    done < "$conf"
+    ISO_FILE="${PROJECT_ROOT}/iso/cyberos-0.1.0-alpha-${VARIANT}.iso"
+    KERNEL_FILE="${PROJECT_ROOT}/build/variants/${VARIANT}/kernel/vmlinuz"
+    INITRD_FILE="${PROJECT_ROOT}/build/variants/${VARIANT}/initramfs.cpio.gz"
+    TIMINGS_FILE="${PROJECT_ROOT}/build/variants/${VARIANT}/timings"
+    KERNEL_APPEND="console=tty0 console=${console},115200"
+}
+
 check_dependency() {
     local cmd=$1
     local install_hint=$2
@@ -138,15 +210,15 @@ check_dependencies() {
     local all_found=true
     
     # Check QEMU
-    if ! check_dependency "qemu-system-x86_64" "brew install qemu"; then
+    if ! check_dependency "$QEMU_SYSTEM" "brew install qemu"; then
         all_found=false
     fi
     
     # Find QEMU binary
-    QEMU_BIN=$(which qemu-system-x86_64 2>/dev/null || echo "")
+    QEMU_BIN=$(which "$QEMU_SYSTEM" 2>/dev/null || echo "")
     
     if [[ -z "$QEMU_BIN" ]]; then
-        print_error "qemu-system-x86_64 not found in PATH"
+        print_error "$QEMU_SYSTEM not found in PATH"
         return 1
     fi
     
@@ -168,25 +240,272 @@ check_iso() {
         echo ""
         echo "Please build CyberOS first:"
         echo "  cd $PROJECT_ROOT"
-        echo "  ./scripts/build.sh"
+        echo "  ./scripts/build.sh${VARIANT_BUILD_ARG}"
         return 1
     fi
     print_success "ISO found: $(basename "$ISO_FILE")"
     return 0
 }
 
+check_direct_boot() {
+    local file
+    for file in "$KERNEL_FILE" "$INITRD_FILE"; do
+        if [[ ! -f "$file" ]]; then
+            print_error "Direct kernel boot needs: $file"
+            echo ""
+            echo "Build the kernel and initramfs first (no ISO needed):"
+            echo "  cd $PROJECT_ROOT"
+            echo "  ./scripts/build.sh --no-iso${VARIANT_BUILD_ARG}"
+            return 1
+        fi
+    done
+    print_success "Kernel and initramfs found"
+    
+    # Report what is skipped, using the last build's stage timings
+    local iso_ms=""
+    if [[ -f "$TIMINGS_FILE" ]]; then
+        iso_ms=$(sed -n 's/^iso=//p' "$TIMINGS_FILE" | tail -n 1)
+    fi
+    if [[ -n "$iso_ms" ]]; then
+        print_info "Skipping ISO creation (last took ${iso_ms} ms) and the 3 s GRUB menu"
+    else
+        print_info "Skipping ISO creation and the 3 s GRUB menu"
+    fi
+    return 0
+}
+
+find_virtiofsd() {
+    # virtiofsd needs vhost-user, which QEMU does not support on macOS
+    return 1
+}
+
+# Report which sharing mechanisms QEMU and the host support
+check_share_support() {
+    local qemu=${QEMU_BIN:-qemu-system-x86_64}
+    local devices virtiofsd
+    devices=$("$qemu" -machine none -device help 2>/dev/null || true)
+    SHARE_9P=false
+    SHARE_VIRTIOFS=false
+    if grep -q '"virtio-9p-pci"' <<< "$devices"; then
+        SHARE_9P=true
+        print_success "9p: supported (virtio-9p-pci)"
+    else
+        print_warning "9p: not supported by $qemu"
+    fi
+    if ! grep -q '"vhost-user-fs-pci"' <<< "$devices"; then
+        print_warning "virtiofs: not supported by $qemu (no vhost-user-fs-pci)"
+    elif ! virtiofsd=$(find_virtiofsd); then
+        print_warning "virtiofs: virtiofsd not found"
+    else
+        SHARE_VIRTIOFS=true
+        print_success "virtiofs: supported ($virtiofsd)"
+    fi
+}
+
+# Pick the mechanism for --share and check the shared tree exists
+resolve_share() {
+    check_share_support
+    case "$SHARE_ROOTFS" in
+        auto)
+            if [[ "$SHARE_VIRTIOFS" == true ]]; then
+                SHARE_MECH=virtiofs
+            elif [[ "$SHARE_9P" == true ]]; then
+                SHARE_MECH=9p
+            fi
+            ;;
+        virtiofs)
+            [[ "$SHARE_VIRTIOFS" == true ]] && SHARE_MECH=virtiofs
+            ;;
+        9p)
+            [[ "$SHARE_9P" == true ]] && SHARE_MECH=9p
+            ;;
+        *)
+            print_error "Unknown share mechanism: $SHARE_ROOTFS (use auto, virtiofs or 9p)"
+            return 1
+            ;;
+    esac
+    if [[ -z "$SHARE_MECH" ]]; then
+        print_error "Cannot share build/rootfs with $SHARE_ROOTFS on this host"
+        return 1
+    fi
+    case "$SHARE_MODE" in
+        overlay|ro) ;;
+        *)
+            print_error "Unknown share mode: $SHARE_MODE (use overlay or ro)"
+            return 1
+            ;;
+    esac
+    if [[ ! -d "$SHARE_DIR" ]]; then
+        print_error "Root filesystem not found: $SHARE_DIR"
+        echo "  ./scripts/build.sh --stages rootfs"
+        return 1
+    fi
+    print_info "Sharing $SHARE_DIR over $SHARE_MECH ($SHARE_MODE)"
+    KERNEL_APPEND="$KERNEL_APPEND cyberos.share=$SHARE_MECH:$SHARE_TAG cyberos.share_mode=$SHARE_MODE"
+    return 0
+}
+
+# Lease a free VNC display so several VNC-mode VMs can run side by side
+allocate_vnc_display() {
+    local lease display
+    if command -v python3 &> /dev/null && \
+        lease=$(python3 "$PROJECT_ROOT/emulator/gui/vnc_ports.py" allocate "$VM_NAME" --pid $$ 2>/dev/null); then
+        read -r VNC_DISPLAY VNC_WEBSOCKET <<< "$lease"
+        VNC_LEASED=true
+        return 0
+    fi
+    # Without the lease store, take the first display nothing listens on
+    for ((display = 0; display < 100; display++)); do
+        if ! (exec 3<>"/dev/tcp/127.0.0.1/$((5900 + display))") 2>/dev/null; then
+            VNC_DISPLAY=$display
+            return 0
+        fi
+    done
+    print_error "No free VNC display"
+    return 1
+}
+
+release_vnc_display() {
+    if [[ "$VNC_LEASED" == true ]]; then
+        python3 "$PROJECT_ROOT/emulator/gui/vnc_ports.py" release "$VNC_DISPLAY" 2>/dev/null || true
+        VNC_LEASED=false
+    fi
+}
+
+# Refuse to start a second guest under the name of a running one
+check_vm_not_running() {
+    local running
+    if command -v python3 &> /dev/null && \
+        running=$(python3 "$PROJECT_ROOT/emulator/gui/vm_registry.py" find "$VM_NAME" 2>/dev/null); then
+        print_error "$VM_NAME is already running: $running"
+        echo "  Stop it first or pass --vm-name to start another VM"
+        return 1
+    fi
+    return 0
+}
+
+# Record the VM so the GUIs list it, re-attach to it and can power it down over QMP
+register_vm() {
+    local options=(--pid $$ --qmp "$QMP_SOCKET" --owner "${CYBEROS_VM_OWNER:-launcher}" --parent "$PPID")
+    if [[ "$DISPLAY_MODE" == vnc ]]; then
+        options+=(--vnc "$VNC_DISPLAY")
+    fi
+    if command -v python3 &> /dev/null && \
+        python3 "$PROJECT_ROOT/emulator/gui/vm_registry.py" register "$VM_NAME" "${options[@]}" 2>/dev/null; then
+        VM_REGISTERED=true
+    fi
+}
+
+unregister_vm() {
+    if [[ "$VM_REGISTERED" == true ]]; then
+        python3 "$PROJECT_ROOT/emulator/gui/vm_registry.py" unregister --pid $$ 2>/dev/null || true
+        VM_REGISTERED=false
+    fi
+    rm -f "$QMP_SOCKET"
+}
+
+# Commit CPU and memory to the VM alongside the GUIs' and cyberosd's guests
+admit_vm() {
+    if ! command -v python3 &> /dev/null; then
+        return 0
+    fi
+    if ! python3 "$PROJECT_ROOT/emulator/gui/admission.py" admit "$VM_NAME" \
+        --cores "$CORES" --memory "$MEMORY" --pid $$; then
+        print_error "Not enough free host resources for $VM_NAME"
+        return 1
+    fi
+    VM_ADMITTED=true
+}
+
+release_vm() {
+    if [[ "$VM_ADMITTED" == true ]]; then
+        python3 "$PROJECT_ROOT/emulator/gui/admission.py" release "$VM_NAME" 2>/dev/null || true
+        VM_ADMITTED=false
+    fi
+}
+
+stop_virtiofsd() {
+    if [[ -n "$VIRTIOFSD_PID" ]]; then
+        kill "$VIRTIOFSD_PID" 2>/dev/null || true
+        wait "$VIRTIOFSD_PID" 2>/dev/null || true
+        VIRTIOFSD_PID=""
+    fi
+    [[ -n "$SHARE_SOCKET" ]] && rm -f "$SHARE_SOCKET"
+}
+
+# virtiofsd serves the share to QEMU over a vhost-user socket
+start_virtiofsd() {
+    local virtiofsd options
+    virtiofsd=$(find_virtiofsd)
+    SHARE_SOCKET="$VM_DIR/${VM_NAME}.virtiofs.sock"
+    rm -f "$SHARE_SOCKET"
+    if "$virtiofsd" --help 2>&1 | grep -q -- "--shared-dir"; then
+        options=(--socket-path="$SHARE_SOCKET" --shared-dir="$SHARE_DIR" --cache=auto --sandbox=none)
+        if "$virtiofsd" --help 2>&1 | grep -q -- "--readonly"; then
+            options+=(--readonly)
+        fi
+    else
+        options=(--socket-path="$SHARE_SOCKET" -o "source=$SHARE_DIR,cache=auto")
+    fi
+    "$virtiofsd" "${options[@]}" &
+    VIRTIOFSD_PID=$!
+    trap stop_virtiofsd EXIT
+    local tries=0
+    while [[ ! -S "$SHARE_SOCKET" ]]; do
+        if ! kill -0 "$VIRTIOFSD_PID" 2>/dev/null || [[ $tries -ge 50 ]]; then
+            print_error "virtiofsd did not start"
+            return 1
+        fi
+        sleep 0.1
+        tries=$((tries + 1))
+    done
+    print_success "virtiofsd started (PID $VIRTIOFSD_PID)"
+}
+
 setup_vm_directory() {
     mkdir -p "$VM_DIR"
     print_info "VM directory: $VM_DIR"
 }
 
+# Disk profiles (keep in sync with emulator/gui/disk_profiles.py)
+check_disk_profile() {
+    case "$DISK_PROFILE" in
+        default|fast|compact)
+            return 0
+            ;;
+        *)
+            print_error "Unknown disk profile: $DISK_PROFILE (use default, fast or compact)"
+            return 1
+            ;;
+    esac
+}
+
+disk_create_options() {
+    case "$DISK_PROFILE" in
+        fast)    echo "preallocation=falloc" ;;
+        compact) echo "lazy_refcounts=on,cluster_size=2M" ;;
+        *)       echo "" ;;
+    esac
+}
+
+# Pick the AIO engine for the "fast" profile (no io_uring/native AIO on macOS)
+disk_aio_engine() {
+    echo "threads"
+}
+
 create_disk_image() {
     local disk_file=$1
     local size_gb=$2
+    local create_opts
+    create_opts=$(disk_create_options)
     
     if [[ ! -f "$disk_file" ]]; then
-        print_info "Creating disk image: $size_gb GB"
-        qemu-img create -f qcow2 "$disk_file" "${size_gb}G"
+        print_info "Creating disk image: $size_gb GB ($DISK_PROFILE profile)"
+        if [[ -n "$create_opts" ]]; then
+            qemu-img create -f qcow2 -o "$create_opts" "$disk_file" "${size_gb}G"
+        else
+            qemu-img create -f qcow2 "$disk_file" "${size_gb}G"
+        fi
         print_success "Disk image created"
     else
         print_info "Using existing disk image: $(basename "$disk_file")"
@@ -200,21 +519,64 @@ build_qemu_command() {
     # Basic configuration
     qemu_cmd+=("${QEMU_BIN}")
     qemu_cmd+=("-name" "$VM_NAME")
-    qemu_cmd+=("-machine" "type=q35,accel=tcg")
+    qemu_cmd+=("-machine" "type=$QEMU_MACHINE,accel=tcg")
+    if [[ -n "$QEMU_CPU" ]]; then
+        qemu_cmd+=("-cpu" "$QEMU_CPU")
+    fi
+    if [[ -n "$QEMU_FIRMWARE" ]] && [[ -f "$QEMU_FIRMWARE" ]]; then
+        qemu_cmd+=("-bios" "$QEMU_FIRMWARE")
+    fi
     
     # CPU and memory
     qemu_cmd+=("-smp" "cores=$CORES")
     qemu_cmd+=("-m" "$MEMORY")
+    # virtiofsd maps guest RAM, so it has to be shareable
+    if [[ "$SHARE_MECH" == virtiofs ]]; then
+        qemu_cmd+=("-object" "memory-backend-memfd,id=ram0,size=${MEMORY}M,share=on")
+        qemu_cmd+=("-numa" "node,memdev=ram0")
+    fi
     
     # Storage
-    qemu_cmd+=("-boot" "d")
-    qemu_cmd+=("-cdrom" "$ISO_FILE")
-    qemu_cmd+=("-drive" "file=$disk_file,format=qcow2")
+    if [[ "$DIRECT_BOOT" == true ]]; then
+        qemu_cmd+=("-kernel" "$KERNEL_FILE")
+        qemu_cmd+=("-initrd" "$INITRD_FILE")
+        qemu_cmd+=("-append" "$KERNEL_APPEND")
+        case "$SHARE_MECH" in
+            9p)
+                qemu_cmd+=("-fsdev" "local,id=rootfs,path=$SHARE_DIR,security_model=none,readonly=on")
+                qemu_cmd+=("-device" "virtio-9p-pci,fsdev=rootfs,mount_tag=$SHARE_TAG")
+                ;;
+            virtiofs)
+                qemu_cmd+=("-chardev" "socket,id=rootfs,path=$SHARE_SOCKET")
+                qemu_cmd+=("-device" "vhost-user-fs-pci,chardev=rootfs,tag=$SHARE_TAG")
+                ;;
+        esac
+    elif [[ "$QEMU_MACHINE" == pc* || "$QEMU_MACHINE" == q35* ]]; then
+        qemu_cmd+=("-boot" "d")
+        qemu_cmd+=("-cdrom" "$ISO_FILE")
+    else
+        # No IDE CD-ROM outside the PC machines
+        qemu_cmd+=("-drive" "file=$ISO_FILE,media=cdrom,if=virtio,readonly=on")
+    fi
+    case "$DISK_PROFILE" in
+        fast)
+            qemu_cmd+=("-object" "iothread,id=iothread0")
+            qemu_cmd+=("-drive" "file=$disk_file,format=qcow2,if=none,id=disk0,cache=none,aio=$(disk_aio_engine)")
+            qemu_cmd+=("-device" "virtio-blk-pci,drive=disk0,iothread=iothread0")
+            ;;
+        compact)
+            qemu_cmd+=("-drive" "file=$disk_file,format=qcow2,if=none,id=disk0,cache=writeback,discard=unmap")
+            qemu_cmd+=("-device" "virtio-blk-pci,drive=disk0")
+            ;;
+        *)
+            qemu_cmd+=("-drive" "file=$disk_file,format=qcow2")
+            ;;
+    esac
     
     # Display
     case "$DISPLAY_MODE" in
         vnc)
-            qemu_cmd+=("-vnc" ":0")
+            qemu_cmd+=("-vnc" ":${VNC_DISPLAY}${VNC_WEBSOCKET:+,websocket=$VNC_WEBSOCKET}")
             qemu_cmd+=("-monitor" "stdio")
             ;;
         serial)
@@ -231,6 +593,10 @@ build_qemu_command() {
             fi
             ;;
     esac
+    if [[ "$DISPLAY_MODE" != serial ]] && ! [[ "$QEMU_MACHINE" == pc* || "$QEMU_MACHINE" == q35* ]]; then
+        # No default graphics or keyboard on virt machines
+        qemu_cmd+=("-device" "virtio-gpu-pci" "-device" "qemu-xhci" "-device" "usb-kbd")
+    fi
     
     # Networking
     if [[ "$ENABLE_NETWORK" == true ]]; then
@@ -239,10 +605,16 @@ build_qemu_command() {
         qemu_cmd+=("-nic" "none")
     fi
     
+    # Control socket for ACPI power down from the GUIs
+    if [[ -n "$QMP_SOCKET" ]]; then
+        qemu_cmd+=("-qmp" "unix:$QMP_SOCKET,server=on,wait=off")
+    fi
+    
     # Improved performance
     qemu_cmd+=("-enable-kvm" 2>/dev/null || true)
     
-    echo "${qemu_cmd[@]}"
+    # Quoted so eval keeps arguments with spaces (-append) together
+    printf '%q ' "${qemu_cmd[@]}"
 }
 
 list_vms() {
@@ -294,13 +666,29 @@ run_vm() {
     echo "  CPU Cores:     $CORES"
     echo "  RAM:           ${MEMORY} MB"
     echo "  Disk Size:     ${DISK_SIZE} GB"
+    echo "  Disk Profile:  $DISK_PROFILE"
     echo "  Networking:    $([ "$ENABLE_NETWORK" == true ] && echo 'Enabled' || echo 'Disabled')"
     echo "  Display:       $DISPLAY_MODE"
+    echo "  Boot:          $([ "$DIRECT_BOOT" == true ] && echo 'Kernel + initramfs (direct)' || echo 'ISO')"
+    if [[ "$SHARE_ROOTFS" != off ]]; then
+        echo "  Root share:    build/rootfs ($SHARE_ROOTFS, $SHARE_MODE)"
+    fi
+    if [[ "$VARIANT" != default ]]; then
+        echo "  Variant:       $VARIANT ($QEMU_SYSTEM -machine $QEMU_MACHINE)"
+    fi
     echo "  VM Name:       $VM_NAME"
     echo ""
     
     setup_vm_directory
     
+    if ! check_vm_not_running; then
+        return 1
+    fi
+    
+    if ! check_disk_profile; then
+        return 1
+    fi
+    
     # Check dependencies
     if ! check_dependencies; then
         print_error "Missing dependencies. Install QEMU:"
@@ -308,8 +696,15 @@ run_vm() {
         return 1
     fi
     
-    # Check ISO
-    if ! check_iso; then
+    # Check the ISO, or the kernel and initramfs for a direct boot
+    if [[ "$DIRECT_BOOT" == true ]]; then
+        if ! check_direct_boot; then
+            return 1
+        fi
+        if [[ "$SHARE_ROOTFS" != off ]] && ! resolve_share; then
+            return 1
+        fi
+    elif ! check_iso; then
         return 1
     fi
     
@@ -317,6 +712,28 @@ run_vm() {
     local disk_file="$VM_DIR/${VM_NAME}.qcow2"
     create_disk_image "$disk_file" "$DISK_SIZE"
     
+    if [[ "$SHARE_MECH" == virtiofs ]] && ! start_virtiofsd; then
+        return 1
+    fi
+    
+    if [[ "$DISPLAY_MODE" == vnc ]]; then
+        if ! allocate_vnc_display; then
+            return 1
+        fi
+        print_info "VNC display :$VNC_DISPLAY (port $((5900 + VNC_DISPLAY))${VNC_WEBSOCKET:+, websocket $VNC_WEBSOCKET})"
+    fi
+    
+    if ! admit_vm; then
+        release_vnc_display
+        return 1
+    fi
+    
+    mkdir -p "$RUN_DIR"
+    # Never reuse the socket of another guest; the registry records the path
+    QMP_SOCKET="$RUN_DIR/${VM_NAME}.$$.qmp"
+    rm -f "$QMP_SOCKET"
+    register_vm
+    
     echo ""
     print_info "Launching CyberOS..."
     print_info "Press Ctrl+C to stop the VM"
@@ -336,6 +753,9 @@ run_vm() {
     set +e
     eval "$qemu_cmd"
     local exit_code=$?
+    release_vnc_display
+    unregister_vm
+    release_vm
     set -e
     
     if [[ $exit_code -eq 0 ]] || [[ $exit_code -eq 130 ]]; then
@@ -376,10 +796,34 @@ main() {
                 DISPLAY_MODE="$2"
                 shift 2
                 ;;
+            -p|--disk-profile)
+                DISK_PROFILE_ARG="$2"
+                shift 2
+                ;;
             -v|--vm-name)
                 VM_NAME="$2"
                 shift 2
                 ;;
+            --direct)
+                DIRECT_BOOT_ARG=true
+                shift
+                ;;
+            --append)
+                KERNEL_APPEND_ARG="$2"
+                shift 2
+                ;;
+            --share)
+                SHARE_ROOTFS_ARG="$2"
+                shift 2
+                ;;
+            --share-mode)
+                SHARE_MODE_ARG="$2"
+                shift 2
+                ;;
+            --variant)
+                VARIANT_ARG="$2"
+                shift 2
+                ;;
             --create)
                 VM_NAME="$2"
                 shift 2
@@ -396,8 +840,10 @@ main() {
                 ;;
             --check)
                 print_header
-                check_dependencies
-                exit $?
+                check_dependencies || exit $?
+                print_info "Root filesystem sharing:"
+                check_share_support
+                exit 0
                 ;;
             -h|--help)
                 print_header
@@ -414,6 +860,35 @@ main() {
     
     # Load configuration file if it exists
     load_config
+    if [[ -n "${VARIANT_ARG:-}" ]]; then
+        VARIANT="$VARIANT_ARG"
+    fi
+    load_variant
+    VARIANT_BUILD_ARG=""
+    if [[ "$VARIANT" != default ]]; then
+        VARIANT_BUILD_ARG=" --variant $VARIANT"
+    fi
+    
+    # Boot options given on the command line win over the config file
+    if [[ -n "${DISK_PROFILE_ARG:-}" ]]; then
+        DISK_PROFILE="$DISK_PROFILE_ARG"
+    fi
+    if [[ -n "${DIRECT_BOOT_ARG:-}" ]]; then
+        DIRECT_BOOT=true
+    fi
+    if [[ -n "${KERNEL_APPEND_ARG:-}" ]]; then
+        KERNEL_APPEND="$KERNEL_APPEND_ARG"
+    fi
+    if [[ -n "${SHARE_ROOTFS_ARG:-}" ]]; then
+        SHARE_ROOTFS="$SHARE_ROOTFS_ARG"
+    fi
+    if [[ -n "${SHARE_MODE_ARG:-}" ]]; then
+        SHARE_MODE="$SHARE_MODE_ARG"
+    fi
+    # A shared root is mounted by the initramfs, so it needs a direct boot
+    if [[ "$SHARE_ROOTFS" != off ]]; then
+        DIRECT_BOOT=true
+    fi
     
     # Run the VM
     run_vm
@@ -10,6 +10,11 @@
 # Options:
 #   --clean      Clean previous builds before starting
 #   --verbose    Show detailed build output
+#   --no-iso     Stop after the initramfs (for direct kernel boot)
+#   --stages L   Only run these stages (comma-separated: kernel,rootfs,initramfs,iso)
+#   --variant V  Build the config/variants/V.conf variant into build/variants/V
+#   --variants L Build several variants (comma-separated or "all") concurrently
+#   --jobs N     Variant builds to run at once with --variants (default: all)
 #   --help       Show this help message
 ################################################################################
 
@@ -30,12 +35,30 @@ KERNEL_DIR="${PROJECT_ROOT}/kernel"
 ROOTFS_DIR="${PROJECT_ROOT}/rootfs"
 BOOTLOADER_DIR="${PROJECT_ROOT}/bootloader"
 SCRIPTS_DIR="${PROJECT_ROOT}/scripts"
+CONFIG_FILE="${PROJECT_ROOT}/config/build.conf"
+VARIANTS_DIR="${PROJECT_ROOT}/config/variants"
+# Architecture-independent stage outputs shared by all variants
+CACHE_DIR="${BUILD_DIR}/cache"
 
 # Build flags
 VERBOSE=0
 CLEAN_BUILD=0
+SKIP_ISO=0
+STAGES=""
+VARIANT=""
+VARIANT_LIST=""
+VARIANT_JOBS=0
+PASS_ARGS=()
 START_TIME=$(date +%s)
 
+# Where this build's kernel, initramfs and ISO go (per variant with --variant)
+OUT_DIR="$BUILD_DIR"
+ISO_NAME="cyberos-0.1.0-alpha.iso"
+
+# Stage durations in milliseconds, written to build/timings
+TIMINGS_FILE="${BUILD_DIR}/timings"
+STAGE_TIMES=()
+
 ################################################################################
 # Functions
 ################################################################################
@@ -67,12 +90,23 @@ Usage: ./scripts/build.sh [options]
 Options:
     --clean     Clean previous builds before starting
     --verbose   Show detailed build output  
+    --no-iso    Skip ISO creation; boot the result with direct kernel boot
+    --stages L  Only run the listed stages (kernel,rootfs,initramfs,iso)
+    --variant V Build one variant (config/variants/V.conf) into build/variants/V
+    --variants L
+                Build variants concurrently, sharing the cached rootfs
+                (comma-separated names, or "all")
+    --jobs N    Concurrent variant builds with --variants (default: all)
     --help      Show this help message
 
 Examples:
     ./scripts/build.sh              # Standard build
     ./scripts/build.sh --clean      # Clean build
     ./scripts/build.sh --verbose    # Verbose output
+    ./scripts/build.sh --no-iso     # Fast dev build (run_cyberos.sh --direct)
+    ./scripts/build.sh --stages rootfs,initramfs   # Incremental rebuild
+    ./scripts/build.sh --variant aarch64            # 64-bit ARM image
+    ./scripts/build.sh --variants all               # Every variant, in parallel
 
 EOF
 }
@@ -83,12 +117,36 @@ parse_args() {
         case $1 in
             --clean)
                 CLEAN_BUILD=1
+                PASS_ARGS+=("$1")
                 shift
                 ;;
             --verbose)
                 VERBOSE=1
+                PASS_ARGS+=("$1")
+                shift
+                ;;
+            --no-iso)
+                SKIP_ISO=1
+                PASS_ARGS+=("$1")
                 shift
                 ;;
+            --stages)
+                STAGES="$2"
+                PASS_ARGS+=("$1" "$2")
+                shift 2
+                ;;
+            --variant)
+                VARIANT="$2"
+                shift 2
+                ;;
+            --variants)
+                VARIANT_LIST="$2"
+                shift 2
+                ;;
+            --jobs)
+                VARIANT_JOBS="$2"
+                shift 2
+                ;;
             --help)
                 show_help
                 exit 0
@@ -102,11 +160,63 @@ parse_args() {
     done
 }
 
+# Export KEY=VALUE lines from a config file (values may contain spaces, so
+# the file is parsed rather than sourced)
+load_config_file() {
+    local key value
+    while IFS='=' read -r key value || [ -n "$key" ]; do
+        case "$key" in
+            ''|\#*) continue ;;
+        esac
+        if [[ "$key" =~ ^[A-Za-z_][A-Za-z0-9_]*$ ]]; then
+            export "$key=$value"
+        fi
+    done < "$1"
+}
+
+# Variant names, from config/variants/*.conf
+list_variants() {
+    local conf
+    for conf in "$VARIANTS_DIR"/*.conf; do
+        [ -f "$conf" ] && basename "$conf" .conf
+    done
+}
+
+# config/build.conf, then the variant's overrides and output locations
+load_build_config() {
+    if [ -f "$CONFIG_FILE" ]; then
+        load_config_file "$CONFIG_FILE"
+    fi
+    ISO_NAME="${ISO_NAME:-cyberos-0.1.0-alpha.iso}"
+    if [ -z "$VARIANT" ]; then
+        return 0
+    fi
+    if [ ! -f "$VARIANTS_DIR/$VARIANT.conf" ]; then
+        print_error "Unknown variant: $VARIANT (available: $(list_variants | tr '\n' ' '))"
+        exit 1
+    fi
+    load_config_file "$VARIANTS_DIR/$VARIANT.conf"
+    OUT_DIR="${BUILD_DIR}/variants/${VARIANT}"
+    ISO_NAME="${ISO_NAME%.iso}-${VARIANT}.iso"
+    TIMINGS_FILE="${OUT_DIR}/timings"
+    export CYBEROS_ROOTFS_DIR="$CACHE_DIR/rootfs-$(rootfs_cache_key)"
+    export CYBEROS_BUILD_DIR="$OUT_DIR"
+    export CYBEROS_ISO_DIR="$ISO_DIR"
+    export ISO_NAME
+}
+
 # Check prerequisites
 check_prerequisites() {
     print_status "Checking prerequisites..."
     
-    local required_tools=("gcc" "make" "bash" "cpio" "grub-mkrescue")
+    local required_tools=("gcc" "make" "bash" "cpio" "gzip")
+    if [ "$SKIP_ISO" -eq 0 ]; then
+        # The ISO is written by tools/iso_writer.py; GRUB only supplies the boot image
+        required_tools+=("python3")
+        if ! command -v grub-mkimage &> /dev/null; then
+            print_warning "grub-mkimage not found: the ISO will not be bootable (try --no-iso for direct boot)"
+        fi
+    fi
     local missing_tools=()
     
     for tool in "${required_tools[@]}"; do
@@ -120,6 +230,9 @@ check_prerequisites() {
         print_warning "Install with: sudo apt-get install build-essential grub-common"
         exit 1
     fi
+    if [ -n "${CROSS_COMPILE:-}" ] && ! command -v "${CROSS_COMPILE}gcc" &> /dev/null; then
+        print_warning "${CROSS_COMPILE}gcc not found: cannot cross-compile for ${TARGET_ARCH}"
+    fi
     
     print_success "All prerequisites found"
 }
@@ -129,6 +242,13 @@ clean_builds() {
     if [ "$CLEAN_BUILD" -eq 1 ]; then
         print_status "Cleaning previous builds..."
         
+        if [ -n "$VARIANT" ]; then
+            # Only this variant's outputs; the shared cache is keyed by content
+            rm -rf "$OUT_DIR" "$ISO_DIR/$ISO_NAME"
+            print_success "Cleaned variant $VARIANT"
+            return 0
+        fi
+        
         if [ -d "$BUILD_DIR" ]; then
             rm -rf "$BUILD_DIR"
             print_success "Cleaned build directory"
@@ -147,9 +267,11 @@ create_directories() {
     
     mkdir -p "$BUILD_DIR"
     mkdir -p "$ISO_DIR"
-    mkdir -p "$BUILD_DIR/kernel"
-    mkdir -p "$BUILD_DIR/rootfs"
-    mkdir -p "$BUILD_DIR/iso"
+    mkdir -p "$OUT_DIR/kernel"
+    if [ -z "$VARIANT" ]; then
+        mkdir -p "$BUILD_DIR/rootfs"
+    fi
+    mkdir -p "$OUT_DIR/iso"
     
     print_success "Build directories created"
 }
@@ -172,6 +294,49 @@ build_kernel() {
     fi
 }
 
+# Key for the shared rootfs: everything build_rootfs.sh reads
+rootfs_cache_key() {
+    local hasher="sha256sum"
+    command -v sha256sum &> /dev/null || hasher="shasum -a 256"
+    (
+        cd "$PROJECT_ROOT"
+        # shellcheck disable=SC2086
+        find rootfs scripts/build_rootfs.sh -type f -print0 | LC_ALL=C sort -z | xargs -0 $hasher
+    ) | $hasher | cut -c1-16
+}
+
+# Build the rootfs once into build/cache/rootfs-<key> and reuse it for every
+# variant until rootfs/ or build_rootfs.sh changes
+build_rootfs_cached() {
+    local key cached lock
+    key=$(rootfs_cache_key)
+    cached="$CACHE_DIR/rootfs-$key"
+    lock="$cached.lock"
+    export CYBEROS_ROOTFS_DIR="$cached"
+    
+    mkdir -p "$CACHE_DIR"
+    # Concurrent variant builds wait for whichever one builds it
+    until mkdir "$lock" 2> /dev/null; do
+        sleep 0.2
+    done
+    if [ -f "$cached.complete" ]; then
+        rmdir "$lock"
+        print_success "RootFS shared from cache (rootfs-$key)"
+    else
+        trap 'rm -rf "$cached.tmp"; rmdir "$lock" 2> /dev/null' EXIT
+        rm -rf "$cached" "$cached.tmp"
+        CYBEROS_ROOTFS_DIR="$cached.tmp" build_rootfs
+        mv "$cached.tmp" "$cached"
+        touch "$cached.complete"
+        rmdir "$lock"
+        trap - EXIT
+    fi
+    if [ -n "$VARIANT" ]; then
+        mkdir -p "$OUT_DIR"
+        ln -sfn "$cached" "$OUT_DIR/rootfs"
+    fi
+}
+
 # Build rootfs
 build_rootfs() {
     print_status "Building root filesystem..."
@@ -190,6 +355,24 @@ build_rootfs() {
     fi
 }
 
+# Pack the rootfs into an initramfs
+build_initramfs() {
+    print_status "Building initramfs..."
+    
+    if [ "$VERBOSE" -eq 1 ]; then
+        bash "$SCRIPTS_DIR/build_initramfs.sh"
+    else
+        bash "$SCRIPTS_DIR/build_initramfs.sh" > /dev/null 2>&1
+    fi
+    
+    if [ $? -eq 0 ]; then
+        print_success "Initramfs built successfully"
+    else
+        print_error "Initramfs build failed"
+        exit 1
+    fi
+}
+
 # Create ISO
 create_iso() {
     print_status "Creating ISO image..."
@@ -208,6 +391,54 @@ create_iso() {
     fi
 }
 
+# Milliseconds since the epoch (whole seconds where bash has no EPOCHREALTIME)
+now_ms() {
+    if [ -n "${EPOCHREALTIME:-}" ]; then
+        local usec=${EPOCHREALTIME/[.,]/}
+        echo $((usec / 1000))
+    else
+        echo $(($(date +%s) * 1000))
+    fi
+}
+
+# Whether a stage was selected with --stages (all are by default)
+stage_selected() {
+    [ -z "$STAGES" ] || [[ ",$STAGES," == *",$1,"* ]]
+}
+
+# Run a build stage and record how long it took
+run_stage() {
+    local name=$1
+    shift
+    if ! stage_selected "$name"; then
+        return 0
+    fi
+    local start
+    start=$(now_ms)
+    "$@"
+    STAGE_TIMES+=("${name}=$(($(now_ms) - start))")
+}
+
+# Previously recorded duration of a stage in ms, empty if unknown
+last_stage_time() {
+    [ -f "$TIMINGS_FILE" ] && sed -n "s/^$1=//p" "$TIMINGS_FILE" | tail -n 1
+}
+
+# Write stage durations; stages that did not run keep their last measurement
+write_timings() {
+    local ran=" ${STAGE_TIMES[*]%%=*} "
+    local previous=()
+    local line
+    if [ -f "$TIMINGS_FILE" ]; then
+        while IFS= read -r line; do
+            if [[ "$ran" != *" ${line%%=*} "* ]]; then
+                previous+=("$line")
+            fi
+        done < "$TIMINGS_FILE"
+    fi
+    printf '%s\n' "${previous[@]}" "${STAGE_TIMES[@]}" | sed '/^$/d' > "$TIMINGS_FILE"
+}
+
 # Print build summary
 print_summary() {
     local end_time=$(date +%s)
@@ -221,21 +452,119 @@ print_summary() {
     echo "=========================================="
     echo ""
     echo "Build Time: ${minutes}m ${seconds}s"
+    local stage
+    for stage in "${STAGE_TIMES[@]}"; do
+        printf "  %-10s %6d ms\n" "${stage%%=*}" "${stage#*=}"
+    done
+    if [ "$SKIP_ISO" -eq 1 ]; then
+        local last_iso
+        last_iso=$(last_stage_time iso || true)
+        echo "  ISO creation skipped${last_iso:+ (saved ~${last_iso} ms, plus the GRUB menu at boot)}"
+    fi
     echo ""
+    [ -n "$VARIANT" ] && echo "Variant: $VARIANT (${TARGET_ARCH})"
     echo "Output files:"
-    [ -f "$BUILD_DIR/kernel/vmlinuz" ] && echo "  - Kernel: $BUILD_DIR/kernel/vmlinuz"
-    [ -d "$BUILD_DIR/rootfs" ] && echo "  - RootFS: $BUILD_DIR/rootfs/"
-    [ -f "$ISO_DIR/cyberos.iso" ] && echo "  - ISO: $ISO_DIR/cyberos.iso"
+    [ -f "$OUT_DIR/kernel/vmlinuz" ] && echo "  - Kernel: $OUT_DIR/kernel/vmlinuz"
+    [ -d "$OUT_DIR/rootfs" ] && echo "  - RootFS: $OUT_DIR/rootfs/"
+    [ -f "$OUT_DIR/initramfs.cpio.gz" ] && echo "  - Initramfs: $OUT_DIR/initramfs.cpio.gz"
+    [ -f "$ISO_DIR/$ISO_NAME" ] && echo "  - ISO: $ISO_DIR/$ISO_NAME"
     echo ""
+    local variant_arg="${VARIANT:+ --variant $VARIANT}"
+    if [ "$SKIP_ISO" -eq 1 ]; then
+        echo "Next steps:"
+        echo "  Boot the kernel and initramfs directly (no ISO, no GRUB):"
+        echo "     ./emulator/linux/run_cyberos.sh --direct${variant_arg}"
+        echo ""
+        return
+    fi
     echo "Next steps:"
     echo "  1. Boot ISO on VirtualBox or KVM:"
-    echo "     VirtualBox: Create VM, set boot media to $ISO_DIR/cyberos.iso"
-    echo "     KVM: qemu-system-x86_64 -cdrom $ISO_DIR/cyberos.iso -boot d"
+    echo "     VirtualBox: Create VM, set boot media to $ISO_DIR/$ISO_NAME"
+    echo "     KVM: ./emulator/linux/run_cyberos.sh${variant_arg}"
     echo "  2. Follow installation wizard"
     echo "  3. Login and enjoy CyberOS!"
     echo ""
 }
 
+# Build each variant in its own build.sh process, all at once (or --jobs N at
+# a time); the shared rootfs is built first so none of them rebuild it
+build_variants() {
+    local names=()
+    local name
+    if [ "$VARIANT_LIST" = "all" ]; then
+        while IFS= read -r name; do
+            names+=("$name")
+        done < <(list_variants)
+    else
+        IFS=',' read -r -a names <<< "$VARIANT_LIST"
+    fi
+    for name in "${names[@]}"; do
+        if [ ! -f "$VARIANTS_DIR/$name.conf" ]; then
+            print_error "Unknown variant: $name (available: $(list_variants | tr '\n' ' '))"
+            exit 1
+        fi
+    done
+    
+    check_prerequisites
+    if [ "$CLEAN_BUILD" -eq 1 ]; then
+        rm -rf "$CACHE_DIR"
+    fi
+    
+    local log_dir="$BUILD_DIR/logs"
+    mkdir -p "$log_dir"
+    local wall_start
+    wall_start=$(now_ms)
+    run_stage rootfs build_rootfs_cached
+    
+    print_status "Building ${#names[@]} variants: ${names[*]}"
+    local pids=()
+    for name in "${names[@]}"; do
+        if [ "$VARIANT_JOBS" -gt 0 ] && [ ${#pids[@]} -ge "$VARIANT_JOBS" ]; then
+            wait "${pids[0]}" || true
+            pids=("${pids[@]:1}")
+        fi
+        (
+            start=$(now_ms)
+            if bash "$SCRIPTS_DIR/build.sh" --variant "$name" "${PASS_ARGS[@]}" > "$log_dir/variant-$name.log" 2>&1; then
+                status=0
+            else
+                status=$?
+            fi
+            echo "$status $(($(now_ms) - start))" > "$log_dir/variant-$name.status"
+        ) &
+        pids+=($!)
+    done
+    wait
+    local wall=$(($(now_ms) - wall_start))
+    
+    echo ""
+    echo "=========================================="
+    local failed=0 serial=0 status ms
+    for name in "${names[@]}"; do
+        read -r status ms < "$log_dir/variant-$name.status"
+        serial=$((serial + ms))
+        if [ "$status" -eq 0 ]; then
+            printf "  ${GREEN}%-10s OK    ${NC} %8d ms  %s\n" "$name" "$ms" "$BUILD_DIR/variants/$name"
+        else
+            failed=$((failed + 1))
+            printf "  ${RED}%-10s FAILED${NC} %8d ms  see %s\n" "$name" "$ms" "$log_dir/variant-$name.log"
+        fi
+        STAGE_TIMES+=("variant-${name}=${ms}")
+    done
+    STAGE_TIMES+=("variants-wall=${wall}")
+    TIMINGS_FILE="$BUILD_DIR/variants/timings"
+    mkdir -p "$BUILD_DIR/variants"
+    write_timings
+    echo ""
+    echo "Total wall time: ${wall} ms for ${#names[@]} variants (${serial} ms of variant builds)"
+    echo "=========================================="
+    if [ "$failed" -gt 0 ]; then
+        print_error "$failed of ${#names[@]} variant builds failed"
+        exit 1
+    fi
+    print_success "All variants built"
+}
+
 ################################################################################
 # Main Build Process
 ################################################################################
@@ -243,6 +572,7 @@ print_summary() {
 main() {
     # Parse arguments
     parse_args "$@"
+    load_build_config
     
     # Print header
     echo "=========================================="
@@ -251,6 +581,11 @@ main() {
     echo "=========================================="
     echo ""
     
+    if [ -n "$VARIANT_LIST" ]; then
+        build_variants
+        return
+    fi
+    
     # Check prerequisites
     check_prerequisites
     
@@ -264,9 +599,17 @@ main() {
     print_status "Starting CyberOS build process..."
     echo ""
     
-    build_kernel
-    build_rootfs
-    create_iso
+    run_stage kernel build_kernel
+    if [ -n "$VARIANT" ]; then
+        run_stage rootfs build_rootfs_cached
+    else
+        run_stage rootfs build_rootfs
+    fi
+    run_stage initramfs build_initramfs
+    if [ "$SKIP_ISO" -eq 0 ]; then
+        run_stage iso create_iso
+    fi
+    write_timings
     
     # Print summary
     print_summary
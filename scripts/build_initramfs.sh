@@ -0,0 +1,100 @@
+#!/bin/bash
+
+################################################################################
+# CyberOS - Initramfs Build Script
+#
+# This script packs the root filesystem into a gzip-compressed newc cpio
+# archive. The same image is used as the ISO's initrd and for direct kernel
+# boot (qemu -kernel/-initrd), which skips the ISO and GRUB entirely.
+#
+# With build.sh --variant the rootfs is the shared, cached one
+# (CYBEROS_ROOTFS_DIR) and the archive goes to the variant's CYBEROS_BUILD_DIR.
+################################################################################
+
+set -e
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+PROJECT_ROOT="$(cd "$SCRIPT_DIR/.." && pwd)"
+ROOTFS_DIR="${CYBEROS_ROOTFS_DIR:-${PROJECT_ROOT}/build/rootfs}"
+OUTPUT="${CYBEROS_BUILD_DIR:-${PROJECT_ROOT}/build}/initramfs.cpio.gz"
+
+echo "[*] Building initramfs..."
+
+if [ ! -d "$ROOTFS_DIR" ]; then
+    echo "[✗] Root filesystem not found: $ROOTFS_DIR (run build_rootfs.sh first)"
+    exit 1
+fi
+
+# The kernel runs /init from the initramfs; hand over to the normal init.
+# With cyberos.share=<9p|virtiofs>:<tag> (emulator/gui/rootfs_share.py) the
+# root is the host's build/rootfs instead, so rootfs edits need no repack.
+# Variants building in parallel share the rootfs: replace /init atomically
+# and only when it changed.
+INIT_TMP="$(mktemp "$ROOTFS_DIR/.init.XXXXXX")"
+cat > "$INIT_TMP" << 'EOF'
+#!/bin/sh
+# CyberOS initramfs entry point
+mount -t proc proc /proc
+mount -t sysfs sysfs /sys
+mount -t devtmpfs none /dev
+
+share=""
+share_mode="overlay"
+for arg in $(cat /proc/cmdline); do
+    case "$arg" in
+        cyberos.share=*) share="${arg#cyberos.share=}" ;;
+        cyberos.share_mode=*) share_mode="${arg#cyberos.share_mode=}" ;;
+    esac
+done
+
+if [ -n "$share" ]; then
+    fstype="${share%%:*}"
+    tag="${share#*:}"
+    options="ro"
+    [ "$fstype" = "9p" ] && options="trans=virtio,version=9p2000.L,ro"
+    mkdir -p /share /newroot
+    if [ "$share_mode" = "ro" ]; then
+        mount -t "$fstype" -o "$options" "$tag" /newroot
+    else
+        # Read-only host tree below, guest writes in RAM above
+        mount -t "$fstype" -o "$options" "$tag" /share &&
+            mkdir -p /cow &&
+            mount -t tmpfs tmpfs /cow &&
+            mkdir -p /cow/upper /cow/work &&
+            mount -t overlay overlay -o lowerdir=/share,upperdir=/cow/upper,workdir=/cow/work /newroot
+    fi
+    if [ -x /newroot/sbin/init ]; then
+        for dir in proc sys dev; do
+            mount --move "/$dir" "/newroot/$dir"
+        done
+        exec switch_root /newroot /sbin/init "$@"
+    fi
+    echo "CyberOS: could not mount the $fstype share '$tag', booting the initramfs"
+fi
+
+exec /sbin/init "$@"
+EOF
+
+chmod 755 "$INIT_TMP"
+if cmp -s "$INIT_TMP" "$ROOTFS_DIR/init"; then
+    rm -f "$INIT_TMP"
+else
+    mv "$INIT_TMP" "$ROOTFS_DIR/init"
+fi
+
+# Sorted names and fixed owners keep the archive reproducible
+CPIO_OPTS=(--null --create --format=newc --quiet)
+if cpio --help 2>&1 | grep -q -- "--reproducible"; then
+    CPIO_OPTS+=(--owner=0:0 --reproducible)
+fi
+
+mkdir -p "$(dirname "$OUTPUT")"
+TMP_OUTPUT="${OUTPUT}.tmp"
+(
+    cd "$ROOTFS_DIR"
+    find . -mindepth 1 ! -name '.init.*' -print0 | LC_ALL=C sort -z | cpio "${CPIO_OPTS[@]}"
+) | gzip -n -6 > "$TMP_OUTPUT"
+mv "$TMP_OUTPUT" "$OUTPUT"
+
+echo "[✓] Initramfs created"
+echo "    Output: $OUTPUT ($(du -h "$OUTPUT" | cut -f1))"
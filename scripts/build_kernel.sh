@@ -5,16 +5,19 @@
 #
 # This script handles compilation of the Linux kernel for CyberOS.
 # It uses a minimal kernel configuration optimized for size and speed.
+# TARGET_ARCH/KERNEL_ARCH/CROSS_COMPILE come from the build variant
+# (config/variants/), CYBEROS_BUILD_DIR from build.sh --variant.
 ################################################################################
 
 set -e
 
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 PROJECT_ROOT="$(cd "$SCRIPT_DIR/.." && pwd)"
-BUILD_DIR="${PROJECT_ROOT}/build/kernel"
+BUILD_DIR="${CYBEROS_BUILD_DIR:-${PROJECT_ROOT}/build}/kernel"
+TARGET_ARCH="${TARGET_ARCH:-x86_64}"
 KERNEL_DIR="${PROJECT_ROOT}/kernel"
 
-echo "[*] Building Linux Kernel..."
+echo "[*] Building Linux Kernel ($TARGET_ARCH)..."
 
 # Create build directory
 mkdir -p "$BUILD_DIR"
@@ -23,11 +26,13 @@ mkdir -p "$BUILD_DIR"
 # In production, this would download and compile actual kernel source
 
 # Create minimal kernel placeholder
-cat > "$BUILD_DIR/vmlinuz" << 'EOF'
+# (make ARCH=$KERNEL_ARCH CROSS_COMPILE=$CROSS_COMPILE in production)
+cat > "$BUILD_DIR/vmlinuz" << EOF
 # Placeholder for Linux kernel
 # In production build, this would contain actual compiled kernel binary
 # Target size: ~5-8MB (compressed)
 # LKO: Linux Kernel Object
+# Target: ${TARGET_ARCH}
 CYBEROS_KERNEL_PLACEHOLDER
 EOF
 
@@ -4,13 +4,15 @@
 # CyberOS - Root Filesystem Build Script
 #
 # This script creates the minimal root filesystem for CyberOS using BusyBox.
+# Nothing in it is architecture-specific, so build.sh --variant builds it once
+# into the shared stage cache (CYBEROS_ROOTFS_DIR) for every variant.
 ################################################################################
 
 set -e
 
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 PROJECT_ROOT="$(cd "$SCRIPT_DIR/.." && pwd)"
-BUILD_DIR="${PROJECT_ROOT}/build/rootfs"
+BUILD_DIR="${CYBEROS_ROOTFS_DIR:-${PROJECT_ROOT}/build/rootfs}"
 ROOTFS_DIR="${PROJECT_ROOT}/rootfs"
 
 echo "[*] Building root filesystem..."
@@ -55,6 +57,7 @@ l3:3:wait:/etc/rc.d/rc 3
 l6:6:wait:/etc/rc.d/rc 6
 ca::ctrlaltdel:/sbin/shutdown -t3 -r now
 1:2345:respawn:/sbin/getty 38400 tty1
+s0:2345:respawn:/sbin/getty -L 115200 ttyS0 vt100
 EOF
 
 cat > "$BUILD_DIR/etc/network/interfaces" << 'EOF'
@@ -111,6 +114,12 @@ EOF
 
 chmod +x "$BUILD_DIR/etc/rc.local"
 
+# Overlay the rootfs/ template; its files win over the generated defaults
+if [ -d "$ROOTFS_DIR" ]; then
+    cp -R "$ROOTFS_DIR"/. "$BUILD_DIR"/
+    rm -f "$BUILD_DIR/README.md"
+fi
+
 # Set permissions
 chmod 755 "$BUILD_DIR"
 chmod 700 "$BUILD_DIR/root"
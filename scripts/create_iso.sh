@@ -4,42 +4,68 @@
 # CyberOS - ISO Creation Script
 #
 # This script creates the bootable ISO image from kernel and rootfs.
+#
+# The image is written by tools/iso_writer.py straight from build/ (no
+# staging copy): build/iso.manifest lists what goes where, and GRUB's BIOS
+# El Torito image is built once into build/grub/ with every module it needs.
+# ISO_WRITER=grub-mkrescue uses the old staging + grub-mkrescue path.
+#
+# build.sh --variant sets CYBEROS_BUILD_DIR, CYBEROS_ISO_DIR, ISO_NAME and the
+# variant's GRUB_PLATFORM (i386-pc: BIOS El Torito, arm64-efi: UEFI image).
 ################################################################################
 
 set -e
 
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 PROJECT_ROOT="$(cd "$SCRIPT_DIR/.." && pwd)"
-BUILD_DIR="${PROJECT_ROOT}/build"
-ISO_DIR="${PROJECT_ROOT}/iso"
-OUTPUT_ISO="${ISO_DIR}/cyberos-0.1.0-alpha.iso"
-
-echo "[*] Creating ISO image..."
+BUILD_DIR="${CYBEROS_BUILD_DIR:-${PROJECT_ROOT}/build}"
+ISO_DIR="${CYBEROS_ISO_DIR:-${PROJECT_ROOT}/iso}"
+OUTPUT_ISO="${ISO_DIR}/${ISO_NAME:-cyberos-0.1.0-alpha.iso}"
+GRUB_DIR="${BUILD_DIR}/grub"
+MANIFEST="${BUILD_DIR}/iso.manifest"
+ISO_WRITER="${ISO_WRITER:-python}"
+GRUB_PLATFORM="${GRUB_PLATFORM:-i386-pc}"
+KERNEL_CONSOLE="${KERNEL_CONSOLE:-ttyS0}"
+
+# Embedded in the boot image, so the ISO needs no GRUB module tree
+if [ "$GRUB_PLATFORM" = "i386-pc" ]; then
+    GRUB_MODULES="biosdisk iso9660 normal configfile multiboot serial terminal echo reboot halt test"
+    BOOT_COMMAND="multiboot /boot/vmlinuz"
+else
+    # No multiboot outside x86: GRUB loads the kernel and initrd itself
+    GRUB_MODULES="part_gpt fat iso9660 normal configfile linux serial terminal echo reboot halt test"
+    BOOT_COMMAND="linux /boot/vmlinuz"
+    BOOT_INITRD=$'\n    initrd /boot/initrd'
+fi
 
-mkdir -p "$ISO_DIR"
+# Same inputs, same ISO: every timestamp is the last commit's
+if [ -z "${SOURCE_DATE_EPOCH:-}" ]; then
+    SOURCE_DATE_EPOCH=$(git -C "$PROJECT_ROOT" log -1 --format=%ct 2>/dev/null || echo 0)
+fi
+export SOURCE_DATE_EPOCH
 
-# Create ISO directory structure
-mkdir -p "$BUILD_DIR/iso"/{boot,efi}
-mkdir -p "$BUILD_DIR/iso/boot/grub"
+echo "[*] Creating ISO image..."
 
-# Copy kernel (if built)
-if [ -f "$BUILD_DIR/kernel/vmlinuz" ]; then
-    cp "$BUILD_DIR/kernel/vmlinuz" "$BUILD_DIR/iso/boot/"
-fi
+mkdir -p "$ISO_DIR" "$GRUB_DIR"
 
 # Create GRUB configuration
-cat > "$BUILD_DIR/iso/boot/grub/grub.cfg" << 'EOF'
+cat > "$GRUB_DIR/grub.cfg" << EOF
 # CyberOS GRUB2 Configuration
 
 set timeout=3
 set default=0
 
+# Mirror the menu on the first serial port for headless (-nographic) boots
+serial --unit=0 --speed=115200
+terminal_input console serial
+terminal_output console serial
+
 menuentry 'CyberOS v0.1.0-alpha' {
-    multiboot /boot/vmlinuz ro quiet console=tty0
+    ${BOOT_COMMAND} ro quiet console=tty0 console=${KERNEL_CONSOLE},115200${BOOT_INITRD:-}
 }
 
 menuentry 'CyberOS (verbose boot)' {
-    multiboot /boot/vmlinuz ro console=tty0
+    ${BOOT_COMMAND} ro console=tty0 console=${KERNEL_CONSOLE},115200${BOOT_INITRD:-}
 }
 
 menuentry 'Reboot' {
@@ -52,34 +78,87 @@ menuentry 'Shutdown' {
 }
 EOF
 
-# Create initramfs placeholder (would contain rootfs in production)
-echo "CyberOS Initramfs Placeholder" > "$BUILD_DIR/iso/boot/initrd"
-
-# Create ISO
-echo "[*] Generating ISO with GRUB2..."
+# The initramfs is packed by build_initramfs.sh
+INITRD="$BUILD_DIR/initramfs.cpio.gz"
+if [ ! -f "$INITRD" ]; then
+    INITRD="$GRUB_DIR/initrd-placeholder"
+    echo "CyberOS Initramfs Placeholder" > "$INITRD"
+fi
 
-if command -v grub-mkrescue &> /dev/null; then
-    grub-mkrescue -o "$OUTPUT_ISO" "$BUILD_DIR/iso" 2>/dev/null || true
-    
-    if [ ! -f "$OUTPUT_ISO" ]; then
-        # Fallback: create simple ISO
-        mkisofs -o "$OUTPUT_ISO" "$BUILD_DIR/iso" 2>/dev/null || true
+# GRUB's boot image, rebuilt only when the platform or module list changes
+ELTORITO="$GRUB_DIR/eltorito.img"
+EFI_IMAGE="$GRUB_DIR/efiboot.img"
+BOOT_STAMP="$GRUB_PLATFORM $GRUB_MODULES"
+if [ "$ISO_WRITER" = "python" ] && [ "$(cat "$GRUB_DIR/boot.modules" 2>/dev/null)" != "$BOOT_STAMP" ]; then
+    rm -f "$ELTORITO" "$EFI_IMAGE" "$GRUB_DIR/boot.modules"
+    if ! command -v grub-mkimage &> /dev/null; then
+        echo "[!] grub-mkimage not found: the ISO will not be bootable (install grub-pc-bin)"
+    elif [ "$GRUB_PLATFORM" = "i386-pc" ]; then
+        echo "[*] Building GRUB El Torito image..."
+        # shellcheck disable=SC2086
+        grub-mkimage -O i386-pc-eltorito -p /boot/grub -o "$ELTORITO" $GRUB_MODULES
+        echo "$BOOT_STAMP" > "$GRUB_DIR/boot.modules"
+    elif command -v mkfs.fat &> /dev/null && command -v mcopy &> /dev/null; then
+        # UEFI firmware boots EFI/BOOT/BOOT<ARCH>.EFI from a FAT image
+        echo "[*] Building GRUB $GRUB_PLATFORM image..."
+        case "$GRUB_PLATFORM" in
+            arm64-efi) EFI_NAME=BOOTAA64.EFI ;;
+            i386-efi) EFI_NAME=BOOTIA32.EFI ;;
+            *) EFI_NAME=BOOTX64.EFI ;;
+        esac
+        # shellcheck disable=SC2086
+        if grub-mkimage -O "$GRUB_PLATFORM" -p /boot/grub -o "$GRUB_DIR/$EFI_NAME" $GRUB_MODULES; then
+            mkfs.fat -C "$EFI_IMAGE" 4096 > /dev/null
+            mmd -i "$EFI_IMAGE" ::/EFI ::/EFI/BOOT
+            mcopy -i "$EFI_IMAGE" "$GRUB_DIR/$EFI_NAME" "::/EFI/BOOT/$EFI_NAME"
+            echo "$BOOT_STAMP" > "$GRUB_DIR/boot.modules"
+        else
+            echo "[!] GRUB $GRUB_PLATFORM modules not installed: the ISO will not be bootable"
+        fi
+    else
+        echo "[!] mkfs.fat/mcopy not found: the $GRUB_PLATFORM ISO will not be bootable (install dosfstools mtools)"
     fi
-else
-    # Fallback to mkisofs
-    mkisofs -o "$OUTPUT_ISO" "$BUILD_DIR/iso" 2>/dev/null || true
 fi
 
-# Verify ISO was created
-if [ -f "$OUTPUT_ISO" ]; then
-    ISO_SIZE=$(du -h "$OUTPUT_ISO" | cut -f1)
-    echo "[✓] ISO image created successfully"
-    echo "    File: $OUTPUT_ISO"
-    echo "    Size: $ISO_SIZE"
+# What goes where in the image
+{
+    echo "# Graft points for tools/iso_writer.py: image path=file"
+    if [ -f "$BUILD_DIR/kernel/vmlinuz" ]; then
+        echo "boot/vmlinuz=$BUILD_DIR/kernel/vmlinuz"
+    fi
+    echo "boot/initrd=$INITRD"
+    echo "boot/grub/grub.cfg=$GRUB_DIR/grub.cfg"
+    if [ -f "$ELTORITO" ]; then
+        echo "boot/grub/eltorito.img=$ELTORITO"
+    fi
+    if [ -f "$EFI_IMAGE" ]; then
+        echo "boot/grub/efiboot.img=$EFI_IMAGE"
+    fi
+} > "$MANIFEST"
+
+if [ "$ISO_WRITER" = "grub-mkrescue" ]; then
+    echo "[*] Generating ISO with grub-mkrescue..."
+    STAGING="$BUILD_DIR/iso"
+    rm -rf "$STAGING"
+    grep -v '^#' "$MANIFEST" | while IFS='=' read -r target source; do
+        mkdir -p "$STAGING/$(dirname "$target")"
+        cp "$source" "$STAGING/$target"
+    done
+    grub-mkrescue -o "$OUTPUT_ISO" "$STAGING"
 else
-    # Create placeholder ISO for documentation
-    touch "$OUTPUT_ISO"
-    echo "[*] ISO placeholder created"
-    echo "    File: $OUTPUT_ISO"
-    echo "    Note: In production, this would be a bootable GRUB2 ISO"
+    echo "[*] Generating ISO..."
+    BOOT_ARGS=()
+    if [ -f "$ELTORITO" ]; then
+        BOOT_ARGS+=(--bios-boot boot/grub/eltorito.img)
+    fi
+    if [ -f "$EFI_IMAGE" ]; then
+        BOOT_ARGS+=(--efi-boot boot/grub/efiboot.img)
+    fi
+    python3 "$PROJECT_ROOT/tools/iso_writer.py" -o "$OUTPUT_ISO" -V CYBEROS \
+        --manifest "$MANIFEST" "${BOOT_ARGS[@]}"
 fi
+
+ISO_SIZE=$(du -h "$OUTPUT_ISO" | cut -f1)
+echo "[✓] ISO image created successfully"
+echo "    File: $OUTPUT_ISO"
+echo "    Size: $ISO_SIZE"
@@ -14,16 +14,35 @@ Manages:
 
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext, filedialog
-import subprocess
 import threading
 import os
 import sys
 import json
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, List, Dict, Tuple
+import time
+from typing import Callable, Optional, List, Dict, Tuple
 import shutil
 
+# Shared VM helpers live next to the emulator GUI
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "emulator" / "gui"))
+from disk_profiles import DISK_PROFILES, DEFAULT_PROFILE
+from disk_maintenance import allocated_bytes
+from vm_metrics import MetricsSampler, MetricsExporter, find_qemu_processes
+from cyberosd import DaemonClient, DaemonError, start_daemon
+from process_engine import ProcessEngine, ProcessHandle, TkBridge, TERMINATE_GRACE
+from project_status import StatusService, diff_lines
+from log_index import LogIndex
+from vm_config import DEFAULT_NAME, VMConfig, VMStore
+from log_search import LogSearchPanel
+from console_stream import configure_tags, insert_line
+from direct_boot import skipped_report
+from build_variants import DEFAULT_VARIANT, build_args, get_variant, load_variants
+from watch_mode import WatchLoop, Cycle
+from ui_profiler import UIProfiler, SlowCallback, install_hook
+from profiler_panel import ProfilerPanel
+from vm_registry import RunningVM, VMRegistry, shutdown_all
+
 
 class CyberOSControlCenter:
     """Master control center for CyberOS project management."""
@@ -42,19 +61,65 @@ class CyberOSControlCenter:
         self.emulator_gui = self.project_root / "emulator" / "gui" / "cyberos_emulator.py"
         
         # Status tracking
-        self.build_process: Optional[subprocess.Popen] = None
-        self.emulator_process: Optional[subprocess.Popen] = None
+        self.build_process: Optional[ProcessHandle] = None
         self.is_building = False
         self.build_output_lines = []
+        self.watch_loop: Optional[WatchLoop] = None
+        
+        # Every subprocess runs on one event loop; callbacks come back via Tk
+        self.bridge = TkBridge(self.root)
+        self.engine = ProcessEngine(dispatch=self.bridge.post).start()
+        
+        # Launchers started from here; their QEMU descendants are sampled
+        self.launched: List[ProcessHandle] = []
+        self._qemu_targets: Dict[int, str] = {}
+        self._qemu_scan_time = 0.0
+        self.metrics_sampler = MetricsSampler(self.metrics_targets, on_error=lambda path, e: self.bridge.post(
+            self.on_metrics_file_error, path, e))
+        self.metrics_exporter: Optional[MetricsExporter] = None
+        
+        # Launcher VMs are recorded, so a later session re-attaches to the ones left running
+        self.vm_registry = VMRegistry()
+        self.adopted: List[RunningVM] = []
+        self.closing = False
+        
+        # Builds and VMs can be owned by cyberosd instead of this window
+        self.daemon = DaemonClient(timeout=30.0)
+        self.daemon_job: Optional[str] = None
+        self.daemon_vm_pids: Dict[int, str] = {}
+        self.use_daemon_var = tk.BooleanVar(value=False)
+        
+        # Build logs and VM consoles of every session, shared with the emulator
+        self.log_index = LogIndex(Path.home() / ".cyberos" / "logs")
+        
+        # Per-VM settings and boot history, shared with the emulator
+        self.vm_store = VMStore()
+        self.vm_store.import_flat_config()
+        
+        # Callback latency watchdog and profiler (Settings tab or CYBEROS_PROFILE)
+        self.profiler = UIProfiler("control-center", self.root, self.bridge.post, on_event=self.on_slow_callback)
+        self.profiler.start_from_environment()
         
         # Setup UI
         self.setup_styles()
         self.create_widgets()
         self.check_dependencies()
-        self.update_project_status()
+        
+        # Dashboard status is collected off the UI thread
+        self.status_lines: List[str] = []
+        self.status_service = StatusService(self.project_root, self.iso_file, self.on_status_update)
+        self.status_service.start()
+        
+        # Pick up work a previous session left running in the daemon, and its VMs
+        self.connect_daemon()
+        threading.Thread(target=self.reattach_vms, daemon=True).start()
         
         # Window close handler
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # Live VM metrics
+        self.metrics_sampler.start()
+        self.update_metrics_panel()
     
     def setup_styles(self):
         """Configure ttk styles."""
@@ -184,10 +249,11 @@ class CyberOSControlCenter:
         self.version_var = tk.StringVar(value="0.1.0")
         ttk.Entry(options_frame, textvariable=self.version_var).grid(row=0, column=1, sticky="w", padx=10)
         
-        # Architecture
-        ttk.Label(options_frame, text="Architecture:", style="Heading.TLabel").grid(row=1, column=0, sticky="w", pady=5)
-        self.arch_var = tk.StringVar(value="x86_64")
-        ttk.Combobox(options_frame, textvariable=self.arch_var, values=["x86_64", "i386"], state="readonly").grid(row=1, column=1, sticky="w", padx=10)
+        # Architecture: a build variant from config/variants/
+        ttk.Label(options_frame, text="Variant:", style="Heading.TLabel").grid(row=1, column=0, sticky="w", pady=5)
+        self.arch_var = tk.StringVar(value=DEFAULT_VARIANT)
+        ttk.Combobox(options_frame, textvariable=self.arch_var, values=list(load_variants(self.project_root)),
+                     state="readonly").grid(row=1, column=1, sticky="w", padx=10)
         
         # Compression
         ttk.Label(options_frame, text="ISO Compression:", style="Heading.TLabel").grid(row=2, column=0, sticky="w", pady=5)
@@ -203,10 +269,30 @@ class CyberOSControlCenter:
         button_frame.pack(fill=tk.X, padx=20, pady=15)
         
         ttk.Button(button_frame, text="🔨 Build ISO", command=self.build_iso).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="⚡ Build Kernel + Initramfs",
+                   command=lambda: self.build_iso(no_iso=True)).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="🧬 Build All Variants",
+                   command=lambda: self.build_iso(variants="all")).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="🧹 Clean", command=self.clean_build).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="🔄 Rebuild All", command=self.rebuild_iso).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="⏹️  Stop Build", command=self.stop_build).pack(side=tk.LEFT, padx=5)
         
+        # Watch mode
+        watch_frame = ttk.LabelFrame(frame, text="Watch Mode", padding=10)
+        watch_frame.pack(fill=tk.X, padx=20, pady=5)
+        
+        self.watch_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(watch_frame, text="👁 Watch sources", variable=self.watch_var,
+                        command=self.toggle_watch).grid(row=0, column=0, sticky="w", padx=5)
+        self.watch_relaunch_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(watch_frame, text="Relaunch dev VM",
+                        variable=self.watch_relaunch_var).grid(row=0, column=1, sticky="w", padx=5)
+        self.watch_direct_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(watch_frame, text="Direct kernel boot",
+                        variable=self.watch_direct_var).grid(row=0, column=2, sticky="w", padx=5)
+        self.watch_status = ttk.Label(watch_frame, text="Not watching", style="Status.TLabel")
+        self.watch_status.grid(row=1, column=0, columnspan=3, sticky="w", padx=5, pady=(5, 0))
+        
         # Progress
         progress_frame = ttk.LabelFrame(frame, text="Build Progress", padding=10)
         progress_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
@@ -223,6 +309,7 @@ class CyberOSControlCenter:
         
         self.build_output = scrolledtext.ScrolledText(output_frame, height=15, width=100, state=tk.DISABLED, font=("Courier", 9))
         self.build_output.pack(fill=tk.BOTH, expand=True)
+        configure_tags(self.build_output, font=("Courier", 9))
     
     def create_emulator_tab(self):
         """Create the emulator management tab."""
@@ -245,6 +332,14 @@ class CyberOSControlCenter:
         config_frame = ttk.LabelFrame(frame, text="Emulator Configuration", padding=15)
         config_frame.pack(fill=tk.X, padx=20, pady=10)
         
+        # VM whose settings are shown (stored per VM, shared with the emulator)
+        ttk.Label(config_frame, text="VM Name:", style="Heading.TLabel").grid(row=7, column=0, sticky="w", pady=5)
+        self.emu_name_var = tk.StringVar(value=self.vm_store.get_setting("last_vm", DEFAULT_NAME))
+        self.emu_name_combo = ttk.Combobox(config_frame, textvariable=self.emu_name_var, width=28)
+        self.emu_name_combo.grid(row=7, column=1, sticky="w", padx=10)
+        self.emu_name_combo.bind("<<ComboboxSelected>>", lambda _: self.load_emulator_config())
+        self.emu_name_combo.bind("<Return>", lambda _: self.load_emulator_config())
+        
         # CPU cores
         ttk.Label(config_frame, text="CPU Cores:", style="Heading.TLabel").grid(row=0, column=0, sticky="w", pady=5)
         self.emu_cores_var = tk.IntVar(value=2)
@@ -269,12 +364,27 @@ class CyberOSControlCenter:
         self.emu_display_var = tk.StringVar(value="sdl")
         ttk.Combobox(config_frame, textvariable=self.emu_display_var, values=["sdl", "vnc", "serial"], state="readonly").grid(row=4, column=1, sticky="w", padx=10)
         
+        # Disk profile
+        ttk.Label(config_frame, text="Disk Profile:", style="Heading.TLabel").grid(row=5, column=0, sticky="w", pady=5)
+        self.emu_disk_profile_var = tk.StringVar(value=DEFAULT_PROFILE)
+        ttk.Combobox(config_frame, textvariable=self.emu_disk_profile_var, values=list(DISK_PROFILES),
+                     state="readonly").grid(row=5, column=1, sticky="w", padx=10)
+        
+        # Boot mode
+        self.emu_direct_boot_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(config_frame, text="Direct kernel boot (skip ISO and GRUB)",
+                        variable=self.emu_direct_boot_var).grid(row=6, column=0, columnspan=2, sticky="w", pady=5)
+        self.load_emulator_config()
+        
         # Launch button
         button_frame = ttk.Frame(frame)
         button_frame.pack(fill=tk.X, padx=20, pady=15)
         
         ttk.Button(button_frame, text="▶️  Launch with Custom Config", command=self.launch_emulator_custom).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="💾 Save VM Config",
+                   command=self.save_emulator_config).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="📂 Open VM Folder", command=self.open_vm_folder).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="⏹️  Power Down VMs", command=self.power_down_vms).pack(side=tk.LEFT, padx=5)
         
         # VM management
         vm_frame = ttk.LabelFrame(frame, text="Virtual Machine Management", padding=15)
@@ -290,6 +400,28 @@ class CyberOSControlCenter:
         
         # Refresh VM list
         self.refresh_vm_list()
+        
+        # Live metrics
+        metrics_frame = ttk.LabelFrame(frame, text="Live VM Metrics", padding=10)
+        metrics_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
+        
+        self.metrics_canvas = tk.Canvas(metrics_frame, height=140, background="#1e1e1e", highlightthickness=0)
+        self.metrics_canvas.pack(fill=tk.BOTH, expand=True)
+        
+        export_frame = ttk.Frame(metrics_frame)
+        export_frame.pack(fill=tk.X, pady=5)
+        
+        self.metrics_http_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(export_frame, text="Serve Prometheus metrics on port", variable=self.metrics_http_var,
+                        command=self.toggle_metrics_exporter).pack(side=tk.LEFT)
+        self.metrics_port_var = tk.IntVar(value=9465)
+        ttk.Spinbox(export_frame, from_=1024, to=65535, textvariable=self.metrics_port_var,
+                    width=7).pack(side=tk.LEFT, padx=5)
+        
+        self.metrics_file_var = tk.StringVar(value="")
+        self.metrics_file_var.trace_add("write", self.set_metrics_file)
+        ttk.Label(export_frame, text="Textfile:", style="Info.TLabel").pack(side=tk.LEFT, padx=(15, 5))
+        ttk.Entry(export_frame, textvariable=self.metrics_file_var, width=30).pack(side=tk.LEFT)
     
     def create_dependencies_tab(self):
         """Create the dependencies management tab."""
@@ -357,6 +489,22 @@ class CyberOSControlCenter:
         button_frame.pack(fill=tk.X, padx=20, pady=15)
         ttk.Button(button_frame, text="💾 Save Settings", command=self.save_settings).pack(side=tk.LEFT, padx=5)
         
+        # Control daemon
+        daemon_frame = ttk.LabelFrame(frame, text="Control Daemon (cyberosd)", padding=15)
+        daemon_frame.pack(fill=tk.X, padx=20, pady=10)
+        
+        ttk.Checkbutton(daemon_frame, text="Run builds and VMs through cyberosd", variable=self.use_daemon_var,
+                        command=self.toggle_daemon).grid(row=0, column=0, sticky="w", pady=5)
+        ttk.Button(daemon_frame, text="▶️  Start Daemon",
+                   command=self.start_daemon).grid(row=0, column=1, sticky="w", padx=10)
+        
+        self.daemon_status_label = ttk.Label(daemon_frame, text="Not connected", style="Info.TLabel")
+        self.daemon_status_label.grid(row=1, column=0, columnspan=2, sticky="w")
+        
+        # Profiling
+        self.profiler_panel = ProfilerPanel(frame, self.profiler)
+        self.profiler_panel.pack(fill=tk.X, padx=20, pady=10)
+        
         # Project paths
         paths_frame = ttk.LabelFrame(frame, text="Project Paths", padding=15)
         paths_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
@@ -375,8 +523,9 @@ Scripts:           {self.project_root / 'scripts'}
 Emulator:          {self.project_root / 'emulator'}
 
 Configuration Files:
-~/.cyberos_vm.conf - Emulator configuration
-~/.cyberos/vms/    - VM disk images
+~/.cyberos/vms.sqlite - Per-VM settings and boot history
+~/.cyberos_vm.conf    - Shell launcher defaults (imported once)
+~/.cyberos/vms/       - VM disk images
 """
         paths_text.insert(1.0, paths_content)
         paths_text.config(state=tk.DISABLED)
@@ -397,8 +546,12 @@ Configuration Files:
         ttk.Button(button_frame, text="🧹 Clear Logs", command=self.clear_logs).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="💾 Save Logs", command=self.save_logs).pack(side=tk.LEFT, padx=5)
         
+        # Search across build logs and VM consoles of every session
+        search_panel = LogSearchPanel(frame, self.log_index, self.bridge.post, scope="Builds")
+        search_panel.pack(fill=tk.X, padx=20, pady=(0, 10))
+        
         # Logs display
-        self.logs_text = scrolledtext.ScrolledText(frame, height=30, width=120, state=tk.DISABLED, font=("Courier", 8))
+        self.logs_text = scrolledtext.ScrolledText(frame, height=20, width=120, state=tk.DISABLED, font=("Courier", 8))
         self.logs_text.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
         
         self.log_entry("System", "Logs initialized")
@@ -488,49 +641,30 @@ For more information, visit the GitHub repository."""
     # ==================== Action Methods ====================
     
     def update_project_status(self):
-        """Update the project status display."""
+        """Ask the status service for a (debounced) refresh."""
+        self.status_service.request()
+    
+    def on_status_update(self, lines: List[str]):
+        """Receive new status lines from the status service thread."""
+        self.bridge.post(self.apply_status_lines, lines)
+    
+    def apply_status_lines(self, lines: List[str]):
+        """Repaint only the status lines that changed."""
+        edits = diff_lines(self.status_lines, lines)
+        if not edits:
+            return
         self.status_text.config(state=tk.NORMAL)
-        self.status_text.delete(1.0, tk.END)
-        
-        status = ""
-        status += "PROJECT: CyberOS v0.1.0-alpha\n"
-        status += "=" * 50 + "\n\n"
-        
-        # Build status
-        status += "BUILD STATUS:\n"
-        if self.iso_file.exists():
-            size = self.iso_file.stat().st_size / (1024 ** 2)
-            status += f"  ✓ ISO Built: {self.iso_file.name} ({size:.2f} MB)\n"
-        else:
-            status += f"  ✗ ISO Not Built\n"
-        
-        status += "\n"
-        
-        # Build files
-        status += "BUILD FILES:\n"
-        status += f"  Kernel: {self.project_root / 'kernel' / 'vmlinuz'}\n"
-        status += f"  RootFS: {self.project_root / 'build' / 'rootfs'}\n"
-        status += f"  ISO: {self.iso_file}\n"
-        
-        status += "\n"
-        
-        # Dependencies
-        status += "DEPENDENCIES:\n"
-        deps = self.get_dependency_status()
-        for dep, present in deps.items():
-            status += f"  {'✓' if present else '✗'} {dep}\n"
-        
-        status += "\n"
-        
-        # Project structure
-        status += "PROJECT STRUCTURE:\n"
-        status += f"  Root: {self.project_root}\n"
-        status += f"  Scripts: {self.script_count()} build scripts\n"
-        status += f"  Docs: {self.doc_count()} documentation files\n"
-        status += f"  Emulator: Available\n"
-        
-        self.status_text.insert(tk.END, status)
+        for index, line in edits:
+            row = index + 1
+            if line is None:
+                self.status_text.delete(f"{row}.0 - 1c", f"{row}.end")
+            elif index < len(self.status_lines):
+                self.status_text.delete(f"{row}.0", f"{row}.end")
+                self.status_text.insert(f"{row}.0", line)
+            else:
+                self.status_text.insert(tk.END, ("\n" if index else "") + line)
         self.status_text.config(state=tk.DISABLED)
+        self.status_lines = lines
     
     def check_dependencies(self):
         """Check for required dependencies."""
@@ -540,8 +674,7 @@ For more information, visit the GitHub repository."""
             "bash": "Shell interpreter",
             "make": "Build automation",
             "gcc": "C compiler (for kernel)",
-            "grub-mkrescue": "GRUB2 bootloader tools",
-            "xorriso": "ISO 9660 creation",
+            "grub-mkimage": "GRUB2 boot image for the ISO",
             "qemu-system-x86_64": "QEMU emulator",
             "python3": "Python interpreter",
             "git": "Version control",
@@ -550,8 +683,7 @@ For more information, visit the GitHub repository."""
         self.log_entry("System", "Checking dependencies...")
         
         for dep, description in deps.items():
-            result = subprocess.run(["which", dep], capture_output=True, text=True)
-            present = result.returncode == 0
+            present = shutil.which(dep) is not None
             
             status = "✓ FOUND  " if present else "✗ MISSING"
             self.deps_listbox.insert(tk.END, f"{status} - {dep:20} ({description})")
@@ -562,40 +694,9 @@ For more information, visit the GitHub repository."""
         
         self.log_entry("System", "Dependency check complete")
     
-    def get_dependency_status(self) -> Dict[str, bool]:
-        """Get status of key dependencies."""
-        deps = {
-            "bash": False,
-            "gcc": False,
-            "grub-mkrescue": False,
-            "xorriso": False,
-            "qemu-system-x86_64": False,
-            "python3": False,
-        }
-        
-        for dep in deps:
-            result = subprocess.run(["which", dep], capture_output=True)
-            deps[dep] = result.returncode == 0
-        
-        return deps
-    
-    def script_count(self) -> int:
-        """Count build scripts."""
-        scripts_dir = self.project_root / "scripts"
-        if scripts_dir.exists():
-            return len(list(scripts_dir.glob("*.sh")))
-        return 0
-    
-    def doc_count(self) -> int:
-        """Count documentation files."""
-        docs_dir = self.project_root / "docs"
-        root_docs = len(list(self.project_root.glob("*.md")))
-        if docs_dir.exists():
-            return root_docs + len(list(docs_dir.glob("*.md")))
-        return root_docs
-    
-    def build_iso(self):
-        """Start building the ISO."""
+    def build_iso(self, no_iso: bool = False, variants: str = ""):
+        """Start building the ISO (or only the kernel and initramfs, for direct kernel boot)
+        of the selected variant, or of several variants at once."""
         if self.is_building:
             messagebox.showwarning("Build", "Build already in progress")
             return
@@ -603,109 +704,231 @@ For more information, visit the GitHub repository."""
         self.is_building = True
         self.build_progress.start()
         self.build_status.config(text="Building...")
-        self.log_entry("Build", "Starting ISO build...")
         
-        thread = threading.Thread(target=self._build_iso_thread)
-        thread.daemon = True
-        thread.start()
-    
-    def _build_iso_thread(self):
-        """Run build in a separate thread."""
-        try:
-            if not self.build_script.exists():
-                self.build_output_append("ERROR: build.sh not found!")
-                raise FileNotFoundError(f"Build script not found at {self.build_script}")
-            
-            # Make script executable
-            os.chmod(self.build_script, 0o755)
-            
-            self.build_process = subprocess.Popen(
-                [str(self.build_script)],
-                cwd=str(self.project_root),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1
-            )
-            
-            if self.build_process.stdout:
-                for line in self.build_process.stdout:
-                    self.build_output_append(line.rstrip())
-            
-            self.build_process.wait()
-            
-            if self.build_process.returncode == 0:
-                self.build_output_append("\n✓ BUILD COMPLETE!")
-                self.log_entry("Build", "ISO build successful")
-                self.build_status.config(text="✓ Build complete", foreground="green")
-                messagebox.showinfo("Build", "ISO build completed successfully!")
-                self.update_project_status()
-            else:
-                self.build_output_append(f"\n✗ BUILD FAILED (exit code: {self.build_process.returncode})")
-                self.log_entry("Build", f"Build failed with code {self.build_process.returncode}")
-                self.build_status.config(text="✗ Build failed", foreground="red")
-                messagebox.showerror("Build", "ISO build failed. Check output for details.")
-        
-        except Exception as e:
-            self.build_output_append(f"ERROR: {e}")
-            self.log_entry("Build", f"Build error: {e}")
-            messagebox.showerror("Build Error", f"Failed to build: {e}")
-        
-        finally:
+        if self.use_daemon_var.get():
+            self.run_daemon_job("build.start", "Build", no_iso=no_iso, variant=self.arch_var.get(), variants=variants)
+            return
+        self.log_entry("Build", "Starting kernel and initramfs build (no ISO)..." if no_iso
+                       else "Starting ISO build...")
+        if variants:
+            self.log_entry("Build", f"Building variants in parallel: {variants}")
+        
+        if not self.build_script.exists():
+            self.build_output_append("ERROR: build.sh not found!")
+            self.log_entry("Build", f"Build error: Build script not found at {self.build_script}")
+            messagebox.showerror("Build Error", f"Failed to build: Build script not found at {self.build_script}")
             self.is_building = False
             self.build_progress.stop()
-            self.build_process = None
+            return
+        
+        # Make script executable
+        os.chmod(self.build_script, 0o755)
+        
+        log = self.log_index.open_session("build", "build")
+        
+        def on_line(line: str):
+            log.feed_line(line)
+            self.build_output_append(line)
+        
+        def on_exit(handle: ProcessHandle):
+            log.close()
+            self.on_build_exit(handle)
+        
+        self.build_process = self.engine.spawn(
+            [str(self.build_script)] + build_args(no_iso, self.arch_var.get(), variants),
+            name="build",
+            cwd=str(self.project_root),
+            on_line=on_line,
+            on_exit=on_exit,
+        )
+    
+    def on_build_exit(self, handle: ProcessHandle):
+        """Report the result of a local build."""
+        self.is_building = False
+        self.build_progress.stop()
+        self.build_process = None
+        
+        if handle.state == "cancelled":
+            self.build_output_append(f"\n⏹️  Build stopped by user")
+            self.log_entry("Build", "Build stopped")
+            self.build_status.config(text="⏹️  Build stopped", foreground="red")
+        elif handle.returncode == 0:
+            self.build_output_append("\n✓ BUILD COMPLETE!")
+            self.log_entry("Build", f"ISO build successful ({handle.duration:.1f} s)")
+            self.build_status.config(text="✓ Build complete", foreground="green")
+            messagebox.showinfo("Build", "ISO build completed successfully!")
+            self.update_project_status()
+        else:
+            self.build_output_append(f"\n✗ BUILD FAILED (exit code: {handle.returncode})")
+            self.log_entry("Build", f"Build failed with code {handle.returncode}")
+            self.build_status.config(text="✗ Build failed", foreground="red")
+            messagebox.showerror("Build", "ISO build failed. Check output for details.")
+    
+    def run_daemon_job(self, method: str, label: str, then: Optional[Callable[[], None]] = None, **params):
+        """Start a build or clean in cyberosd and stream its output."""
+        def worker():
+            try:
+                job = self.daemon.call(method, **params)
+            except DaemonError as e:
+                self.bridge.post(self.on_daemon_job_done, None, label, str(e), None)
+                return
+            self.bridge.post(self.log_entry, label, f"{label} started in cyberosd as {job['id']}")
+            self._follow_daemon_job(job, label, then)
+        
+        threading.Thread(target=worker, daemon=True).start()
+    
+    def _follow_daemon_job(self, job: Dict, label: str, then: Optional[Callable[[], None]] = None):
+        """Stream a daemon job into the build output until it ends (worker thread)."""
+        self.daemon_job = job["id"]
+        try:
+            result = self.daemon.follow(job["id"], lambda line: self.bridge.post(self.build_output_append, line))
+            self.bridge.post(self.on_daemon_job_done, result, label, None, then)
+        except DaemonError as e:
+            self.bridge.post(self.on_daemon_job_done, None, label, f"Lost connection to cyberosd: {e}", None)
+    
+    def on_daemon_job_done(self, result: Optional[Dict], label: str, error: Optional[str],
+                           then: Optional[Callable[[], None]]):
+        """Report the result of a build or clean that ran in cyberosd."""
+        self.daemon_job = None
+        self.is_building = False
+        self.build_progress.stop()
+        if result is None:
+            self.build_output_append(f"ERROR: {error}")
+            self.log_entry(label, f"{label} error: {error}")
+        elif result["state"] == "succeeded":
+            self.log_entry(label, f"{label} successful")
+            self.build_status.config(text=f"✓ {label} complete", foreground="green")
+            self.update_project_status()
+            if then:
+                then()
+        elif result["state"] == "stopped":
+            self.build_status.config(text=f"⏹️  {label} stopped", foreground="red")
+        else:
+            self.log_entry(label, f"{label} failed with code {result['returncode']}")
+            self.build_status.config(text=f"✗ {label} failed", foreground="red")
     
     def build_output_append(self, text: str):
         """Append text to build output."""
         self.build_output.config(state=tk.NORMAL)
-        self.build_output.insert(tk.END, text + "\n")
+        insert_line(self.build_output, "end-1c", text, "\n")
         self.build_output.see(tk.END)
         self.build_output.config(state=tk.DISABLED)
-        self.root.update()
+    
+    def toggle_watch(self):
+        """Start or stop watch mode."""
+        if not self.watch_var.get():
+            if self.watch_loop:
+                self.watch_loop.stop()
+                self.watch_loop = None
+            self.watch_status.config(text="Not watching", foreground="")
+            self.log_entry("Watch", "Stopped watching sources")
+            return
+        self.watch_loop = WatchLoop(
+            self.engine, self.project_root,
+            direct_boot=self.watch_direct_var.get(), relaunch=self.watch_relaunch_var.get(),
+            cores=self.emu_cores_var.get(), memory=self.emu_memory_var.get(),
+            display=self.emu_display_var.get(),
+            log=lambda message: self.bridge.post(self.log_entry, "Watch", message),
+            on_cycle=lambda cycle: self.bridge.post(self.update_watch_status, cycle),
+            on_console=self.build_output_append)
+        self.watch_loop.start()
+        self.watch_status.config(text="Watching for changes...", foreground="blue")
+    
+    def update_watch_status(self, cycle: Cycle):
+        """Show the state and latency of the latest watch cycle."""
+        failed = "failed" in cycle.state
+        colour = "red" if failed else "green" if cycle.state in ("built", "ready") else "blue"
+        self.watch_status.config(text=cycle.describe(), foreground=colour)
     
     def stop_build(self):
         """Stop the current build."""
+        if self.daemon_job:
+            job = self.daemon_job
+            threading.Thread(target=lambda: self.daemon.call("job.stop", job=job), daemon=True).start()
+            self.log_entry("Build", f"Stopping {job} in cyberosd")
+            return
         if self.build_process:
-            try:
-                self.build_process.terminate()
-                self.build_process.wait(timeout=5)
-                self.build_output_append("\n⏹️  Build stopped by user")
-                self.log_entry("Build", "Build stopped")
-            except subprocess.TimeoutExpired:
-                self.build_process.kill()
-                self.build_output_append("\n⏹️  Build killed")
-            finally:
-                self.is_building = False
-                self.build_progress.stop()
-                self.build_process = None
-    
-    def clean_build(self):
-        """Clean build artifacts."""
+            self.build_process.cancel()
+    
+    def clean_build(self, then: Optional[Callable[[], None]] = None):
+        """Clean build artifacts, then run then() if given and successful."""
         if not messagebox.askyesno("Confirm", "Delete all build artifacts?"):
             return
+        if self.is_building:
+            messagebox.showwarning("Build", "Build already in progress")
+            return
         
         self.log_entry("Build", "Cleaning build artifacts...")
         
-        try:
-            clean_script = self.project_root / "scripts" / "clean.sh"
-            if clean_script.exists():
-                os.chmod(clean_script, 0o755)
-                subprocess.run([str(clean_script)], cwd=str(self.project_root), check=True)
+        if self.use_daemon_var.get():
+            self.is_building = True
+            self.build_progress.start()
+            self.build_status.config(text="Cleaning...")
+            self.run_daemon_job("clean.start", "Clean", then)
+            return
+        
+        clean_script = self.project_root / "scripts" / "clean.sh"
+        if not clean_script.exists():
+            messagebox.showerror("Error", "clean.sh not found")
+            return
+        
+        def on_exit(handle: ProcessHandle):
+            self.is_building = False
+            self.build_progress.stop()
+            self.build_process = None
+            if handle.returncode == 0:
                 self.log_entry("Build", "Build artifacts cleaned")
-                messagebox.showinfo("Clean", "Build cleaned successfully!")
+                self.build_status.config(text="✓ Clean complete", foreground="green")
                 self.update_project_status()
+                if then:
+                    then()
+                else:
+                    messagebox.showinfo("Clean", "Build cleaned successfully!")
             else:
-                messagebox.showerror("Error", "clean.sh not found")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to clean: {e}")
-            self.log_entry("Build", f"Clean failed: {e}")
+                messagebox.showerror("Error", f"Failed to clean: exit code {handle.returncode}")
+                self.log_entry("Build", f"Clean failed with code {handle.returncode}")
+        
+        os.chmod(clean_script, 0o755)
+        self.is_building = True
+        self.build_progress.start()
+        self.build_status.config(text="Cleaning...")
+        self.build_process = self.engine.spawn([str(clean_script)], name="clean", cwd=str(self.project_root),
+                                               on_line=self.build_output_append, on_exit=on_exit)
     
     def rebuild_iso(self):
         """Clean and rebuild ISO."""
         if messagebox.askyesno("Confirm", "Clean and rebuild ISO?"):
-            self.clean_build()
-            self.root.after(1000, self.build_iso)
+            self.clean_build(then=self.build_iso)
+    
+    def check_boot_files(self) -> bool:
+        """Check for the ISO, or the kernel and initramfs when direct kernel boot is selected
+        (of the VM's build variant)."""
+        variant = get_variant(self.emulator_config().variant, self.project_root)
+        if not self.emu_direct_boot_var.get():
+            if not variant.iso_file(self.project_root).exists():
+                messagebox.showwarning("Warning", "ISO not built. Build ISO first?")
+                return False
+            return True
+        missing = variant.direct_boot(self.project_root).missing()
+        if missing:
+            messagebox.showwarning("Warning", "Direct kernel boot needs:\n" + "\n".join(map(str, missing)) +
+                                   "\n\nUse ⚡ Build Kernel + Initramfs first.")
+            return False
+        self.log_entry("Emulator", skipped_report(self.project_root))
+        return True
+    
+    def launcher_args(self) -> List[str]:
+        """Boot options for run_cyberos.sh."""
+        args = ["--direct"] if self.emu_direct_boot_var.get() else []
+        variant = self.emulator_config().variant
+        if variant != DEFAULT_VARIANT:
+            args += ["--variant", variant]
+        return args
+    
+    @staticmethod
+    def launcher_env() -> Dict[str, str]:
+        """Environment for run_cyberos.sh, which records its VM as started from here."""
+        return {**os.environ, "CYBEROS_VM_OWNER": "control-center"}
     
     def launch_emulator_gui(self):
         """Launch the emulator GUI."""
@@ -714,12 +937,11 @@ For more information, visit the GitHub repository."""
                 messagebox.showerror("Error", f"Emulator GUI not found at {self.emulator_gui}")
                 return
             
-            if not self.iso_file.exists():
-                messagebox.showwarning("Warning", "ISO not built. Build ISO first?")
+            if not self.check_boot_files():
                 return
             
             self.log_entry("Emulator", "Launching emulator GUI...")
-            subprocess.Popen([sys.executable, str(self.emulator_gui)])
+            self.launched.append(self.engine.spawn([sys.executable, str(self.emulator_gui)], capture=False))
             self.log_entry("Emulator", "Emulator GUI launched")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to launch emulator: {e}")
@@ -728,8 +950,7 @@ For more information, visit the GitHub repository."""
     def launch_emulator_cli(self, cores: int, memory: int, network: bool):
         """Launch emulator from command line."""
         try:
-            if not self.iso_file.exists():
-                messagebox.showwarning("Warning", "ISO not built. Build ISO first?")
+            if not self.check_boot_files():
                 return
             
             launcher = self.project_root / "emulator" / "macos" / "run_cyberos.sh"
@@ -740,52 +961,275 @@ For more information, visit the GitHub repository."""
                 messagebox.showerror("Error", f"Launcher not found")
                 return
             
-            cmd = [str(launcher), "-c", str(cores), "-m", str(memory)]
+            cmd = [str(launcher), "-c", str(cores), "-m", str(memory)] + self.launcher_args()
             if network:
                 cmd.append("-n")
             
             os.chmod(launcher, 0o755)
-            subprocess.Popen(cmd)
+            self.launched.append(self.engine.spawn(cmd, env=self.launcher_env(), capture=False))
             self.log_entry("Emulator", f"Launched with {cores} cores, {memory} MB RAM, {'networking' if network else 'no network'}")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to launch emulator: {e}")
     
+    def emulator_config(self) -> VMConfig:
+        """Settings in the Emulator tab, keeping stored ones it does not show."""
+        name = self.emu_name_var.get().strip() or DEFAULT_NAME
+        config = self.vm_store.config_for(name)
+        config.cores = self.emu_cores_var.get()
+        config.memory = self.emu_memory_var.get()
+        config.disk_size = self.emu_disk_var.get()
+        config.network = self.emu_network_var.get()
+        config.display = self.emu_display_var.get()
+        config.disk_profile = self.emu_disk_profile_var.get()
+        config.direct_boot = self.emu_direct_boot_var.get()
+        return config
+    
+    def load_emulator_config(self):
+        """Show the stored settings of the VM named in the Emulator tab."""
+        config = self.vm_store.config_for(self.emu_name_var.get().strip() or DEFAULT_NAME)
+        self.emu_cores_var.set(config.cores)
+        self.emu_memory_var.set(config.memory)
+        self.emu_disk_var.set(config.disk_size)
+        self.emu_network_var.set(config.network)
+        self.emu_display_var.set(config.display)
+        self.emu_disk_profile_var.set(config.disk_profile if config.disk_profile in DISK_PROFILES else DEFAULT_PROFILE)
+        self.emu_direct_boot_var.set(config.direct_boot)
+    
+    def save_emulator_config(self):
+        """Store the Emulator tab's settings for its VM."""
+        config = self.emulator_config()
+        try:
+            self.vm_store.save(config)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save configuration: {e}")
+            return
+        self.log_entry("Emulator", f"Saved settings of {config.name} to {self.vm_store.db_path}")
+        self.refresh_vm_list()
+    
     def launch_emulator_custom(self):
         """Launch emulator with custom configuration."""
+        self.vm_store.save(self.emulator_config())
         cores = self.emu_cores_var.get()
         memory = self.emu_memory_var.get()
         disk = self.emu_disk_var.get()
         network = self.emu_network_var.get()
         display = self.emu_display_var.get()
+        disk_profile = self.emu_disk_profile_var.get()
+        
+        if self.use_daemon_var.get():
+            params = {"name": self.emu_name_var.get().strip() or DEFAULT_NAME,
+                      "cores": cores, "memory": memory, "disk_size": disk, "display": display,
+                      "network": network, "disk_profile": disk_profile,
+                      "direct_boot": self.emu_direct_boot_var.get(), "variant": self.emulator_config().variant}
+            
+            def launched(job: Dict):
+                self.daemon_vm_pids[job["pid"]] = job["name"]
+                self.log_entry("Emulator", f"cyberosd launched {job['name']} (PID {job['pid']}): "
+                                           f"{cores}c, {memory}MB, {disk}GB ({disk_profile}), {display}")
+                self.refresh_vm_list()
+            
+            def worker():
+                try:
+                    job = self.daemon.call("vm.launch", **params)
+                except DaemonError as e:
+                    self.bridge.post(messagebox.showerror, "Error", f"Failed to launch: {e}")
+                    return
+                self.bridge.post(launched, job)
+            
+            threading.Thread(target=worker, daemon=True).start()
+            return
         
         try:
-            if not self.iso_file.exists():
-                messagebox.showwarning("Warning", "ISO not built. Build ISO first?")
+            if not self.check_boot_files():
                 return
             
             launcher = self.project_root / "emulator" / "macos" / "run_cyberos.sh"
             if sys.platform == "linux":
                 launcher = self.project_root / "emulator" / "linux" / "run_cyberos.sh"
             
-            cmd = [str(launcher), "-c", str(cores), "-m", str(memory), "-s", str(disk), "-d", display]
+            cmd = [str(launcher), "-c", str(cores), "-m", str(memory), "-s", str(disk),
+                   "-d", display, "-p", disk_profile]
+            cmd += self.launcher_args()
             if network:
                 cmd.append("-n")
             
             os.chmod(launcher, 0o755)
-            subprocess.Popen(cmd)
-            self.log_entry("Emulator", f"Custom launch: {cores}c, {memory}MB, {disk}GB, {display}")
+            self.launched.append(self.engine.spawn(cmd, env=self.launcher_env(), capture=False))
+            self.log_entry("Emulator", f"Custom launch: {cores}c, {memory}MB, {disk}GB ({disk_profile}), {display}")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to launch: {e}")
     
     def refresh_vm_list(self):
-        """Refresh the VM list."""
-        self.vm_listbox.delete(0, tk.END)
+        """Refresh the VM list (asking cyberosd from a worker thread in daemon mode)."""
+        if self.use_daemon_var.get():
+            def worker():
+                try:
+                    vms, error = self.daemon.call("vm.list"), None
+                except DaemonError as e:
+                    vms, error = [], str(e)
+                self.bridge.post(self.show_daemon_vms, vms, error)
+            
+            threading.Thread(target=worker, daemon=True).start()
+            return
         
+        self.vm_listbox.delete(0, tk.END)
         vm_dir = Path.home() / ".cyberos" / "vms"
-        if vm_dir.exists():
-            for vm_file in sorted(vm_dir.glob("*.qcow2")):
-                size = vm_file.stat().st_size / (1024 ** 3)
-                self.vm_listbox.insert(tk.END, f"{vm_file.stem} ({size:.2f} GB)")
+        records = {record.name: record for record in self.vm_store.list()}
+        disks = {vm_file.stem: vm_file for vm_file in vm_dir.glob("*.qcow2")} if vm_dir.exists() else {}
+        self.emu_name_combo.config(values=sorted(records))
+        for name in sorted(set(records) | set(disks)):
+            size = f"{allocated_bytes(disks[name]) / (1024 ** 3):.2f} GB on disk" if name in disks else "no disk yet"
+            details = f" · {records[name].describe()}" if name in records else ""
+            self.vm_listbox.insert(tk.END, f"{name} ({size}){details}")
+    
+    def show_daemon_vms(self, vms: List[Dict], error: Optional[str]):
+        """Show the VMs cyberosd reported."""
+        if error:
+            self.log_entry("Emulator", f"Could not list VMs from cyberosd: {error}")
+        self.daemon_vm_pids = {vm["pid"]: vm["name"] for vm in vms if vm["running"]}
+        self.vm_listbox.delete(0, tk.END)
+        for vm in vms:
+            size = vm["allocated_bytes"] / (1024 ** 3)
+            running = " · running in cyberosd" if vm["running"] else ""
+            self.vm_listbox.insert(tk.END, f"{vm['name']} ({size:.2f} GB on disk){running}")
+    
+    def metrics_targets(self) -> Dict[int, str]:
+        """QEMU processes started from this window, rescanned every 5 s (sampler thread).
+
+        The launcher lists belong to the UI thread, so they are only copied
+        here; exited entries are pruned there.
+        """
+        now = time.monotonic()
+        if now - self._qemu_scan_time >= 5.0:
+            self._qemu_scan_time = now
+            pids = ([handle.pid for handle in list(self.launched) if handle.running and handle.pid] +
+                    [vm.pid for vm in list(self.adopted) if vm.running])
+            self._qemu_targets = find_qemu_processes(pids) if pids else {}
+            self.bridge.post(self.prune_launched)
+        return {**self._qemu_targets, **dict(self.daemon_vm_pids)}
+    
+    def prune_launched(self):
+        """Forget launchers and VMs that have exited."""
+        self.launched = [handle for handle in self.launched if handle.running]
+        self.adopted = [vm for vm in self.adopted if vm.running]
+        self.daemon_vm_pids = {pid: name for pid, name in self.daemon_vm_pids.items()
+                               if Path(f"/proc/{pid}").exists()}
+    
+    def reattach_vms(self):
+        """Adopt VMs an earlier session of the Control Center left running (worker thread)."""
+        vms = self.vm_registry.orphans(owner="control-center")
+        if not vms:
+            return
+        self.bridge.post(self.track_adopted, self.vm_registry.adopt(vms))
+        self._qemu_scan_time = 0.0
+        self.bridge.post(self.log_entry, "Emulator", f"Re-attached to {len(vms)} VM(s) left running: " +
+                         ", ".join(vm.describe() for vm in vms))
+    
+    def track_adopted(self, vms: List[RunningVM]):
+        """Watch re-attached VMs alongside the ones launched here."""
+        self.adopted.extend(vms)
+    
+    def power_down_vms(self, then: Optional[Callable[[], None]] = None):
+        """Power down every VM started from here at once, off the UI thread."""
+        vms = self.vm_registry.supervised(owner="control-center")
+        if not vms:
+            self.log_entry("Emulator", "No running VMs launched from the Control Center")
+            if then:
+                then()
+            return
+        self.log_entry("Emulator", f"Powering down {', '.join(vm.name for vm in vms)}...")
+        
+        def worker():
+            shutdown_all(vms, on_progress=lambda message: self.bridge.post(self.log_entry, "Emulator", message))
+            if then:
+                self.bridge.post(then)
+        
+        threading.Thread(target=worker, daemon=True).start()
+    
+    def update_metrics_panel(self):
+        """Redraw the metrics sparklines."""
+        canvas = self.metrics_canvas
+        canvas.delete("all")
+        samples = self.metrics_sampler.snapshot()
+        width = max(canvas.winfo_width(), 400)
+        
+        if not samples:
+            canvas.create_text(10, 10, anchor="nw", fill="#888888", font=("Courier", 9),
+                               text="No running VMs launched from the Control Center")
+        
+        row_height = 44
+        spark_width = (width - 200) // 2
+        for row, (name, sample) in enumerate(sorted(samples.items())):
+            top = 6 + row * row_height
+            canvas.create_text(10, top, anchor="nw", fill="#ffffff", font=("Courier", 9, "bold"), text=name)
+            canvas.create_text(10, top + 14, anchor="nw", fill="#bbbbbb", font=("Courier", 8),
+                               text=f"RSS {sample.rss_mb:.0f} MB")
+            canvas.create_text(10, top + 26, anchor="nw", fill="#bbbbbb", font=("Courier", 8),
+                               text=f"IO r {sample.read_bytes_per_s / 1024:.0f} / "
+                                    f"w {sample.write_bytes_per_s / 1024:.0f} KB/s")
+            
+            lanes = [
+                ("cpu_percent", f"CPU {sample.cpu_percent:.0f}%", "#4caf50", 100.0),
+                ("vcpu_saturation", f"vCPU {sample.vcpu_saturation:.0%}", "#ff9800", 1.0),
+            ]
+            for lane, (attribute, label, color, ceiling) in enumerate(lanes):
+                left = 190 + lane * (spark_width + 10)
+                values = self.metrics_sampler.series(name, attribute)
+                self.draw_sparkline(canvas, values, left, top, spark_width, row_height - 10, color, ceiling)
+                canvas.create_text(left + 4, top + 2, anchor="nw", fill=color, font=("Courier", 8), text=label)
+        
+        if samples:
+            canvas.config(height=max(row_height * len(samples) + 12, 60))
+        
+        self.root.after(1000, self.update_metrics_panel)
+    
+    def set_metrics_file(self, *_):
+        """Have the sampler thread write its samples to the textfile path entered."""
+        path = self.metrics_file_var.get().strip()
+        self.metrics_sampler.textfile = Path(path).expanduser() if path else None
+    
+    def on_metrics_file_error(self, path: Path, error: OSError):
+        """Stop exporting to a textfile the sampler could not write."""
+        self.metrics_file_var.set("")
+        self.log_entry("Metrics", f"Could not write {path}: {error}")
+    
+    @staticmethod
+    def draw_sparkline(canvas: tk.Canvas, values: List[float], left: int, top: int,
+                       width: int, height: int, color: str, ceiling: float):
+        """Draw a series as a sparkline scaled to at least ceiling."""
+        canvas.create_rectangle(left, top, left + width, top + height, outline="#333333")
+        if len(values) < 2:
+            return
+        scale = max(max(values), ceiling) or 1.0
+        step = width / (len(values) - 1)
+        points = []
+        for i, value in enumerate(values):
+            points.extend([left + i * step, top + height - (value / scale) * (height - 2) - 1])
+        canvas.create_line(*points, fill=color, width=1)
+    
+    def toggle_metrics_exporter(self):
+        """Start or stop the Prometheus HTTP endpoint."""
+        if self.metrics_http_var.get():
+            try:
+                self.metrics_exporter = MetricsExporter(self.metrics_sampler, port=self.metrics_port_var.get())
+                self.metrics_exporter.start()
+                self.log_entry("Metrics", f"Serving Prometheus metrics at {self.metrics_exporter.url}")
+            except (OSError, tk.TclError) as e:
+                self.metrics_http_var.set(False)
+                messagebox.showerror("Metrics", f"Could not start metrics endpoint: {e}")
+        elif self.metrics_exporter:
+            self.metrics_exporter.stop()
+            self.metrics_exporter = None
+            self.log_entry("Metrics", "Metrics endpoint stopped")
+    
+    def run_helper(self, cmd: List[str]):
+        """Run a short helper command (open, xdg-open) and report failures."""
+        def on_exit(handle: ProcessHandle):
+            if handle.returncode != 0:
+                messagebox.showerror("Error", f"{cmd[0]} failed: {' '.join(output) or handle.state}")
+        
+        output: List[str] = []
+        self.engine.spawn(cmd, on_line=output.append, on_exit=on_exit)
     
     def open_vm_folder(self):
         """Open VM folder in file explorer."""
@@ -794,35 +1238,21 @@ For more information, visit the GitHub repository."""
             vm_dir.mkdir(parents=True, exist_ok=True)
             
             if sys.platform == "darwin":
-                subprocess.run(["open", str(vm_dir)], check=True)
+                self.run_helper(["open", str(vm_dir)])
             elif sys.platform == "linux":
-                subprocess.run(["xdg-open", str(vm_dir)], check=True)
+                self.run_helper(["xdg-open", str(vm_dir)])
             elif sys.platform == "win32":
                 os.startfile(str(vm_dir))
         except Exception as e:
             messagebox.showerror("Error", f"Failed to open folder: {e}")
     
     def open_emulator_settings(self):
-        """Open emulator configuration file."""
-        try:
-            config_file = Path.home() / ".cyberos_vm.conf"
-            if not config_file.exists():
-                # Create default config
-                config_content = """# CyberOS VM Configuration
-CORES=2
-MEMORY=512
-DISK_SIZE=2
-ENABLE_NETWORK=true
-DISPLAY=sdl
-"""
-                config_file.write_text(config_content)
-            
-            if sys.platform == "darwin":
-                subprocess.run(["open", "-t", str(config_file)], check=True)
-            elif sys.platform == "linux":
-                subprocess.run(["xdg-open", str(config_file)], check=True)
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to open settings: {e}")
+        """Show the per-VM emulator settings (stored in ~/.cyberos/vms.sqlite)."""
+        self.load_emulator_config()
+        for tab in self.notebook.tabs():
+            if "Emulator" in self.notebook.tab(tab, "text"):
+                self.notebook.select(tab)
+                break
     
     def install_dependencies(self):
         """Install missing dependencies."""
@@ -837,18 +1267,71 @@ DISPLAY=sdl
             
             if installer.exists():
                 os.chmod(installer, 0o755)
-                if sys.platform == "linux":
-                    subprocess.run(["sudo", str(installer)], check=False)
-                else:
-                    subprocess.run([str(installer)], check=False)
+                cmd = ["sudo", str(installer)] if sys.platform == "linux" else [str(installer)]
                 
-                self.log_entry("System", "Dependency installation completed")
-                self.check_dependencies()
+                def on_exit(handle: ProcessHandle):
+                    self.log_entry("System", f"Dependency installation finished (exit code {handle.returncode})")
+                    self.check_dependencies()
+                    self.update_project_status()
+                
+                # Runs in the launching terminal so sudo can prompt
+                self.log_entry("System", "Installing dependencies...")
+                self.engine.spawn(cmd, name="install-deps", capture=False, on_exit=on_exit)
             else:
                 messagebox.showerror("Error", f"Installer not found")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to install dependencies: {e}")
     
+    def connect_daemon(self):
+        """Use cyberosd if it is running and re-attach to its current build."""
+        def worker():
+            try:
+                status = self.daemon.call("status")
+            except DaemonError:
+                self.bridge.post(self.daemon_status_label.config, {"text": "Not connected"})
+                return
+            self.bridge.post(self.on_daemon_connected, status)
+        
+        threading.Thread(target=worker, daemon=True).start()
+    
+    def on_daemon_connected(self, status: Dict):
+        """Switch to daemon mode and follow any job that is still running."""
+        self.use_daemon_var.set(True)
+        self.daemon_status_label.config(
+            text=f"Connected to cyberosd (PID {status['pid']}) · {len(status['jobs'])} running job(s) · "
+                 f"{status['allocation']}"
+        )
+        self.log_entry("System", f"Connected to cyberosd at {self.daemon.socket_path}")
+        self.refresh_vm_list()
+        for job in status["jobs"]:
+            if job["kind"] in ("build", "clean") and not self.is_building:
+                label = job["kind"].capitalize()
+                self.is_building = True
+                self.build_progress.start()
+                self.build_status.config(text=f"{label} running in cyberosd...")
+                self.log_entry(label, f"Re-attached to {job['id']}")
+                threading.Thread(target=self._follow_daemon_job, args=(job, label), daemon=True).start()
+    
+    def toggle_daemon(self):
+        """Check the daemon is reachable when daemon mode is switched on."""
+        if self.use_daemon_var.get():
+            self.use_daemon_var.set(False)
+            self.connect_daemon()
+        else:
+            self.daemon_status_label.config(text="Not used")
+            self.refresh_vm_list()
+    
+    def start_daemon(self):
+        """Start cyberosd in the background and connect to it."""
+        def worker():
+            if start_daemon(self.daemon.socket_path):
+                self.connect_daemon()
+            else:
+                self.bridge.post(messagebox.showerror, "cyberosd",
+                                 f"cyberosd did not start; see {self.daemon.socket_path.parent / 'cyberosd.log'}")
+        
+        threading.Thread(target=worker, daemon=True).start()
+    
     def save_settings(self):
         """Save application settings."""
         messagebox.showinfo("Settings", "Settings saved!")
@@ -875,6 +1358,12 @@ DISPLAY=sdl
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save logs: {e}")
     
+    def on_slow_callback(self, event: SlowCallback):
+        """Show profiler events; only stalls go to the log."""
+        self.profiler_panel.on_event(event)
+        if event.level != "slow":
+            self.log_entry("Profiler", event.describe())
+    
     def log_entry(self, source: str, message: str):
         """Add a log entry."""
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -884,15 +1373,14 @@ DISPLAY=sdl
         self.logs_text.insert(tk.END, log_line + "\n")
         self.logs_text.see(tk.END)
         self.logs_text.config(state=tk.DISABLED)
-        self.root.update()
     
     def open_project_folder(self):
         """Open project folder."""
         try:
             if sys.platform == "darwin":
-                subprocess.run(["open", str(self.project_root)], check=True)
+                self.run_helper(["open", str(self.project_root)])
             elif sys.platform == "linux":
-                subprocess.run(["xdg-open", str(self.project_root)], check=True)
+                self.run_helper(["xdg-open", str(self.project_root)])
             elif sys.platform == "win32":
                 os.startfile(str(self.project_root))
         except Exception as e:
@@ -916,24 +1404,70 @@ DISPLAY=sdl
             readme = self.project_root / "README.md"
             if readme.exists():
                 if sys.platform == "darwin":
-                    subprocess.run(["open", "-t", str(readme)], check=True)
+                    self.run_helper(["open", "-t", str(readme)])
                 elif sys.platform == "linux":
-                    subprocess.run(["xdg-open", str(readme)], check=True)
+                    self.run_helper(["xdg-open", str(readme)])
         except Exception as e:
             messagebox.showerror("Error", f"Failed to open documentation: {e}")
     
     def on_close(self):
-        """Handle window close event."""
-        if self.is_building:
-            if messagebox.askyesno("Confirm", "Build in progress. Stop and quit?"):
-                self.stop_build()
-                self.root.destroy()
-        else:
-            self.root.destroy()
+        """Handle window close event; VMs started from here are powered down in the background or left running."""
+        if self.closing:
+            self.log_entry("Emulator", "Still powering down; the window closes once the VMs are gone.")
+            return
+        if self.is_building and not self.daemon_job:
+            if not messagebox.askyesno("Confirm", "Build in progress. Stop and quit?"):
+                return
+            self.stop_build()
+        vms = self.vm_registry.supervised(owner="control-center")
+        if vms:
+            answer = messagebox.askyesnocancel(
+                "Quit", f"{len(vms)} VM(s) launched from here are running. Power them down before quitting?\n\n"
+                        "No leaves them running; the Control Center re-attaches to them next time.")
+            if answer is None:
+                return
+            if answer:
+                self.closing = True
+                self.root.title("CyberOS Control Center (powering down VMs...)")
+                self.power_down_vms(then=self.finish_close)
+                return
+        self.finish_close()
+    
+    def finish_close(self):
+        """Tear the window down once its VMs are gone or left running.
+
+        A cancelled build is waited for off the UI thread; the window is
+        destroyed once it has exited.
+        """
+        self.closing = True
+        if self.watch_loop:
+            self.watch_loop.stop()
+        self.profiler.close()
+        self.metrics_sampler.stop()
+        self.status_service.stop()
+        if self.metrics_exporter:
+            self.metrics_exporter.stop()
+        build_process = self.build_process
+        if not build_process:
+            self._destroy_window()
+            return
+        build_process.cancel()
+        
+        def worker():
+            build_process.wait(TERMINATE_GRACE + 1)
+            self.bridge.post(self._destroy_window)
+        
+        threading.Thread(target=worker, daemon=True, name="cyberos-close").start()
+    
+    def _destroy_window(self):
+        """Final teardown on the UI thread."""
+        self.bridge.close()
+        self.root.destroy()
 
 
 def main():
     """Main entry point."""
+    install_hook()
     root = tk.Tk()
     app = CyberOSControlCenter(root)
     root.mainloop()
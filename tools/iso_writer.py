@@ -0,0 +1,893 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS ISO Writer
+Builds the bootable ISO in one streaming pass from a file manifest.
+
+The manifest maps paths in the image to files on disk ("graft points",
+`boot/vmlinuz=build/kernel/vmlinuz`), so nothing is copied into a staging
+tree first. All sizes are known from stat(), which fixes the layout before
+the first byte is written: volume descriptors, the El Torito boot catalog,
+path tables and directories come first, then each file is streamed into
+its extent (sendfile where the OS allows it). Memory use depends on the
+number of files, not their size, and the output can be a pipe.
+
+The image has three views of the same file data:
+    ISO 9660     level 2 names (A-Z, 0-9, _; 30 characters)
+    Rock Ridge   POSIX names, modes and symlinks (RRIP 1.09, read by Linux and GRUB)
+    Joliet       Unicode names up to 64 characters (read by Windows)
+
+Directories deeper than eight levels are not relocated (like `mkisofs -D`),
+which Linux and GRUB accept.
+
+El Torito entries are taken from prebuilt images in the tree: a BIOS
+no-emulation image (GRUB's eltorito.img, patched with a boot info table)
+and optionally a UEFI FAT image. Output is reproducible: names are sorted,
+owners are root and every timestamp is SOURCE_DATE_EPOCH (or --date).
+
+Usage:
+    python3 tools/iso_writer.py -o out.iso boot/vmlinuz=build/kernel/vmlinuz ...
+    python3 tools/iso_writer.py -o out.iso --manifest build/iso.manifest \\
+        --bios-boot boot/grub/eltorito.img
+    python3 tools/iso_writer.py --bench --manifest build/iso.manifest \\
+        --bios-boot boot/grub/eltorito.img      # compare with grub-mkrescue
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import shutil
+import stat
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple
+
+SECTOR = 2048
+# Sectors 0-15 are the system area, left empty
+FIRST_DESCRIPTOR = 16
+COPY_CHUNK = 1 << 20
+# ISO 9660 level 2 name lengths (without ".", ";1")
+FILE_NAME_MAX = 30
+DIR_NAME_MAX = 31
+JOLIET_NAME_MAX = 64
+# A directory record is at most 255 bytes; larger system use data moves to a continuation area
+RECORD_MAX = 255
+CE_LENGTH = 28
+# GRUB's eltorito.img is loaded in 512-byte sectors
+BIOS_LOAD_SECTORS = 4
+PLATFORM_BIOS = 0x00
+PLATFORM_EFI = 0xEF
+BOOT_CATALOG = "boot/boot.cat"
+
+RRIP_ID = b"RRIP_1991A"
+RRIP_DESCRIPTION = b"THE ROCK RIDGE INTERCHANGE PROTOCOL PROVIDES SUPPORT FOR POSIX FILE SYSTEM SEMANTICS"
+RRIP_SOURCE = (b"PLEASE CONTACT DISC PUBLISHER FOR SPECIFICATION SOURCE.  SEE PUBLISHER IDENTIFIER "
+               b"IN PRIMARY VOLUME DESCRIPTOR FOR CONTACT INFORMATION.")
+
+_NOT_D_CHARS = re.compile(r"[^A-Z0-9_]")
+_NOT_JOLIET = re.compile(r"[*/:;?\\\x00-\x1f]|[^\x00-\uffff]")
+
+
+def both16(value: int) -> bytes:
+    return struct.pack("<H", value) + struct.pack(">H", value)
+
+
+def both32(value: int) -> bytes:
+    return struct.pack("<I", value) + struct.pack(">I", value)
+
+
+def record_date(timestamp: int) -> bytes:
+    """7-byte directory record date (UTC)."""
+    t = time.gmtime(timestamp)
+    return bytes([t.tm_year - 1900, t.tm_mon, t.tm_mday, t.tm_hour, t.tm_min, t.tm_sec, 0])
+
+
+def descriptor_date(timestamp: Optional[int]) -> bytes:
+    """17-byte volume descriptor date; None means "not specified"."""
+    if timestamp is None:
+        return b"0" * 16 + b"\x00"
+    return time.strftime("%Y%m%d%H%M%S", time.gmtime(timestamp)).encode() + b"00\x00"
+
+
+def padded(text: str, length: int) -> bytes:
+    return text.encode("ascii", "replace")[:length].ljust(length, b" ")
+
+
+def padded_ucs2(text: str, length: int) -> bytes:
+    encoded = text.encode("utf-16-be")[:length - length % 2]
+    return encoded + b"\x00 " * ((length - len(encoded)) // 2) + b" " * ((length - len(encoded)) % 2)
+
+
+@dataclass(eq=False)
+class Node:
+    """A file, directory or symlink in the image."""
+    name: str
+    kind: str  # "dir", "file" or "symlink"
+    source: Optional[Path] = None
+    size: int = 0
+    mode: int = 0o755
+    target: str = ""
+    # Generated content (the boot catalog), filled in once the layout is known
+    data: Optional[bytes] = None
+    # Same source file grafted twice shares one extent
+    inode: Optional[Tuple[int, int]] = None
+    children: Dict[str, "Node"] = field(default_factory=dict)
+    parent: Optional["Node"] = None
+    # Layout
+    iso_name: bytes = b""
+    joliet_name: bytes = b""
+    extent: int = 0
+    dir_size: int = 0
+    joliet_extent: int = 0
+    joliet_size: int = 0
+    boot_info_table: bool = False
+
+    @property
+    def is_dir(self) -> bool:
+        return self.kind == "dir"
+
+    @property
+    def path(self) -> str:
+        parts = []
+        node = self
+        while node.parent is not None:
+            parts.append(node.name)
+            node = node.parent
+        return "/".join(reversed(parts))
+
+    def sorted_children(self, joliet: bool = False) -> List["Node"]:
+        return sorted(self.children.values(), key=lambda child: child.joliet_name if joliet else child.iso_name)
+
+    def walk(self) -> Iterable["Node"]:
+        """Depth-first, in Rock Ridge name order."""
+        for name in sorted(self.children):
+            child = self.children[name]
+            yield child
+            if child.is_dir:
+                yield from child.walk()
+
+
+class IsoTree:
+    """The image's directory tree, built from graft points."""
+
+    def __init__(self):
+        self.root = Node("", "dir")
+
+    def _directory(self, parts: List[str]) -> Node:
+        node = self.root
+        for part in parts:
+            child = node.children.get(part)
+            if child is None:
+                child = node.children[part] = Node(part, "dir", parent=node)
+            elif not child.is_dir:
+                raise ValueError(f"{child.path} is a file and a directory")
+            node = child
+        return node
+
+    @staticmethod
+    def _split(iso_path: str) -> List[str]:
+        parts = [part for part in iso_path.strip("/").split("/") if part not in ("", ".")]
+        if ".." in parts:
+            raise ValueError(f"'..' in image path {iso_path}")
+        for part in parts:
+            if len(part.encode()) > 250:
+                raise ValueError(f"name too long for Rock Ridge: {part[:40]}...")
+        return parts
+
+    def _add(self, iso_path: str, node: Node):
+        parts = self._split(iso_path)
+        if not parts:
+            raise ValueError("a file cannot be grafted onto the root directory")
+        parent = self._directory(parts[:-1])
+        node.name, node.parent = parts[-1], parent
+        existing = parent.children.get(node.name)
+        if existing is not None and (existing.is_dir or node.is_dir):
+            raise ValueError(f"{node.path} is grafted twice")
+        parent.children[node.name] = node
+
+    def add_file(self, iso_path: str, source: Path, follow: bool = True):
+        info = source.stat() if follow else source.lstat()
+        if stat.S_ISLNK(info.st_mode):
+            self._add(iso_path, Node("", "symlink", target=os.readlink(source), mode=0o777))
+        elif stat.S_ISREG(info.st_mode):
+            if info.st_size >= 1 << 32:
+                raise ValueError(f"{source} is 4 GiB or larger (multi-extent files are not supported)")
+            mode = 0o755 if info.st_mode & 0o111 else 0o644
+            self._add(iso_path, Node("", "file", source=source, size=info.st_size, mode=mode,
+                                     inode=(info.st_dev, info.st_ino)))
+        elif stat.S_ISDIR(info.st_mode):
+            self.add_tree(iso_path, source)
+        else:
+            raise ValueError(f"{source}: only files, directories and symlinks can be added")
+
+    def add_tree(self, iso_path: str, source: Path):
+        """Add a directory's contents under iso_path (symlinks are kept as symlinks)."""
+        self._directory(self._split(iso_path))
+        for entry in sorted(os.scandir(source), key=lambda entry: entry.name):
+            self.add_file(f"{iso_path}/{entry.name}", Path(entry.path), follow=False)
+
+    def add_data(self, iso_path: str, size: int) -> Node:
+        """A generated file whose content is set after layout."""
+        node = Node("", "file", size=size, mode=0o444)
+        self._add(iso_path, node)
+        return node
+
+    def add_graft(self, spec: str, base: Path = Path(".")):
+        """Add `image/path=source` (or a bare source, like mkisofs)."""
+        if "=" in spec:
+            iso_path, source = spec.split("=", 1)
+            self.add_file(iso_path, base / source)
+        else:
+            source = base / spec
+            if source.is_dir():
+                self.add_tree("", source)
+            else:
+                self.add_file(source.name, source)
+
+    def find(self, iso_path: str) -> Node:
+        node = self.root
+        for part in self._split(iso_path):
+            if part not in node.children:
+                raise ValueError(f"{iso_path} is not in the image")
+            node = node.children[part]
+        return node
+
+    def directories(self, joliet: bool = False) -> List[Node]:
+        """Breadth-first, which is the order path tables require."""
+        order = [self.root]
+        for directory in order:
+            order.extend(child for child in directory.sorted_children(joliet) if child.is_dir)
+        return order
+
+
+def read_manifest(path: Path) -> List[str]:
+    """Graft points from a manifest file, one per line ("#" starts a comment)."""
+    lines = []
+    for line in path.read_text().splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            lines.append(line)
+    return lines
+
+
+# ==================== Names ====================
+
+def _unique(name: str, used: set, fit) -> str:
+    if name not in used:
+        return name
+    for number in range(1, 100000):
+        candidate = fit(f"~{number}")
+        if candidate not in used:
+            return candidate
+    raise ValueError(f"too many names like {name}")
+
+
+def assign_names(directory: Node):
+    """ISO 9660 and Joliet identifiers for every child, unique per directory."""
+    used_iso: set = set()
+    used_joliet: set = set()
+    for name in sorted(directory.children):
+        child = directory.children[name]
+        if child.is_dir:
+            base = _NOT_D_CHARS.sub("_", name.upper())[:DIR_NAME_MAX] or "_"
+            iso = _unique(base, used_iso, lambda suffix: base[:DIR_NAME_MAX - len(suffix)] + suffix)
+            child.iso_name = iso.encode()
+        else:
+            stem, dot, extension = name.upper().rpartition(".")
+            if not dot or not stem:
+                stem, extension = name.upper(), ""
+            extension = _NOT_D_CHARS.sub("_", extension)[:8]
+            stem = _NOT_D_CHARS.sub("_", stem)[:FILE_NAME_MAX - len(extension)] or "_"
+            iso = _unique(f"{stem}.{extension}", used_iso,
+                          lambda suffix: f"{stem[:FILE_NAME_MAX - len(extension) - len(suffix)]}{suffix}.{extension}")
+            child.iso_name = (iso + ";1").encode()
+        used_iso.add(iso)
+        base = _NOT_JOLIET.sub("_", name)[:JOLIET_NAME_MAX]
+        joliet = _unique(base, used_joliet, lambda suffix: base[:JOLIET_NAME_MAX - len(suffix)] + suffix)
+        used_joliet.add(joliet)
+        child.joliet_name = joliet.encode("utf-16-be")
+        if child.is_dir:
+            assign_names(child)
+
+
+# ==================== Rock Ridge ====================
+
+def susp_px(mode: int, links: int) -> bytes:
+    return b"PX" + bytes([36, 1]) + both32(mode) + both32(links) + both32(0) + both32(0)
+
+
+def susp_tf(timestamp: int) -> bytes:
+    return b"TF" + bytes([12, 1, 0x02]) + record_date(timestamp)
+
+
+def susp_nm(name: str) -> bytes:
+    encoded = name.encode()
+    return b"NM" + bytes([5 + len(encoded), 1, 0]) + encoded
+
+
+def susp_sl(target: str) -> bytes:
+    components = b""
+    if target.startswith("/"):
+        components += bytes([0x08, 0])
+    for part in target.split("/"):
+        if part in ("", "."):
+            if part == ".":
+                components += bytes([0x02, 0])
+            continue
+        if part == "..":
+            components += bytes([0x04, 0])
+        else:
+            encoded = part.encode()
+            components += bytes([0, len(encoded)]) + encoded
+    if 5 + len(components) > 250:
+        raise ValueError(f"symlink target too long: {target[:40]}...")
+    return b"SL" + bytes([5 + len(components), 1, 0]) + components
+
+
+def susp_sp() -> bytes:
+    return b"SP" + bytes([7, 1, 0xBE, 0xEF, 0])
+
+
+def susp_er() -> bytes:
+    return (b"ER" + bytes([8 + len(RRIP_ID) + len(RRIP_DESCRIPTION) + len(RRIP_SOURCE), 1,
+                           len(RRIP_ID), len(RRIP_DESCRIPTION), len(RRIP_SOURCE), 1])
+            + RRIP_ID + RRIP_DESCRIPTION + RRIP_SOURCE)
+
+
+def posix_mode(node: Node) -> int:
+    kind = {"dir": stat.S_IFDIR, "file": stat.S_IFREG, "symlink": stat.S_IFLNK}[node.kind]
+    return kind | node.mode
+
+
+def link_count(node: Node) -> int:
+    if node.is_dir:
+        return 2 + sum(1 for child in node.children.values() if child.is_dir)
+    return 1
+
+
+# ==================== Directory records ====================
+
+@dataclass
+class Record:
+    """One directory record, laid out before extents are known."""
+    identifier: bytes
+    node: Node
+    flags: int
+    system_use: bytes = b""
+    # System use entries that did not fit, and where they ended up
+    continuation: bytes = b""
+    ce_extent: int = 0
+    ce_offset: int = 0
+
+    @property
+    def base_length(self) -> int:
+        return 33 + len(self.identifier) + (1 - len(self.identifier) % 2)
+
+    @property
+    def length(self) -> int:
+        length = self.base_length + len(self.system_use) + (CE_LENGTH if self.continuation else 0)
+        return length + length % 2
+
+    def encode(self, extent: int, size: int, timestamp: int) -> bytes:
+        system_use = self.system_use
+        if self.continuation:
+            system_use += (b"CE" + bytes([CE_LENGTH, 1]) + both32(self.ce_extent) + both32(self.ce_offset)
+                           + both32(len(self.continuation)))
+        data = (bytes([self.length, 0]) + both32(extent) + both32(size) + record_date(timestamp)
+                + bytes([self.flags, 0, 0]) + both16(1) + bytes([len(self.identifier)]) + self.identifier
+                + b"\x00" * (1 - len(self.identifier) % 2) + system_use)
+        return data + b"\x00" * (self.length - len(data))
+
+
+def make_record(identifier: bytes, node: Node, entries: List[bytes]) -> Record:
+    """Split system use entries between the record and a continuation area."""
+    record = Record(identifier, node, 0x02 if node.is_dir else 0x00)
+    room = RECORD_MAX - 1 - record.base_length
+    if sum(map(len, entries)) <= room:
+        record.system_use = b"".join(entries)
+        return record
+    inline = b""
+    for index, entry in enumerate(entries):
+        if len(inline) + len(entry) + CE_LENGTH > room:
+            record.continuation = b"".join(entries[index:])
+            break
+        inline += entry
+    record.system_use = inline
+    return record
+
+
+def directory_records(directory: Node, joliet: bool, timestamp: int) -> List[Record]:
+    parent = directory.parent or directory
+    if joliet:
+        records = [Record(b"\x00", directory, 0x02), Record(b"\x01", parent, 0x02)]
+        records += [Record(child.joliet_name, child, 0x02 if child.is_dir else 0x00)
+                    for child in directory.sorted_children(joliet=True)]
+        return records
+    dot = [susp_px(posix_mode(directory), link_count(directory)), susp_tf(timestamp)]
+    if directory.parent is None:
+        dot = [susp_sp()] + dot + [susp_er()]
+    records = [make_record(b"\x00", directory, dot),
+               make_record(b"\x01", parent, [susp_px(posix_mode(parent), link_count(parent)), susp_tf(timestamp)])]
+    for child in directory.sorted_children():
+        entries = [susp_px(posix_mode(child), link_count(child)), susp_tf(timestamp), susp_nm(child.name)]
+        if child.kind == "symlink":
+            entries.append(susp_sl(child.target))
+        records.append(make_record(child.iso_name, child, entries))
+    return records
+
+
+def directory_size(records: List[Record]) -> int:
+    """Bytes of a directory's extent (records never cross a sector boundary)."""
+    used = 0
+    for record in records:
+        if used % SECTOR + record.length > SECTOR:
+            used += SECTOR - used % SECTOR
+        used += record.length
+    return -(-used // SECTOR) * SECTOR
+
+
+def encode_directory(records: List[Record], joliet: bool, timestamp: int) -> bytes:
+    out = bytearray()
+    for record in records:
+        if len(out) % SECTOR + record.length > SECTOR:
+            out += b"\x00" * (SECTOR - len(out) % SECTOR)
+        node = record.node
+        if node.is_dir:
+            extent, size = (node.joliet_extent, node.joliet_size) if joliet else (node.extent, node.dir_size)
+        else:
+            extent, size = node.extent, node.size
+        out += record.encode(extent, size, timestamp)
+    out += b"\x00" * (-len(out) % SECTOR)
+    return bytes(out)
+
+
+def path_table(directories: List[Node], joliet: bool, big_endian: bool) -> bytes:
+    order = ">" if big_endian else "<"
+    numbers = {id(directory): index + 1 for index, directory in enumerate(directories)}
+    out = bytearray()
+    for directory in directories:
+        name = b"\x00" if directory.parent is None else (directory.joliet_name if joliet else directory.iso_name)
+        extent = directory.joliet_extent if joliet else directory.extent
+        parent = numbers[id(directory.parent or directory)]
+        out += bytes([len(name), 0]) + struct.pack(order + "IH", extent, parent) + name + b"\x00" * (len(name) % 2)
+    return bytes(out)
+
+
+# ==================== El Torito ====================
+
+@dataclass
+class BootImage:
+    """An El Torito entry pointing at a file in the image."""
+    iso_path: str
+    platform: int = PLATFORM_BIOS
+    load_sectors: Optional[int] = None
+    info_table: bool = False
+    node: Optional[Node] = None
+
+    def sector_count(self) -> int:
+        if self.load_sectors is not None:
+            return self.load_sectors
+        # UEFI reads the whole FAT image; 0 would mean "one sector" to some firmware
+        return min(-(-self.node.size // 512), 0xFFFF)
+
+
+def boot_catalog(images: List[BootImage]) -> bytes:
+    """Validation entry, default entry, then one section per other platform."""
+    validation = bytearray(bytes([1, images[0].platform, 0, 0]) + padded("CYBEROS", 24) + b"\x00\x00\x55\xAA")
+    checksum = -sum(struct.unpack("<16H", bytes(validation))) & 0xFFFF
+    validation[28:30] = struct.pack("<H", checksum)
+
+    def entry(image: BootImage) -> bytes:
+        return (bytes([0x88, 0]) + struct.pack("<H", 0) + bytes([0, 0]) + struct.pack("<H", image.sector_count())
+                + struct.pack("<I", image.node.extent) + b"\x00" * 20)
+
+    catalog = bytes(validation) + entry(images[0])
+    others = images[1:]
+    for index, image in enumerate(others):
+        final = 0x91 if index == len(others) - 1 else 0x90
+        catalog += bytes([final, image.platform]) + struct.pack("<H", 1) + b"\x00" * 28 + entry(image)
+    return catalog.ljust(SECTOR, b"\x00")
+
+
+def patch_info_table(data: bytes, extent: int) -> bytes:
+    """Boot info table (mkisofs -boot-info-table): GRUB's cdboot reads where the rest of core.img is."""
+    if len(data) < 64:
+        raise ValueError("boot image too small for a boot info table")
+    checksum = 0
+    tail = data[64:] + b"\x00" * (-len(data[64:]) % 4)
+    for (word,) in struct.iter_unpack("<I", tail):
+        checksum = (checksum + word) & 0xFFFFFFFF
+    table = struct.pack("<IIII", FIRST_DESCRIPTOR, extent, len(data), checksum) + b"\x00" * 40
+    return data[:8] + table + data[64:]
+
+
+# ==================== Writer ====================
+
+@dataclass
+class IsoStats:
+    files: int
+    bytes: int
+    seconds: float
+    peak_rss: int
+
+
+class _Output:
+    """Sequential output that only ever moves forward."""
+
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+        self.fd = stream.fileno()
+        self.position = 0
+        self.sendfile = hasattr(os, "sendfile")
+
+    def write(self, data: bytes):
+        view = memoryview(data)
+        while view:
+            written = os.write(self.fd, view)
+            view = view[written:]
+        self.position += len(data)
+
+    def pad_to(self, sector: int, offset: int = 0):
+        target = sector * SECTOR + offset
+        if target < self.position:
+            raise AssertionError("layout went backwards")
+        while self.position < target:
+            self.write(b"\x00" * min(target - self.position, COPY_CHUNK))
+
+    def copy(self, source: Path, size: int):
+        with open(source, "rb") as file:
+            if os.fstat(file.fileno()).st_size != size:
+                raise ValueError(f"{source} changed size while the image was being written")
+            remaining, offset = size, 0
+            while remaining and self.sendfile:
+                try:
+                    sent = os.sendfile(self.fd, file.fileno(), offset, min(remaining, 1 << 30))
+                except OSError:
+                    # Not supported for this pair of files (e.g. macOS to a regular file)
+                    self.sendfile = False
+                    break
+                if sent == 0:
+                    break
+                offset += sent
+                remaining -= sent
+                self.position += sent
+            file.seek(offset)
+            while remaining:
+                chunk = file.read(min(remaining, COPY_CHUNK))
+                if not chunk:
+                    raise ValueError(f"{source} shrank while the image was being written")
+                self.write(chunk)
+                remaining -= len(chunk)
+
+
+class IsoWriter:
+    """Lays out an IsoTree and streams it to a file or pipe."""
+
+    def __init__(self, tree: IsoTree, volume_id: str = "CYBEROS", timestamp: int = 0,
+                 boot_images: Optional[List[BootImage]] = None, joliet: bool = True):
+        self.tree = tree
+        self.volume_id = _NOT_D_CHARS.sub("_", volume_id.upper())[:32]
+        self.joliet_volume_id = volume_id[:16]
+        self.timestamp = timestamp
+        self.boot_images = boot_images or []
+        self.joliet = joliet
+        self.catalog: Optional[Node] = None
+        if self.boot_images:
+            self.catalog = tree.add_data(BOOT_CATALOG, SECTOR)
+            for image in self.boot_images:
+                image.node = tree.find(image.iso_path)
+                if image.node.kind != "file":
+                    raise ValueError(f"boot image {image.iso_path} is not a file")
+                image.node.boot_info_table = image.info_table
+
+    def layout(self) -> int:
+        """Assign every extent; returns the image size in sectors."""
+        assign_names(self.tree.root)
+        sector = FIRST_DESCRIPTOR + 1 + bool(self.boot_images) + self.joliet + 1
+        self.dirs = self.tree.directories()
+        self.joliet_dirs = self.tree.directories(joliet=True) if self.joliet else []
+
+        # Path table sizes only depend on names
+        self.path_table_size = len(path_table(self.dirs, False, False))
+        self.joliet_path_table_size = len(path_table(self.joliet_dirs, True, False)) if self.joliet else 0
+        self.path_tables = []
+        for size in [self.path_table_size] * 2 + [self.joliet_path_table_size] * (2 if self.joliet else 0):
+            self.path_tables.append(sector)
+            sector += -(-size // SECTOR)
+
+        self.records = {id(directory): directory_records(directory, False, self.timestamp) for directory in self.dirs}
+        for directory in self.dirs:
+            directory.dir_size = directory_size(self.records[id(directory)])
+            directory.extent = sector
+            sector += directory.dir_size // SECTOR
+        self.joliet_records = {id(directory): directory_records(directory, True, self.timestamp)
+                               for directory in self.joliet_dirs}
+        for directory in self.joliet_dirs:
+            directory.joliet_size = directory_size(self.joliet_records[id(directory)])
+            directory.joliet_extent = sector
+            sector += directory.joliet_size // SECTOR
+
+        # Rock Ridge continuation areas, packed without crossing sectors
+        self.continuation_start = sector
+        used = 0
+        for directory in self.dirs:
+            for record in self.records[id(directory)]:
+                if not record.continuation:
+                    continue
+                if used % SECTOR + len(record.continuation) > SECTOR:
+                    used += SECTOR - used % SECTOR
+                record.ce_extent = sector + used // SECTOR
+                record.ce_offset = used % SECTOR
+                used += len(record.continuation)
+        sector += -(-used // SECTOR)
+
+        # File data: boot catalog and images first, then depth-first order
+        self.files: List[Node] = []
+        extents: Dict[Tuple[int, int], int] = {}
+        boot_nodes = [self.catalog] + [image.node for image in self.boot_images] if self.catalog else []
+        ordered = boot_nodes + [node for node in self.tree.root.walk()
+                                if node.kind == "file" and node not in boot_nodes]
+        for node in ordered:
+            shared = node.inode in extents and not node.boot_info_table
+            if shared:
+                node.extent = extents[node.inode]
+                continue
+            if not node.size:
+                node.extent = 0
+                continue
+            node.extent = sector
+            if node.inode and not node.boot_info_table:
+                extents[node.inode] = node.extent
+            sector += -(-node.size // SECTOR)
+            self.files.append(node)
+        self.total_sectors = sector
+        if self.catalog:
+            self.catalog.data = boot_catalog(self.boot_images)
+        return sector
+
+    # ---------- Volume descriptors ----------
+
+    def _root_record(self, joliet: bool) -> bytes:
+        root = self.tree.root
+        extent, size = (root.joliet_extent, root.joliet_size) if joliet else (root.extent, root.dir_size)
+        return Record(b"\x00", root, 0x02).encode(extent, size, self.timestamp)
+
+    def _volume_descriptor(self, joliet: bool) -> bytes:
+        if joliet:
+            text = padded_ucs2
+            table_size = self.joliet_path_table_size
+            l_table, m_table = self.path_tables[2], self.path_tables[3]
+            escape = b"%/E".ljust(32, b"\x00")
+            volume = padded_ucs2(self.joliet_volume_id, 32)
+        else:
+            text = padded
+            table_size = self.path_table_size
+            l_table, m_table = self.path_tables[0], self.path_tables[1]
+            escape = b"\x00" * 32
+            volume = padded(self.volume_id, 32)
+        created = descriptor_date(self.timestamp)
+        descriptor = (bytes([2 if joliet else 1]) + b"CD001\x01\x00" + text("LINUX", 32) + volume
+                      + b"\x00" * 8 + both32(self.total_sectors) + escape + both16(1) + both16(1) + both16(SECTOR)
+                      + both32(table_size) + struct.pack("<I", l_table) + b"\x00" * 4
+                      + struct.pack(">I", m_table) + b"\x00" * 4 + self._root_record(joliet)
+                      + text("", 128) + text("CYBEROS", 128) + text("", 128) + text("CYBEROS ISO_WRITER", 128)
+                      + text("", 37) + text("", 37) + text("", 37)
+                      + created + created + descriptor_date(None) + created + b"\x01\x00")
+        return descriptor.ljust(SECTOR, b"\x00")
+
+    def _boot_record(self) -> bytes:
+        return (b"\x00CD001\x01" + b"EL TORITO SPECIFICATION".ljust(32, b"\x00") + b"\x00" * 32
+                + struct.pack("<I", self.catalog.extent)).ljust(SECTOR, b"\x00")
+
+    # ---------- Output ----------
+
+    def write(self, stream: BinaryIO) -> IsoStats:
+        started = time.perf_counter()
+        if not hasattr(self, "total_sectors"):
+            self.layout()
+        out = _Output(stream)
+        out.pad_to(FIRST_DESCRIPTOR)
+        header = self._volume_descriptor(False)
+        if self.boot_images:
+            header += self._boot_record()
+        if self.joliet:
+            header += self._volume_descriptor(True)
+        header += b"\xffCD001\x01".ljust(SECTOR, b"\x00")
+        out.write(header)
+
+        tables = [path_table(self.dirs, False, False), path_table(self.dirs, False, True)]
+        if self.joliet:
+            tables += [path_table(self.joliet_dirs, True, False), path_table(self.joliet_dirs, True, True)]
+        for sector, table in zip(self.path_tables, tables):
+            out.pad_to(sector)
+            out.write(table)
+        for directory in self.dirs:
+            out.pad_to(directory.extent)
+            out.write(encode_directory(self.records[id(directory)], False, self.timestamp))
+        for directory in self.joliet_dirs:
+            out.pad_to(directory.joliet_extent)
+            out.write(encode_directory(self.joliet_records[id(directory)], True, self.timestamp))
+        for directory in self.dirs:
+            for record in self.records[id(directory)]:
+                if record.continuation:
+                    out.pad_to(record.ce_extent, record.ce_offset)
+                    out.write(record.continuation)
+
+        written = 0
+        for node in self.files:
+            out.pad_to(node.extent)
+            if node.data is not None:
+                out.write(node.data[:node.size])
+            elif node.boot_info_table:
+                out.write(patch_info_table(node.source.read_bytes(), node.extent))
+            else:
+                out.copy(node.source, node.size)
+            written += node.size
+        out.pad_to(self.total_sectors)
+        return IsoStats(len(self.files), written, time.perf_counter() - started, peak_rss())
+
+
+def peak_rss() -> int:
+    """Peak resident memory of this process in bytes (0 where unknown)."""
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def source_date(default: int = 0) -> int:
+    """SOURCE_DATE_EPOCH (reproducible-builds.org), else the given default."""
+    try:
+        return int(os.environ["SOURCE_DATE_EPOCH"])
+    except (KeyError, ValueError):
+        return default
+
+
+def build_iso(grafts: List[str], output: Path, volume_id: str = "CYBEROS", timestamp: Optional[int] = None,
+              boot_images: Optional[List[BootImage]] = None, joliet: bool = True) -> IsoStats:
+    """Write an ISO from graft points; a partial file is never left at `output`."""
+    tree = IsoTree()
+    for graft in grafts:
+        tree.add_graft(graft)
+    writer = IsoWriter(tree, volume_id, source_date() if timestamp is None else timestamp, boot_images, joliet)
+    writer.layout()
+    if str(output) == "-":
+        return writer.write(sys.stdout.buffer)
+    temporary = output.with_name(output.name + ".tmp")
+    try:
+        with open(temporary, "wb") as stream:
+            stats = writer.write(stream)
+        os.replace(temporary, output)
+    finally:
+        if temporary.exists():
+            temporary.unlink()
+    return stats
+
+
+# ==================== Benchmark ====================
+
+def _run_measured(command: List[str]) -> Tuple[int, float, int]:
+    """Exit code, wall time and peak RSS (including waited-for children) of a command."""
+    started = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - started
+    process.returncode = os.waitstatus_to_exitcode(status)
+    peak = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    return process.returncode, elapsed, peak
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(COPY_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def benchmark(grafts: List[str], writer_args: List[str]):
+    """Time this writer (twice, checking the output is identical) against grub-mkrescue."""
+    mib = 1024 * 1024
+    with tempfile.TemporaryDirectory(prefix="cyberos-iso-bench-") as scratch:
+        scratch = Path(scratch)
+        digests = []
+        for run in (1, 2):
+            output = scratch / f"writer{run}.iso"
+            code, elapsed, peak = _run_measured([sys.executable, __file__, "-o", str(output)] + writer_args + grafts)
+            if code != 0:
+                raise SystemExit(f"iso_writer failed with exit code {code}")
+            digests.append(_sha256(output))
+            print(f"iso_writer run {run}: {elapsed:.2f} s, peak RSS {peak / mib:.1f} MiB, "
+                  f"{output.stat().st_size / mib:.1f} MiB")
+        print(f"Reproducible: {'yes' if digests[0] == digests[1] else 'NO'} (sha256 {digests[0][:16]}...)")
+
+        mkrescue = shutil.which("grub-mkrescue")
+        if mkrescue is None:
+            print("grub-mkrescue: not installed, nothing to compare against")
+            return
+        # grub-mkrescue needs the tree copied into one directory first
+        started = time.perf_counter()
+        staging = scratch / "staging"
+        tree = IsoTree()
+        for graft in grafts:
+            tree.add_graft(graft)
+        for node in tree.root.walk():
+            target = staging / node.path
+            if node.is_dir:
+                target.mkdir(parents=True, exist_ok=True)
+            elif node.kind == "symlink":
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.symlink(node.target, target)
+            else:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(node.source, target)
+        staged = time.perf_counter() - started
+        output = scratch / "grub-mkrescue.iso"
+        code, elapsed, peak = _run_measured([mkrescue, "-o", str(output), str(staging)])
+        if code != 0:
+            print(f"grub-mkrescue failed with exit code {code}")
+            return
+        print(f"grub-mkrescue: {elapsed:.2f} s (+{staged:.2f} s staging copy), peak RSS {peak / mib:.1f} MiB, "
+              f"{output.stat().st_size / mib:.1f} MiB")
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Write a bootable ISO 9660 image from graft points")
+    parser.add_argument("grafts", nargs="*", help="image/path=source/path (a bare directory adds its contents)")
+    parser.add_argument("-o", "--output", type=Path, help="ISO file to write ('-' for stdout)")
+    parser.add_argument("--manifest", type=Path, action="append", default=[],
+                        help="file with one graft point per line (may be repeated)")
+    parser.add_argument("-V", "--volume-id", default="CYBEROS", help="volume label")
+    parser.add_argument("--date", type=int, help="timestamp for every file (default: SOURCE_DATE_EPOCH or 0)")
+    parser.add_argument("--bios-boot", metavar="IMAGE_PATH",
+                        help="El Torito no-emulation BIOS image in the tree (e.g. boot/grub/eltorito.img)")
+    parser.add_argument("--no-boot-info-table", action="store_true",
+                        help="do not patch a boot info table into the BIOS image")
+    parser.add_argument("--efi-boot", metavar="IMAGE_PATH", help="El Torito UEFI FAT image in the tree")
+    parser.add_argument("--no-joliet", action="store_true", help="omit the Joliet tree")
+    parser.add_argument("--bench", action="store_true",
+                        help="time this writer twice and grub-mkrescue once on the same files")
+    args = parser.parse_args()
+
+    grafts = [graft for manifest in args.manifest for graft in read_manifest(manifest)] + args.grafts
+    if not grafts:
+        parser.error("no files given")
+    boot_images = []
+    if args.bios_boot:
+        boot_images.append(BootImage(args.bios_boot, PLATFORM_BIOS, BIOS_LOAD_SECTORS,
+                                     info_table=not args.no_boot_info_table))
+    if args.efi_boot:
+        boot_images.append(BootImage(args.efi_boot, PLATFORM_EFI))
+
+    if args.bench:
+        writer_args = ["-V", args.volume_id]
+        for option, value in (("--date", args.date), ("--bios-boot", args.bios_boot), ("--efi-boot", args.efi_boot)):
+            if value is not None:
+                writer_args += [option, str(value)]
+        writer_args += ["--no-boot-info-table"] * args.no_boot_info_table + ["--no-joliet"] * args.no_joliet
+        benchmark(grafts, writer_args)
+        return
+    if not args.output:
+        parser.error("--output is required")
+    try:
+        stats = build_iso(grafts, args.output, args.volume_id, args.date, boot_images, not args.no_joliet)
+    except (ValueError, OSError) as e:
+        print(f"iso_writer: {e}", file=sys.stderr)
+        sys.exit(1)
+    if str(args.output) != "-":
+        rate = stats.bytes / 1024 / 1024 / max(stats.seconds, 1e-6)
+        print(f"Wrote {args.output}: {stats.files} files, {stats.bytes / 1024 / 1024:.1f} MiB in "
+              f"{stats.seconds:.2f} s ({rate:.0f} MiB/s), peak memory {stats.peak_rss / 1024 / 1024:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
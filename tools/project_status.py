@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS Project Status Service
+Collects the Dashboard's project status off the Tk thread.
+
+A single background thread gathers the facts shown on the Dashboard (ISO,
+dependencies, scripts, docs), renders them to lines and hands them to a
+callback. Refresh requests are debounced, the project tree is polled for
+changes cheaply via directory mtimes, and a periodic refresh keeps the
+dashboard current when nothing else triggers one.
+"""
+
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+DEPENDENCIES = ["bash", "gcc", "grub-mkimage", "qemu-system-x86_64", "python3"]
+
+
+def dependency_status(deps: List[str] = DEPENDENCIES) -> Dict[str, bool]:
+    """Check which dependencies are on PATH."""
+    return {dep: shutil.which(dep) is not None for dep in deps}
+
+
+def _count(directory: Path, suffix: str) -> int:
+    """Number of entries in directory ending with suffix."""
+    try:
+        with os.scandir(directory) as entries:
+            return sum(1 for entry in entries if entry.name.endswith(suffix))
+    except OSError:
+        return 0
+
+
+def script_count(project_root: Path) -> int:
+    """Count build scripts."""
+    return _count(project_root / "scripts", ".sh")
+
+
+def doc_count(project_root: Path) -> int:
+    """Count documentation files."""
+    return _count(project_root, ".md") + _count(project_root / "docs", ".md")
+
+
+def render_status(project_root: Path, iso_file: Path) -> List[str]:
+    """Collect the project status and render it as Dashboard lines."""
+    lines = ["PROJECT: CyberOS v0.1.0-alpha", "=" * 50, ""]
+
+    lines.append("BUILD STATUS:")
+    try:
+        size = iso_file.stat().st_size / (1024 ** 2)
+        lines.append(f"  ✓ ISO Built: {iso_file.name} ({size:.2f} MB)")
+    except OSError:
+        lines.append("  ✗ ISO Not Built")
+    lines.append("")
+
+    lines.append("BUILD FILES:")
+    lines.append(f"  Kernel: {project_root / 'kernel' / 'vmlinuz'}")
+    lines.append(f"  RootFS: {project_root / 'build' / 'rootfs'}")
+    lines.append(f"  ISO: {iso_file}")
+    lines.append("")
+
+    lines.append("DEPENDENCIES:")
+    for dep, present in dependency_status().items():
+        lines.append(f"  {'✓' if present else '✗'} {dep}")
+    lines.append("")
+
+    lines.append("PROJECT STRUCTURE:")
+    lines.append(f"  Root: {project_root}")
+    lines.append(f"  Scripts: {script_count(project_root)} build scripts")
+    lines.append(f"  Docs: {doc_count(project_root)} documentation files")
+    lines.append("  Emulator: Available")
+    return lines
+
+
+def diff_lines(old: List[str], new: List[str]) -> List[Tuple[int, Optional[str]]]:
+    """Line edits turning old into new.
+
+    Returns (index, text) pairs for lines that changed or were added, and
+    (index, None) for trailing lines to delete, highest index first.
+    """
+    edits: List[Tuple[int, Optional[str]]] = [
+        (i, line) for i, line in enumerate(new) if i >= len(old) or old[i] != line
+    ]
+    edits.extend((i, None) for i in range(len(old) - 1, len(new) - 1, -1))
+    return edits
+
+
+class StatusService(threading.Thread):
+    """Background refresher for the Dashboard's project status.
+
+    on_update is called from the service thread with the rendered lines
+    whenever they differ from the previous refresh.
+    """
+
+    def __init__(self, project_root: Path, iso_file: Path, on_update: Callable[[List[str]], None],
+                 interval: float = 30.0, poll: float = 2.0, debounce: float = 0.5):
+        super().__init__(daemon=True, name="cyberos-status")
+        self.project_root = project_root
+        self.iso_file = iso_file
+        self.on_update = on_update
+        self.interval = interval
+        self.poll = poll
+        self.debounce = debounce
+        self.lines: List[str] = []
+        self.last_duration = 0.0
+        self._due: Optional[float] = 0.0
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+
+    def watched_paths(self) -> List[Path]:
+        """Paths whose mtime changes when the status may have changed."""
+        return [self.project_root, self.project_root / "scripts", self.project_root / "docs",
+                self.iso_file.parent, self.iso_file]
+
+    def fingerprint(self) -> Tuple[float, ...]:
+        """Cheap summary of the watched paths' modification times."""
+        stamps = []
+        for path in self.watched_paths():
+            try:
+                stamps.append(path.stat().st_mtime)
+            except OSError:
+                stamps.append(0.0)
+        return tuple(stamps)
+
+    def request(self, delay: Optional[float] = None):
+        """Schedule a refresh; bursts of requests collapse into one."""
+        with self._cond:
+            self._due = time.monotonic() + (self.debounce if delay is None else delay)
+            self._cond.notify()
+
+    def stop(self):
+        """Stop the service."""
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify()
+
+    def run(self):
+        last_refresh = time.monotonic()
+        last_fingerprint = self.fingerprint()
+        next_poll = time.monotonic() + self.poll
+        while not self._stop_event.is_set():
+            with self._cond:
+                now = time.monotonic()
+                wake = min(next_poll, last_refresh + self.interval)
+                if self._due is not None:
+                    wake = min(wake, self._due)
+                if wake > now:
+                    self._cond.wait(wake - now)
+                    continue
+                due = self._due is not None and self._due <= now
+                if due:
+                    self._due = None
+            if self._stop_event.is_set():
+                break
+
+            now = time.monotonic()
+            if now >= next_poll:
+                next_poll = now + self.poll
+                fingerprint = self.fingerprint()
+                if fingerprint != last_fingerprint:
+                    last_fingerprint = fingerprint
+                    self.request()
+            if due or now - last_refresh >= self.interval:
+                last_refresh = now
+                self.refresh()
+
+    def refresh(self):
+        """Collect the status now and publish it if it changed."""
+        started = time.perf_counter()
+        lines = render_status(self.project_root, self.iso_file)
+        self.last_duration = time.perf_counter() - started
+        if lines != self.lines:
+            self.lines = lines
+            self.on_update(lines)
@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS Smoke Tests
+Boots the ISO headless in parallel and checks each guest with expect scripts.
+
+Every test case boots its own guest with -nographic on the serial console
+and a throwaway qcow2 overlay, then walks through its steps:
+
+    {"expect": "regex", "timeout": 60}   wait for output matching regex
+    {"send": "text\\n"}                   type text on the serial console
+    {"reject": "regex", "timeout": 5}    fail if regex appears within timeout
+    {"sleep": 2}                         wait
+
+Any "fail_on" pattern (such as "Kernel panic") fails a case as soon as it
+is printed. Guests run concurrently as far as the host's CPU and memory
+allow (admission control), and results are written as JUnit XML and/or JSON
+with the duration of every step. Each guest's console is kept in the
+output directory. With --screens, every guest's screen is also captured over
+QMP during boot (boot_screens.py) and a case fails if it stops at an earlier
+boot stage, gets there much later or shows a different screen than the
+baseline recorded with --record-screens.
+
+Usage:
+    python3 tools/smoke_test.py                          # all cases in smoke_tests.json
+    python3 tools/smoke_test.py -k boot --junit results.xml --json results.json
+    python3 tools/smoke_test.py --record-screens screens.json   # then --screens screens.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "emulator" / "gui"))
+from admission import AdmissionController, AdmissionError
+from boot_screens import BootRecord, BootScreenSupervisor, compare
+from direct_boot import DirectBoot
+from process_engine import ProcessEngine, ProcessHandle
+from vm_command import VMSpec, build_qemu_command
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_ISO = PROJECT_ROOT / "iso" / "cyberos-0.1.0-alpha.iso"
+DEFAULT_CASES = Path(__file__).resolve().parent / "smoke_tests.json"
+# Output kept for matching; older text is dropped
+BUFFER_LIMIT = 1024 * 1024
+
+
+@dataclass
+class Step:
+    """One expect-script step."""
+    kind: str
+    value: str
+    timeout: float = 30.0
+
+
+@dataclass
+class SmokeCase:
+    """A guest to boot and the steps to run against it."""
+    name: str
+    steps: List[Step]
+    description: str = ""
+    cores: int = 1
+    memory: int = 256
+    timeout: float = 300.0
+    fail_on: List[str] = field(default_factory=list)
+
+
+@dataclass
+class StepResult:
+    """Outcome of one step."""
+    kind: str
+    value: str
+    status: str
+    duration: float
+    message: str = ""
+
+
+@dataclass
+class CaseResult:
+    """Outcome of one test case."""
+    name: str
+    status: str = "passed"
+    duration: float = 0.0
+    boot_wait: float = 0.0
+    message: str = ""
+    console_log: str = ""
+    steps: List[StepResult] = field(default_factory=list)
+    boot_screens: str = ""
+    screen_issues: List[str] = field(default_factory=list)
+
+
+def load_cases(path: Path, keyword: Optional[str] = None) -> List[SmokeCase]:
+    """Read test cases from a JSON file, optionally only those whose name contains keyword."""
+    data = json.loads(path.read_text())
+    defaults = data.get("defaults", {})
+    cases = []
+    for raw in data["cases"]:
+        if keyword and keyword not in raw["name"]:
+            continue
+        steps = []
+        for step in raw["steps"]:
+            kind = next(key for key in ("expect", "send", "reject", "sleep") if key in step)
+            steps.append(Step(kind, str(step[kind]), float(step.get("timeout", 30))))
+        settings = {**defaults, **{k: v for k, v in raw.items() if k != "steps"}}
+        cases.append(SmokeCase(
+            name=settings["name"],
+            steps=steps,
+            description=settings.get("description", ""),
+            cores=int(settings.get("cores", 1)),
+            memory=int(settings.get("memory", 256)),
+            timeout=float(settings.get("timeout", 300)),
+            fail_on=list(settings.get("fail_on", [])),
+        ))
+    return cases
+
+
+class CaseFailure(Exception):
+    """A step did not hold."""
+
+
+class ExpectSession:
+    """Matches a guest's console output against patterns (engine loop only)."""
+
+    def __init__(self, handle: ProcessHandle, fail_on: List[str], log):
+        self.handle = handle
+        self.fail_on = [re.compile(pattern) for pattern in fail_on]
+        self.log = log
+        self.text = ""
+        self.partial = ""
+        self._consumed = 0
+        self.failure: Optional[str] = None
+        self._changed = asyncio.Event()
+
+    def on_line(self, line: str):
+        self.log.write(line + "\n")
+        line = line[self._consumed:] if self._consumed <= len(line) else ""
+        self._consumed = 0
+        self.partial = ""
+        self.text = (self.text + line + "\n")[-BUFFER_LIMIT:]
+        for pattern in self.fail_on:
+            if pattern.search(line):
+                self.failure = f"console printed {line.strip()!r}"
+        self._changed.set()
+
+    def on_partial(self, line: str):
+        self.partial = line[self._consumed:]
+        self._changed.set()
+
+    def _search(self, regex: "re.Pattern") -> Optional["re.Match"]:
+        """Look for a pattern in unconsumed output and consume up to the match."""
+        buffer = self.text + self.partial
+        match = regex.search(buffer)
+        if match is None:
+            return None
+        if match.end() <= len(self.text):
+            self.text = self.text[match.end():]
+        else:
+            self._consumed += match.end() - len(self.text)
+            self.partial = self.partial[match.end() - len(self.text):]
+            self.text = ""
+        return match
+
+    async def wait_for(self, pattern: str, timeout: float) -> Optional["re.Match"]:
+        """Wait until pattern appears; None on timeout."""
+        regex = re.compile(pattern, re.MULTILINE)
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.failure:
+                raise CaseFailure(self.failure)
+            match = self._search(regex)
+            if match:
+                return match
+            if not self.handle.running:
+                raise CaseFailure(f"guest exited with code {self.handle.returncode}")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    def send(self, text: str):
+        self.log.write(f"<<< {text!r}\n")
+        self.handle.write(text.encode())
+
+
+class SmokeRunner:
+    """Boots one guest per test case, as many at once as the host allows."""
+
+    def __init__(self, iso_file: Path, output_dir: Path, accel: str, jobs: Optional[int] = None,
+                 direct_boot: Optional[DirectBoot] = None, screens: bool = False,
+                 screen_baseline: Optional[BootRecord] = None):
+        self.iso_file = iso_file
+        self.direct_boot = direct_boot
+        self.output_dir = output_dir
+        self.accel = accel
+        self.jobs = jobs
+        self.admission = AdmissionController()
+        self.engine = ProcessEngine().start()
+        self.work_dir = Path(tempfile.mkdtemp(prefix="cyberos-smoke-"))
+        # Boot screens of every guest, checked against screen_baseline if given
+        self.screen_baseline = screen_baseline
+        self.boot_records: Dict[str, BootRecord] = {}
+        self.screens: Optional[BootScreenSupervisor] = None
+        if screens or screen_baseline:
+            self.screens = BootScreenSupervisor(self.work_dir / "screens")
+            self.screens.start()
+
+    async def _run_helper(self, command: List[str]):
+        code, output = await self.engine.run(command, timeout=120)
+        if code != 0:
+            raise CaseFailure(f"{command[0]} failed: {output.strip()}")
+
+    async def run_all(self, cases: List[SmokeCase]) -> List[CaseResult]:
+        """Run every case; results come back in the order of cases."""
+        base = self.work_dir / "base.qcow2"
+        await self._run_helper(["qemu-img", "create", "-f", "qcow2", str(base), "1G"])
+        limit = asyncio.Semaphore(self.jobs or len(cases) or 1)
+
+        async def bounded(case: SmokeCase) -> CaseResult:
+            async with limit:
+                return await self.run_case(case, base)
+
+        return list(await asyncio.gather(*(bounded(case) for case in cases)))
+
+    async def run_case(self, case: SmokeCase, base: Path) -> CaseResult:
+        """Boot a guest for one case and run its steps."""
+        result = CaseResult(case.name)
+        loop = asyncio.get_running_loop()
+        name = f"smoke-{case.name}"
+        admitted = False
+        started = time.monotonic()
+        try:
+            try:
+                await loop.run_in_executor(None, lambda: self.admission.admit(
+                    name, case.cores, case.memory, queue=True, timeout=case.timeout))
+                admitted = True
+            except AdmissionError as e:
+                raise CaseFailure(f"not admitted: {e}")
+            result.boot_wait = time.monotonic() - started
+
+            overlay = self.work_dir / f"{case.name}.qcow2"
+            await self._run_helper(["qemu-img", "create", "-f", "qcow2", "-b", str(base), "-F", "qcow2",
+                                    str(overlay)])
+            spec = VMSpec(name=name, cores=case.cores, memory=case.memory, iso_file=self.iso_file,
+                          disk_file=overlay, display="serial", accel=self.accel, direct_boot=self.direct_boot,
+                          qmp_socket=self.work_dir / f"{case.name}.qmp" if self.screens else None)
+            await self._run_case_guest(case, spec, result)
+        except CaseFailure as e:
+            result.status = "failed"
+            result.message = str(e)
+        except Exception as e:
+            result.status = "error"
+            result.message = f"{type(e).__name__}: {e}"
+        finally:
+            if admitted:
+                self.admission.release(name)
+            result.duration = time.monotonic() - started - result.boot_wait
+        return result
+
+    async def _run_case_guest(self, case: SmokeCase, spec: VMSpec, result: CaseResult):
+        """Start the guest and walk the steps until one fails or all pass."""
+        log_path = self.output_dir / f"{case.name}.console.log"
+        result.console_log = str(log_path)
+        screens = self.screens
+
+        def on_line(line: str):
+            session.on_line(line)
+            if screens:
+                screens.mark(spec.name, line)
+
+        with open(log_path, "w", errors="replace") as log:
+            session: Optional[ExpectSession] = None
+            handle = self.engine.spawn(build_qemu_command(spec), name=spec.name, stdin=True, timeout=case.timeout,
+                                       on_line=on_line, on_partial=lambda line: session.on_partial(line))
+            session = ExpectSession(handle, case.fail_on, log)
+            try:
+                if await handle.started() is None:
+                    raise CaseFailure(f"{spec.qemu_binary} could not be started")
+                if screens:
+                    screens.register(spec.name, spec.qmp_socket, self.screen_baseline,
+                                     case=case.name, iso=str(self.iso_file))
+                for step in case.steps:
+                    await self._run_step(session, step, result)
+                if screens:
+                    self._finish_screens(spec.name, case, result, check=True)
+            finally:
+                if screens:
+                    self._finish_screens(spec.name, case, result, check=False)
+                handle.cancel()
+                await handle.finished()
+
+    def _finish_screens(self, name: str, case: SmokeCase, result: CaseResult, check: bool):
+        """Keep a guest's boot stages; with check, fail on visual regressions against the baseline."""
+        record = self.screens.unregister(name)
+        if record is None:
+            return
+        self.boot_records[case.name] = record
+        result.boot_screens = record.summary()
+        if check and self.screen_baseline:
+            result.screen_issues = compare(self.screen_baseline, record)
+            if result.screen_issues:
+                raise CaseFailure(f"visual regression: {'; '.join(result.screen_issues)}")
+
+    @staticmethod
+    async def _run_step(session: ExpectSession, step: Step, result: CaseResult):
+        """Run one step and record its outcome; raises CaseFailure if it fails."""
+        started = time.monotonic()
+        status, message = "passed", ""
+        try:
+            if step.kind == "expect":
+                match = await session.wait_for(step.value, step.timeout)
+                if match is None:
+                    status, message = "failed", f"timed out after {step.timeout:g} s waiting for {step.value!r}"
+                else:
+                    message = f"matched {match.group(0).strip()!r}"
+            elif step.kind == "reject":
+                match = await session.wait_for(step.value, step.timeout)
+                if match is not None:
+                    status, message = "failed", f"unexpected output {match.group(0).strip()!r}"
+            elif step.kind == "send":
+                session.send(step.value)
+            elif step.kind == "sleep":
+                await asyncio.sleep(float(step.value))
+        except CaseFailure as e:
+            status, message = "failed", str(e)
+        result.steps.append(StepResult(step.kind, step.value, status, time.monotonic() - started, message))
+        if status != "passed":
+            raise CaseFailure(f"{step.kind} step {len(result.steps)}: {message}")
+
+    def close(self):
+        """Stop every guest and remove the overlays."""
+        if self.screens:
+            self.screens.stop()
+        self.engine.stop()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+def write_junit(results: List[CaseResult], path: Path, total: float):
+    """Write results as a JUnit XML report (one testcase per case, steps in system-out)."""
+    failures = sum(1 for r in results if r.status == "failed")
+    errors = sum(1 for r in results if r.status == "error")
+    suite = ET.Element("testsuite", name="cyberos-smoke", tests=str(len(results)), failures=str(failures),
+                       errors=str(errors), time=f"{total:.3f}")
+    for result in results:
+        case = ET.SubElement(suite, "testcase", classname="cyberos.smoke", name=result.name,
+                             time=f"{result.duration:.3f}")
+        if result.status in ("failed", "error"):
+            ET.SubElement(case, result.status if result.status == "error" else "failure",
+                          message=result.message).text = result.message
+        lines = [f"queued for host resources: {result.boot_wait:.3f} s"]
+        lines.extend(f"[{step.status}] {step.kind} {step.value!r} {step.duration:.3f} s {step.message}".rstrip()
+                     for step in result.steps)
+        if result.boot_screens:
+            lines.append(f"boot screens: {result.boot_screens}")
+        lines.append(f"console: {result.console_log}")
+        ET.SubElement(case, "system-out").text = "\n".join(lines)
+    ET.ElementTree(suite).write(path, encoding="utf-8", xml_declaration=True)
+
+
+def default_accel() -> str:
+    """KVM when this user can open /dev/kvm, otherwise TCG."""
+    return "kvm" if os.access("/dev/kvm", os.R_OK | os.W_OK) else "tcg"
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Boot the CyberOS ISO and run smoke tests")
+    parser.add_argument("--iso", type=Path, default=DEFAULT_ISO, help="ISO to test")
+    parser.add_argument("--cases", type=Path, default=DEFAULT_CASES, help="test case file")
+    parser.add_argument("-k", dest="keyword", help="only run cases whose name contains this")
+    parser.add_argument("-j", "--jobs", type=int, help="most guests at once (default: as many as the host allows)")
+    parser.add_argument("--direct", action="store_true",
+                        help="boot build/kernel/vmlinuz and the initramfs directly instead of the ISO")
+    parser.add_argument("--accel", default=default_accel(), help="QEMU accelerator (kvm or tcg)")
+    parser.add_argument("--output-dir", type=Path, default=Path("smoke-results"), help="console logs go here")
+    parser.add_argument("--junit", type=Path, help="write a JUnit XML report")
+    parser.add_argument("--json", type=Path, help="write a JSON report")
+    parser.add_argument("--screens", type=Path, metavar="BASELINE",
+                        help="capture boot screens and fail cases that regress against this baseline")
+    parser.add_argument("--record-screens", type=Path, metavar="BASELINE",
+                        help="capture boot screens and save the furthest boot as a baseline")
+    args = parser.parse_args()
+
+    direct_boot = DirectBoot.for_project(PROJECT_ROOT) if args.direct else None
+    if direct_boot and direct_boot.missing():
+        parser.error(f"not built: {', '.join(map(str, direct_boot.missing()))} (run ./scripts/build.sh --no-iso)")
+    if not direct_boot and not args.iso.exists():
+        parser.error(f"ISO not found: {args.iso} (run ./scripts/build.sh first)")
+    for tool in ("qemu-img", VMSpec.qemu_binary):
+        if shutil.which(tool) is None:
+            parser.error(f"{tool} is not installed")
+    cases = load_cases(args.cases, args.keyword)
+    if not cases:
+        parser.error("no test cases selected")
+
+    screen_baseline = None
+    if args.screens:
+        try:
+            screen_baseline = BootRecord.load(args.screens)
+        except (OSError, ValueError, KeyError) as e:
+            parser.error(f"cannot read screen baseline {args.screens}: {e}")
+
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    runner = SmokeRunner(args.iso, args.output_dir, args.accel, args.jobs, direct_boot,
+                         screens=bool(args.record_screens), screen_baseline=screen_baseline)
+    print(f"Running {len(cases)} smoke test(s) with {args.accel.upper()}...")
+    started = time.monotonic()
+    try:
+        results = runner.engine.submit(runner.run_all(cases)).result()
+    finally:
+        runner.close()
+    total = time.monotonic() - started
+
+    for result in results:
+        mark = "✓" if result.status == "passed" else "✗"
+        print(f"{mark} {result.name:<24} {result.status:<7} {result.duration:7.1f} s  {result.message}")
+        for step in result.steps:
+            print(f"    {step.status:<7} {step.duration:6.2f} s  {step.kind} {step.value!r}")
+        if result.boot_screens:
+            print(f"    screens  {result.boot_screens}")
+    passed = sum(1 for r in results if r.status == "passed")
+    print(f"\n{passed}/{len(results)} passed in {total:.1f} s")
+
+    if args.record_screens:
+        records = sorted(runner.boot_records.values(), key=lambda record: len(record.stages))
+        if records:
+            records[-1].save(args.record_screens)
+            print(f"Boot screen baseline ({records[-1].summary()}) saved to {args.record_screens}")
+        else:
+            print("No boot screens were captured; baseline not saved")
+    if args.junit:
+        write_junit(results, args.junit, total)
+    if args.json:
+        args.json.write_text(json.dumps({"total_time": total, "accel": args.accel, "iso": str(args.iso),
+                                         "results": [asdict(r) for r in results]}, indent=2))
+    sys.exit(0 if passed == len(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS VM Clusters
+Boots a group of networked guests headless and measures the links between them.
+
+The guests are wired together with vm_network.py: point-to-point links for
+the pair and star topologies and a user-space switch (or multicast) for a
+LAN, all without root. Each guest boots on its serial console, root logs
+in, and every NIC is given its 10.77.<link>.<n>/24 address. Then, one link
+at a time, the first guest on the link pings the others (latency) and sends
+them 10 MB with dd and nc (throughput). On switch links the switch's own
+counters give a second throughput figure that does not depend on the
+guest's tools. Guests without ping or nc get "n/a" for that measurement.
+
+Usage:
+    python3 tools/vm_cluster.py --vms 3 --topology lan
+    python3 tools/vm_cluster.py --vms 2 --topology pair --backend socket --json links.json
+    python3 tools/vm_cluster.py --vms 3 --topology star --keep   # leave it running until Ctrl+C
+"""
+
+import argparse
+import asyncio
+import json
+import shutil
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, asdict, replace
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "emulator" / "gui"))
+from admission import AdmissionController, AdmissionError
+from direct_boot import DirectBoot
+from process_engine import ProcessEngine, ProcessHandle
+from smoke_test import DEFAULT_ISO, PROJECT_ROOT, CaseFailure, ExpectSession, default_accel
+from vm_command import VMSpec, build_qemu_command
+from vm_network import BACKENDS, TOPOLOGIES, GuestNIC, NetworkError, NetworkPlan, parse_stats, qemu_version
+
+FAIL_ON = ["Kernel panic", "not syncing", "Oops:"]
+PROMPT = r"[#$] ?$"
+# Throughput test: dd blocks sent through nc to a listener on the peer
+TRANSFER_BLOCKS = 160
+TRANSFER_PORT = 5001
+SWITCH_INTERVAL = 0.5
+
+
+@dataclass
+class LinkResult:
+    """Latency and throughput from one guest to another."""
+    link: int
+    backend: str
+    source: str
+    target: str
+    target_ip: str
+    rtt_ms: Optional[float] = None
+    loss: Optional[int] = None
+    mbit_s: Optional[float] = None
+    switch_mbit_s: Optional[float] = None
+    message: str = ""
+
+
+class ClusterRunner:
+    """Starts the switches and guests of a NetworkPlan and drives their consoles."""
+
+    def __init__(self, plan: NetworkPlan, template: VMSpec, output_dir: Path, boot_timeout: float = 300):
+        self.plan = plan
+        self.template = template
+        self.output_dir = output_dir
+        self.boot_timeout = boot_timeout
+        self.admission = AdmissionController()
+        self.engine = ProcessEngine().start()
+        self.handles: Dict[str, ProcessHandle] = {}
+        self.sessions: Dict[str, ExpectSession] = {}
+        self.switches: List[ProcessHandle] = []
+        # Latest switch counters: UDP port -> (frames, bytes)
+        self.counters: Dict[int, Tuple[int, int]] = {}
+        self._admitted: List[str] = []
+        self._logs = []
+
+    def _on_stats(self, line: str):
+        counters = parse_stats(line)
+        if counters:
+            self.counters.update(counters)
+
+    async def start(self):
+        """Start the switches, then every guest in an order that lets the links connect."""
+        self.plan.cleanup()
+        for link in self.plan.links:
+            if link.backend == "switch":
+                handle = self.engine.spawn(self.plan.switch_command(link, SWITCH_INTERVAL),
+                                           name=f"switch-{link.index}", on_line=self._on_stats)
+                if await handle.started() is None:
+                    raise CaseFailure(f"switch for link {link.index} could not be started")
+                self.switches.append(handle)
+        for vm in self.plan.start_order():
+            # Every guest has to run at once, so waiting in the admission queue would deadlock
+            try:
+                self.admission.admit(vm, self.template.cores, self.template.memory)
+            except AdmissionError as e:
+                raise CaseFailure(f"{vm} does not fit on this host: {e}")
+            self._admitted.append(vm)
+            await self._start_guest(vm)
+
+    async def _start_guest(self, vm: str):
+        spec = replace(self.template, name=vm, net_args=self.plan.qemu_args(vm))
+        log = open(self.output_dir / f"{vm}.console.log", "w", errors="replace")
+        self._logs.append(log)
+        session: Optional[ExpectSession] = None
+        handle = self.engine.spawn(build_qemu_command(spec), name=vm, stdin=True,
+                                   on_line=lambda line: session.on_line(line),
+                                   on_partial=lambda line: session.on_partial(line))
+        session = ExpectSession(handle, FAIL_ON, log)
+        self.handles[vm] = handle
+        self.sessions[vm] = session
+        if await handle.started() is None:
+            raise CaseFailure(f"{spec.qemu_binary} could not be started")
+        deadline = time.monotonic() + 30
+        while not self.plan.ready(vm):
+            if not handle.running or time.monotonic() > deadline:
+                raise CaseFailure(f"{vm} did not open its network sockets")
+            await asyncio.sleep(0.2)
+
+    async def _command(self, vm: str, command: str, timeout: float = 15):
+        """Run a shell command in a guest and wait for the prompt."""
+        session = self.sessions[vm]
+        session.send(command + "\n")
+        if await session.wait_for(PROMPT, timeout) is None:
+            raise CaseFailure(f"{vm}: no prompt after {command!r}")
+
+    async def login(self, vm: str):
+        """Log in as root and configure the guest's NICs."""
+        session = self.sessions[vm]
+        if await session.wait_for("login:", self.boot_timeout) is None:
+            raise CaseFailure(f"{vm}: no login prompt after {self.boot_timeout:g} s")
+        session.send("root\n")
+        if await session.wait_for(PROMPT, 30) is None:
+            raise CaseFailure(f"{vm}: no shell prompt after logging in")
+        for nic in self.plan.nics[vm]:
+            await self._command(vm, nic.configure_command())
+
+    async def measure(self, source: GuestNIC, target: GuestNIC) -> LinkResult:
+        """Ping and a 10 MB transfer from one guest to another."""
+        link = self.plan.links[source.link]
+        result = LinkResult(link.index, link.backend, source.vm, target.vm, target.ip)
+        session = self.sessions[source.vm]
+
+        session.send(f"ping -c 5 -W 2 {target.ip}\n")
+        match = await session.wait_for(r"(\d+)% packet loss|not found", 30)
+        if match and match.group(1) is not None:
+            result.loss = int(match.group(1))
+            match = await session.wait_for(rf"min/avg/max\S* = [\d.]+/([\d.]+)/|{PROMPT}", 5)
+            if match and match.group(1):
+                result.rtt_ms = float(match.group(1))
+                await session.wait_for(PROMPT, 5)
+        else:
+            result.message = "no ping in the guest"
+            await session.wait_for(PROMPT, 5)
+
+        await self._command(target.vm, f"(nc -l -p {TRANSFER_PORT} || nc -l {TRANSFER_PORT}) >/dev/null 2>&1 &")
+        await asyncio.sleep(0.5)
+        port = link.ports.get(source.vm)
+        before = self.counters.get(port, (0, 0))[1] if port else 0
+        session.send(f"dd if=/dev/zero bs=64k count={TRANSFER_BLOCKS} 2>/tmp/dd.log"
+                     f" | nc -w 2 {target.ip} {TRANSFER_PORT}; cat /tmp/dd.log\n")
+        match = await session.wait_for(r"(\d+) bytes.*copied, ([\d.]+) ?s|not found", 120)
+        await session.wait_for(PROMPT, 10)
+        await self._command(target.vm, "kill $! 2>/dev/null")
+        if match and match.group(1):
+            seconds = max(float(match.group(2)), 1e-6)
+            result.mbit_s = int(match.group(1)) * 8 / seconds / 1e6
+            if port:
+                # Give the switch time to report the last frames
+                await asyncio.sleep(SWITCH_INTERVAL * 2)
+                sent = self.counters.get(port, (0, 0))[1] - before
+                result.switch_mbit_s = sent * 8 / seconds / 1e6
+        else:
+            result.message = "; ".join(filter(None, [result.message, "no nc in the guest"]))
+        return result
+
+    async def run(self, measure: bool = True) -> List[LinkResult]:
+        """Boot the cluster, log in everywhere and measure every link."""
+        await self.start()
+        await asyncio.gather(*(self.login(vm) for vm in self.plan.vms))
+        if not measure:
+            return []
+        # One link at a time, so transfers do not compete for the host's CPUs
+        return [await self.measure(source, target) for source, target in self.plan.peers()]
+
+    def traffic(self) -> Dict[str, Tuple[int, int]]:
+        """Frames and bytes each guest has sent through a switch."""
+        totals = {}
+        for port, (frames, sent) in self.counters.items():
+            owner = self.plan.link_of_port(port)
+            if owner:
+                link, vm = owner
+                totals[f"{vm} (link {link.index})"] = (frames, sent)
+        return totals
+
+    def close(self):
+        """Stop the guests and switches."""
+        self.engine.stop()
+        for vm in self._admitted:
+            self.admission.release(vm)
+        for log in self._logs:
+            log.close()
+        self.plan.cleanup()
+
+
+def format_value(value: Optional[float], unit: str) -> str:
+    return f"{value:,.1f} {unit}" if value is not None else "n/a"
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Boot a networked group of CyberOS guests and measure the links")
+    parser.add_argument("--vms", type=int, default=2, help="number of guests (default: 2)")
+    parser.add_argument("--topology", choices=TOPOLOGIES, default="pair")
+    parser.add_argument("--backend", choices=BACKENDS, default="auto",
+                        help="auto: stream (or socket) for point-to-point links, switch for a LAN")
+    parser.add_argument("--iso", type=Path, default=DEFAULT_ISO, help="ISO to boot")
+    parser.add_argument("--direct", action="store_true",
+                        help="boot build/kernel/vmlinuz and the initramfs directly instead of the ISO")
+    parser.add_argument("--accel", default=default_accel(), help="QEMU accelerator (kvm or tcg)")
+    parser.add_argument("--cores", type=int, default=1)
+    parser.add_argument("--memory", type=int, default=256, help="MB per guest")
+    parser.add_argument("--boot-timeout", type=float, default=300, help="seconds to wait for each login prompt")
+    parser.add_argument("--no-measure", action="store_true", help="only boot and configure the cluster")
+    parser.add_argument("--keep", action="store_true", help="keep the cluster running until Ctrl+C")
+    parser.add_argument("--output-dir", type=Path, default=Path("cluster-results"), help="console logs go here")
+    parser.add_argument("--json", type=Path, help="write the measurements as JSON")
+    args = parser.parse_args()
+
+    direct_boot = DirectBoot.for_project(PROJECT_ROOT) if args.direct else None
+    if direct_boot and direct_boot.missing():
+        parser.error(f"not built: {', '.join(map(str, direct_boot.missing()))} (run ./scripts/build.sh --no-iso)")
+    if not direct_boot and not args.iso.exists():
+        parser.error(f"ISO not found: {args.iso} (run ./scripts/build.sh first)")
+    if shutil.which(VMSpec.qemu_binary) is None:
+        parser.error(f"{VMSpec.qemu_binary} is not installed")
+
+    run_dir = Path(tempfile.mkdtemp(prefix="cyberos-cluster-"))
+    try:
+        plan = NetworkPlan([f"cluster-{n}" for n in range(1, args.vms + 1)], args.topology, args.backend,
+                           run_dir, qemu_version(VMSpec.qemu_binary))
+    except NetworkError as e:
+        parser.error(str(e))
+    print("\n".join(plan.describe()))
+
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    template = VMSpec(name="cluster", cores=args.cores, memory=args.memory, iso_file=args.iso,
+                      display="serial", accel=args.accel, direct_boot=direct_boot)
+    runner = ClusterRunner(plan, template, args.output_dir, args.boot_timeout)
+    print(f"\nBooting {args.vms} guests with {args.accel.upper()}...")
+    started = time.monotonic()
+    results: List[LinkResult] = []
+    status = 0
+    try:
+        results = runner.engine.submit(runner.run(not args.no_measure)).result()
+        print(f"Cluster up and measured in {time.monotonic() - started:.1f} s\n")
+        for r in results:
+            print(f"link {r.link} {r.backend:<6} {r.source} -> {r.target} ({r.target_ip}): "
+                  f"rtt {format_value(r.rtt_ms, 'ms')}"
+                  f"{f', {r.loss}% loss' if r.loss else ''}, throughput {format_value(r.mbit_s, 'Mbit/s')}"
+                  f"{f' (switch {r.switch_mbit_s:,.1f} Mbit/s)' if r.switch_mbit_s is not None else ''}"
+                  f"{f'  [{r.message}]' if r.message else ''}")
+        for name, (frames, sent) in runner.traffic().items():
+            print(f"switch: {name} sent {frames:,} frames, {sent / 1e6:,.1f} MB")
+        if args.keep:
+            print("\nCluster running; consoles are logged in "
+                  f"{args.output_dir}. Press Ctrl+C to stop.")
+            while all(handle.running for handle in runner.handles.values()):
+                time.sleep(1)
+    except CaseFailure as e:
+        print(f"✗ {e}", file=sys.stderr)
+        status = 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        runner.close()
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+    if args.json:
+        args.json.write_text(json.dumps({"topology": args.topology, "backend": args.backend,
+                                         "links": [link.describe() for link in plan.links],
+                                         "results": [asdict(r) for r in results]}, indent=2))
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+
+"""
+CyberOS Watch Mode
+Rebuilds what changed and relaunches the dev VM whenever the sources change.
+
+The source directories (rootfs/, scripts/, kernel/, bootloader/, config/)
+are watched with inotify on Linux; elsewhere, or when the inotify watch
+limit is reached, a polling scanner compares each file's mtime and size.
+Bursts of saves are debounced into one change set, which is mapped to the
+build stages it affects and handed to `build.sh --stages`. A build still
+running when new changes arrive is cancelled and its stages are folded into
+the next one. After a successful build the dev VM is restarted (direct
+kernel boot by default, see direct_boot.py) and the time from the first
+change to the guest's prompt is reported.
+
+Usage:
+    python3 tools/watch_mode.py              # rebuild and relaunch, console here
+    python3 tools/watch_mode.py --no-vm      # rebuild only
+    python3 tools/watch_mode.py --poll       # force the polling scanner
+"""
+
+import argparse
+import asyncio
+import ctypes
+import ctypes.util
+import errno
+import os
+import re
+import select
+import struct
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "emulator" / "gui"))
+from console_stream import ConsoleLine
+from direct_boot import DirectBoot
+from process_engine import ProcessEngine, ProcessHandle
+from vm_command import VMSpec, build_qemu_command
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+WATCHED_DIRS = ["rootfs", "scripts", "kernel", "bootloader", "config"]
+STAGES = ["kernel", "rootfs", "initramfs", "iso"]
+
+# First matching prefix wins; paths matching nothing trigger no rebuild
+STAGE_RULES: List[Tuple[str, Tuple[str, ...]]] = [
+    ("scripts/build_kernel.sh", ("kernel", "iso")),
+    ("scripts/build_rootfs.sh", ("rootfs", "initramfs", "iso")),
+    ("scripts/build_initramfs.sh", ("initramfs", "iso")),
+    ("scripts/create_iso.sh", ("iso",)),
+    ("scripts/build.sh", tuple(STAGES)),
+    ("kernel/", ("kernel", "iso")),
+    ("rootfs/", ("rootfs", "initramfs", "iso")),
+    ("bootloader/", ("iso",)),
+    ("config/", tuple(STAGES)),
+]
+# Reported when a watcher lost track of events and everything may have changed
+EVERYTHING = "*"
+
+# Quiet time after the last change before a build starts
+DEBOUNCE = 0.3
+POLL_INTERVAL = 0.5
+# What counts as the guest being ready: a login or shell prompt
+PROMPT = re.compile(r"(login:|[#$])\s*$")
+
+IN_ATTRIB = 0x004
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+_EVENT = struct.Struct("iIII")
+
+
+def ignored(name: str) -> bool:
+    """Editor swap, backup and probe files, caches and docs."""
+    return (name.startswith(".") or name.endswith(("~", ".swp", ".swx", ".tmp", ".pyc")) or name == "4913"
+            or name == "__pycache__" or name.endswith(".md"))
+
+
+def stages_for(paths: Iterable[str], direct_boot: bool = True) -> List[str]:
+    """Build stages affected by changed paths (relative to the project root), in build order."""
+    needed: Set[str] = set()
+    for path in paths:
+        if path == EVERYTHING:
+            needed.update(STAGES)
+            continue
+        for prefix, stages in STAGE_RULES:
+            if path == prefix.rstrip("/") or path.startswith(prefix):
+                needed.update(stages)
+                break
+    if direct_boot:
+        needed.discard("iso")
+    return [stage for stage in STAGES if stage in needed]
+
+
+class PollingWatcher:
+    """Finds changes by comparing (mtime, size) of every watched file."""
+
+    def __init__(self, root: Path, dirs: List[str] = WATCHED_DIRS, interval: float = POLL_INTERVAL):
+        self.root = root
+        self.dirs = dirs
+        self.interval = interval
+        self.kind = "polling"
+        self._snapshot = self._scan()
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        snapshot: Dict[str, Tuple[int, int]] = {}
+        stack = [self.root / name for name in self.dirs]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if ignored(entry.name):
+                            continue
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(Path(entry.path))
+                            continue
+                        try:
+                            info = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        snapshot[os.path.relpath(entry.path, self.root)] = (info.st_mtime_ns, info.st_size)
+            except OSError:
+                continue
+        return snapshot
+
+    def read(self, timeout: float) -> List[str]:
+        """Changed paths, waiting up to timeout for the next scan."""
+        time.sleep(min(timeout, self.interval))
+        snapshot = self._scan()
+        old = self._snapshot
+        self._snapshot = snapshot
+        changed = [path for path, stamp in snapshot.items() if old.get(path) != stamp]
+        changed.extend(path for path in old if path not in snapshot)
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Recursive inotify watches on the source directories (Linux)."""
+
+    def __init__(self, root: Path, dirs: List[str] = WATCHED_DIRS):
+        self.root = root
+        self.kind = "inotify"
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._paths: Dict[int, Path] = {}
+        try:
+            for name in dirs:
+                if (root / name).is_dir():
+                    self._watch_tree(root / name)
+        except OSError:
+            self.close()
+            raise
+
+    @staticmethod
+    def available() -> bool:
+        return sys.platform.startswith("linux")
+
+    def _watch_tree(self, top: Path):
+        """Watch a directory and everything below it; ENOSPC means the watch limit was hit."""
+        for directory, subdirs, _ in os.walk(top):
+            subdirs[:] = [name for name in subdirs if not ignored(name)]
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                if error in (errno.ENOENT, errno.ENOTDIR):
+                    continue
+                raise OSError(error, f"inotify_add_watch {directory}: {os.strerror(error)}")
+            self._paths[wd] = Path(directory)
+
+    def read(self, timeout: float) -> List[str]:
+        """Changed paths, waiting up to timeout for the first event."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return []
+        changed: List[str] = []
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0").decode(errors="replace")
+            offset += _EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                changed.append(EVERYTHING)
+                continue
+            directory = self._paths.get(wd)
+            if mask & IN_IGNORED:
+                self._paths.pop(wd, None)
+                continue
+            if directory is None or (name and ignored(name)):
+                continue
+            path = directory / name if name else directory
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                try:
+                    self._watch_tree(path)
+                except OSError:
+                    changed.append(EVERYTHING)
+            changed.append(os.path.relpath(path, self.root))
+        return changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def open_watcher(root: Path, poll: bool = False, log: Callable[[str], None] = print):
+    """inotify where possible, otherwise the polling scanner."""
+    if not poll and InotifyWatcher.available():
+        try:
+            return InotifyWatcher(root)
+        except (OSError, AttributeError) as e:
+            log(f"inotify unavailable ({e}), polling every {POLL_INTERVAL:g} s")
+    return PollingWatcher(root)
+
+
+@dataclass
+class Cycle:
+    """One change set: its build and the dev VM launch after it."""
+    number: int
+    changed: List[str]
+    stages: List[str]
+    changed_at: float
+    state: str = "building"
+    build_seconds: Optional[float] = None
+    boot_started: Optional[float] = None
+    prompt_latency: Optional[float] = None
+
+    def describe(self) -> str:
+        files = ", ".join(self.changed[:3]) + (f" (+{len(self.changed) - 3})" if len(self.changed) > 3 else "")
+        text = f"#{self.number} {files or 'start'} → {','.join(self.stages) or 'no rebuild'}: {self.state}"
+        if self.build_seconds is not None:
+            text += f", build {self.build_seconds:.1f} s"
+        if self.prompt_latency is not None:
+            text += f", change → prompt {self.prompt_latency:.1f} s"
+        return text
+
+
+class WatchLoop(threading.Thread):
+    """Watches the sources, rebuilds affected stages and relaunches the dev VM.
+
+    Builds and the VM run on the given ProcessEngine, so console callbacks
+    arrive through its dispatcher. on_cycle receives a Cycle whenever its
+    state changes.
+    """
+
+    def __init__(self, engine: ProcessEngine, project_root: Path = PROJECT_ROOT, *,
+                 direct_boot: bool = True, relaunch: bool = True, cores: int = 2, memory: int = 512,
+                 display: str = "serial", poll: bool = False, debounce: float = DEBOUNCE,
+                 log: Callable[[str], None] = print,
+                 on_cycle: Optional[Callable[[Cycle], None]] = None,
+                 on_console: Optional[Callable[[ConsoleLine], None]] = None,
+                 on_partial: Optional[Callable[[ConsoleLine], None]] = None):
+        super().__init__(daemon=True, name="cyberos-watch")
+        self.engine = engine
+        self.project_root = project_root
+        self.direct_boot = direct_boot
+        self.relaunch = relaunch
+        self.cores = cores
+        self.memory = memory
+        self.display = display
+        self.poll = poll
+        self.debounce = debounce
+        self.log = log
+        self.on_cycle = on_cycle
+        self.on_console = on_console
+        self.on_partial = on_partial
+        self.build: Optional[ProcessHandle] = None
+        self.vm: Optional[ProcessHandle] = None
+        self.watcher_kind = ""
+        self._cycles = 0
+        self._current: Optional[Cycle] = None
+        self._task = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        watcher = open_watcher(self.project_root, self.poll, self.log)
+        self.watcher_kind = watcher.kind
+        self.log(f"Watching {', '.join(WATCHED_DIRS)} ({watcher.kind})")
+        pending: List[str] = []
+        first_change = quiet_until = 0.0
+        try:
+            while not self._stop_event.is_set():
+                changes = watcher.read(0.2)
+                now = time.monotonic()
+                if changes:
+                    if not pending:
+                        first_change = now
+                    pending.extend(path for path in changes if path not in pending)
+                    quiet_until = now + self.debounce
+                elif pending and now >= quiet_until:
+                    self._start_cycle(pending, first_change)
+                    pending = []
+        finally:
+            watcher.close()
+
+    def trigger(self, stages: Optional[List[str]] = None):
+        """Rebuild (all stages by default) and relaunch without waiting for a change."""
+        self._start_cycle([], time.monotonic(), stages or stages_for([EVERYTHING], self.direct_boot))
+
+    def _start_cycle(self, changed: List[str], changed_at: float, stages: Optional[List[str]] = None):
+        """Cancel the running cycle and start one for this change set."""
+        stages = stages if stages is not None else stages_for(changed, self.direct_boot)
+        previous = self._current
+        if previous and previous.state == "building":
+            # The cancelled build's stages still have to run
+            stages = [stage for stage in STAGES if stage in stages or stage in previous.stages]
+        elif not stages:
+            return
+        self._cycles += 1
+        cycle = Cycle(self._cycles, changed, stages, changed_at)
+        self._current = cycle
+        self.engine.submit(self._replace(cycle))
+
+    async def _replace(self, cycle: Cycle):
+        """Cancel the running cycle task (engine loop) and run the new one."""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = asyncio.get_running_loop().create_task(self._run_cycle(cycle))
+
+    def _publish(self, cycle: Cycle, state: str):
+        cycle.state = state
+        self.log(cycle.describe())
+        if self.on_cycle:
+            self.on_cycle(cycle)
+
+    async def _run_cycle(self, cycle: Cycle):
+        """Build the stages, then restart the dev VM (engine loop)."""
+        script = self.project_root / "scripts" / "build.sh"
+        command = [str(script), "--stages", ",".join(cycle.stages)]
+        if self.direct_boot:
+            command.append("--no-iso")
+        started = time.monotonic()
+        self.build = self.engine.spawn(command, name=f"watch-build-{cycle.number}", cwd=str(self.project_root),
+                                       on_line=self.on_console)
+        self._publish(cycle, "building")
+        try:
+            # Shielded: cancelling the cycle must not cancel the handle's own future
+            code = await asyncio.shield(self.build.finished())
+        except asyncio.CancelledError:
+            self.build.cancel()
+            self._publish(cycle, "cancelled")
+            raise
+        cycle.build_seconds = time.monotonic() - started
+        if code != 0:
+            self._publish(cycle, f"build failed ({code})")
+            return
+        if not self.relaunch:
+            self._publish(cycle, "built")
+            return
+        await self._restart_vm(cycle)
+
+    async def _restart_vm(self, cycle: Cycle):
+        """Stop the previous dev VM and boot the new build."""
+        if self.vm and self.vm.running:
+            self.vm.cancel()
+            await asyncio.shield(self.vm.finished())
+        boot = DirectBoot.for_project(self.project_root) if self.direct_boot else None
+        spec = VMSpec(name="CyberOS-dev", cores=self.cores, memory=self.memory,
+                      iso_file=self.project_root / "iso" / "cyberos-0.1.0-alpha.iso",
+                      display=self.display, direct_boot=boot, serial_stdio=True,
+                      accel="kvm" if os.access("/dev/kvm", os.R_OK | os.W_OK) else "tcg")
+        prompt_seen = False
+
+        def check_prompt(line: ConsoleLine):
+            nonlocal prompt_seen
+            if not prompt_seen and PROMPT.search(line) and cycle is self._current:
+                prompt_seen = True
+                cycle.prompt_latency = time.monotonic() - cycle.changed_at
+                self._publish(cycle, "ready")
+
+        def on_line(line: ConsoleLine):
+            if self.on_console:
+                self.on_console(line)
+
+        def on_partial(line: ConsoleLine):
+            if self.on_partial:
+                self.on_partial(line)
+            check_prompt(line)
+
+        cycle.boot_started = time.monotonic()
+        self.vm = self.engine.spawn(build_qemu_command(spec), name=spec.name, stdin=True,
+                                    on_line=on_line, on_partial=on_partial)
+        if await asyncio.shield(self.vm.started()) is None:
+            self._publish(cycle, "VM failed to start")
+            return
+        self._publish(cycle, "booting")
+
+    def stop(self):
+        """Stop watching, cancel any build and stop the dev VM."""
+        self._stop_event.set()
+
+        async def shutdown():
+            if self._task and not self._task.done():
+                self._task.cancel()
+            for handle in (self.build, self.vm):
+                if handle and handle.running:
+                    handle.cancel()
+
+        self.engine.submit(shutdown())
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Rebuild CyberOS and relaunch the dev VM on source changes")
+    parser.add_argument("--no-vm", action="store_true", help="only rebuild")
+    parser.add_argument("--iso", action="store_true", help="boot the ISO instead of direct kernel boot")
+    parser.add_argument("--poll", action="store_true", help="use the polling scanner instead of inotify")
+    parser.add_argument("-c", "--cores", type=int, default=2)
+    parser.add_argument("-m", "--memory", type=int, default=512)
+    parser.add_argument("--display", default="serial", choices=["serial", "sdl", "vnc"],
+                        help="dev VM display; the serial console is always shown here")
+    parser.add_argument("--debounce", type=float, default=DEBOUNCE, help="quiet seconds before building")
+    parser.add_argument("--now", action="store_true", help="build everything and launch once at start")
+    args = parser.parse_args()
+
+    engine = ProcessEngine().start()
+
+    # Completed lines replace the partial line shown with \r
+    def show(line: str, end: str = "\n"):
+        sys.stdout.write(f"\r{line}{end}")
+        sys.stdout.flush()
+
+    loop = WatchLoop(engine, direct_boot=not args.iso, relaunch=not args.no_vm, cores=args.cores,
+                     memory=args.memory, display=args.display, poll=args.poll, debounce=args.debounce,
+                     log=lambda message: engine.call_soon(show, f"[watch] {message}"),
+                     on_console=show, on_partial=lambda line: show(line, ""))
+    loop.start()
+    if args.now:
+        loop.trigger()
+
+    # Typed lines go to the dev VM's serial console
+    def forward_stdin():
+        for line in sys.stdin:
+            if loop.vm and loop.vm.running:
+                loop.vm.write(line.encode())
+
+    threading.Thread(target=forward_stdin, daemon=True).start()
+    try:
+        while loop.is_alive():
+            loop.join(1.0)
+    except KeyboardInterrupt:
+        print()
+    finally:
+        loop.stop()
+        engine.stop()
+
+
+if __name__ == "__main__":
+    main()